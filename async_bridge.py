@@ -0,0 +1,786 @@
+"""
+ASGI serving mode for the Reamaze API Bridge.
+
+Serves the same tool endpoints as the Flask app in main.py (identical request
+parsing and JSON responses, via the shared helpers there), but on asyncio with
+async Reamaze and Shopify clients, so a single process can have hundreds of
+tool calls waiting on upstreams at once instead of one per sync worker.
+
+Run with:
+    uvicorn async_bridge:asgi_app --host 0.0.0.0 --port 5000 --workers 4
+
+The dashboard/report routes are only served by the Flask app.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import httpx
+
+import main
+from main import app, ReamazeAPIClient, ShopifyAPIClient
+from rate_limiter import parse_retry_after
+from bulkhead import AsyncBulkhead, BulkheadFull, bulkhead_rejection
+from circuit_breaker import CircuitOpen, circuit_open_rejection
+from singleflight import flight_key
+from deadline import start_deadline, reset_deadline, remaining_budget, cap_to_budget, deadline_exceeded
+
+logger = logging.getLogger(__name__)
+
+
+def _async_client(headers=None, auth=None):
+    return httpx.AsyncClient(
+        headers=headers,
+        auth=auth,
+        limits=httpx.Limits(
+            max_connections=app.config['ASYNC_MAX_CONNECTIONS'],
+            max_keepalive_connections=app.config['ASYNC_MAX_CONNECTIONS'],
+            keepalive_expiry=app.config['HTTP_KEEPALIVE_IDLE'] or None
+        )
+    )
+
+
+class AsyncReamazeAPIClient(ReamazeAPIClient):
+    """
+    Reamaze client on a shared httpx.AsyncClient.
+
+    Only the transport is async; the endpoint helpers inherited from
+    ReamazeAPIClient return `self._make_request(...)` and so become awaitable.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+
+    def _make_bulkhead(self):
+        return AsyncBulkhead(
+            'Reamaze',
+            max_concurrent=app.config['REAMAZE_MAX_CONCURRENCY'],
+            max_queue=app.config['BULKHEAD_MAX_QUEUE'],
+            max_wait=app.config['BULKHEAD_MAX_WAIT']
+        )
+
+    def _get_client(self):
+        if self.client is None:
+            self.client = _async_client(
+                headers=self.headers,
+                auth=(app.config['REAMAZE_EMAIL'], app.config['REAMAZE_API_TOKEN'])
+            )
+        return self.client
+
+    async def _make_request(self, method, endpoint, data=None, params=None):
+        if method.upper() == 'GET':
+            key = flight_key(method, endpoint, params)
+            return await self.singleflight.ado(key, self._send_request, method, endpoint, data, params)
+        return await self._send_request(method, endpoint, data, params)
+
+    async def _send_request(self, method, endpoint, data=None, params=None):
+        """Make HTTP request to Reamaze API with error handling and retries, within the call's deadline"""
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        min_attempt = app.config['MIN_ATTEMPT_BUDGET']
+
+        # Reuse stored GET responses: fresh ones without a request, stale ones via a conditional request
+        cache_key = flight_key(endpoint, params) if method.upper() == 'GET' else None
+        cached = self.cache.lookup(cache_key) if cache_key else None
+        if cached is not None and cached.fresh():
+            return self.cache.hit(cached)
+
+        for attempt in range(app.config['RATE_LIMIT_RETRIES']):
+            if remaining_budget(default=min_attempt) < min_attempt:
+                logger.warning(f"Deadline exhausted before attempt {attempt + 1} to {url}")
+                return deadline_exceeded()
+
+            try:
+                # sqlite may block briefly on the cross-process lock, so keep it off the event loop
+                max_wait = cap_to_budget(app.config['RATE_LIMIT_MAX_WAIT'], reserve=min_attempt)
+                granted, wait = await asyncio.to_thread(self.rate_limiter.acquire, max_wait)
+                if not granted:
+                    logger.warning(f"Rate limit budget exhausted, asking caller to retry in {wait:.1f} seconds")
+                    return {"error": "Rate limit exceeded, please try again shortly", "status_code": 429, "retry_after": round(wait, 1)}
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                logger.info(f"Making {method} request to {url}")
+
+                async with self.bulkhead.slot(max_wait=cap_to_budget(app.config['BULKHEAD_MAX_WAIT'], reserve=min_attempt)):
+                    # Fail fast while the upstream is down; only a half-open probe gets through, and
+                    # it holds its slot for the HTTP call alone, not while waiting for a token
+                    with self._breaker(method).call(failure_types=(httpx.HTTPError,)) as call:
+                        started = time.monotonic()
+                        response = await self._get_client().request(
+                            method,
+                            url,
+                            json=data,
+                            params=params,
+                            headers=cached.conditional_headers() if cached else None,
+                            timeout=self.latency.attempt_timeout(app.config['UPSTREAM_TIMEOUT'])
+                        )
+                        self.latency.record(time.monotonic() - started)
+                        call.record_status(response.status_code)
+
+                logger.info(f"Response status: {response.status_code}")
+
+                if response.status_code == 429:  # Rate limited
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if retry_after is None:
+                        retry_after = app.config['RATE_LIMIT_DELAY']
+                    await asyncio.to_thread(self.rate_limiter.penalize, retry_after)
+                    if attempt < app.config['RATE_LIMIT_RETRIES'] - 1 and retry_after <= cap_to_budget(app.config['RATE_LIMIT_MAX_WAIT'], reserve=min_attempt):
+                        logger.warning(f"Rate limited, retrying in {retry_after} seconds")
+                        continue
+                    logger.warning(f"Rate limited, asking caller to retry in {retry_after} seconds")
+                    return {"error": "Rate limit exceeded, please try again shortly", "status_code": 429, "retry_after": round(retry_after, 1)}
+
+                if response.status_code == 304 and cached is not None:
+                    return self.cache.not_modified(cache_key, cached, response.headers)
+
+                response.raise_for_status()
+                if cache_key:
+                    self.cache.store(cache_key, endpoint, response.headers, response.content)
+                else:
+                    self.cache.invalidate(endpoint)
+                return response.json() if response.content else {}
+
+            except CircuitOpen as e:
+                return circuit_open_rejection(e)
+            except BulkheadFull as e:
+                return bulkhead_rejection(e)
+            except httpx.HTTPError as e:
+                logger.error(f"Request failed (attempt {attempt + 1}): {e}")
+                backoff = 2 ** attempt  # Exponential backoff
+                if attempt < app.config['RATE_LIMIT_RETRIES'] - 1 and cap_to_budget(backoff, reserve=min_attempt) == backoff:
+                    await asyncio.sleep(backoff)
+                elif isinstance(e, httpx.TimeoutException) and remaining_budget(default=min_attempt) < min_attempt:
+                    return deadline_exceeded()
+                else:
+                    return {"error": str(e), "status_code": 500}
+
+        return {"error": "Max retries exceeded", "status_code": 500}
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class AsyncShopifyAPIClient(ShopifyAPIClient):
+    """Shopify client on a shared httpx.AsyncClient, reusing the sync client's queries and parsing"""
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+
+    def _make_bulkhead(self):
+        return AsyncBulkhead(
+            'Shopify',
+            max_concurrent=app.config['SHOPIFY_MAX_CONCURRENCY'],
+            max_queue=app.config['BULKHEAD_MAX_QUEUE'],
+            max_wait=app.config['BULKHEAD_MAX_WAIT']
+        )
+
+    def _get_client(self):
+        if self.client is None:
+            self.client = _async_client(headers=self.rest_headers)
+        return self.client
+
+    async def _read(self, query: str, variables: dict, interactive: bool = True):
+        key = flight_key(query, variables)
+        if not interactive:
+            return await self.singleflight.ado(key, self._graphql, query, variables, False)
+        return await self.singleflight.ado(key, self.hedger.arun, self._graphql, query, variables, True)
+
+    async def _graphql(self, query: str, variables: dict, interactive: bool = True):
+        if not self.graphql_url:
+            return {"error": "Shopify not configured", "status_code": 500}
+        min_attempt = app.config['MIN_ATTEMPT_BUDGET']
+        if remaining_budget(default=min_attempt) < min_attempt:
+            return deadline_exceeded()
+        cost, wait, error = self._reserve_cost(query, variables, interactive, min_attempt)
+        if error:
+            return error
+        if wait > 0:
+            await asyncio.sleep(wait)
+        settled = False
+        try:
+            # Queue for a slot before claiming the breaker, so a half-open probe is held only for the call
+            async with self.bulkhead.slot(max_wait=cap_to_budget(app.config['BULKHEAD_MAX_WAIT'], reserve=min_attempt)):
+                with self._breaker(query).call(failure_types=(httpx.HTTPError,)) as call:
+                    started = time.monotonic()
+                    response = await self._get_client().post(
+                        self.graphql_url,
+                        json={"query": query, "variables": variables},
+                        timeout=self.latency.attempt_timeout(app.config['UPSTREAM_TIMEOUT'])
+                    )
+                    self.latency.record(time.monotonic() - started)
+                    call.record_status(response.status_code)
+            logger.info(f"Shopify GraphQL status: {response.status_code}")
+            response.raise_for_status()
+            data = response.json()
+            settled = True
+            return self._graphql_result(data, query, variables, cost)
+        except CircuitOpen as e:
+            return circuit_open_rejection(e)
+        except BulkheadFull as e:
+            return bulkhead_rejection(e)
+        except httpx.TimeoutException as e:
+            logger.error(f"Shopify GraphQL request timed out: {e}")
+            if remaining_budget(default=min_attempt) < min_attempt:
+                return deadline_exceeded()
+            return {"error": str(e), "status_code": 500}
+        except httpx.HTTPError as e:
+            logger.error(f"Shopify GraphQL request failed: {e}")
+            return {"error": str(e), "status_code": 500}
+        finally:
+            if not settled:
+                self.throttle.settle(cost, query, variables, None)
+
+    async def get_order_by_number(self, order_number: str, fields=None):
+        """Find a single order by name (e.g., #1001), using GraphQL search and a wider recent scan."""
+        logger.info(f"Searching for order: {order_number}")
+
+        summary = main.indexed_order(order_number)
+        if summary:
+            order = await self.get_order_by_id(summary['id'], fields)
+            if order:
+                return order
+
+        potential_names = self._order_name_candidates(order_number)
+        search = lambda: self._search_order_names(potential_names, fields)
+        if main.order_index_ready():
+            return await search()
+        scan = lambda: self._scan_for_order(potential_names, order_number, fields)
+        return await self.hedger.arace(search, scan, self._order_race_delay())
+
+    async def _search_order_names(self, potential_names, fields=None):
+        logger.info(f"Attempting aliased GraphQL name search for {potential_names}")
+        data = await self._read(main.order_queries(fields)['name_search'], self._order_name_variables(potential_names))
+        return self._match_name_search(data, potential_names)
+
+    async def _scan_for_order(self, potential_names, order_number, fields=None):
+        logger.info("Starting wider recent scan...")
+        data = await self._read(self.ORDER_SCAN_GQL, {"first": self._order_scan_size()}, False)
+        if self._is_upstream_error(data):
+            return data
+        match = self._match_scanned_order(data, potential_names, order_number)
+        if not match:
+            return None
+        return await self.get_order_by_id(match['id'], fields)
+
+    async def get_orders_by_number(self, order_numbers):
+        """Find several orders by name, with one aliased GraphQL query per ORDER_BATCH_SIZE orders: (found, error)."""
+        found = {}
+        for start in range(0, len(order_numbers), self.ORDER_BATCH_SIZE):
+            batch = order_numbers[start:start + self.ORDER_BATCH_SIZE]
+            data = await self._read(*self._order_batch_request(batch))
+            if self._is_upstream_error(data):
+                return found, data
+            found.update(self._match_order_batch(data, batch))
+        return found, None
+
+    async def get_order_by_id(self, order_id: str, fields=None):
+        data = await self._read(main.order_queries(fields)['by_id'], {"id": order_id})
+        if self._is_upstream_error(data):
+            return data
+        return (data or {}).get('order') if isinstance(data, dict) else None
+
+    async def search_products(self, query_text: str = None, filters: dict = None, limit: int = 5, fields=None):
+        """Search products using simple natural language query + basic filters with smart sorting"""
+        filters = filters or {}
+        q, variables = self._product_search_request(query_text, filters, limit)
+        local = self._mirrored_product_search(q, variables, query_text, filters)
+        if local is not None:
+            return local
+
+        fill = self._product_fill(variables)
+        page_variables = variables
+        while page_variables is not None:
+            data = await self._read(main.product_search_query(fields), page_variables)
+            if "error" in data:
+                # With nothing kept yet an empty list would pass an outage off as "no products"
+                if not fill.products:
+                    return data
+                break  # keep what the earlier pages found
+            page_variables = self._add_product_page(fill, data, page_variables, filters)
+
+        return self._product_fill_result(fill, q, variables)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+reamaze_client = AsyncReamazeAPIClient()
+shopify_client = AsyncShopifyAPIClient()
+
+# Tool calls currently being served by this process
+STATS = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "deadline_exceeded": 0, "abandoned": 0}
+
+
+# ==========================
+# Tool endpoints (see the Flask views in main.py for the sync equivalents)
+# ==========================
+
+async def create_ticket(data):
+    fields, missing_fields = main.build_ticket_fields(data)
+    if missing_fields:
+        logger.warning(f"Ticket creation failed: Missing {', '.join(missing_fields)}")
+        return {
+            "success": False,
+            "error": f"Missing required fields: {', '.join(missing_fields)}"
+        }, 400
+
+    if main.mock_reamaze_enabled():
+        return main.mock_ticket_response(fields), 200
+
+    logger.info(f"Attempting to create Reamaze ticket for {fields['customer_email']}")
+    result = await reamaze_client.create_conversation(**fields)
+    if "error" in result:
+        logger.error(f"Reamaze API error: {result['error']}")
+        return main.upstream_error(result)
+
+    return main.format_created_ticket(result), 200
+
+
+async def search_knowledge_base(data):
+    if not data.get('query_term'):
+        return {
+            "success": False,
+            "error": "Missing required field: query_term"
+        }, 400
+
+    query_term = data['query_term']
+    max_results = data.get('max_results', 5)
+
+    result = main.mirrored_article_search(query_term, max_results) or await reamaze_client.search_articles(query_term, max_results)
+    result, stale_age = main.stale_reads.read('/search-kb', flight_key(query_term.strip().lower(), max_results), result)
+    if "error" in result:
+        logger.error(f"Failed to search knowledge base: {result['error']}")
+        return main.upstream_error(result)
+
+    return main.mark_stale(main.format_article_results(result, query_term, max_results), stale_age), 200
+
+
+async def get_instructions(data):
+    topic = data.get('topic')
+    article_id = data.get('article_id')
+
+    if not topic and not article_id:
+        return {
+            "success": False,
+            "error": "Either 'topic' or 'article_id' must be provided"
+        }, 400
+
+    if article_id:
+        result = main.mirrored_article(article_id) or await reamaze_client.get_article(article_id)
+    else:
+        search_result = main.mirrored_article_search(topic, 1) or await reamaze_client.search_articles(topic, 1)
+        if "error" in search_result:
+            return main.upstream_error(search_result)
+
+        result, error_body, status = main.first_search_article(search_result, topic)
+        if error_body:
+            return error_body, status
+
+    if "error" in result:
+        logger.error(f"Failed to get instructions: {result['error']}")
+        return main.upstream_error(result)
+
+    logger.info(f"Retrieved instructions for: {topic or article_id}")
+    return main.format_instructions(result, main.instruction_token_budget(data)), 200
+
+
+async def get_previous_conversations(data):
+    customer_email = data.get('customer_email')
+    order_number = data.get('order_number')
+    limit = data.get('limit', 10)
+
+    if not customer_email and not order_number:
+        return {
+            "success": False,
+            "error": "Either 'customer_email' or 'order_number' must be provided"
+        }, 400
+
+    if customer_email:
+        result = await reamaze_client.get_conversations(for_email=customer_email, limit=limit)
+    else:
+        result = await reamaze_client.get_conversations(q=order_number, limit=limit)
+
+    if "error" in result:
+        logger.error(f"Failed to retrieve conversations: {result['error']}")
+        return main.upstream_error(result)
+
+    return main.format_conversations(result, customer_email, order_number), 200
+
+
+async def check_ticket_status(data):
+    ticket_id = data.get('ticket_id')
+    if not ticket_id:
+        return {
+            "success": False,
+            "error": "Missing required field: ticket_id"
+        }, 400
+
+    result = await reamaze_client.get_conversation(ticket_id)
+    if "error" in result:
+        logger.error(f"Failed to get ticket status: {result['error']}")
+        if main.is_not_found(result):
+            return {
+                "success": False,
+                "error": f"Ticket not found: {ticket_id}"
+            }, 404
+        return main.upstream_error(result)
+
+    logger.info(f"Retrieved ticket status for ID: {ticket_id}")
+    return main.format_ticket_status(result), 200
+
+
+async def add_ticket_info(data):
+    required_fields = ['ticket_id', 'message', 'customer_email']
+    missing_fields = [field for field in required_fields if not data.get(field)]
+    if missing_fields:
+        return {
+            "success": False,
+            "error": f"Missing required fields: {', '.join(missing_fields)}"
+        }, 400
+
+    ticket_id = data['ticket_id']
+    customer_email = data['customer_email']
+
+    existing_ticket = await reamaze_client.get_conversation(ticket_id)
+    if "error" in existing_ticket:
+        if main.is_not_found(existing_ticket):
+            return {
+                "success": False,
+                "error": f"Ticket not found: {ticket_id}"
+            }, 404
+        return main.upstream_error(existing_ticket)
+
+    result = await reamaze_client.add_message_to_conversation(
+        conversation_id=ticket_id,
+        body=data['message'],
+        author_email=customer_email,
+        author_name=data.get('customer_name', customer_email)
+    )
+    if "error" in result:
+        logger.error(f"Failed to add message to ticket {ticket_id}: {result['error']}")
+        return main.upstream_error(result)
+
+    logger.info(f"Successfully added message to ticket {ticket_id} from {customer_email}")
+    return main.format_added_ticket_info(result, ticket_id), 200
+
+
+async def track_order(data):
+    fields, error = main.requested_fields(data, tuple(main.ORDER_FIELD_SETS), 'status')
+    if error:
+        return error
+    raw_order_number = str(data.get('order_number', '')).strip()
+    if not raw_order_number:
+        return await track_order_by_identifiers(main.order_lookup_identifiers(data), fields)
+
+    order_number = main.normalize_order_number(raw_order_number)
+    order = await shopify_client.get_order_by_number(order_number, fields)
+    order, stale_age = main.stale_reads.read('/track-order', main.field_set_key(order_number, fields), order)
+    if order and "error" in order:
+        return main.upstream_error(order)
+    if not order:
+        logger.error(f"Shopify search returned no results for order_number: {order_number}")
+        return {
+            "success": False,
+            "error": f"Order not found: {order_number}"
+        }, 404
+
+    return main.mark_stale({
+        "success": True,
+        "order": main.format_order(order, fields)
+    }, stale_age), 200
+
+
+async def track_order_by_identifiers(identifiers, fields=None):
+    error = main.order_lookup_error(identifiers)
+    if error:
+        return error
+    matches = main.order_index.find(identifiers)
+    if not matches:
+        return {
+            "success": False,
+            "error": f"No order found for that {' and '.join(kind.replace('_', ' ') for kind in identifiers)}"
+        }, 404
+    order = await shopify_client.get_order_by_id(matches[0]['id'], fields)
+    if order and "error" in order:
+        return main.upstream_error(order)
+    if not order:
+        return {
+            "success": False,
+            "error": f"Order not found: {matches[0]['name']}"
+        }, 404
+    return {
+        "success": True,
+        "order": main.format_order(order, fields),
+        "matched_by": sorted(identifiers),
+        "other_orders": main.summarize_other_orders(matches[1:5])
+    }, 200
+
+
+async def track_orders(data):
+    order_numbers = main.parse_order_numbers(data.get('order_numbers'))
+    error = main.track_orders_error(order_numbers)
+    if error:
+        return error
+
+    return main.track_orders_body(order_numbers, *await shopify_client.get_orders_by_number(order_numbers))
+
+
+async def recommend_products(data):
+    query_text, essential_filters, limit = main.build_product_search(data)
+    fields, error = main.requested_fields(data, main.PRODUCT_FIELD_SETS, 'summary')
+    if error:
+        return error
+
+    result = await shopify_client.search_products(query_text=query_text, filters=essential_filters, limit=limit, fields=fields)
+    stale_key = main.field_set_key(main.product_search_key(query_text, essential_filters, limit), fields)
+    result, stale_age = main.stale_reads.read('/recommend-products', stale_key, result)
+    if "error" in result:
+        return main.upstream_error(result)
+
+    return main.mark_stale(main.format_products(result, fields), stale_age), 200
+
+
+async def health_check(data):
+    return {
+        "status": "healthy",
+        "service": "Reamaze API Bridge",
+        "timestamp": datetime.utcnow().isoformat()
+    }, 200
+
+
+async def debug_stats(data):
+    return {
+        "async": dict(STATS),
+        "rate_limiters": {
+            "reamaze": reamaze_client.rate_limiter.stats()
+        },
+        "bulkheads": {
+            "reamaze": reamaze_client.bulkhead.stats(),
+            "shopify": shopify_client.bulkhead.stats()
+        },
+        "latency": {
+            "reamaze": reamaze_client.latency.stats(),
+            "shopify": shopify_client.latency.stats()
+        },
+        "circuit_breakers": main.circuit_breaker_stats(reamaze_client, shopify_client),
+        "hedging": {
+            "shopify": shopify_client.hedger.stats()
+        },
+        "singleflight": {
+            "reamaze": reamaze_client.singleflight.stats(),
+            "shopify": shopify_client.singleflight.stats()
+        },
+        "response_cache": {
+            "reamaze": reamaze_client.cache.stats()
+        },
+        "shopify_cost": shopify_client.throttle.stats(),
+        "stale_cache": main.stale_reads.stats(),
+        "kb_mirror": main.kb_mirror.stats(),
+        "instruction_digests": main.instruction_digests.stats(),
+        "catalog_mirror": main.catalog_mirror.stats(),
+        "product_ranking": main.product_ranker.stats(),
+        "product_fill": main.product_fill_stats.stats(),
+        "tool_cache": main.tool_cache.stats(),
+        "availability": main.product_availability.stats(),
+        "order_index": main.order_index.stats()
+    }, 200
+
+
+async def inventory_levels_webhook(data):
+    return main.inventory_webhook(data['body'], data['signature'], data['topic'])
+
+
+async def circuit_breakers(data):
+    return main.circuit_breaker_stats(reamaze_client, shopify_client), 200
+
+
+ROUTES = {
+    ('GET', '/'): health_check,
+    ('GET', '/debug-stats'): debug_stats,
+    ('GET', '/circuit-breakers'): circuit_breakers,
+    ('POST', '/create-ticket'): create_ticket,
+    ('POST', '/search-kb'): search_knowledge_base,
+    ('POST', '/get-instructions'): get_instructions,
+    ('POST', '/get-previous-conversations'): get_previous_conversations,
+    ('POST', '/check-ticket-status'): check_ticket_status,
+    ('POST', '/add-ticket-info'): add_ticket_info,
+    ('POST', '/track-order'): track_order,
+    ('POST', '/track-orders'): track_orders,
+    ('POST', '/recommend-products'): recommend_products,
+    ('POST', '/webhooks/inventory-levels'): inventory_levels_webhook,
+}
+
+# Signed by Shopify over the raw body; handed over as-is instead of as a tool payload
+WEBHOOK_PATHS = {'/webhooks/inventory-levels'}
+
+# Payloads go through the same rescue logic as the Flask views
+TOOL_PATHS = {path for method, path in ROUTES if method == 'POST'} - WEBHOOK_PATHS
+
+
+# ==========================
+# ASGI plumbing
+# ==========================
+
+def _decode_payload(scope, body):
+    """Mirror extract_payload's sources: JSON body first, then form data, then query args"""
+    headers = dict(scope.get('headers') or [])
+    content_type = headers.get(b'content-type', b'').decode('latin-1')
+    if body and 'json' in content_type:
+        return json.loads(body)
+    if body and 'application/x-www-form-urlencoded' in content_type:
+        return dict(parse_qsl(body.decode('utf-8')))
+    query_string = scope.get('query_string', b'')
+    if query_string:
+        return dict(parse_qsl(query_string.decode('utf-8')))
+    return {}
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _send_json(send, body, status, headers=None):
+    payload = (json.dumps(body, sort_keys=True, separators=(',', ':')) + "\n").encode('utf-8')
+    raw_headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(payload)).encode('latin-1'))
+    ]
+    for key, value in (headers or {}).items():
+        raw_headers.append((key.lower().encode('latin-1'), str(value).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await _warm_connections()
+            main.start_kb_mirror()
+            main.start_catalog_mirror()
+            main.start_availability_index()
+            main.start_order_index()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await reamaze_client.aclose()
+            await shopify_client.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _warm_connections():
+    if not app.config['HTTP_PREWARM']:
+        return
+    targets = [(reamaze_client, reamaze_client.base_url)]
+    if shopify_client.graphql_url:
+        targets.append((shopify_client, shopify_client.graphql_url))
+    for client, url in targets:
+        try:
+            await client._get_client().head(url, timeout=5)
+            logger.info(f"Pre-warmed async connection to {url}")
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to pre-warm async connection to {url}: {e}")
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _run_handler(handler, data, receive, budget):
+    """
+    Run a handler within the call's budget. Returns None if the client hung up
+    first, in which case the handler is cancelled so no more upstream calls are
+    made for a response nobody will read.
+    """
+    work = asyncio.ensure_future(asyncio.wait_for(handler(data), budget))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        done, _ = await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not work.done():
+            work.cancel()
+    if work not in done:
+        return None
+    return work.result()
+
+
+async def asgi_app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method = scope['method']
+    path = scope['path']
+    handler = ROUTES.get((method, path))
+    body = await _read_body(receive)
+
+    if handler is None:
+        await _send_json(send, {"success": False, "error": "Endpoint not found"}, 404)
+        return
+
+    STATS["requests"] += 1
+    STATS["in_flight"] += 1
+    STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+    budget = None
+    token = None
+    if method == 'POST':
+        headers = dict(scope.get('headers') or [])
+        header_value = headers.get(app.config['TOOL_DEADLINE_HEADER'].lower().encode('latin-1'))
+        budget = main.tool_deadline_budget(path, header_value.decode('latin-1') if header_value else None)
+        token = start_deadline(budget)
+    cache_key = None
+    try:
+        data = {}
+        if path in TOOL_PATHS:
+            data = main.normalize_payload(_decode_payload(scope, body), path)
+            cache_key = main.tool_cache_key(path, data)
+        elif path in WEBHOOK_PATHS:
+            headers = dict(scope.get('headers') or [])
+            data = {
+                "body": body,
+                "signature": headers.get(b'x-shopify-hmac-sha256', b'').decode('latin-1') or None,
+                "topic": headers.get(b'x-shopify-topic', b'').decode('latin-1') or None
+            }
+        response = main.tool_cache.get(cache_key)
+        if response is None:
+            response = await _run_handler(handler, data, receive, budget)
+            if response is not None and len(response) == 2:
+                main.tool_cache.put(cache_key, *response)
+    except asyncio.TimeoutError:
+        logger.warning(f"{path} exceeded its {budget:.1f}s deadline")
+        STATS["deadline_exceeded"] += 1
+        response = main.upstream_error(deadline_exceeded())
+    except Exception as e:
+        logger.exception(f"Unexpected error serving {path}: {e}")
+        response = ({"success": False, "error": "Internal server error"}, 500)
+    finally:
+        STATS["in_flight"] -= 1
+        if token is not None:
+            reset_deadline(token)
+
+    if response is None:
+        logger.info(f"Client disconnected, abandoned {path}")
+        STATS["abandoned"] += 1
+        return
+    await _send_json(send, *response)
@@ -0,0 +1,266 @@
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+
+from mirror_store import MirrorStore
+
+logger = logging.getLogger(__name__)
+
+# Webhook topics that carry a location's available quantity
+INVENTORY_TOPICS = ('inventory_levels/update', 'inventory_levels/connect')
+
+
+def utc_timestamp(value):
+    """Shopify timestamp (any offset) -> "2026-01-01T15:00:00Z", so stored times sort as strings"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def gid(kind, value):
+    """123 -> gid://shopify/<kind>/123 (gids pass through)"""
+    if value is None:
+        return None
+    value = str(value)
+    return value if value.startswith('gid://') else f"gid://shopify/{kind}/{value}"
+
+
+def _level_key(item, location):
+    return f"{item}|{location}"
+
+
+def parse_inventory_page(data):
+    """
+    One productVariants page -> (variant rows, level rows, pageInfo). Variant rows
+    carry the inventory item, whether it is tracked and the oversell policy; level
+    rows carry one location's available quantity.
+    """
+    connection = ((data or {}).get('productVariants') or {}) if isinstance(data, dict) else {}
+    variants, levels = {}, {}
+    for edge in connection.get('edges') or []:
+        node = edge.get('node') or {}
+        item = node.get('inventoryItem') or {}
+        row = {
+            "variant": node.get('id'),
+            "inventory_item": item.get('id'),
+            "tracked": bool(item.get('tracked')),
+            "policy": (node.get('inventoryPolicy') or 'DENY').upper()
+        }
+        variants[row["variant"]] = (f"{row['inventory_item']}|{row['tracked']}|{row['policy']}", row)
+        for level_edge in ((item.get('inventoryLevels') or {}).get('edges') or []):
+            level = level_edge.get('node') or {}
+            location = (level.get('location') or {}).get('id')
+            quantities = level.get('quantities') or [{}]
+            levels[_level_key(item.get('id'), location)] = (utc_timestamp(level.get('updatedAt')), {
+                "inventory_item": item.get('id'),
+                "location": location,
+                "available": quantities[0].get('quantity')
+            })
+    return variants, levels, connection.get('pageInfo') or {}
+
+
+class AvailabilityIndex:
+    """
+    Whether each variant can be bought right now, looked up in constant time.
+
+    Built from Shopify's inventory: which inventory item a variant draws on,
+    whether it is tracked, whether it may oversell (`CONTINUE`) and the available
+    quantity at each location. A variant is sellable if it is untracked, may
+    oversell, or has stock somewhere. Inventory-level webhook events update
+    single levels as they happen; a full sync every `sync_interval` seconds
+    catches anything missed and drops deleted variants.
+
+    Like the mirrors, rows live in a sqlite file shared by the workers on a
+    host (one syncs at a time) and every worker reloads when the version
+    moves. Levels keep the newest `updated_at` seen, so an event that arrives
+    late (or a sync page read before it) can't undo a newer one. Variants the
+    index hasn't seen count as sellable, and nothing is filtered once the last
+    sync is older than `max_age`.
+    """
+
+    def __init__(self, db_path, sync_interval, max_age, lease=600):
+        self.variant_store = MirrorStore(db_path, 'availability_variants', lease)
+        self.level_store = MirrorStore(db_path, 'availability_levels', lease)
+        self.sync_interval = sync_interval
+        self.max_age = max_age
+        # Bumped whenever sellable flags may have changed (callers cache per generation)
+        self.generation = 0
+        self.syncs = 0
+        self.sync_failures = 0
+        self.events = 0
+        self.late_events = 0
+        self.ignored_events = 0
+        self.last_event_at = None
+        self.last_error = None
+        self._versions = (0, 0)
+        self._synced_at = 0.0
+        self._variants = {}
+        self._by_item = {}
+        self._levels = {}
+        self._sellable = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ---- sync (writer side) ----
+
+    def sync(self, source, force=False):
+        """
+        Reload every variant's inventory through `source` (a ShopifyAPIClient).
+        Returns True if the index is now current, False if skipped or failed.
+        """
+        due = None if force else (lambda state: state['synced_at'] <= time.time() - self.sync_interval)
+        token = self.variant_store.claim(due)
+        if token is None:
+            return False
+        variants, levels, after = {}, {}, None
+        try:
+            while True:
+                page = source.inventory_page(after)
+                if isinstance(page, dict) and "error" in page:
+                    raise RuntimeError(f"inventory sync failed: {page['error']}")
+                page_variants, page_levels, page_info = parse_inventory_page(page)
+                variants.update(page_variants)
+                levels.update(page_levels)
+                if not page_info.get('hasNextPage'):
+                    break
+                after = page_info.get('endCursor')
+            self.variant_store.apply(variants, replace=True)
+            self.level_store.apply(levels, replace=True, only_newer=True)
+        except Exception as e:
+            self.sync_failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Availability sync failed: {e}")
+            self.variant_store.release(token)
+            return False
+        self.variant_store.release(token, synced_at=time.time())
+        self.syncs += 1
+        self.last_error = None
+        return True
+
+    def apply_event(self, topic, event):
+        """
+        Record an inventory-level webhook event (topic and decoded body).
+        Returns False if it was ignored (other topic, or older than what is stored).
+        """
+        if topic not in INVENTORY_TOPICS or not isinstance(event, dict):
+            self.ignored_events += 1
+            return False
+        item = gid('InventoryItem', event.get('inventory_item_id'))
+        location = gid('Location', event.get('location_id'))
+        updated_at = utc_timestamp(event.get('updated_at'))
+        if item is None or location is None:
+            self.ignored_events += 1
+            return False
+        row = {"inventory_item": item, "location": location, "available": event.get('available')}
+        changed, _ = self.level_store.apply({_level_key(item, location): (updated_at, row)}, only_newer=True)
+        self.events += 1
+        self.last_event_at = time.time()
+        if not changed:
+            self.late_events += 1
+            return False
+        # Visible to this worker now; the others pick it up on their next refresh
+        with self._lock:
+            self._levels.setdefault(item, {})[location] = row["available"]
+            self._update_item(item)
+        return True
+
+    # ---- lookups (reader side) ----
+
+    def refresh(self):
+        """Reload if another worker (or this one) changed the stored inventory"""
+        state = self.variant_store.state()
+        self._synced_at = state['synced_at']
+        versions = (state['version'], self.level_store.state()['version'])
+        if versions == self._versions:
+            return False
+        variant_version, variants = self.variant_store.load()
+        level_version, levels = self.level_store.load()
+        with self._lock:
+            self._variants = {row['variant']: row for row in variants}
+            self._by_item = {}
+            for row in variants:
+                self._by_item.setdefault(row['inventory_item'], []).append(row['variant'])
+            self._levels = {}
+            for row in levels:
+                self._levels.setdefault(row['inventory_item'], {})[row['location']] = row['available']
+            self._sellable = {variant: self._is_sellable(row) for variant, row in self._variants.items()}
+            self._versions = (variant_version, level_version)
+            self.generation += 1
+        return True
+
+    def ready(self):
+        return bool(self._variants) and time.time() - self._synced_at <= self.max_age
+
+    def sellable(self, variant_id):
+        """Whether a variant can be bought (True when unknown or the index is out of date)"""
+        if not self.ready():
+            return True
+        return self._sellable.get(variant_id, True)
+
+    def quantity(self, variant_id):
+        """Available quantity across locations, or None if untracked or unknown"""
+        row = self._variants.get(variant_id)
+        if row is None or not row['tracked']:
+            return None
+        return sum(q or 0 for q in self._levels.get(row['inventory_item'], {}).values())
+
+    def allowed(self, products):
+        """Sellable flag per variant across `products` (ProductRanker's `allowed`), or None if nothing is hidden"""
+        flags = [self.sellable(v.get('id')) for p in products for v in p.get('variants') or []]
+        return None if all(flags) else flags
+
+    def _is_sellable(self, row):
+        if not row['tracked'] or row['policy'] == 'CONTINUE':
+            return True
+        return any((q or 0) > 0 for q in self._levels.get(row['inventory_item'], {}).values())
+
+    def _update_item(self, item):
+        for variant in self._by_item.get(item, ()):
+            self._sellable[variant] = self._is_sellable(self._variants[variant])
+        self.generation += 1
+
+    # ---- background loop ----
+
+    def start(self, source):
+        """Keep the index synced and this worker's view current from a daemon thread"""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, args=(source,), name='availability', daemon=True)
+        self._thread.start()
+
+    def _run(self, source):
+        while True:
+            try:
+                self.sync(source)
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception(f"Availability loop error: {e}")
+            # Events land in the shared file; reload them well inside the sync interval
+            time.sleep(min(self.sync_interval, 30) * random.uniform(0.5, 1.0))
+
+    def stats(self):
+        sellable = sum(self._sellable.values())
+        return {
+            "ready": self.ready(),
+            "variants": len(self._variants),
+            "sellable": sellable,
+            "sold_out": len(self._sellable) - sellable,
+            "synced_seconds_ago": round(time.time() - self._synced_at, 1) if self._synced_at else None,
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+            "events": self.events,
+            "late_events": self.late_events,
+            "ignored_events": self.ignored_events,
+            "last_event_seconds_ago": round(time.time() - self.last_event_at, 1) if self.last_event_at else None,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync gunicorn deployment vs. the ASGI serving mode.
+
+Starts a fake Reamaze/Shopify upstream with a fixed response latency, then
+runs the bridge both ways against it and drives /search-kb and /track-order
+at a fixed concurrency, reporting requests/sec and latency percentiles.
+
+Usage:
+    python3 bench_async_bridge.py --concurrency 200 --requests 2000 --upstream-latency 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+UPSTREAM_LATENCY = float(os.environ.get('BENCH_UPSTREAM_LATENCY', '0.2'))
+
+
+async def fake_upstream(scope, receive, send):
+    """Minimal Reamaze + Shopify stand-in that answers after UPSTREAM_LATENCY seconds"""
+    if scope['type'] != 'http':
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                await send({'type': message['type'] + '.complete'})
+                if message['type'] == 'lifespan.shutdown':
+                    return
+        return
+
+    while (await receive()).get('more_body'):
+        pass
+    await asyncio.sleep(UPSTREAM_LATENCY)
+
+    if scope['path'].endswith('/graphql.json'):
+        body = {"data": {"orders": {"edges": [{"node": {
+            "id": "gid://shopify/Order/1", "name": "#1001", "displayFulfillmentStatus": "FULFILLED",
+            "fulfillments": [], "lineItems": {"edges": []}
+        }}]}}}
+    else:
+        body = {"articles": [{"id": 1, "title": "Band sizing", "slug": "band-sizing", "body": "Measure your wrist.", "url": "u"}], "total_count": 1}
+
+    payload = json.dumps(body).encode()
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def start(cmd, env):
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def drive(port, path, payload, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "rps": total / elapsed,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "errors": errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync gunicorn vs ASGI bridge throughput')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--upstream-latency', type=float, default=UPSTREAM_LATENCY)
+    parser.add_argument('--sync-workers', type=int, default=4)
+    parser.add_argument('--async-workers', type=int, default=1)
+    args = parser.parse_args()
+
+    upstream_port, sync_port, async_port = free_port(), free_port(), free_port()
+    tmp = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        BENCH_UPSTREAM_LATENCY=str(args.upstream_latency),
+        REAMAZE_API_TOKEN='bench', REAMAZE_EMAIL='bench@example.com',
+        REAMAZE_BASE_URL=f"http://127.0.0.1:{upstream_port}/api/v1",
+        SHOPIFY_STORE_DOMAIN='bench.myshopify.com', SHOPIFY_ADMIN_TOKEN='bench',
+        SHOPIFY_ADMIN_GRAPHQL_URL=f"http://127.0.0.1:{upstream_port}/admin/api/graphql.json",
+        REAMAZE_RATE_LIMIT_PER_SECOND='1000000', REAMAZE_RATE_LIMIT_BURST='1000000',
+        RATE_LIMIT_DB_PATH=os.path.join(tmp, 'ratelimit.sqlite3'),
+        FLASK_DEBUG='False', LOG_LEVEL='WARNING'
+    )
+
+    procs = [start([sys.executable, '-m', 'uvicorn', 'bench_async_bridge:fake_upstream', '--port', str(upstream_port), '--log-level', 'warning'], env)]
+    procs.append(start([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(args.sync_workers),
+                        '-b', f"127.0.0.1:{sync_port}", 'main:app'], env))
+    procs.append(start([sys.executable, '-m', 'uvicorn', 'async_bridge:asgi_app', '--port', str(async_port),
+                        '--workers', str(args.async_workers), '--log-level', 'warning'], env))
+    try:
+        for port in (upstream_port, sync_port, async_port):
+            wait_for_port(port)
+
+        print(f"Upstream latency {args.upstream_latency * 1000:.0f} ms, concurrency {args.concurrency}, {args.requests} requests per run")
+        print(f"{'endpoint':<14} {'mode':<24} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for path, payload in (('/search-kb', {"query_term": "band size"}), ('/track-order', {"order_number": "1001"})):
+            for label, port in ((f"sync gunicorn -w {args.sync_workers}", sync_port), (f"asgi uvicorn -w {args.async_workers}", async_port)):
+                result = asyncio.run(drive(port, path, payload, args.requests, args.concurrency))
+                print(f"{path:<14} {label:<24} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7}")
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
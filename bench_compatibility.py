@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compatibility index build time and lookup latency.
+
+Builds the index over the product titles in products.json (repeated to reach
+the requested catalog size, with Apple-style size variants on band products)
+and times lookups for common watch_model / size requests, cold (first lookup
+of a request) and memoized.
+
+Usage:
+    python3 bench_compatibility.py
+    python3 bench_compatibility.py --sizes 425 5000 20000
+"""
+
+import json
+import time
+import argparse
+
+from compatibility import CompatibilityIndex, parse_request
+
+REQUESTS = [
+    ("Series 7", "45mm"), ("Series 9", "41mm"), ("Apple Watch SE", "40mm"), ("Ultra 2", None),
+    ("Series 10", "42mm"), (None, "44mm"), ("Galaxy Watch 6", None), ("Fitbit Versa 2", None),
+    ("Fitbit Charge 5", None), ("Pixel Watch 2", None),
+]
+
+
+def catalog(titles, size):
+    documents = []
+    for i in range(size):
+        title = titles[i % len(titles)]
+        variants = ["Black / 38/40/41mm", "Black / 42/44/45/49mm"] if 'band' in title.lower() else ["Default Title"]
+        documents.append((title, variants))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time compatibility index builds and lookups')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[425, 5000, 20000], help='catalog sizes')
+    parser.add_argument('--products', default='products.json', help='JSON list of product titles')
+    args = parser.parse_args()
+
+    with open(args.products) as f:
+        titles = json.load(f)
+    specs = [parse_request(model, size) for model, size in REQUESTS]
+
+    print(f"{'products':>9} {'build ms':>9} {'cold lookup us':>15} {'memo lookup us':>15} {'avg candidates':>15}")
+    for size in args.sizes:
+        index = CompatibilityIndex(catalog(titles, size))
+        started = time.perf_counter()
+        results = [index.lookup(spec) for spec in specs]
+        cold_us = (time.perf_counter() - started) / len(specs) * 1e6
+        repeats = 1000
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for spec in specs:
+                index.lookup(spec)
+        memo_us = (time.perf_counter() - started) / (repeats * len(specs)) * 1e6
+        candidates = sum(map(len, results)) / len(results)
+        print(f"{size:>9} {index.build_ms:>9.1f} {cold_us:>15.1f} {memo_us:>15.3f} {candidates:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
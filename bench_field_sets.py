@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: caller-selected field sets on /track-order and /recommend-products.
+
+Runs order lookups and product searches against the offline Shopify stand-in
+(which answers only the fields a query selects) and reports, per field set,
+the query's estimated cost, the response bytes and cost points actually
+spent per call, and the time to shape and serialize the answer
+(format_order / format_products plus json.dumps).
+
+The "all" rows are what every caller got before `fields` existed.
+
+Usage:
+    python3 bench_field_sets.py
+    python3 bench_field_sets.py --lookups 200 --items 5
+"""
+
+import os
+import json
+import time
+import argparse
+
+os.environ.setdefault('REAMAZE_API_TOKEN', 'bench')
+os.environ.setdefault('REAMAZE_EMAIL', 'bench@example.com')
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+import main as bridge
+from field_sets import ORDER_FIELD_SETS, PRODUCT_FIELD_SETS, parse_field_set, order_queries, product_search_query
+from shopify_standin import ShopifyStandIn
+from shopify_throttle import estimate_query_cost
+from bench_order_lookup import make_order
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+ORDER_CASES = ["all", "status", "status,tracking", "status,customer,shipping", "items"]
+PRODUCT_CASES = ["all", "summary", "variants", "images"]
+
+
+def make_product(number):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": f"Leather Band {number}", "handle": f"leather-band-{number}",
+        "onlineStoreUrl": f"https://astrastraps.com/products/leather-band-{number}",
+        "featuredImage": {"url": f"https://cdn.example/{number}.jpg"},
+        "createdAt": "2025-06-01T00:00:00Z", "updatedAt": "2026-01-01T00:00:00Z",
+        "variants": {"edges": [
+            {"node": {"id": f"gid://shopify/ProductVariant/{number}{size}", "title": f"Black / {size}mm",
+                      "sku": f"AS-LE-{number}-{size}", "price": "39.99", "compareAtPrice": "59.99",
+                      "image": {"url": f"https://cdn.example/{number}-{size}.jpg"}}}
+            for size in (38, 41, 42, 44, 45, 49)
+        ]}
+    }
+
+
+def make_client(standin):
+    client = bridge.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    return client
+
+
+def timed(fn, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def bench_orders(args):
+    order = make_order(1234)
+    order["lineItems"]["edges"] *= args.items // 2 or 1
+    print(f"order lookups by id ({len(order['lineItems']['edges'])} line items)")
+    print(f"{'fields':>26} {'est cost':>9} {'bytes':>7} {'points':>7} {'shape us':>9}")
+    for case in ORDER_CASES:
+        fields, _ = parse_field_set(case, tuple(ORDER_FIELD_SETS), 'status')
+        standin = ShopifyStandIn(orders=[order], restore_rate=100000)
+        client = make_client(standin)
+        for _ in range(args.lookups):
+            node = client.get_order_by_id(order["id"], fields)
+        cost = estimate_query_cost(order_queries(fields)['by_id'], {"id": order["id"]})
+        shape = timed(lambda: json.dumps(bridge.format_order(node, fields)), args.repeats)
+        print(f"{case:>26} {cost:>9} {standin.bytes_sent / args.lookups:>7.0f} "
+              f"{standin.points_spent / args.lookups:>7.0f} {shape:>9.1f}")
+
+
+def bench_products(args):
+    print(f"\nproduct searches ({args.limit} results, 6 variants each)")
+    print(f"{'fields':>26} {'est cost':>9} {'bytes':>7} {'points':>7} {'shape us':>9}")
+    variables = {"q": "", "first": args.limit, "sortKey": "RELEVANCE", "reverse": False, "after": None}
+    for case in PRODUCT_CASES:
+        fields, _ = parse_field_set(case, PRODUCT_FIELD_SETS, 'summary')
+        standin = ShopifyStandIn(products=[make_product(n) for n in range(args.limit * 3)], restore_rate=100000)
+        client = make_client(standin)
+        for _ in range(args.lookups):
+            result = client.search_products(query_text="leather band", limit=args.limit, fields=fields)
+        calls = standin.calls or 1
+        cost = estimate_query_cost(product_search_query(fields), variables)
+        shape = timed(lambda: json.dumps(bridge.format_products(result, fields)), args.repeats)
+        print(f"{case:>26} {cost:>9} {standin.bytes_sent / calls:>7.0f} {standin.points_spent / calls:>7.0f} {shape:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query cost, bytes and shaping time per caller-selected field set')
+    parser.add_argument('--lookups', type=int, default=50, help='calls per field set')
+    parser.add_argument('--repeats', type=int, default=2000, help='timed format + json.dumps runs per field set')
+    parser.add_argument('--items', type=int, default=4, help='line items per order')
+    parser.add_argument('--limit', type=int, default=5, help='products per search')
+    args = parser.parse_args()
+
+    bridge.app.config['ORDER_INDEX_ENABLED'] = False
+    bridge.app.config['CATALOG_MIRROR_ENABLED'] = False
+    bench_orders(args)
+    bench_products(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: typo-tolerant product retrieval (character n-gram TF-IDF) vs BM25 alone.
+
+Runs a labelled set of product queries against the product titles in
+products.json and reports recall@5 (the expected product is among the first
+five results), top-1 accuracy and per-query latency for:
+
+  - bm25:   the word-level BM25 index the catalog mirror used on its own
+  - ngram:  character n-gram TF-IDF cosine similarity alone
+  - mirror: BM25, switching to n-gram similarity when a query has words no
+            product contains (what CatalogMirror.search does)
+
+The queries are product names as customers and the LLM wrote them in the
+conversations behind the analysis reports, plus misspelled variants.
+
+Usage:
+    python3 bench_fuzzy_search.py
+    python3 bench_fuzzy_search.py --repeats 200 --verbose
+"""
+
+import json
+import time
+import argparse
+
+from kb_mirror import BM25Index
+from fuzzy_search import NgramIndex
+
+# (query as asked, product it should find)
+LABELLED = [
+    ("Neptune band", "Neptuse Silicone Band"),
+    ("Neptuse band", "Neptuse Silicone Band"),
+    ("nepture silicone", "Neptuse Silicone Band"),
+    ("Oscen sports band", "Oscen Silicone Sports Band"),
+    ("oscen", "Oscen Silicone Sports Band"),
+    ("Monstro Milanese band", "Monstro Milanese Steel Band For Fitbit Series"),
+    ("Jasper Milanese band", "Jasper Milanese Stainless Steel Band With Case"),
+    ("jasper millanese with case", "Jasper Milanese Stainless Steel Band With Case"),
+    ("Gleamin strap", "Gleamin Luxury Diamond Band"),
+    ("gleaming diamond band", "Gleamin Luxury Diamond Band"),
+    ("Cypress band", "Cypress Silicone Band"),
+    ("cyprus silicon band", "Cypress Silicone Band"),
+    ("Tango elastic nylon", "Tango Elastic Nylon Band For Google Pixel Watch"),
+    ("Aere band", "Aere Slim Stainless Steel Band"),
+    ("aire slim stainless", "Aere Slim Stainless Steel Band"),
+    ("Sedeo magnetic band", "Sedeo Magnetic Stainless Steel Band"),
+    ("Noceo band", "Noceo Magnetic Milanese Steel Band"),
+    ("noceo magnetic milanise", "Noceo Magnetic Milanese Steel Band"),
+    ("Ignotus retro band", "Ignotus Retro Leather Band"),
+    ("ignotis retro leather", "Ignotus Retro Leather Band"),
+    ("Saddle Brown Marley Magnetic Leather Band", "Marley Magnetic Leather Band"),
+    ("marly magnetic lether", "Marley Magnetic Leather Band"),
+    ("Durus titanium band", "Durus Upgraded Titanium Steel Band"),
+    ("Nix Nylon Band", "Nix Nylon Band"),
+    ("nix nylong band", "Nix Nylon Band"),
+    ("Arceo braided loop", "Arceo Braided Loop Band"),
+    ("Vistel leather link", "Vistel Slim Leather Link Band"),
+    ("vistell slim leather link strap", "Vistel Slim Leather Link Band"),
+    ("Devito stainless steel band", "Devito Stainless Steel Band"),
+    ("devitto steel", "Devito Stainless Steel Band"),
+    ("Ire luxury metal band", "Ire Luxury Metal Band"),
+    ("Avoco magnetic silicone", "Avoco Magnetic Silicone Band"),
+    ("avacado magnetic silicone band", "Avoco Magnetic Silicone Band"),
+    ("Fari braided loop", "Fari Braided Loop Band"),
+    ("Nauta braided nylon galaxy", "Nauta Braided Nylon Galaxy Band"),
+    ("Thano band", "Thano Stainless Steel Band"),
+    ("Ferveo band", "Ferveo Loop Band + Case"),
+    ("Agere band", "Agere Magnetic D-Buckle Galaxy Sports Band"),
+    ("Adamo strap", "Adamo Slim Leather Band"),
+    ("Capita Milanese band", "Capita Milanese Stainless Steel Band"),
+    ("Festino leather band", "Festino Leather Band For Google Pixel Watch"),
+    ("Echo resin strap", "Echo Resin Metal Band"),
+]
+
+
+def recall_at(results, expected, k=5):
+    return expected in results[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall@5 and latency of n-gram product retrieval vs BM25')
+    parser.add_argument('--products', default='products.json', help='JSON list of product titles')
+    parser.add_argument('--repeats', type=int, default=100, help='timed runs per query')
+    parser.add_argument('--verbose', action='store_true', help='print the queries each engine misses')
+    args = parser.parse_args()
+
+    with open(args.products) as f:
+        titles = json.load(f)
+    missing = {expected for _, expected in LABELLED} - set(titles)
+    if missing:
+        raise SystemExit(f"Labelled products not in {args.products}: {sorted(missing)}")
+
+    started = time.perf_counter()
+    bm25 = BM25Index([(title, '') for title in titles])
+    bm25_build_ms = (time.perf_counter() - started) * 1000
+    fuzzy = NgramIndex([(i, None, title, '') for i, title in enumerate(titles)])
+    # One product renamed: the rebuild re-tokenizes only that product
+    renamed = list(titles)
+    renamed[0] = renamed[0] + " Renamed"
+    rebuilt = NgramIndex([(i, 'v2' if i == 0 else None, title, '') for i, title in enumerate(renamed)], previous=fuzzy)
+
+    def bm25_search(query):
+        return [doc for doc, _ in bm25.search(query, 5)]
+
+    def ngram_search(query):
+        return [doc for doc, _ in fuzzy.search(query, 5)]
+
+    def mirror_search(query):
+        order = bm25_search(query)
+        if not order or bm25.unknown_terms(query):
+            order = [doc for doc, _ in fuzzy.search(query, 5)] or order
+        return order
+
+    print(f"{len(titles)} products, {len(LABELLED)} labelled queries")
+    print(f"build: bm25 {bm25_build_ms:.1f} ms, n-gram {fuzzy.build_ms:.1f} ms "
+          f"(incremental rebuild after one change {rebuilt.build_ms:.1f} ms, {rebuilt.reused} reused)")
+    print(f"{'engine':>8} {'recall@5':>9} {'top-1':>6} {'avg us':>9} {'p99 us':>9}")
+    for name, search in (("bm25", bm25_search), ("ngram", ngram_search), ("mirror", mirror_search)):
+        hits, top, timings, misses = 0, 0, [], []
+        for query, expected in LABELLED:
+            results = [titles[doc] for doc in search(query)]
+            top += recall_at(results, expected, k=1)
+            if recall_at(results, expected):
+                hits += 1
+            else:
+                misses.append((query, results[:3]))
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                search(query)
+                timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        print(f"{name:>8} {hits / len(LABELLED):>9.2f} {top / len(LABELLED):>6.2f} {sum(timings) / len(timings):>9.1f} "
+              f"{timings[int(len(timings) * 0.99)]:>9.1f}")
+        if args.verbose:
+            for query, results in misses:
+                print(f"    missed {query!r}: {results}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: local KB mirror (BM25) vs. Reamaze's live /articles?q= search.
+
+Syncs every article into a throwaway mirror, then runs each query against
+both and reports per-query latency and how many of the live top-k results
+the mirror also returns (overlap@k).
+
+Usage:
+    python3 bench_kb_search.py                      # live comparison (needs REAMAZE_* credentials)
+    python3 bench_kb_search.py --queries queries.txt --k 5
+    python3 bench_kb_search.py --synthetic 2000     # mirror latency only, on generated articles
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+
+DEFAULT_QUERIES = [
+    "band size", "how do I measure my wrist", "return policy", "exchange for a different size",
+    "shipping time", "international shipping", "order status", "cancel my order",
+    "leather band care", "magnetic band", "apple watch ultra", "warranty",
+    "discount code", "change shipping address", "damaged item", "refund",
+]
+
+WORDS = (
+    "band strap leather silicone magnetic milanese loop sport nylon metal link buckle clasp watch ultra series "
+    "size wrist measure fit small medium large order ship shipping delivery tracking return exchange refund "
+    "warranty damaged replace cancel address discount code gift care clean water sweat color black white"
+).split()
+
+
+def synthetic_articles(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        "id": i,
+        "slug": f"article-{i}",
+        "title": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).capitalize(),
+        "body": "<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 400))) + "</p>",
+        "updated_at": "2025-01-01T00:00:00Z"
+    } for i in range(count)]
+
+
+def timed(fn, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - started) / repeats * 1000, result
+
+
+def ids(result, k):
+    return [article.get('id') or article.get('slug') for article in (result or {}).get('articles', [])[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare local KB mirror search with live Reamaze search')
+    parser.add_argument('--queries', help='file with one query per line (default: built-in support queries)')
+    parser.add_argument('--k', type=int, default=5, help='results per query')
+    parser.add_argument('--repeats', type=int, default=200, help='mirror searches per query for timing')
+    parser.add_argument('--synthetic', type=int, default=0, help='index N generated articles instead of syncing from Reamaze')
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    from kb_mirror import KnowledgeBaseMirror
+    mirror = KnowledgeBaseMirror(os.path.join(tempfile.mkdtemp(), 'kb.sqlite3'), sync_interval=0, max_age=3600)
+
+    live = None
+    if args.synthetic:
+        articles = synthetic_articles(args.synthetic)
+        fetch_page = (lambda page: {"articles": articles, "page_count": 1})
+    else:
+        from main import reamaze_client
+        live = reamaze_client
+        fetch_page = reamaze_client.list_articles
+
+    started = time.perf_counter()
+    if not mirror.sync(fetch_page, force=True):
+        raise SystemExit(f"Sync failed: {mirror.last_error}")
+    synced = time.perf_counter()
+    mirror.refresh()
+    indexed = time.perf_counter()
+    stats = mirror.stats()
+    print(f"Mirrored {stats['articles']} articles in {(synced - started) * 1000:.0f} ms, "
+          f"indexed {stats['terms']} terms in {(indexed - synced) * 1000:.1f} ms")
+
+    print(f"{'query':<32} {'mirror ms':>10} {'live ms':>9} {'overlap@' + str(args.k):>10}")
+    mirror_total, live_total, overlaps = 0.0, 0.0, []
+    for query in queries:
+        mirror_ms, local = timed(lambda: mirror.search(query, args.k), args.repeats)
+        mirror_total += mirror_ms
+        if live is None:
+            print(f"{query[:32]:<32} {mirror_ms:>10.3f} {'-':>9} {'-':>10}")
+            continue
+        live_ms, remote = timed(lambda: live.search_articles(query, args.k), 1)
+        live_total += live_ms
+        expected = ids(remote, args.k)
+        overlap = len(set(expected) & set(ids(local, args.k))) / len(expected) if expected else None
+        if overlap is not None:
+            overlaps.append(overlap)
+        print(f"{query[:32]:<32} {mirror_ms:>10.3f} {live_ms:>9.1f} {'-' if overlap is None else f'{overlap:.2f}':>10}")
+
+    print(f"\nmean mirror latency {mirror_total / len(queries):.3f} ms")
+    if live is not None:
+        print(f"mean live latency   {live_total / len(queries):.1f} ms")
+        if overlaps:
+            print(f"mean overlap@{args.k}     {sum(overlaps) / len(overlaps):.2f} over {len(overlaps)} queries with live results")
+
+
+if __name__ == '__main__':
+    main()
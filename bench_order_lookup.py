@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /track-order name lookups, sequential searches vs one aliased search raced by the scan.
+
+Runs lookups against the offline Shopify stand-in (with a fixed per-call
+latency) and reports round-trips, response bytes, cost points and latency
+per lookup for:
+
+  - before: a name search for "#1234", then one for "1234" (each returning up
+            to five full orders), then the names-only scan of recent orders
+            and a fetch of the match
+  - after:  ShopifyAPIClient.get_order_by_number: both name forms in one
+            aliased query, raced by the names-only scan and a fetch of the match
+
+for orders the search index has, orders only the scan finds (not indexed
+yet), and names that don't exist. The order index is left out (it would
+answer all three without a search).
+
+Usage:
+    python3 bench_order_lookup.py
+    python3 bench_order_lookup.py --orders 1000 --lookups 50 --latency 0.1
+"""
+
+import os
+import time
+import argparse
+
+os.environ.setdefault('REAMAZE_API_TOKEN', 'bench')
+os.environ.setdefault('REAMAZE_EMAIL', 'bench@example.com')
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+import main as bridge
+from shopify_standin import ShopifyStandIn
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+# The name search get_order_by_number sent once per name form before
+LEGACY_ORDER_SEARCH_GQL = """
+        query($q: String!) {
+          orders(first: 5, query: $q) {
+            edges { node { """ + bridge.ShopifyAPIClient.ORDER_FIELDS + """
+            } }
+          }
+        }
+        """
+
+
+def make_order(number):
+    return {
+        "id": f"gid://shopify/Order/{number}", "name": f"#{number}",
+        "processedAt": f"2026-01-01T{number // 3600 % 24:02d}:{number // 60 % 60:02d}:{number % 60:02d}Z",
+        "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+        "customer": {"displayName": "Jane Smith", "email": "jane@example.com"},
+        "shippingAddress": {"name": "Jane Smith", "address1": "1 Main St", "address2": None, "city": "Austin",
+                            "province": "TX", "country": "US", "zip": "78701", "phone": None},
+        "fulfillments": [{"createdAt": "2026-01-02T10:00:00Z", "status": "SUCCESS",
+                          "trackingInfo": [{"number": f"1Z{number:016d}", "url": "https://ups.example/track", "company": "UPS"}]}],
+        "lineItems": {"edges": [{"node": {
+            "name": f"Leather Band - 45mm / {i}", "quantity": 1, "sku": f"AS-LE-45-{i}",
+            "variant": {"id": f"gid://shopify/ProductVariant/{i}", "title": "Black / 45mm", "image": {"url": "https://cdn.example/band.jpg"},
+                        "product": {"id": f"gid://shopify/Product/{i}", "title": "Leather Band", "handle": "leather-band",
+                                    "onlineStoreUrl": "https://astrastraps.com/products/leather-band"}}
+        }} for i in range(2)]}
+    }
+
+
+def legacy_get_order_by_number(client, order_number):
+    """get_order_by_number as it was: sequential searches, then the scan and a fetch"""
+    potential_names = client._order_name_candidates(order_number)
+    for name in potential_names:
+        data = client._read(LEGACY_ORDER_SEARCH_GQL, {"q": f'name:"{name}"'})
+        if client._is_retryable_error(data):
+            return data
+        node = client._match_searched_order(data, name)
+        if node:
+            return node
+    data = client._read(client.ORDER_SCAN_GQL, {"first": client._order_scan_size()}, False)
+    if client._is_retryable_error(data):
+        return data
+    match = client._match_scanned_order(data, potential_names, order_number)
+    if not match:
+        return None
+    return client.get_order_by_id(match['id'])
+
+
+def run(lookup, numbers, orders, unindexed, latency):
+    standin = ShopifyStandIn(orders=orders, restore_rate=100000, latency=latency, unindexed=unindexed)
+    client = bridge.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    timings = []
+    for number in numbers:
+        started = time.perf_counter()
+        lookup(client, str(number))
+        timings.append((time.perf_counter() - started) * 1000)
+    count = len(numbers)
+    return {
+        "round_trips": standin.calls / count,
+        "bytes": standin.bytes_sent / count,
+        "points": standin.points_spent / count,
+        "avg_ms": sum(timings) / count,
+        "max_ms": max(timings)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round-trips, bytes and latency of order name lookups')
+    parser.add_argument('--orders', type=int, default=300, help='orders in the stand-in store')
+    parser.add_argument('--lookups', type=int, default=20, help='lookups per case')
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in latency per call, seconds')
+    args = parser.parse_args()
+
+    bridge.app.config['ORDER_INDEX_ENABLED'] = False
+    numbers = list(range(1000, 1000 + args.orders))
+    orders = [make_order(n) for n in numbers]
+    recent = numbers[-min(200, len(numbers)):]
+    cases = {
+        "indexed": recent[:args.lookups],
+        "scan-only": recent[-args.lookups:],
+        "not found": list(range(900000, 900000 + args.lookups)),
+    }
+    unindexed = {f"#{n}" for n in cases["scan-only"]}
+
+    print(f"{args.orders} orders, {args.lookups} lookups per case, {args.latency * 1000:.0f} ms per Shopify call")
+    print(f"{'case':>10} {'version':>7} {'trips':>6} {'bytes':>8} {'points':>7} {'avg ms':>8} {'max ms':>8}")
+    for case, case_numbers in cases.items():
+        for name, lookup in (("before", legacy_get_order_by_number), ("after", lambda c, n: c.get_order_by_number(n))):
+            r = run(lookup, case_numbers, orders, unindexed, args.latency)
+            print(f"{case:>10} {name:>7} {r['round_trips']:>6.1f} {r['bytes']:>8.0f} {r['points']:>7.0f} "
+                  f"{r['avg_ms']:>8.1f} {r['max_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: NumPy product ranking vs. the per-product Python scoring it replaced.
+
+Generates shaped products (1-10 variants, some on sale, spread over a year of
+updated_at values) and times, for each catalog size:
+  - legacy:    variant filtering + calculate_product_score sort (the old _sort_products_python)
+  - numpy:     ProductRanker.rank, building features from the products on every call (live search path)
+  - numpy pre: ProductRanker.rank on precomputed features (catalog mirror path)
+
+Usage:
+    python3 bench_product_ranking.py
+    python3 bench_product_ranking.py --sizes 100 1000 10000 --limit 10 --filters price_max=40
+"""
+
+import time
+import random
+import argparse
+from datetime import datetime, timezone, timedelta
+
+from catalog_mirror import product_filters, variant_matches, is_on_sale, to_float
+from product_ranking import ProductRanker
+
+
+def synthetic_products(count, seed=7):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    products = []
+    for i in range(count):
+        base = rng.choice([9.99, 14.99, 19.99, 24.99, 29.99, 39.99, 49.99, 59.99, 79.99])
+        sale = rng.random() < 0.2
+        products.append({
+            "id": f"gid://shopify/Product/{i}",
+            "title": f"Band {rng.randint(0, 10 ** 6)}",
+            "image": "https://cdn.test/band.jpg" if rng.random() < 0.9 else None,
+            "updated_at": (now - timedelta(days=rng.randint(0, 365))).isoformat().replace('+00:00', 'Z'),
+            "variants": [{
+                "id": f"gid://shopify/ProductVariant/{i}{v}",
+                "price": f"{base + rng.choice([0, 0, 5]):.2f}",
+                "compare_at_price": f"{base + 10:.2f}" if sale else None
+            } for v in range(rng.randint(1, 10))]
+        })
+    return products
+
+
+def legacy_rank(products, filters):
+    """The pre-NumPy /recommend-products post-processing, kept verbatim for comparison"""
+    price_min, price_max, on_sale_only = product_filters(filters)
+    filtered = []
+    for product in products:
+        variants = [
+            v for v in product['variants']
+            if variant_matches(to_float(v['price']), is_on_sale(to_float(v['price']), to_float(v['compare_at_price'])),
+                               price_min, price_max, on_sale_only)
+        ]
+        if variants:
+            filtered.append(dict(product, variants=variants))
+
+    def calculate_product_score(product):
+        score = 0
+        variants = product.get('variants', [])
+        if not variants:
+            return score
+        first_variant = variants[0]
+        price = to_float(first_variant.get('price'))
+        compare_price = to_float(first_variant.get('compare_at_price'))
+        if price is not None and compare_price is not None and compare_price > price:
+            score += 100
+        score += min(len(variants) * 5, 25)
+        if price is not None and price > 0:
+            if price <= 20:
+                score += 30
+            elif price <= 40:
+                score += 20
+            elif price <= 60:
+                score += 10
+        if product.get('image'):
+            score += 5
+        updated_at = product.get('updated_at')
+        if updated_at:
+            try:
+                from datetime import datetime, timezone
+                update_time = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+                days_old = (datetime.now(timezone.utc) - update_time).days
+                if days_old <= 30:
+                    score += 15
+                elif days_old <= 90:
+                    score += 5
+            except:
+                pass
+        return score
+
+    filtered.sort(key=lambda p: (-calculate_product_score(p), p.get('title', '').lower()))
+    return filtered
+
+
+def timed(fn, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - started) / repeats * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare NumPy product ranking with the legacy Python scoring')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='candidate set sizes')
+    parser.add_argument('--limit', type=int, default=10, help='top-k returned')
+    parser.add_argument('--filters', nargs='*', default=[], help='key=value filters, e.g. price_max=40 on_sale=true')
+    args = parser.parse_args()
+    filters = dict(item.split('=', 1) for item in args.filters)
+
+    ranker = ProductRanker()
+    print(f"filters={filters or '{}'} limit={args.limit}")
+    print(f"{'products':>9} {'legacy ms':>10} {'numpy ms':>9} {'numpy pre ms':>13} {'speedup':>8} {'top-k overlap':>14}")
+    for size in args.sizes:
+        products = synthetic_products(size)
+        repeats = max(3, 20000 // size)
+        features = ranker.features(products)
+        legacy_ms, legacy = timed(lambda: legacy_rank(products, filters)[:args.limit], repeats)
+        numpy_ms, _ = timed(lambda: ranker.rank(products, filters, args.limit), repeats)
+        pre_ms, ranked = timed(lambda: ranker.rank(products, filters, args.limit, features=features), repeats)
+        # Scores differ by design where a product's first variant isn't its cheapest or only sale variant
+        expected = {p['id'] for p in legacy}
+        overlap = len(expected & {p['id'] for p in ranked}) / len(expected) if expected else 1.0
+        print(f"{size:>9} {legacy_ms:>10.2f} {numpy_ms:>9.2f} {pre_ms:>13.3f} {legacy_ms / pre_ms:>7.0f}x {overlap:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
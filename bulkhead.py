@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class BulkheadFull(Exception):
+    """Raised when a bulkhead cannot admit a call within its queue limits"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is at capacity")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class _BulkheadStats:
+    def __init__(self, name, max_concurrent, max_queue, max_wait):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def retry_hint(self):
+        # One slot's worth of wait is a reasonable hint; never advertise less than a second
+        return max(1.0, self.max_wait)
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "peak_queue_depth": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected_queue_full + self.rejected_timeout,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout
+        }
+
+
+class Bulkhead(_BulkheadStats):
+    """
+    Concurrency limit for one upstream, for threaded callers.
+
+    At most `max_concurrent` calls run at once; up to `max_queue` more may wait
+    for a slot, each for at most `max_wait` seconds. Anything beyond that is
+    rejected immediately with BulkheadFull so one slow upstream cannot tie up
+    every worker thread.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, max_wait):
+        super().__init__(name, max_concurrent, max_queue, max_wait)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, max_wait=None):
+        max_wait = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        with self._cond:
+            if self.in_flight >= self.max_concurrent:
+                if self.queued >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    logger.warning(f"Bulkhead '{self.name}' full ({self.in_flight} in flight, {self.queued} queued)")
+                    raise BulkheadFull(self.name, self.retry_hint())
+                self.queued += 1
+                self.peak_queued = max(self.peak_queued, self.queued)
+                deadline = time.monotonic() + max_wait
+                try:
+                    while self.in_flight >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected_timeout += 1
+                            logger.warning(f"Bulkhead '{self.name}' wait exceeded {max_wait:.2f}s")
+                            raise BulkheadFull(self.name, self.retry_hint())
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify()
+
+
+class AsyncBulkhead(_BulkheadStats):
+    """asyncio counterpart of Bulkhead for the ASGI serving mode"""
+
+    def __init__(self, name, max_concurrent, max_queue, max_wait):
+        super().__init__(name, max_concurrent, max_queue, max_wait)
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def slot(self, max_wait=None):
+        max_wait = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self.in_flight >= self.max_concurrent:
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                logger.warning(f"Bulkhead '{self.name}' full ({self.in_flight} in flight, {self.queued} queued)")
+                raise BulkheadFull(self.name, self.retry_hint())
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), max_wait)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                logger.warning(f"Bulkhead '{self.name}' wait exceeded {max_wait:.2f}s")
+                raise BulkheadFull(self.name, self.retry_hint())
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+def bulkhead_rejection(error):
+    """Error result returned by the API clients when a bulkhead rejects a call"""
+    return {
+        "error": f"{error.name} is busy, please try again shortly",
+        "status_code": 503,
+        "retry_after": error.retry_after
+    }
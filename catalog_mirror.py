@@ -0,0 +1,528 @@
+import json
+import time
+import heapq
+import itertools
+import random
+import logging
+import threading
+
+from kb_mirror import BM25Index
+from mirror_store import MirrorStore
+from compatibility import CompatibilityIndex, parse_request
+from fuzzy_search import NgramIndex
+
+logger = logging.getLogger(__name__)
+
+# Variants returned per product, as in the live products(...) search
+MAX_VARIANTS = 10
+
+PRODUCT_FIELDS = """id title handle onlineStoreUrl status productType vendor tags
+                featuredImage { url }
+                createdAt updatedAt"""
+VARIANT_FIELDS = "id title sku price compareAtPrice image { url }"
+
+# Bulk operations run without page sizes; Shopify streams every product and variant as JSONL
+BULK_PRODUCTS_QUERY = """
+{
+  products {
+    edges {
+      node {
+        """ + PRODUCT_FIELDS + """
+        variants { edges { node { """ + VARIANT_FIELDS + """ } } }
+      }
+    }
+  }
+}
+"""
+
+
+def to_float(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def numeric_id(gid):
+    """gid://shopify/ProductVariant/123 -> "123" """
+    if isinstance(gid, str) and '/' in gid:
+        return gid.split('/')[-1]
+    return None
+
+
+def product_filters(filters):
+    """(price_min, price_max, on_sale_only) from a /recommend-products filter dict"""
+    filters = filters or {}
+    on_sale_raw = filters.get('on_sale')
+    if isinstance(on_sale_raw, str):
+        stripped = on_sale_raw.strip().lower()
+        on_sale = stripped in ("1", "true", "yes", "y") if stripped else False
+    else:
+        on_sale = bool(on_sale_raw) if on_sale_raw is not None else False
+    return to_float(filters.get('price_min')), to_float(filters.get('price_max')), on_sale
+
+
+def variant_matches(price, sale, price_min, price_max, on_sale_only):
+    """Whether a variant (numeric price, sale flag) passes the essential filters"""
+    if price is None and (price_min is not None or price_max is not None):
+        return False
+    if price_min is not None and price is not None and price < price_min:
+        return False
+    if price_max is not None and price is not None and price > price_max:
+        return False
+    return sale or not on_sale_only
+
+
+def is_on_sale(price, compare_at_price):
+    return price is not None and compare_at_price is not None and compare_at_price > price
+
+
+def shape_product(node, store_domain, max_variants=None):
+    """
+    Tool-response shape of a product node (GraphQL edges or a plain variant list),
+    with variant storefront URLs and numeric ids worked out.
+    """
+    handle = node.get('handle')
+    online_url = node.get('onlineStoreUrl') or (f"https://{store_domain}/products/{handle}" if store_domain and handle else None)
+    image = (node.get('featuredImage') or {}).get('url')
+    raw_variants = node.get('variants') or []
+    if isinstance(raw_variants, dict):
+        raw_variants = [edge.get('node', {}) for edge in (raw_variants.get('edges') or [])]
+    variants = []
+    for v in raw_variants[:max_variants]:
+        variant_numeric_id = numeric_id(v.get('id') or '')
+        # Variant-specific URL if possible
+        variant_url = None
+        if online_url and variant_numeric_id:
+            separator = '&' if '?' in online_url else '?'
+            variant_url = f"{online_url}{separator}variant={variant_numeric_id}"
+        variants.append({
+            "id": v.get('id'),
+            "title": v.get('title'),
+            "sku": v.get('sku'),
+            "price": v.get('price'),
+            "compare_at_price": v.get('compareAtPrice'),
+            "currency": None,
+            "image": ((v.get('image') or {}).get('url')) or image,
+            "url": variant_url
+        })
+    return {
+        "id": node.get('id'),
+        "title": node.get('title'),
+        "handle": handle,
+        "url": online_url,
+        "image": image,
+        "variants": variants,
+        "created_at": node.get('createdAt'),
+        "updated_at": node.get('updatedAt')
+    }
+
+
+def parse_bulk_jsonl(lines):
+    """Bulk export JSONL (products, then variants pointing back via __parentId) -> product nodes with variant lists"""
+    products = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        parent = record.pop('__parentId', None)
+        if parent is None:
+            record['variants'] = []
+            products[record['id']] = record
+        elif parent in products:
+            products[parent]['variants'].append(record)
+    return products
+
+
+def normalize_node(node):
+    """Paged GraphQL product node -> the stored form (variants as a plain list)"""
+    node = dict(node)
+    variants = node.get('variants') or {}
+    if isinstance(variants, dict):
+        node['variants'] = [edge.get('node', {}) for edge in (variants.get('edges') or [])]
+    return node
+
+
+class _CatalogEntry:
+    __slots__ = ('product', 'prices', 'sale')
+
+    def __init__(self, node, store_domain):
+        self.product = shape_product(node, store_domain, MAX_VARIANTS)
+        self.prices = [to_float(v['price']) for v in self.product['variants']]
+        self.sale = [is_on_sale(p, to_float(v['compare_at_price'])) for p, v in zip(self.prices, self.product['variants'])]
+
+
+class _CatalogSnapshot:
+    """Active products of one mirror version, pre-shaped and indexed; replaced wholesale, never mutated"""
+
+    def __init__(self, version, nodes, store_domain, ranker=None, previous=None):
+        self.version = version
+        active = [n for n in nodes if (n.get('status') or 'ACTIVE').upper() == 'ACTIVE']
+        self.entries = [_CatalogEntry(n, store_domain) for n in active]
+        documents = [
+            (n.get('title') or '', ' '.join(
+                [n.get('productType') or '', n.get('vendor') or ''] + list(n.get('tags') or []) +
+                [v.get('title') or '' for v in n.get('variants') or []]
+            ))
+            for n in active
+        ]
+        self.index = BM25Index(documents)
+        # Misspelled queries: character n-gram TF-IDF, reusing unchanged products' grams from the last snapshot
+        self.fuzzy = NgramIndex(
+            [(n['id'], n.get('updatedAt'), title, text) for n, (title, text) in zip(active, documents)],
+            previous=previous.fuzzy if previous is not None else None
+        )
+        # Watch family / model / case size -> products and variants that fit
+        self.compatibility = CompatibilityIndex([
+            (' '.join([n.get('title') or '', n.get('productType') or ''] + list(n.get('tags') or [])),
+             [v.get('title') or '' for v in entry.product['variants']])
+            for n, entry in zip(active, self.entries)
+        ])
+        # No query text: most recently updated first
+        self.recent = sorted(range(len(active)), key=lambda i: active[i].get('updatedAt') or '', reverse=True)
+        self.recency = {doc: rank for rank, doc in enumerate(self.recent)}
+        # Ranking features for the whole catalog, sliced per search
+        self.features = ranker.features([entry.product for entry in self.entries]) if ranker else None
+
+
+class CatalogMirror:
+    """
+    Local copy of the Shopify catalog that answers product searches in-process.
+
+    Seeded from a bulk-operation JSONL export (re-run every `reseed_interval`
+    seconds, which also drops deleted products) and kept fresh in between by
+    paging through products with `updated_at` at or after the newest one seen.
+    Like the KB mirror, products live in a sqlite file shared by all workers,
+    one worker at a time syncs, and each worker rebuilds its index when the
+    mirror's version moves. Searches go live while the mirror is empty or its
+    last sync is older than `max_age`. With a `ranker` (ProductRanker), results
+    come back ranked, scored from features precomputed per index build. With
+    an `availability` index, sold-out products and variants are left out.
+    Queries with words no product contains (usually misspellings) are ranked
+    by character n-gram similarity instead of BM25.
+    """
+
+    # Candidates the ranker filters, scores and cuts to `limit` per search: the best relevance
+    # hits (most recently updated, without query text), so relevance still decides the pool
+    RANK_POOL = 50
+
+    def __init__(self, db_path, store_domain, sync_interval, reseed_interval, max_age, bulk_timeout=600, poll_interval=2.0,
+                 ranker=None, availability=None):
+        self.store = MirrorStore(db_path, 'catalog', lease=bulk_timeout + 60)
+        self.store_domain = store_domain
+        self.sync_interval = sync_interval
+        self.reseed_interval = reseed_interval
+        self.max_age = max_age
+        self.bulk_timeout = bulk_timeout
+        self.poll_interval = poll_interval
+        self.ranker = ranker
+        self.availability = availability
+        self.seeds = 0
+        self.syncs = 0
+        self.sync_failures = 0
+        self.products_updated = 0
+        self.products_removed = 0
+        self.searches = 0
+        self.compat_lookups = 0
+        self.compat_lookup_ms = 0.0
+        self.fuzzy_searches = 0
+        self.fuzzy_ms = 0.0
+        self.fallbacks = {}
+        self.last_error = None
+        self._snapshot = _CatalogSnapshot(0, [], store_domain, ranker)
+        self._synced_at = 0.0
+        self._stock = (None, None)
+        self._thread = None
+
+    # ---- sync (writer side) ----
+
+    def sync(self, source, force=False):
+        """
+        Seed or incrementally update the mirror through `source` (a ShopifyAPIClient).
+        Returns True if the mirror is now current, False if skipped or failed.
+        """
+        due = None if force else (lambda state: state['synced_at'] <= time.time() - self.sync_interval)
+        token = self.store.claim(due)
+        if token is None:
+            return False
+        state = self.store.state()
+        reseed = state['seeded_at'] <= time.time() - self.reseed_interval or not state['cursor']
+        try:
+            if reseed:
+                nodes = self._bulk_export(source)
+                changed, removed = self.store.apply(self._items(nodes), replace=True)
+            else:
+                nodes = self._updated_since(source, state['cursor'])
+                changed, removed = self.store.apply(self._items(nodes))
+        except Exception as e:
+            self.sync_failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Catalog sync failed: {e}")
+            self.store.release(token)
+            return False
+
+        now = time.time()
+        cursor = max([n.get('updatedAt') or '' for n in nodes] + [state['cursor'] or ''])
+        if reseed:
+            self.store.release(token, synced_at=now, seeded_at=now, cursor=cursor)
+            self.seeds += 1
+        else:
+            self.store.release(token, synced_at=now, cursor=cursor)
+        self.syncs += 1
+        self.products_updated += changed
+        self.products_removed += removed
+        self.last_error = None
+        if changed or removed:
+            logger.info(f"Catalog mirror ({'bulk seed' if reseed else 'incremental'}): {changed} products updated, {removed} removed")
+        return True
+
+    @staticmethod
+    def _items(nodes):
+        return {n['id']: (n.get('updatedAt'), n) for n in nodes}
+
+    def _bulk_export(self, source):
+        started = source.start_bulk_query(BULK_PRODUCTS_QUERY)
+        _raise_for_error(started, "bulk operation start")
+        deadline = time.monotonic() + self.bulk_timeout
+        while True:
+            operation = source.current_bulk_operation()
+            _raise_for_error(operation, "bulk operation status")
+            status = (operation or {}).get('status')
+            if status == 'COMPLETED':
+                break
+            if status in ('FAILED', 'CANCELED', 'EXPIRED'):
+                raise RuntimeError(f"Bulk operation {status.lower()}: {operation.get('errorCode')}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Bulk operation still {status} after {self.bulk_timeout}s")
+            time.sleep(self.poll_interval)
+        if not operation.get('url'):
+            return []  # no objects matched
+        lines = source.download_bulk_result(operation['url'])
+        _raise_for_error(lines, "bulk result download")
+        return list(parse_bulk_jsonl(lines).values())
+
+    @staticmethod
+    def _updated_since(source, cursor):
+        nodes, after = [], None
+        while True:
+            page = source.products_updated_since(cursor, after)
+            _raise_for_error(page, "incremental product sync")
+            connection = (page or {}).get('products') or {}
+            nodes.extend(normalize_node(edge.get('node', {})) for edge in connection.get('edges') or [])
+            page_info = connection.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                return nodes
+            after = page_info.get('endCursor')
+
+    # ---- search (reader side) ----
+
+    def refresh(self):
+        """Reload the index if another worker (or this one) changed the mirror"""
+        state = self.store.state()
+        self._synced_at = state['synced_at']
+        if state['version'] == self._snapshot.version:
+            return False
+        version, nodes = self.store.load()
+        self._snapshot = _CatalogSnapshot(version, nodes, self.store_domain, self.ranker, previous=self._snapshot)
+        return True
+
+    def ready(self):
+        return bool(self._snapshot.entries) and time.time() - self._synced_at <= self.max_age
+
+    def search(self, query_text, filters, limit):
+        """
+        Products for a search, shaped, filtered (and ranked, with a ranker) like
+        the live search, or None if the live API should answer. A watch_model /
+        size in `filters` narrows the search to products and variants that fit;
+        price / on-sale filters narrow it before the top `limit` are picked, and
+        hand it to the live search when fewer than `limit` products match.
+        """
+        if not self.ready():
+            self._fallback('not_ready')
+            return None
+        snapshot = self._snapshot
+        fits = None
+        watch_model, size = (filters or {}).get('watch_model'), (filters or {}).get('size')
+        if watch_model or size:
+            spec = parse_request(watch_model, size)
+            if spec is None:
+                # Not a watch we can index: let relevance use the words instead
+                query_text = ' '.join(filter(None, [query_text, watch_model, size]))
+            else:
+                fits = self._compatible(snapshot, spec)
+                if not fits:
+                    self._fallback('no_compatible')
+                    return None
+        stock = self._in_stock(snapshot)
+        candidates = fits
+        if stock is not None:
+            in_stock, _ = stock
+            candidates = in_stock if fits is None else {doc: fits[doc] for doc in fits if doc in in_stock}
+        # Price / on-sale filters narrow the candidates before relevance cuts to `limit`,
+        # so matching products ranked lower by relevance aren't cut first and filtered out after
+        priced = self._priced(snapshot, filters, candidates, fits, stock)
+        if priced is not None:
+            if not priced:
+                self._fallback('no_filter_matches')
+                return None
+            candidates = priced
+        # The ranker picks the top `limit` itself, from the whole candidate slice
+        pool = limit if snapshot.features is None else max(limit, self.RANK_POOL)
+        if query_text:
+            order = [doc for doc, _ in snapshot.index.search(query_text, pool, candidates=candidates)]
+            if not order or snapshot.index.unknown_terms(query_text):
+                order = self._fuzzy(snapshot, query_text, pool, candidates) or order
+            if not order:
+                self._fallback('no_hits')
+                return None
+        elif fits is not None or priced is not None:
+            order = heapq.nsmallest(pool, candidates, key=snapshot.recency.__getitem__)
+        elif stock is not None:
+            order = list(itertools.islice((doc for doc in snapshot.recent if doc in candidates), pool))
+        else:
+            order = snapshot.recent[:pool]
+        products = self._shape(snapshot, order, filters, limit, fits, stock)
+        if priced is not None and len(products) < limit:
+            # Fewer matches than asked for: the live search pages further for them
+            self._fallback('filtered_short')
+            return None
+        self.searches += 1
+        return products
+
+    def _shape(self, snapshot, order, filters, limit, fits, stock):
+        """
+        Up to `limit` products from the docs in `order`, with only the variants
+        that fit, are in stock and pass the filters (ranked, with a ranker)
+        """
+        allowed = None
+        if fits is not None or stock is not None:
+            allowed = [
+                (fits is None or fits[doc] is None or position in fits[doc]) and (stock is None or stock[1][doc][position])
+                for doc in order for position in range(len(snapshot.entries[doc].product['variants']))
+            ]
+        if snapshot.features is not None:
+            return self.ranker.rank([snapshot.entries[doc].product for doc in order], filters, limit,
+                                    features=snapshot.features.take(order), allowed=allowed)
+        price_min, price_max, on_sale_only = product_filters(filters)
+        products = []
+        flags = iter(allowed) if allowed is not None else None
+        for doc in order:
+            entry = snapshot.entries[doc]
+            variants = [
+                dict(variant) for variant, price, sale in zip(entry.product['variants'], entry.prices, entry.sale)
+                if (flags is None or next(flags)) and variant_matches(price, sale, price_min, price_max, on_sale_only)
+            ]
+            if variants:
+                products.append(dict(entry.product, variants=variants))
+        return products
+
+    @staticmethod
+    def _priced(snapshot, filters, candidates, fits, stock):
+        """
+        The candidates (all products when None) with a variant that passes the
+        price / on-sale filters and also fits and is in stock, or None when no
+        price / on-sale filter is set.
+        """
+        price_min, price_max, on_sale_only = product_filters(filters)
+        if price_min is None and price_max is None and not on_sale_only:
+            return None
+        return {
+            doc for doc in (range(len(snapshot.entries)) if candidates is None else candidates)
+            if any(
+                variant_matches(price, sale, price_min, price_max, on_sale_only)
+                and (fits is None or fits[doc] is None or position in fits[doc])
+                and (stock is None or stock[1][doc][position])
+                for position, (price, sale) in enumerate(zip(snapshot.entries[doc].prices, snapshot.entries[doc].sale))
+            )
+        }
+
+    def _in_stock(self, snapshot):
+        """
+        (products with a sellable variant, sellable flags per product's variants)
+        for a snapshot, or None without a current availability index. Worked out
+        again only when the snapshot or the availability index changes.
+        """
+        if self.availability is None or not self.availability.ready():
+            return None
+        key, stock = self._stock
+        if key != (snapshot.version, self.availability.generation):
+            flags = [[self.availability.sellable(v['id']) for v in entry.product['variants']] for entry in snapshot.entries]
+            stock = ({doc for doc, variant_flags in enumerate(flags) if any(variant_flags)}, flags)
+            self._stock = ((snapshot.version, self.availability.generation), stock)
+        return stock
+
+    def _fuzzy(self, snapshot, query_text, limit, candidates):
+        started = time.perf_counter()
+        hits = snapshot.fuzzy.search(query_text, limit, candidates=candidates)
+        self.fuzzy_searches += 1
+        self.fuzzy_ms += (time.perf_counter() - started) * 1000
+        return [doc for doc, _ in hits]
+
+    def _compatible(self, snapshot, spec):
+        started = time.perf_counter()
+        fits = snapshot.compatibility.lookup(spec)
+        self.compat_lookups += 1
+        self.compat_lookup_ms += (time.perf_counter() - started) * 1000
+        return fits
+
+    def _fallback(self, reason):
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+
+    # ---- background loop ----
+
+    def start(self, source):
+        """Keep the mirror synced and this worker's index current from a daemon thread"""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, args=(source,), name='catalog-mirror', daemon=True)
+        self._thread.start()
+
+    def _run(self, source):
+        while True:
+            try:
+                self.sync(source)
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception(f"Catalog mirror loop error: {e}")
+            # Jitter so workers don't all poll the sqlite file in lockstep
+            time.sleep(min(self.sync_interval, 60) * random.uniform(0.5, 1.0))
+
+    def stats(self):
+        snapshot = self._snapshot
+        state = self.store.state()
+        return {
+            "ready": self.ready(),
+            "products": len(snapshot.entries),
+            "version": snapshot.version,
+            "synced_seconds_ago": round(time.time() - self._synced_at, 1) if self._synced_at else None,
+            "seeded_seconds_ago": round(time.time() - state['seeded_at'], 1) if state['seeded_at'] else None,
+            "cursor": state['cursor'],
+            "seeds": self.seeds,
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+            "products_updated": self.products_updated,
+            "products_removed": self.products_removed,
+            "searches": self.searches,
+            "sold_out_products": len(self._stock[1][1]) - len(self._stock[1][0]) if self._stock[1] else None,
+            "compatibility": dict(
+                snapshot.compatibility.stats(),
+                lookups=self.compat_lookups,
+                avg_lookup_ms=round(self.compat_lookup_ms / self.compat_lookups, 4) if self.compat_lookups else None
+            ),
+            "fuzzy": dict(
+                snapshot.fuzzy.stats(),
+                searches=self.fuzzy_searches,
+                avg_search_ms=round(self.fuzzy_ms / self.fuzzy_searches, 4) if self.fuzzy_searches else None
+            ),
+            "fallbacks": dict(self.fallbacks),
+            "last_error": self.last_error
+        }
+
+
+def _raise_for_error(result, what):
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(f"{what} failed: {result['error']}")
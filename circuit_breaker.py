@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, upstream, name, retry_after):
+        super().__init__(f"{name} circuit is open")
+        self.upstream = upstream
+        self.name = name
+        self.retry_after = retry_after
+
+
+class _Call:
+    """Outcome of one admitted call; None means it never reached the upstream"""
+
+    def __init__(self):
+        self.outcome = None
+
+    def record_status(self, status_code):
+        # 4xx/429 mean the upstream is answering; only server errors count against it
+        self.outcome = status_code < 500
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one upstream and operation class.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls
+    fail fast with CircuitOpen. Once `recovery_timeout` seconds have passed up
+    to `half_open_max_calls` probes are let through at a time; a successful
+    probe closes the breaker, a failed one re-opens it for another timeout.
+    """
+
+    def __init__(self, upstream, kind='read', failure_threshold=5, recovery_timeout=30, half_open_max_calls=1):
+        self.upstream = upstream
+        self.kind = kind
+        self.name = f"{upstream} {kind}s"
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.short_circuited = 0
+        self.transitions = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def _transition(self, state, reason):
+        logger.warning(f"Circuit '{self.name}' {self.state} -> {state} ({reason})")
+        self.transitions.append({"at": time.time(), "from": self.state, "to": state, "reason": reason})
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.opened_at = None
+            self.consecutive_failures = 0
+
+    def _retry_after(self):
+        return max(1.0, round(self.opened_at + self.recovery_timeout - time.monotonic(), 1))
+
+    def _admit(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.short_circuited += 1
+                    raise CircuitOpen(self.upstream, self.name, self._retry_after())
+                self._transition(HALF_OPEN, "recovery timeout elapsed")
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_max_calls:
+                    self.short_circuited += 1
+                    raise CircuitOpen(self.upstream, self.name, 1.0)
+                self.probes_in_flight += 1
+                return True
+            return False
+
+    def _record(self, probe, outcome):
+        with self._lock:
+            if probe:
+                self.probes_in_flight -= 1
+            if outcome is None:
+                return
+            if outcome:
+                self.consecutive_failures = 0
+                if self.state == HALF_OPEN and probe:
+                    self._transition(CLOSED, "probe succeeded")
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN and probe:
+                self._transition(OPEN, "probe failed")
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN, f"{self.consecutive_failures} consecutive failures")
+
+    @contextmanager
+    def call(self, failure_types=()):
+        """
+        Guard one upstream call. Raises CircuitOpen if the call may not proceed.
+        Exceptions of `failure_types` count as failures; set the outcome for
+        completed calls with `record_status()` on the yielded object.
+        """
+        probe = self._admit()
+        call = _Call()
+        try:
+            yield call
+        except failure_types:
+            call.outcome = False
+            raise
+        finally:
+            self._record(probe, call.outcome)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "retry_after": self._retry_after() if self.state == OPEN else None,
+                "probes_in_flight": self.probes_in_flight,
+                "short_circuited": self.short_circuited,
+                "transitions": list(self.transitions)
+            }
+
+
+def make_breakers(upstream, failure_threshold, recovery_timeout, half_open_max_calls):
+    """Separate read and write breakers for one upstream, so failing writes don't block lookups"""
+    return {
+        kind: CircuitBreaker(
+            upstream,
+            kind,
+            failure_threshold=failure_threshold,
+            recovery_timeout=recovery_timeout,
+            half_open_max_calls=half_open_max_calls
+        )
+        for kind in ('read', 'write')
+    }
+
+
+def circuit_open_rejection(error):
+    """Error result returned by the API clients when a breaker short-circuits a call"""
+    return {
+        "error": f"{error.upstream} is temporarily unavailable, please try again shortly",
+        "status_code": 503,
+        "retry_after": error.retry_after
+    }
@@ -0,0 +1,225 @@
+import re
+import time
+from collections import namedtuple
+
+# What a /recommend-products caller asked to fit: a watch family, optionally a model, and case-size keys
+CompatSpec = namedtuple('CompatSpec', 'family model sizes')
+
+# Families named outright; the model clues below only count when none of these appear
+_FAMILY_NAMES = (
+    ('apple', re.compile(r'\b(?:apple|iwatch)\b', re.I)),
+    ('galaxy', re.compile(r'\b(?:samsung|galaxy)\b', re.I)),
+    ('pixel', re.compile(r'\bpixel\b', re.I)),
+    ('fitbit', re.compile(r'\bfitbit\b', re.I)),
+    ('garmin', re.compile(r'\b(?:garmin|fenix|forerunner|vivoactive)\b', re.I)),
+)
+_FAMILY_CLUES = (
+    ('fitbit', re.compile(r'\b(?:versa|charge\s*\d|alta)\b', re.I)),
+    ('apple', re.compile(r'\b(?:series\s*\d|ultra)\b', re.I)),
+)
+
+# "3 & 4", "7/8/9", "4, 5 and 6"
+_NUMBER_LIST = r'(\d{1,2}(?:\s*(?:/|&|,|and)\s*\d{1,2})*)'
+_MODELS = {
+    'apple': (
+        (re.compile(r'\bseries\s*' + _NUMBER_LIST, re.I), 'series {}'),
+        (re.compile(r'\bultra\b', re.I), 'ultra'),
+        (re.compile(r'\bSE\b'), 'se'),
+    ),
+    'galaxy': (
+        (re.compile(r'\bwatch\s*' + _NUMBER_LIST, re.I), 'watch {}'),
+        (re.compile(r'\bultra\b', re.I), 'ultra'),
+        (re.compile(r'\bfit\s*' + _NUMBER_LIST, re.I), 'fit {}'),
+        (re.compile(r'\bactive\b', re.I), 'active'),
+    ),
+    'fitbit': (
+        (re.compile(r'\bversa\s*(\d|lite)\b', re.I), 'versa {}'),
+        (re.compile(r'\bversa\b(?!\s*(?:\d|lite))', re.I), 'versa'),
+        (re.compile(r'\bcharge\s*' + _NUMBER_LIST, re.I), 'charge {}'),
+        (re.compile(r'\balta\s*hr\b', re.I), 'alta hr'),
+        (re.compile(r'\balta\b(?!\s*hr)', re.I), 'alta'),
+        (re.compile(r'\bluxe\b', re.I), 'luxe'),
+        (re.compile(r'\bsense\b', re.I), 'sense'),
+        (re.compile(r'\binspire\b', re.I), 'inspire'),
+    ),
+}
+
+# "45mm", "38/40/41mm", "42 & 44 mm"
+_SIZE_LIST = re.compile(r'(\d{2}(?:\s*(?:mm)?\s*(?:/|&|,|-|or)\s*\d{2})*)\s*mm\b', re.I)
+_BARE_SIZE = re.compile(r'^\s*(\d{2})\s*$')
+
+# Apple bands come in two lug sizes; which one a 42mm case takes depends on the generation
+APPLE_MODEL_SIZES = {
+    **{f'series {n}': (38, 42) for n in (1, 2, 3)},
+    **{f'series {n}': (40, 44) for n in (4, 5, 6)},
+    'se': (40, 44),
+    **{f'series {n}': (41, 45) for n in (7, 8, 9)},
+    'series 10': (42, 46),
+    'ultra': (49,),
+}
+_APPLE_SMALL = {38, 40, 41}
+_APPLE_LARGE = {44, 45, 46, 49}
+
+# Distinct requests remembered per index (models come from caller text, so bound them)
+_MAX_MEMOIZED = 1024
+
+
+def case_sizes(text):
+    """Case sizes (mm) mentioned in a title, e.g. "Black / 38/40/41mm" -> {38, 40, 41}"""
+    sizes = set()
+    for match in _SIZE_LIST.finditer(text or ''):
+        sizes.update(int(n) for n in re.findall(r'\d{2}', match.group(1)))
+    return {s for s in sizes if 18 <= s <= 55}
+
+
+def detect_families(text):
+    families = [family for family, pattern in _FAMILY_NAMES if pattern.search(text or '')]
+    if not families:
+        families = [family for family, pattern in _FAMILY_CLUES if pattern.search(text or '')][:1]
+    return families
+
+
+def detect_models(family, text):
+    models = []
+    for pattern, template in _MODELS.get(family, ()):
+        for match in pattern.finditer(text or ''):
+            numbers = re.findall(r'\d{1,2}|lite', match.group(1), re.I) if pattern.groups else ['']
+            for number in numbers:
+                model = template.format(number.lower()).strip()
+                if model not in models:
+                    models.append(model)
+    return models
+
+
+def size_keys(family, sizes, model=None):
+    """
+    Index keys for Apple case sizes: the band they take ("small" / "large").
+    Other families' bands are sized by lug width, which callers rarely know,
+    so they match on model alone (no keys).
+    """
+    if family != 'apple':
+        return set()
+    keys = set()
+    for size in sizes:
+        if size in _APPLE_SMALL:
+            keys.add('small')
+        elif size in _APPLE_LARGE:
+            keys.add('large')
+        elif size == 42:
+            if model == 'series 10' or sizes & _APPLE_SMALL:
+                keys.add('small')
+            elif model is not None or sizes & _APPLE_LARGE:
+                keys.add('large')
+            else:
+                keys.update(('small', 'large'))  # a bare 42mm could be either generation
+    return keys
+
+
+def parse_request(watch_model, size):
+    """
+    CompatSpec for a recommendation request's watch_model / size, or None if
+    neither names a watch this index knows. A size on its own is taken as an
+    Apple Watch case, which is most of the catalog.
+    """
+    text = f"{watch_model or ''} {size or ''}"
+    sizes = case_sizes(text)
+    bare = _BARE_SIZE.match(str(size or ''))
+    if bare:
+        sizes.add(int(bare.group(1)))
+    families = detect_families(text)
+    if not families:
+        if not sizes:
+            return None
+        families = ['apple']
+    family = families[0]
+    models = detect_models(family, text)
+    model = models[0] if models else None
+    if not sizes and family == 'apple' and model in APPLE_MODEL_SIZES:
+        sizes = set(APPLE_MODEL_SIZES[model])
+    keys = size_keys(family, sizes, model) if sizes else None
+    return CompatSpec(family, model, frozenset(keys) if keys else None)
+
+
+class CompatibilityIndex:
+    """
+    Which products (and which of their variants) fit a watch, built once per catalog snapshot.
+
+    Families and models come from each product's title, type and tags;
+    case sizes from variant titles (or the product title when the variants
+    don't say). A product naming no model fits every model of its family;
+    one with no sized variants fits every size. Untagged products whose
+    variants carry Apple case sizes count as Apple Watch bands.
+    Lookups return positions into each product's variant list.
+    """
+
+    def __init__(self, documents):
+        """`documents`: (product text, [variant titles]) per catalog entry, in entry order"""
+        started = time.perf_counter()
+        self.family_docs = {}     # family -> docs naming no specific model
+        self.model_docs = {}      # (family, model) -> docs naming that model
+        self.sized = {}           # (family, size key) -> {doc: variant positions}
+        self.unsized = set()      # (family, doc) whose variants fit every size
+        for doc, (text, variant_titles) in enumerate(documents):
+            title_sizes = case_sizes(text)
+            variant_sizes = [case_sizes(title) or title_sizes for title in variant_titles]
+            families = detect_families(text)
+            if not families and any(variant_sizes) and set().union(*variant_sizes) <= _APPLE_SMALL | _APPLE_LARGE | {42}:
+                families = ['apple']
+            for family in families:
+                models = detect_models(family, text)
+                for model in models:
+                    self.model_docs.setdefault((family, model), set()).add(doc)
+                if not models:
+                    self.family_docs.setdefault(family, set()).add(doc)
+                self._add_sizes(family, doc, variant_sizes)
+        self.family_all = {}
+        for family, docs in self.family_docs.items():
+            self.family_all.setdefault(family, set()).update(docs)
+        for (family, _), docs in self.model_docs.items():
+            self.family_all.setdefault(family, set()).update(docs)
+        self._lookups = {}
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def _add_sizes(self, family, doc, variant_sizes):
+        key_sets = [size_keys(family, sizes) for sizes in variant_sizes]
+        if not any(key_sets):
+            self.unsized.add((family, doc))
+            return
+        by_key = {}
+        any_size = [position for position, keys in enumerate(key_sets) if not keys]
+        for position, keys in enumerate(key_sets):
+            for key in keys:
+                by_key.setdefault(key, []).append(position)
+        for key, positions in by_key.items():
+            self.sized.setdefault((family, key), {})[doc] = frozenset(positions + any_size)
+
+    def lookup(self, spec):
+        """{doc: variant positions that fit, or None for all of them}; memoized, as the index never changes"""
+        result = self._lookups.get(spec)
+        if result is not None:
+            return result
+        if spec.model:
+            docs = self.family_docs.get(spec.family, set()) | self.model_docs.get((spec.family, spec.model), set())
+        else:
+            docs = self.family_all.get(spec.family, set())
+        if spec.sizes is None:
+            result = dict.fromkeys(docs)
+        else:
+            result = {doc: None for doc in docs if (spec.family, doc) in self.unsized}
+            for key in spec.sizes:
+                for doc, positions in self.sized.get((spec.family, key), {}).items():
+                    if doc in docs:
+                        result[doc] = positions | result.get(doc, frozenset())
+        if len(self._lookups) >= _MAX_MEMOIZED:
+            self._lookups.clear()
+        self._lookups[spec] = result
+        return result
+
+    def stats(self):
+        return {
+            "build_ms": round(self.build_ms, 2),
+            "families": sorted(self.family_all),
+            "models": len(self.model_docs),
+            "size_keys": len(self.sized),
+            "memoized_lookups": len(self._lookups)
+        }
@@ -1,8 +1,20 @@
 import os
+import json
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_overrides(env_name, defaults):
+    """`defaults` (tool path -> seconds) updated from a "path=seconds,..." environment variable"""
+    values = dict(defaults)
+    for item in filter(None, os.environ.get(env_name, '').split(',')):
+        path, _, seconds = item.partition('=')
+        values[path.strip()] = float(seconds)
+    return values
+
+
 class Config:
     # Flask Configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
@@ -12,24 +24,170 @@ class Config:
     REAMAZE_SUBDOMAIN = os.environ.get('REAMAZE_SUBDOMAIN', 'bodwellness')
     REAMAZE_API_TOKEN = os.environ.get('REAMAZE_API_TOKEN')
     REAMAZE_EMAIL = os.environ.get('REAMAZE_EMAIL')
-    REAMAZE_BASE_URL = f"https://{REAMAZE_SUBDOMAIN}.reamaze.io/api/v1"
+    REAMAZE_BASE_URL = os.environ.get('REAMAZE_BASE_URL') or f"https://{REAMAZE_SUBDOMAIN}.reamaze.io/api/v1"
     
     # Rate limiting configuration
     RATE_LIMIT_RETRIES = int(os.environ.get('RATE_LIMIT_RETRIES', '3'))
-    RATE_LIMIT_DELAY = int(os.environ.get('RATE_LIMIT_DELAY', '60'))  # seconds
-    
+    RATE_LIMIT_DELAY = int(os.environ.get('RATE_LIMIT_DELAY', '60'))  # seconds, used when a 429 has no Retry-After
+    RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '5'))  # longest a request may wait for a token
+    REAMAZE_RATE_LIMIT_PER_SECOND = float(os.environ.get('REAMAZE_RATE_LIMIT_PER_SECOND', '2'))
+    REAMAZE_RATE_LIMIT_BURST = int(os.environ.get('REAMAZE_RATE_LIMIT_BURST', '10'))
+    # Shared by all gunicorn workers on the host
+    RATE_LIMIT_DB_PATH = os.environ.get(
+        'RATE_LIMIT_DB_PATH', os.path.join(tempfile.gettempdir(), 'reamaze_bridge_ratelimit.sqlite3')
+    )
+
+    # Upstream HTTP connection pooling (one pool per worker process)
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '4'))  # distinct hosts kept pooled
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))  # keep-alive connections per host
+    HTTP_KEEPALIVE_IDLE = int(os.environ.get('HTTP_KEEPALIVE_IDLE', '60'))  # seconds before TCP keep-alive probes, 0 disables
+    HTTP_PREWARM = os.environ.get('HTTP_PREWARM', 'True').lower() == 'true'
+
+    # Bulkheads: separate concurrency limits per upstream so a slow Shopify can't starve Reamaze calls
+    REAMAZE_MAX_CONCURRENCY = int(os.environ.get('REAMAZE_MAX_CONCURRENCY', '8'))
+    SHOPIFY_MAX_CONCURRENCY = int(os.environ.get('SHOPIFY_MAX_CONCURRENCY', '8'))
+    BULKHEAD_MAX_QUEUE = int(os.environ.get('BULKHEAD_MAX_QUEUE', '16'))  # callers allowed to wait for a slot
+    BULKHEAD_MAX_WAIT = float(os.environ.get('BULKHEAD_MAX_WAIT', '2'))  # seconds a caller may wait before a 503
+
+    # Circuit breakers (per upstream, separate for reads and writes)
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))  # consecutive failures before opening
+    BREAKER_RECOVERY_TIMEOUT = float(os.environ.get('BREAKER_RECOVERY_TIMEOUT', '30'))  # seconds open before probing
+    BREAKER_HALF_OPEN_PROBES = int(os.environ.get('BREAKER_HALF_OPEN_PROBES', '1'))  # concurrent probes while half-open
+
+    # Hedged Shopify reads (order lookup and product search)
+    HEDGE_READS = os.environ.get('HEDGE_READS', 'false').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', '0.95'))  # hedge once a read is slower than this
+    HEDGE_BUDGET_RATIO = float(os.environ.get('HEDGE_BUDGET_RATIO', '0.1'))  # at most 10% extra GraphQL calls
+
+    # Coalescing of identical in-flight reads (within a worker, and across workers via sqlite)
+    SINGLEFLIGHT_SHARED = os.environ.get('SINGLEFLIGHT_SHARED', 'true').lower() == 'true'
+    SINGLEFLIGHT_DB_PATH = os.environ.get(
+        'SINGLEFLIGHT_DB_PATH', os.path.join(tempfile.gettempdir(), 'reamaze_bridge_singleflight.sqlite3')
+    )
+    SINGLEFLIGHT_LEASE = float(os.environ.get('SINGLEFLIGHT_LEASE', '30'))  # max seconds to wait on another worker's call
+
+    # Per-worker cache of Reamaze GET responses (ETag/Last-Modified revalidation); 0 disables it
+    REAMAZE_CACHE_MAX_BYTES = int(os.environ.get('REAMAZE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+    # Shopify GraphQL cost budget (mirrors extensions.cost.throttleStatus)
+    SHOPIFY_COST_MAX_WAIT = float(os.environ.get('SHOPIFY_COST_MAX_WAIT', '5'))  # longest delay before answering 429
+    SHOPIFY_INTERACTIVE_RESERVE = float(os.environ.get('SHOPIFY_INTERACTIVE_RESERVE', '0.2'))  # share of the bucket scans may not use
+
+    # Local knowledge-base mirror searched with BM25 (live Reamaze search remains the fallback)
+    KB_MIRROR_ENABLED = os.environ.get('KB_MIRROR_ENABLED', 'true').lower() == 'true'
+    KB_MIRROR_DB_PATH = os.environ.get(
+        'KB_MIRROR_DB_PATH', os.path.join(tempfile.gettempdir(), 'reamaze_bridge_kb.sqlite3')
+    )
+    KB_SYNC_INTERVAL = float(os.environ.get('KB_SYNC_INTERVAL', '600'))  # seconds between article list pulls
+    KB_MIRROR_MAX_AGE = float(os.environ.get('KB_MIRROR_MAX_AGE', '86400'))  # older than this, search live instead
+
+    # Local Shopify catalog mirror for /recommend-products (bulk-export seed + incremental updated_at syncs)
+    CATALOG_MIRROR_ENABLED = os.environ.get('CATALOG_MIRROR_ENABLED', 'true').lower() == 'true'
+    CATALOG_MIRROR_DB_PATH = os.environ.get(
+        'CATALOG_MIRROR_DB_PATH', os.path.join(tempfile.gettempdir(), 'reamaze_bridge_catalog.sqlite3')
+    )
+    CATALOG_SYNC_INTERVAL = float(os.environ.get('CATALOG_SYNC_INTERVAL', '300'))  # seconds between incremental syncs
+    CATALOG_RESEED_INTERVAL = float(os.environ.get('CATALOG_RESEED_INTERVAL', '86400'))  # full bulk export (drops deleted products)
+    CATALOG_MIRROR_MAX_AGE = float(os.environ.get('CATALOG_MIRROR_MAX_AGE', '3600'))  # older than this, search live instead
+    CATALOG_BULK_TIMEOUT = float(os.environ.get('CATALOG_BULK_TIMEOUT', '600'))  # longest wait for a bulk export
+
+    # Sold-out variants left out of /recommend-products (inventory webhooks + periodic sync)
+    AVAILABILITY_ENABLED = os.environ.get('AVAILABILITY_ENABLED', 'true').lower() == 'true'
+    AVAILABILITY_DB_PATH = os.environ.get(
+        'AVAILABILITY_DB_PATH', os.path.join(tempfile.gettempdir(), 'reamaze_bridge_availability.sqlite3')
+    )
+    AVAILABILITY_SYNC_INTERVAL = float(os.environ.get('AVAILABILITY_SYNC_INTERVAL', '900'))  # full inventory reload
+    AVAILABILITY_MAX_AGE = float(os.environ.get('AVAILABILITY_MAX_AGE', '21600'))  # older than this, filter nothing
+
+    # Order name -> id, so /track-order hydrates one order instead of scanning recent ones
+    ORDER_INDEX_ENABLED = os.environ.get('ORDER_INDEX_ENABLED', 'true').lower() == 'true'
+    ORDER_INDEX_DB_PATH = os.environ.get(
+        'ORDER_INDEX_DB_PATH', os.path.join(tempfile.gettempdir(), 'reamaze_bridge_orders.sqlite3')
+    )
+    ORDER_INDEX_SYNC_INTERVAL = float(os.environ.get('ORDER_INDEX_SYNC_INTERVAL', '60'))  # seconds between updated_at polls
+    ORDER_INDEX_BACKFILL_DAYS = int(os.environ.get('ORDER_INDEX_BACKFILL_DAYS', '730'))  # how far back the first sync reaches
+    ORDER_INDEX_MAX_AGE = float(os.environ.get('ORDER_INDEX_MAX_AGE', '900'))  # older than this, fall back to the scan
+    # Start the recent-orders scan alongside a name search that's slower than usual, not only after it misses
+    ORDER_LOOKUP_RACE = os.environ.get('ORDER_LOOKUP_RACE', 'true').lower() == 'true'
+    TRACK_ORDERS_MAX_ORDERS = int(os.environ.get('TRACK_ORDERS_MAX_ORDERS', '10'))  # order numbers per /track-orders call
+
+    # /recommend-products ranking points, merged over product_ranking.DEFAULT_WEIGHTS
+    # e.g. PRODUCT_RANKING_WEIGHTS='{"on_sale": 50, "price_tiers": [[25, 30], [50, 15]]}'
+    PRODUCT_RANKING_WEIGHTS = json.loads(os.environ.get('PRODUCT_RANKING_WEIGHTS') or '{}')
+    # Live product searches page through results until `limit` products pass the filters, within this many pages
+    PRODUCT_SEARCH_MAX_PAGES = int(os.environ.get('PRODUCT_SEARCH_MAX_PAGES', '3'))
+
+    # /get-instructions returns a digest of the article (plain text, steps, links) within a token budget
+    INSTRUCTIONS_MAX_TOKENS = int(os.environ.get('INSTRUCTIONS_MAX_TOKENS', '600'))  # when the caller sends no max_tokens
+    INSTRUCTIONS_MAX_TOKENS_LIMIT = int(os.environ.get('INSTRUCTIONS_MAX_TOKENS_LIMIT', '4000'))
+    INSTRUCTION_DIGEST_CACHE_SIZE = int(os.environ.get('INSTRUCTION_DIGEST_CACHE_SIZE', '1000'))  # article versions kept
+
+    # Stale-if-error: serve the last good answer (flagged "stale") when the upstream fails; seconds per tool
+    STALE_CACHE_MAX_ENTRIES = int(os.environ.get('STALE_CACHE_MAX_ENTRIES', '2000'))
+    # e.g. STALE_MAX_AGES_OVERRIDE="/track-order=0,/search-kb=3600"
+    STALE_MAX_AGES = _parse_overrides('STALE_MAX_AGES_OVERRIDE', {
+        '/search-kb': 86400,
+        '/recommend-products': 3600,
+        '/track-order': 900,
+    })
+
+    # Whole tool responses cached per worker, keyed on the canonical payload; seconds per tool
+    TOOL_CACHE_ENABLED = os.environ.get('TOOL_CACHE_ENABLED', 'true').lower() == 'true'
+    TOOL_CACHE_MAX_ENTRIES = int(os.environ.get('TOOL_CACHE_MAX_ENTRIES', '5000'))
+    TOOL_CACHE_MAX_BYTES = int(os.environ.get('TOOL_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    # e.g. TOOL_CACHE_TTLS_OVERRIDE="/track-order=0,/search-kb=600" (0 disables a tool)
+    TOOL_CACHE_TTLS = _parse_overrides('TOOL_CACHE_TTLS_OVERRIDE', {
+        '/search-kb': 300,
+        '/get-instructions': 900,
+        '/recommend-products': 120,
+        '/track-order': 60,
+    })
+    # "Nothing found" answers (unknown order, no matching articles or products); TOOL_CACHE_NEGATIVE_TTLS_OVERRIDE likewise
+    TOOL_CACHE_NEGATIVE_TTLS = _parse_overrides('TOOL_CACHE_NEGATIVE_TTLS_OVERRIDE', {
+        '/search-kb': 60,
+        '/get-instructions': 60,
+        '/recommend-products': 30,
+        '/track-order': 20,
+    })
+
+    # End-to-end deadline per tool call (covers rate-limit waits, retries, backoff and every attempt)
+    TOOL_DEADLINE_HEADER = os.environ.get('TOOL_DEADLINE_HEADER', 'X-Request-Timeout')  # seconds, set by the caller
+    TOOL_DEADLINE_DEFAULT = float(os.environ.get('TOOL_DEADLINE_DEFAULT', '20'))
+    TOOL_DEADLINE_MAX = float(os.environ.get('TOOL_DEADLINE_MAX', '28'))  # stay under gunicorn's 30s worker timeout
+    # e.g. TOOL_DEADLINES_OVERRIDE="/track-order=12,/search-kb=6"
+    TOOL_DEADLINES = _parse_overrides('TOOL_DEADLINES_OVERRIDE', {
+        '/search-kb': 10,
+        '/get-instructions': 10,
+        '/check-ticket-status': 15,
+        '/get-previous-conversations': 15,
+        '/recommend-products': 15,
+        '/track-order': 20,
+        '/track-orders': 20,
+        '/create-ticket': 25,
+        '/add-ticket-info': 25,
+    })
+    UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', '30'))  # ceiling for a single attempt
+    MIN_ATTEMPT_BUDGET = float(os.environ.get('MIN_ATTEMPT_BUDGET', '0.5'))  # don't start an attempt with less left
+    ADAPTIVE_TIMEOUT_PERCENTILE = float(os.environ.get('ADAPTIVE_TIMEOUT_PERCENTILE', '0.99'))
+    ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.environ.get('ADAPTIVE_TIMEOUT_MULTIPLIER', '2'))
+    ADAPTIVE_TIMEOUT_MIN = float(os.environ.get('ADAPTIVE_TIMEOUT_MIN', '1'))
+
+    # Async serving mode (async_bridge.py): connections shared by all in-flight tool calls in one process
+    ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS', '100'))
+
     # Logging configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     
     # Shopify Admin API Configuration (optional but required for Shopify endpoints)
     SHOPIFY_STORE_DOMAIN = os.environ.get('SHOPIFY_STORE_DOMAIN')  # e.g. rtoprcostmetics.myshopify.com
     SHOPIFY_ADMIN_TOKEN = os.environ.get('SHOPIFY_ADMIN_TOKEN')  # Admin API access token (starts with shpat_)
+    SHOPIFY_WEBHOOK_SECRET = os.environ.get('SHOPIFY_WEBHOOK_SECRET')  # signs inventory_levels/update webhooks
     SHOPIFY_API_VERSION = os.environ.get('SHOPIFY_API_VERSION', '2024-10')
     SHOPIFY_ADMIN_REST_BASE_URL = (
         f"https://{SHOPIFY_STORE_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}"
         if SHOPIFY_STORE_DOMAIN else None
     )
-    SHOPIFY_ADMIN_GRAPHQL_URL = (
+    SHOPIFY_ADMIN_GRAPHQL_URL = os.environ.get('SHOPIFY_ADMIN_GRAPHQL_URL') or (
         f"https://{SHOPIFY_STORE_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
         if SHOPIFY_STORE_DOMAIN else None
     )
@@ -0,0 +1,123 @@
+import time
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from contextvars import ContextVar
+
+
+class Deadline:
+    """Total time budget for one tool call, shared by every upstream attempt made on its behalf"""
+
+    def __init__(self, budget):
+        self.budget = float(budget)
+        self.expires_at = time.monotonic() + self.budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+_current_deadline = ContextVar('tool_call_deadline', default=None)
+
+
+def start_deadline(budget):
+    """Install a deadline for the current request; returns a token for reset_deadline()"""
+    return _current_deadline.set(Deadline(budget))
+
+
+def reset_deadline(token):
+    _current_deadline.reset(token)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def remaining_budget(default=None):
+    """Seconds left for the current tool call, or `default` outside of one"""
+    deadline = _current_deadline.get()
+    return default if deadline is None else deadline.remaining()
+
+
+def cap_to_budget(seconds, reserve=0.0):
+    """Shrink a wait/timeout so that `reserve` seconds are still left afterwards"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return seconds
+    return max(0.0, min(seconds, deadline.remaining() - reserve))
+
+
+def resolve_budget(header_value, default, maximum):
+    """Budget from the caller's timeout header (seconds) if valid, else the endpoint default"""
+    try:
+        requested = float(header_value)
+    except (TypeError, ValueError):
+        return default
+    if requested <= 0:
+        return default
+    return min(requested, maximum)
+
+
+def deadline_exceeded():
+    """Error result returned by the API clients once the caller's budget is spent"""
+    return {"error": "Request deadline exceeded, please try again", "status_code": 504}
+
+
+class LatencyTracker:
+    """
+    Rolling window of upstream call latencies used to size per-attempt timeouts.
+
+    Until enough samples exist the configured default is used; afterwards the
+    timeout is `multiplier` x the chosen percentile, floored at `minimum`.
+    """
+
+    def __init__(self, name, window=200, percentile=0.99, multiplier=2.0, minimum=1.0, min_samples=20):
+        self.name = name
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.minimum = minimum
+        self.min_samples = min_samples
+        self._window = deque(maxlen=window)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            if len(self._window) == self._window.maxlen:
+                evicted = self._window[0]
+                del self._sorted[bisect_left(self._sorted, evicted)]
+            self._window.append(seconds)
+            insort(self._sorted, seconds)
+
+    def warmed_up(self):
+        return len(self._window) >= self.min_samples
+
+    def quantile(self, q):
+        with self._lock:
+            if not self._sorted:
+                return None
+            return self._sorted[min(len(self._sorted) - 1, int(len(self._sorted) * q))]
+
+    def attempt_timeout(self, default):
+        """Per-attempt timeout from observed latency, capped by the remaining call budget"""
+        timeout = default
+        if self.warmed_up():
+            timeout = min(default, max(self.minimum, self.quantile(self.percentile) * self.multiplier))
+        return cap_to_budget(timeout)
+
+    def stats(self):
+        return {
+            "samples": len(self._window),
+            "p50_ms": _ms(self.quantile(0.5)),
+            "p99_ms": _ms(self.quantile(0.99)),
+            "adaptive_timeout_ms": _ms(
+                max(self.minimum, self.quantile(self.percentile) * self.multiplier)
+                if self.warmed_up() else None
+            )
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
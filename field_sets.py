@@ -0,0 +1,131 @@
+import re
+from functools import lru_cache
+
+# Caller-selectable parts of an order (`fields` on /track-order) and their GraphQL selections;
+# "status" is always selected
+ORDER_FIELD_SETS = {
+    "status": "id name processedAt cancelledAt closedAt displayFinancialStatus displayFulfillmentStatus",
+    "customer": "customer { displayName email }",
+    "shipping": "shippingAddress { name address1 address2 city province country zip phone }",
+    "tracking": "fulfillments { createdAt status trackingInfo { number url company } }",
+    "items": "lineItems(first: 50) { edges { node { name quantity sku variant { id title image { url } product { id title handle onlineStoreUrl } } } } }",
+}
+# format_order keys filled by each order field set
+ORDER_RESPONSE_KEYS = {"customer": "customer", "shipping": "shipping_address", "tracking": "fulfillments", "items": "items"}
+
+# Caller-selectable parts of a product (`fields` on /recommend-products). "summary" is always
+# selected, and so is what filtering and ranking read: variant ids, titles and prices, and the
+# featured image
+PRODUCT_FIELD_SETS = ("summary", "variants", "images")
+
+
+def parse_field_set(value, choices, base):
+    """
+    A `fields` payload value (a list, or text like "status, tracking") -> (field set, unknown names).
+
+    The field set always holds `base`. It is None, meaning every field, when
+    nothing is given, for "all", and when every choice is named, so those
+    share the default queries.
+    """
+    if isinstance(value, (list, tuple)):
+        names = [str(name) for name in value]
+    else:
+        names = re.split(r'[\s,;|]+', str(value or ''))
+    names = {name.strip().lower() for name in names if name.strip()}
+    if not names or 'all' in names:
+        return None, []
+    unknown = sorted(names - set(choices))
+    field_set = frozenset(names & set(choices)) | {base}
+    return (None if field_set == frozenset(choices) else field_set), unknown
+
+
+@lru_cache(maxsize=None)
+def order_queries(field_set=None):
+    """Order selection plus the name search and fetch-by-id queries for a field set (None: every field), compiled once per set"""
+    fields = "\n              ".join(
+        selection for name, selection in ORDER_FIELD_SETS.items() if field_set is None or name in field_set
+    )
+    return {
+        "fields": fields,
+        # Both name forms ("#1001" and "1001") in one round-trip; one order per alias keeps the
+        # full order fields within Shopify's per-query cost limit
+        "name_search": """
+        query($hashed: String!, $plain: String!) {
+          hashed: orders(first: 1, query: $hashed) {
+            edges { node { """ + fields + """
+            } }
+          }
+          plain: orders(first: 1, query: $plain) {
+            edges { node { """ + fields + """
+            } }
+          }
+        }
+        """,
+        "by_id": """
+        query($id: ID!) {
+          order(id: $id) { """ + fields + """
+          }
+        }
+        """
+    }
+
+
+@lru_cache(maxsize=None)
+def product_search_query(field_set=None):
+    """Product search query for a field set (None: every field), compiled once per set"""
+    variant = ["id", "title"]
+    if field_set is None or "variants" in field_set:
+        variant.append("sku")
+    variant += ["price", "compareAtPrice"]
+    if field_set is None or "images" in field_set:
+        variant.append("image { url }")
+    return """
+        query($q: String!, $first: Int!, $sortKey: ProductSortKeys!, $reverse: Boolean!, $after: String) {
+          products(first: $first, after: $after, query: $q, sortKey: $sortKey, reverse: $reverse) {
+            pageInfo { hasNextPage endCursor }
+            edges {
+              node {
+                id
+                title
+                handle
+                onlineStoreUrl
+                featuredImage { url }
+                createdAt
+                updatedAt
+                variants(first: 10) {
+                  edges {
+                    node {
+                      """ + "\n                      ".join(variant) + """
+                    }
+                  }
+                }
+              }
+            }
+          }
+        }
+        """
+
+
+def project_order(order, field_set):
+    """A format_order result without the parts outside `field_set` (None: all kept)"""
+    if field_set is None:
+        return order
+    dropped = {key for name, key in ORDER_RESPONSE_KEYS.items() if name not in field_set}
+    return {key: value for key, value in order.items() if key not in dropped}
+
+
+def project_products(products, field_set):
+    """Shaped products without the parts outside `field_set` (None: all kept)"""
+    if field_set is None:
+        return products
+    projected = []
+    for product in products:
+        product = dict(product)
+        if "images" not in field_set:
+            product.pop('image', None)
+        if "variants" not in field_set:
+            product.pop('variants', None)
+        elif "images" not in field_set:
+            product['variants'] = [{k: v for k, v in variant.items() if k != 'image'} for variant in product['variants']]
+        projected.append(product)
+    return projected
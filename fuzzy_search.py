@@ -0,0 +1,132 @@
+import re
+import time
+
+import numpy as np
+
+from kb_mirror import STOPWORDS
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+# Query word -> words the catalog uses for the same material, style or colour
+SYNONYMS = {
+    "rubber": "silicone", "silicon": "silicone", "sport": "sports",
+    "mesh": "milanese", "metal": "stainless steel", "steel": "stainless", "stainless": "steel",
+    "fabric": "nylon", "cloth": "nylon", "canvas": "nylon", "woven": "braided", "braid": "braided",
+    "stretchy": "elastic", "stretch": "elastic", "magnet": "magnetic", "links": "link",
+    "grey": "gray", "gray": "grey", "pink": "rose", "rosegold": "rose gold", "navy": "blue",
+    "tan": "brown", "cream": "starlight", "clear": "transparent", "transparent": "clear",
+    "bumper": "case", "cover": "case", "protector": "screen", "strap": "band", "straps": "band",
+    "iwatch": "apple", "samsung": "galaxy",
+}
+
+
+def ngrams(text, n=3):
+    """Character n-grams of each word, padded so word starts and ends count ("milanese" -> " mi", "mil", ...)"""
+    grams = []
+    for word in _WORD.findall((text or '').lower()):
+        if word in STOPWORDS:
+            continue
+        padded = f" {word} "
+        grams.extend(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return grams
+
+
+def expand_synonyms(text):
+    """Query text with each word's catalog synonyms appended"""
+    words = _WORD.findall((text or '').lower())
+    return ' '.join(words + [SYNONYMS[w] for w in words if w in SYNONYMS])
+
+
+class NgramIndex:
+    """
+    Typo-tolerant product retrieval: TF-IDF over character trigrams, ranked by cosine similarity.
+
+    Each document is (key, version, title, text); title grams count
+    `title_weight` times. The doc-term matrix is kept sparse as NumPy arrays
+    sorted by term (CSC layout), so a query only touches the postings of its
+    own grams. Passing the `previous` index reuses the gram counts of
+    documents whose (key, version) is unchanged, so a catalog update only
+    re-tokenizes the products that changed; the weights are recomputed from
+    the counts in a few vectorized passes.
+    """
+
+    def __init__(self, documents, previous=None, title_weight=2, min_similarity=0.2):
+        started = time.perf_counter()
+        self.min_similarity = min_similarity
+        self.vocabulary = dict(previous.vocabulary) if previous is not None else {}
+        cached = previous._counts if previous is not None else {}
+        self._counts = {}
+        self.reused = 0
+        terms, counts, docs = [], [], []
+        for doc, (key, version, title, text) in enumerate(documents):
+            entry = cached.get(key)
+            if entry is not None and entry[0] == version:
+                self.reused += 1
+            else:
+                entry = (version,) + self._vectorize(ngrams(title) * title_weight + ngrams(text))
+            self._counts[key] = entry
+            terms.append(entry[1])
+            counts.append(entry[2])
+            docs.append(np.full(len(entry[1]), doc, dtype=np.int32))
+        self.size = len(documents)
+        self._build(terms, counts, docs)
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def _vectorize(self, grams):
+        """Gram list -> (term ids, counts), growing the vocabulary"""
+        ids = np.fromiter((self.vocabulary.setdefault(g, len(self.vocabulary)) for g in grams), dtype=np.int32, count=len(grams))
+        terms, tf = np.unique(ids, return_counts=True)
+        return terms.astype(np.int32), tf.astype(np.float32)
+
+    def _build(self, terms, counts, docs):
+        vocab = len(self.vocabulary)
+        terms = np.concatenate(terms) if terms else np.zeros(0, dtype=np.int32)
+        tf = np.concatenate(counts) if counts else np.zeros(0, dtype=np.float32)
+        docs = np.concatenate(docs) if docs else np.zeros(0, dtype=np.int32)
+        df = np.bincount(terms, minlength=vocab)
+        self.idf = (np.log((1 + self.size) / (1 + df)) + 1).astype(np.float32)
+        weights = (1 + np.log(tf)) * self.idf[terms]
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=self.size))
+        weights = weights / np.maximum(norms[docs], 1e-9)
+        order = np.argsort(terms, kind='stable')
+        self.postings_docs = docs[order]
+        self.postings_weights = weights[order].astype(np.float32)
+        self.indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+    def search(self, query, limit, candidates=None):
+        """Top `limit` (document index, cosine similarity) pairs for `query`, best first (only `candidates`, if given)"""
+        ids = [self.vocabulary[g] for g in ngrams(expand_synonyms(query)) if g in self.vocabulary]
+        if not ids or not self.size:
+            return []
+        terms, tf = np.unique(np.array(ids, dtype=np.int64), return_counts=True)
+        query_weights = (1 + np.log(tf)) * self.idf[terms]
+        query_weights /= np.linalg.norm(query_weights)
+        starts, ends = self.indptr[terms], self.indptr[terms + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return []
+        # Postings of every query gram, gathered with one index array
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        scores = np.bincount(
+            self.postings_docs[positions],
+            weights=self.postings_weights[positions] * np.repeat(query_weights, lengths),
+            minlength=self.size
+        )
+        if candidates is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[np.fromiter(candidates, dtype=np.int64, count=len(candidates))] = True
+            scores[~mask] = 0.0
+        hits = np.flatnonzero(scores >= self.min_similarity)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [(int(doc), float(scores[doc])) for doc in hits]
+
+    def stats(self):
+        return {
+            "documents": self.size,
+            "grams": len(self.vocabulary),
+            "postings": int(len(self.postings_docs)),
+            "reused_documents": self.reused,
+            "build_ms": round(self.build_ms, 2)
+        }
@@ -0,0 +1,19 @@
+# Gunicorn configuration for the Reamaze API Bridge
+# Picked up automatically by `gunicorn main:app` when run from the project root.
+
+
+def post_worker_init(worker):
+    """Pre-warm upstream keep-alive connections and start the KB, catalog mirror, inventory and order index syncs once the worker has loaded the app"""
+    try:
+        from main import warm_http_pools
+        warm_http_pools()
+    except Exception as e:
+        worker.log.warning(f"Upstream connection pre-warm failed: {e}")
+    try:
+        from main import start_kb_mirror, start_catalog_mirror, start_availability_index, start_order_index
+        start_kb_mirror()
+        start_catalog_mirror()
+        start_availability_index()
+        start_order_index()
+    except Exception as e:
+        worker.log.warning(f"Local mirror start failed: {e}")
@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FuturesTimeout, wait
+
+logger = logging.getLogger(__name__)
+
+
+def _is_error(result):
+    return isinstance(result, dict) and "error" in result
+
+
+class Hedger:
+    """
+    Hedged execution of idempotent reads.
+
+    If a call has not answered after the `percentile` latency observed by
+    `latency` (a deadline.LatencyTracker), one duplicate is started and the
+    first successful answer wins. Every hedge-eligible call earns
+    `budget_ratio` of a hedge, so hedges can never exceed that share of calls
+    (plus a small burst of `max_tokens`).
+    """
+
+    def __init__(self, name, latency, enabled=True, percentile=0.95, budget_ratio=0.1, min_delay=0.05, max_tokens=5, max_workers=32):
+        self.name = name
+        self.latency = latency
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_delay = min_delay
+        self.max_tokens = max_tokens
+        self.max_workers = max_workers
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.skipped_no_budget = 0
+        self.races = 0
+        self.race_fallbacks = 0
+        self.race_fallback_wins = 0
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while disabled or until enough latency has been observed"""
+        if not self.enabled or not self.latency.warmed_up():
+            return None
+        return max(self.min_delay, self.latency.quantile(self.percentile))
+
+    def _admit_call(self):
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.budget_ratio)
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._tokens < 1:
+                self.skipped_no_budget += 1
+                return False
+            self._tokens -= 1
+            self.hedges_fired += 1
+            return True
+
+    def _won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def _submit(self, call, args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"hedge-{self.name}")
+        # Carry the caller's context (deadline budget) into the worker thread
+        return self._executor.submit(contextvars.copy_context().run, call, *args)
+
+    def run(self, call, *args):
+        """Run `call(*args)` with hedging, for threaded callers"""
+        delay = self.hedge_delay()
+        if delay is None:
+            return call(*args)
+        self._admit_call()
+        primary = self._submit(call, args)
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        if not self._take_hedge():
+            return primary.result()
+        logger.info(f"Hedging {self.name} read after {delay * 1000:.0f}ms")
+        hedge = self._submit(call, args)
+        pending = {primary, hedge}
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if not _is_error(result):
+                    if future is hedge:
+                        self._won()
+                    for loser in pending:
+                        loser.cancel()  # an already-running request is simply left to finish and discarded
+                    return result
+        return result
+
+    async def arun(self, call, *args):
+        """Run `await call(*args)` with hedging; the losing request is cancelled"""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await call(*args)
+        self._admit_call()
+        primary = asyncio.ensure_future(call(*args))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            if not self._take_hedge():
+                return await primary
+            logger.info(f"Hedging {self.name} read after {delay * 1000:.0f}ms")
+            hedge = asyncio.ensure_future(call(*args))
+            pending = {primary, hedge}
+            result = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if not _is_error(result):
+                        if task is hedge:
+                            self._won()
+                        return result
+            return result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _count_race(self, fallback_started, fallback_won=False):
+        with self._lock:
+            self.races += 1
+            self.race_fallbacks += fallback_started
+            self.race_fallback_wins += fallback_won
+
+    def race(self, primary, fallback, delay):
+        """
+        Run `primary()`, and `fallback()` too once primary has returned None or not
+        answered within `delay` seconds (None: only after a miss). An error from
+        primary before fallback starts is returned as is. Otherwise the first result
+        that is neither None nor an error wins, then primary's error, then fallback's
+        result. For threaded callers.
+        """
+        if delay is None:
+            result = primary()
+            if result is not None:
+                self._count_race(False)
+                return result
+            result = fallback()
+            self._count_race(True, result is not None and not _is_error(result))
+            return result
+        first = self._submit(primary, ())
+        try:
+            result = first.result(timeout=delay)
+            if result is not None:
+                self._count_race(False)
+                return result
+        except FuturesTimeout:
+            logger.info(f"Racing {self.name} fallback after {delay * 1000:.0f}ms")
+        second = self._submit(fallback, ())
+        results, pending = {}, {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[future] = future.result()
+                if results[future] is not None and not _is_error(results[future]):
+                    self._count_race(True, future is second)
+                    for loser in pending:
+                        loser.cancel()  # an already-running request is simply left to finish and discarded
+                    return results[future]
+        self._count_race(True)
+        return results[first] if _is_error(results[first]) else results[second]
+
+    async def arace(self, primary, fallback, delay):
+        """`race` for coroutine functions; the losing stage is cancelled"""
+        if delay is None:
+            result = await primary()
+            if result is not None:
+                self._count_race(False)
+                return result
+            result = await fallback()
+            self._count_race(True, result is not None and not _is_error(result))
+            return result
+        first = asyncio.ensure_future(primary())
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done and first.result() is not None:
+                self._count_race(False)
+                return first.result()
+            if not done:
+                logger.info(f"Racing {self.name} fallback after {delay * 1000:.0f}ms")
+            second = asyncio.ensure_future(fallback())
+            pending = {second} if done else {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None and not _is_error(result):
+                        self._count_race(True, task is second)
+                        return result
+            self._count_race(True)
+            return first.result() if _is_error(first.result()) else second.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        delay = self.hedge_delay()
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "skipped_no_budget": self.skipped_no_budget,
+            "hedge_rate": round(self.hedges_fired / self.calls, 3) if self.calls else 0.0,
+            "win_rate": round(self.hedge_wins / self.hedges_fired, 3) if self.hedges_fired else 0.0,
+            "hedge_delay_ms": None if delay is None else round(delay * 1000, 1),
+            "races": self.races,
+            "race_fallbacks": self.race_fallbacks,
+            "race_fallback_wins": self.race_fallback_wins
+        }
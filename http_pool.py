@@ -0,0 +1,130 @@
+import os
+import socket
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive on every pooled connection"""
+
+    def __init__(self, keepalive_idle=None, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def _socket_options(self):
+        from urllib3.connection import HTTPConnection
+
+        options = list(HTTPConnection.default_socket_options)
+        if self.keepalive_idle:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            # TCP_KEEPIDLE/TCP_KEEPINTVL are not available on every platform (e.g. macOS)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(self.keepalive_idle)))
+            if hasattr(socket, 'TCP_KEEPINTVL'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, int(self.keepalive_idle) // 3)))
+        return options
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self._socket_options()
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledSession:
+    """
+    Per-process pooled `requests.Session` for a single upstream.
+
+    The underlying session is rebuilt lazily whenever the process id changes,
+    so a client created before gunicorn forks never shares sockets with its
+    workers.
+    """
+
+    def __init__(self, name, pool_connections=4, pool_maxsize=10, keepalive_idle=60, headers=None, auth=None):
+        self.name = name
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_idle = keepalive_idle
+        self.headers = headers or {}
+        self.auth = auth
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        session = requests.Session()
+        adapter = KeepAliveAdapter(
+            keepalive_idle=self.keepalive_idle,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=False
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers)
+        if self.auth is not None:
+            session.auth = self.auth
+        return session
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build()
+                    self._pid = pid
+                    logger.info(f"Created pooled HTTP session '{self.name}' (pid {pid})")
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method=method, url=url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def warm(self, url, timeout=5):
+        """Open a connection to the upstream host ahead of the first real call."""
+        try:
+            response = self.session.head(url, timeout=timeout, allow_redirects=False)
+            logger.info(f"Pre-warmed '{self.name}' connection to {url} (status {response.status_code})")
+            return True
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Failed to pre-warm '{self.name}' connection to {url}: {e}")
+            return False
+
+    def stats(self):
+        """
+        Connection reuse statistics for every host this session has talked to.
+
+        `new_connections` counts TCP(+TLS) handshakes; `reused` counts requests
+        served on an already-open connection.
+        """
+        hosts = {}
+        if self._session is None or self._pid != os.getpid():
+            return {"pid": os.getpid(), "hosts": hosts}
+
+        for adapter in set(self._session.adapters.values()):
+            manager = getattr(adapter, 'poolmanager', None)
+            if manager is None:
+                continue
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                entry = hosts.setdefault(host, {"new_connections": 0, "requests": 0, "reused": 0})
+                entry["new_connections"] += pool.num_connections
+                entry["requests"] += pool.num_requests
+                entry["reused"] += max(0, pool.num_requests - pool.num_connections)
+
+        return {
+            "pid": os.getpid(),
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "keepalive_idle": self.keepalive_idle,
+            "hosts": hosts
+        }
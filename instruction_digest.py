@@ -0,0 +1,179 @@
+import re
+import math
+import hashlib
+import threading
+from html import escape
+from html.parser import HTMLParser
+from collections import OrderedDict
+
+_BLOCK_TAGS = {'p', 'div', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'tr', 'blockquote', 'pre', 'section', 'table'}
+_SKIP_TAGS = {'script', 'style', 'head'}
+_SPACE = re.compile(r'\s+')
+# "1. Do this", "2) Do that", "Step 3: Do the other"
+_NUMBERED = re.compile(r'^(?:step\s*)?\d{1,2}\s*[.):-]\s+(.+)$', re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (~4 characters per token for English text)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def content_hash(body):
+    return hashlib.sha1((body or '').encode('utf-8')).hexdigest()
+
+
+class _ArticleParser(HTMLParser):
+    """Splits article HTML into paragraphs, ordered-list steps and links"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs = []
+        self.steps = []
+        self.links = []
+        self._lists = []
+        self._buffer = []
+        self._skip = 0
+        self._href = None
+        self._anchor = []
+
+    def _flush(self):
+        text = _SPACE.sub(' ', ''.join(self._buffer)).strip()
+        self._buffer = []
+        if not text:
+            return
+        if self._lists and self._lists[-1] == 'ol':
+            self.steps.append(text)
+        elif self._lists:
+            self.paragraphs.append(f"- {text}")
+        else:
+            self.paragraphs.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag in ('ol', 'ul'):
+            self._flush()
+            self._lists.append(tag)
+        elif tag == 'li' or tag in _BLOCK_TAGS:
+            self._flush()
+        elif tag == 'a':
+            href = dict(attrs).get('href') or ''
+            self._href = href if href.startswith(('http://', 'https://', 'mailto:', '/')) else None
+            self._anchor = []
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in ('ol', 'ul'):
+            self._flush()
+            if self._lists:
+                self._lists.pop()
+        elif tag == 'li' or tag in _BLOCK_TAGS:
+            self._flush()
+        elif tag == 'a' and self._href:
+            text = _SPACE.sub(' ', ''.join(self._anchor)).strip() or self._href
+            if all(link['url'] != self._href for link in self.links):
+                self.links.append({"text": text, "url": self._href})
+            self._href = None
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self._buffer.append(data)
+        if self._href:
+            self._anchor.append(data)
+
+
+def digest_article(body):
+    """
+    Compact form of an article body: plain-text paragraphs, numbered steps and
+    links. Steps come from <ol> items, or from "1." / "Step 1:" lines when the
+    article has no ordered list.
+    """
+    body = body or ''
+    if '<' not in body:
+        # Plain-text article: treat each line as a block
+        body = ''.join(f"<p>{escape(line, quote=False)}</p>" for line in body.splitlines())
+    parser = _ArticleParser()
+    parser.feed(body)
+    parser.close()
+    parser._flush()
+    paragraphs, steps = parser.paragraphs, parser.steps
+    if not steps:
+        numbered = [_NUMBERED.match(p) for p in paragraphs]
+        steps = [m.group(1) for m in numbered if m]
+        paragraphs = [p for p, m in zip(paragraphs, numbered) if not m]
+    return {"paragraphs": paragraphs, "steps": steps, "links": parser.links}
+
+
+def fit_digest(digest, max_tokens):
+    """
+    Trim a digest to roughly `max_tokens`: steps first, then links, then
+    paragraphs (the last one cut at a word boundary). Returns (fitted, truncated).
+    """
+    budget = max_tokens
+    fitted = {"steps": [], "links": [], "paragraphs": []}
+    truncated = False
+    for field, cost in (("steps", estimate_tokens), ("links", lambda link: estimate_tokens(link['text'] + link['url']))):
+        for item in digest[field]:
+            if cost(item) > budget:
+                truncated = True
+                break
+            fitted[field].append(item)
+            budget -= cost(item)
+    for paragraph in digest["paragraphs"]:
+        tokens = estimate_tokens(paragraph)
+        if tokens <= budget:
+            fitted["paragraphs"].append(paragraph)
+            budget -= tokens
+            continue
+        truncated = True
+        if budget >= 16:
+            cut = paragraph[:budget * 4].rsplit(' ', 1)[0]
+            fitted["paragraphs"].append(cut + ' …')
+        break
+    return fitted, truncated
+
+
+class DigestCache:
+    """Digests keyed by (article id, content hash), so each article version is converted once per worker"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.conversions = 0
+        self.original_bytes = 0
+        self.digest_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, article_id, body):
+        key = (str(article_id), content_hash(body))
+        with self._lock:
+            digest = self._entries.get(key)
+            if digest is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return digest
+        digest = digest_article(body)
+        with self._lock:
+            self.conversions += 1
+            self._entries[key] = digest
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+    def record_payload(self, original_bytes, digest_bytes):
+        with self._lock:
+            self.original_bytes += original_bytes
+            self.digest_bytes += digest_bytes
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "conversions": self.conversions,
+            "original_bytes": self.original_bytes,
+            "digest_bytes": self.digest_bytes,
+            "bytes_saved": self.original_bytes - self.digest_bytes
+        }
@@ -0,0 +1,258 @@
+import re
+import html
+import math
+import time
+import heapq
+import random
+import logging
+import threading
+
+from mirror_store import MirrorStore
+
+logger = logging.getLogger(__name__)
+
+_TAG = re.compile(r'<[^>]+>')
+_WORD = re.compile(r'[a-z0-9]+')
+_SUFFIXES = ('ing', 'es', 'ed', 's')
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from how i if in into is it its my of on or our so "
+    "that the their them then there these they this to was we what when where which who why will "
+    "with you your".split()
+)
+
+
+def _stem(word):
+    """Crude suffix stripping so "sizes", "sizing" and "size" meet on the same term"""
+    if word.isdigit() or word.endswith('ss'):
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith('e') and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Article HTML or a query -> index terms"""
+    text = html.unescape(_TAG.sub(' ', text or '')).lower()
+    return [_stem(word) for word in _WORD.findall(text) if word not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index over (title, body) documents with Okapi BM25 ranking.
+
+    Title terms are counted `title_weight` times, so an article about a topic
+    outranks one that only mentions it in passing.
+    """
+
+    def __init__(self, documents, k1=1.2, b=0.75, title_weight=3):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = []
+        for doc, (title, body) in enumerate(documents):
+            terms = tokenize(title) * title_weight + tokenize(body)
+            self.lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((doc, tf))
+        total = len(self.lengths)
+        self.avgdl = (sum(self.lengths) / total) if total else 0.0
+        # Per-document length normalisation, so scoring a posting is one division
+        self.norms = [k1 * (1 - b + b * length / (self.avgdl or 1)) for length in self.lengths]
+        self.idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query, limit, candidates=None):
+        """Top `limit` (document index, score) pairs for `query`, best first (only `candidates`, if given)"""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            boost = idf * (self.k1 + 1)
+            for doc, tf in self.postings[term]:
+                if candidates is not None and doc not in candidates:
+                    continue
+                scores[doc] = scores.get(doc, 0.0) + boost * tf / (tf + self.norms[doc])
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def unknown_terms(self, query):
+        """Query terms no document contains (misspellings, or words the catalog doesn't use)"""
+        return [term for term in set(tokenize(query)) if term not in self.idf]
+
+
+def article_key(article):
+    return str(article.get('id') or article.get('slug'))
+
+
+class _Snapshot:
+    """Articles and their index as of one mirror version; replaced wholesale, never mutated"""
+
+    def __init__(self, version, articles):
+        self.version = version
+        self.articles = articles
+        self.by_key = {}
+        for article in articles:
+            for value in (article.get('id'), article.get('slug')):
+                if value is not None:
+                    self.by_key[str(value)] = article
+        self.index = BM25Index([(a.get('title') or '', a.get('body') or '') for a in articles])
+
+
+class KnowledgeBaseMirror:
+    """
+    Local copy of every Reamaze KB article, searched in-process with BM25.
+
+    Articles live in a sqlite file shared by all workers. One worker at a time
+    (whoever takes the sync lease) pages through Reamaze's article list and
+    writes only the articles whose `updated_at` moved; every worker reloads its
+    index when the mirror's version changes. Searches go to the live API while
+    the mirror is empty or its last successful sync is older than `max_age`.
+    """
+
+    def __init__(self, db_path, sync_interval, max_age, lease=120):
+        self.store = MirrorStore(db_path, 'kb_mirror', lease)
+        self.sync_interval = sync_interval
+        self.max_age = max_age
+        self.syncs = 0
+        self.sync_failures = 0
+        self.articles_updated = 0
+        self.articles_removed = 0
+        self.searches = 0
+        self.fallbacks = {}
+        self.last_error = None
+        self._snapshot = _Snapshot(0, [])
+        self._synced_at = 0.0
+        self._thread = None
+
+    # ---- sync (writer side) ----
+
+    def sync(self, fetch_page, force=False):
+        """
+        Pull the article list through `fetch_page(page)` and apply what changed.
+        Returns True if the mirror is now current, False if skipped or failed.
+        """
+        due = None if force else (lambda state: state['synced_at'] <= time.time() - self.sync_interval)
+        token = self.store.claim(due)
+        if token is None:
+            return False
+        try:
+            articles = self._fetch_all(fetch_page)
+        except Exception as e:
+            self.sync_failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Knowledge base sync failed: {e}")
+            self.store.release(token)
+            return False
+        changed, removed = self.store.apply(
+            {key: (article.get('updated_at'), article) for key, article in articles.items()}, replace=True
+        )
+        self.store.release(token, synced_at=time.time())
+        self.articles_updated += changed
+        self.articles_removed += removed
+        if changed or removed:
+            logger.info(f"Knowledge base mirror: {changed} articles updated, {removed} removed")
+        self.syncs += 1
+        self.last_error = None
+        return True
+
+    @staticmethod
+    def _fetch_all(fetch_page):
+        articles = {}
+        page = 1
+        while True:
+            result = fetch_page(page)
+            if not isinstance(result, dict) or "error" in result:
+                error = result.get("error") if isinstance(result, dict) else None
+                raise RuntimeError(error or "invalid article list response")
+            batch = result.get('articles') or []
+            for article in batch:
+                articles[article_key(article)] = article
+            if not batch or page >= int(result.get('page_count') or 1):
+                return articles
+            page += 1
+
+    # ---- index (reader side) ----
+
+    def refresh(self):
+        """Reload the index if another worker (or this one) changed the mirror"""
+        state = self.store.state()
+        self._synced_at = state['synced_at']
+        if state['version'] == self._snapshot.version:
+            return False
+        self._snapshot = _Snapshot(*self.store.load())
+        return True
+
+    def ready(self):
+        return bool(self._snapshot.articles) and time.time() - self._synced_at <= self.max_age
+
+    def search(self, query, limit):
+        """Reamaze-shaped search result from the local index, or None if the live API should answer"""
+        if not self.ready():
+            self._fallback('not_ready')
+            return None
+        snapshot = self._snapshot
+        hits = snapshot.index.search(query, limit)
+        if not hits:
+            self._fallback('no_hits')
+            return None
+        self.searches += 1
+        return {
+            "articles": [snapshot.articles[doc] for doc, _ in hits],
+            "total_count": len(snapshot.articles)
+        }
+
+    def get(self, article_id):
+        """Mirrored article by id or slug, or None"""
+        if not self.ready():
+            return None
+        return self._snapshot.by_key.get(str(article_id))
+
+    def _fallback(self, reason):
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+
+    # ---- background loop ----
+
+    def start(self, fetch_page):
+        """Keep the mirror synced and this worker's index current from a daemon thread"""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, args=(fetch_page,), name='kb-mirror', daemon=True)
+        self._thread.start()
+
+    def _run(self, fetch_page):
+        while True:
+            try:
+                self.sync(fetch_page)
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception(f"Knowledge base mirror loop error: {e}")
+            # Jitter so workers don't all poll the sqlite file in lockstep
+            time.sleep(min(self.sync_interval, 60) * random.uniform(0.5, 1.0))
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "ready": self.ready(),
+            "articles": len(snapshot.articles),
+            "terms": len(snapshot.index.postings),
+            "version": snapshot.version,
+            "synced_seconds_ago": round(time.time() - self._synced_at, 1) if self._synced_at else None,
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+            "articles_updated": self.articles_updated,
+            "articles_removed": self.articles_removed,
+            "searches": self.searches,
+            "fallbacks": dict(self.fallbacks),
+            "last_error": self.last_error
+        }
@@ -1,12 +1,44 @@
 import os
+import hmac
 import json
+import base64
+import hashlib
 import logging
 import time
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from functools import wraps
+from flask import Flask, request, jsonify, send_from_directory, g, make_response
 import requests
 from requests.auth import HTTPBasicAuth
 from config import Config
+from http_pool import PooledSession
+from rate_limiter import SharedTokenBucket, parse_retry_after
+from bulkhead import Bulkhead, BulkheadFull, bulkhead_rejection
+from hedging import Hedger
+from singleflight import Singleflight, flight_key
+from response_cache import ResponseCache
+from stale_cache import StaleCache, mark_stale, is_upstream_failure
+from tool_cache import ToolCache
+from kb_mirror import KnowledgeBaseMirror
+from instruction_digest import DigestCache, fit_digest, estimate_tokens
+from catalog_mirror import (
+    CatalogMirror, shape_product, product_filters,
+    PRODUCT_FIELDS as CATALOG_PRODUCT_FIELDS, VARIANT_FIELDS as CATALOG_VARIANT_FIELDS
+)
+from product_ranking import ProductRanker
+from availability import AvailabilityIndex
+from order_index import OrderIndex, ORDER_SUMMARY_FIELDS, IDENTIFIERS
+from search_fill import ProductFill, FillStats, pushdown_terms
+from field_sets import (
+    ORDER_FIELD_SETS, PRODUCT_FIELD_SETS, parse_field_set, order_queries, product_search_query,
+    project_order, project_products
+)
+from shopify_throttle import ShopifyCostThrottle, is_throttled
+from circuit_breaker import CircuitOpen, make_breakers, circuit_open_rejection
+from deadline import (
+    LatencyTracker, start_deadline, reset_deadline, remaining_budget, cap_to_budget,
+    resolve_budget, deadline_exceeded
+)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -75,6 +107,9 @@ def extract_payload(raw_data):
     Also handles 'stuffed' fields where the LLM incorrectly merges multiple 
     key-value pairs into a single string, and UI-fragment contamination.
     """
+    if 'tool_payload' in g:
+        # Already extracted for this request (the tool cache reads it before the view runs)
+        return g.tool_payload
     if not raw_data:
         # Fallback to form data or args if JSON is empty
         if request.form:
@@ -84,12 +119,20 @@ def extract_payload(raw_data):
         else:
             return {}
     
+    g.tool_payload = normalize_payload(raw_data, request.path)
+    return g.tool_payload
+
+def normalize_payload(raw_data, path=None):
+    """Apply the tool_payload merge and field rescues to an already-decoded payload (framework independent)."""
+    if not raw_data:
+        return {}
+
     # Store for debugging
     try:
         RECENT_RAW_PAYLOADS.insert(0, {
             "timestamp": datetime.utcnow().isoformat(),
             "data": raw_data,
-            "path": request.path
+            "path": path
         })
         if len(RECENT_RAW_PAYLOADS) > MAX_DEBUG_PAYLOADS:
             RECENT_RAW_PAYLOADS.pop()
@@ -154,14 +197,22 @@ def extract_payload(raw_data):
 
     return final_payload
 
-def safe_float(value):
-    """Safely convert a value to float, returning None if conversion fails."""
-    if value is None or value == '':
-        return None
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return None
+def upstream_error(result):
+    """Return (body, status, headers) for a failed upstream call, passing through any retry hint."""
+    body = {
+        "success": False,
+        "error": result.get("error", "Unknown error")
+    }
+    retry_after = result.get("retry_after")
+    if retry_after is None:
+        return body, result.get("status_code", 500), {}
+    body["retry_after"] = retry_after
+    return body, result.get("status_code", 500), {"Retry-After": str(max(1, int(round(retry_after))))}
+
+def upstream_error_response(result):
+    """Flask response for a failed upstream call."""
+    body, status, headers = upstream_error(result)
+    return jsonify(body), status, headers
 
 class ReamazeAPIClient:
     """Client for interacting with the Reamaze API"""
@@ -173,42 +224,152 @@ class ReamazeAPIClient:
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        self.http = PooledSession(
+            'reamaze',
+            pool_connections=app.config['HTTP_POOL_CONNECTIONS'],
+            pool_maxsize=app.config['HTTP_POOL_MAXSIZE'],
+            keepalive_idle=app.config['HTTP_KEEPALIVE_IDLE'],
+            headers=self.headers,
+            auth=self.auth
+        )
+        self.rate_limiter = SharedTokenBucket(
+            'reamaze',
+            rate=app.config['REAMAZE_RATE_LIMIT_PER_SECOND'],
+            capacity=app.config['REAMAZE_RATE_LIMIT_BURST'],
+            db_path=app.config['RATE_LIMIT_DB_PATH']
+        )
+        self.bulkhead = self._make_bulkhead()
+        self.latency = self._make_latency_tracker('reamaze')
+        self.breakers = self._make_breakers('Reamaze')
+        self.singleflight = self._make_singleflight('reamaze')
+        self.cache = ResponseCache('reamaze', max_bytes=app.config['REAMAZE_CACHE_MAX_BYTES'])
+
+    @staticmethod
+    def _make_singleflight(name):
+        return Singleflight(
+            name,
+            db_path=app.config['SINGLEFLIGHT_DB_PATH'] if app.config['SINGLEFLIGHT_SHARED'] else None,
+            lease=app.config['SINGLEFLIGHT_LEASE']
+        )
+
+    def _breaker(self, method):
+        return self.breakers['read' if method.upper() == 'GET' else 'write']
+
+    @staticmethod
+    def _make_breakers(upstream):
+        return make_breakers(
+            upstream,
+            failure_threshold=app.config['BREAKER_FAILURE_THRESHOLD'],
+            recovery_timeout=app.config['BREAKER_RECOVERY_TIMEOUT'],
+            half_open_max_calls=app.config['BREAKER_HALF_OPEN_PROBES']
+        )
+
+    @staticmethod
+    def _make_latency_tracker(name):
+        return LatencyTracker(
+            name,
+            percentile=app.config['ADAPTIVE_TIMEOUT_PERCENTILE'],
+            multiplier=app.config['ADAPTIVE_TIMEOUT_MULTIPLIER'],
+            minimum=app.config['ADAPTIVE_TIMEOUT_MIN']
+        )
+
+    def _make_bulkhead(self):
+        return Bulkhead(
+            'Reamaze',
+            max_concurrent=app.config['REAMAZE_MAX_CONCURRENCY'],
+            max_queue=app.config['BULKHEAD_MAX_QUEUE'],
+            max_wait=app.config['BULKHEAD_MAX_WAIT']
+        )
     
     def _make_request(self, method, endpoint, data=None, params=None):
-        """Make HTTP request to Reamaze API with error handling and retries"""
+        """Make HTTP request to Reamaze API; identical concurrent GETs share one upstream call"""
+        if method.upper() == 'GET':
+            key = flight_key(method, endpoint, params)
+            return self.singleflight.do(key, self._send_request, method, endpoint, data, params)
+        return self._send_request(method, endpoint, data, params)
+
+    def _send_request(self, method, endpoint, data=None, params=None):
+        """Make HTTP request to Reamaze API with error handling and retries.
+
+        Every wait, backoff and per-attempt timeout is shrunk to fit the
+        current tool call's deadline; once it is spent no further attempt is made.
+        """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        min_attempt = app.config['MIN_ATTEMPT_BUDGET']
+
+        # Reuse stored GET responses: fresh ones without a request, stale ones via a conditional request
+        cache_key = flight_key(endpoint, params) if method.upper() == 'GET' else None
+        cached = self.cache.lookup(cache_key) if cache_key else None
+        if cached is not None and cached.fresh():
+            return self.cache.hit(cached)
         
         for attempt in range(app.config['RATE_LIMIT_RETRIES']):
+            if remaining_budget(default=min_attempt) < min_attempt:
+                logger.warning(f"Deadline exhausted before attempt {attempt + 1} to {url}")
+                return deadline_exceeded()
+
             try:
+                # Pace calls through the bucket shared by every worker instead of sleeping out a 429
+                max_wait = cap_to_budget(app.config['RATE_LIMIT_MAX_WAIT'], reserve=min_attempt)
+                granted, wait = self.rate_limiter.acquire(max_wait)
+                if not granted:
+                    logger.warning(f"Rate limit budget exhausted, asking caller to retry in {wait:.1f} seconds")
+                    return {"error": "Rate limit exceeded, please try again shortly", "status_code": 429, "retry_after": round(wait, 1)}
+                if wait > 0:
+                    time.sleep(wait)
+
                 logger.info(f"Making {method} request to {url}")
-                
-                response = requests.request(
-                    method=method,
-                    url=url,
-                    auth=self.auth,
-                    headers=self.headers,
-                    json=data,
-                    params=params,
-                    timeout=30
-                )
+
+                with self.bulkhead.slot(max_wait=cap_to_budget(app.config['BULKHEAD_MAX_WAIT'], reserve=min_attempt)):
+                    # Fail fast while the upstream is down; only a half-open probe gets through, and
+                    # it holds its slot for the HTTP call alone, not while waiting for a token
+                    with self._breaker(method).call(failure_types=(requests.exceptions.RequestException,)) as call:
+                        started = time.monotonic()
+                        response = self.http.request(
+                            method,
+                            url,
+                            json=data,
+                            params=params,
+                            headers=cached.conditional_headers() if cached else None,
+                            timeout=self.latency.attempt_timeout(app.config['UPSTREAM_TIMEOUT'])
+                        )
+                        self.latency.record(time.monotonic() - started)
+                        call.record_status(response.status_code)
                 
                 logger.info(f"Response status: {response.status_code}")
                 
                 if response.status_code == 429:  # Rate limited
-                    if attempt < app.config['RATE_LIMIT_RETRIES'] - 1:
-                        logger.warning(f"Rate limited, retrying in {app.config['RATE_LIMIT_DELAY']} seconds")
-                        time.sleep(app.config['RATE_LIMIT_DELAY'])
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if retry_after is None:
+                        retry_after = app.config['RATE_LIMIT_DELAY']
+                    self.rate_limiter.penalize(retry_after)
+                    if attempt < app.config['RATE_LIMIT_RETRIES'] - 1 and retry_after <= cap_to_budget(app.config['RATE_LIMIT_MAX_WAIT'], reserve=min_attempt):
+                        logger.warning(f"Rate limited, retrying in {retry_after} seconds")
                         continue
-                    else:
-                        return {"error": "Rate limit exceeded", "status_code": 429}
+                    logger.warning(f"Rate limited, asking caller to retry in {retry_after} seconds")
+                    return {"error": "Rate limit exceeded, please try again shortly", "status_code": 429, "retry_after": round(retry_after, 1)}
                 
+                if response.status_code == 304 and cached is not None:
+                    return self.cache.not_modified(cache_key, cached, response.headers)
+
                 response.raise_for_status()
+                if cache_key:
+                    self.cache.store(cache_key, endpoint, response.headers, response.content)
+                else:
+                    self.cache.invalidate(endpoint)
                 return response.json() if response.content else {}
                 
+            except CircuitOpen as e:
+                return circuit_open_rejection(e)
+            except BulkheadFull as e:
+                return bulkhead_rejection(e)
             except requests.exceptions.RequestException as e:
                 logger.error(f"Request failed (attempt {attempt + 1}): {e}")
-                if attempt < app.config['RATE_LIMIT_RETRIES'] - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
+                backoff = 2 ** attempt  # Exponential backoff
+                if attempt < app.config['RATE_LIMIT_RETRIES'] - 1 and cap_to_budget(backoff, reserve=min_attempt) == backoff:
+                    time.sleep(backoff)
+                elif isinstance(e, requests.exceptions.Timeout) and remaining_budget(default=min_attempt) < min_attempt:
+                    return deadline_exceeded()
                 else:
                     return {"error": str(e), "status_code": 500}
         
@@ -244,6 +405,10 @@ class ReamazeAPIClient:
     def get_article(self, article_id):
         """Get a specific article by ID"""
         return self._make_request('GET', f'/articles/{article_id}')
+
+    def list_articles(self, page=1):
+        """One page of every knowledge base article (used by the KB mirror sync)"""
+        return self._make_request('GET', '/articles', params={'page': page})
     
     def get_conversations(self, for_email=None, q=None, limit=10, page=1):
         """Retrieve conversations with optional filtering"""
@@ -304,83 +469,194 @@ class ShopifyAPIClient:
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        self.http = PooledSession(
+            'shopify',
+            pool_connections=Config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            keepalive_idle=Config.HTTP_KEEPALIVE_IDLE,
+            headers=self.rest_headers
+        )
+        self.bulkhead = self._make_bulkhead()
+        self.latency = ReamazeAPIClient._make_latency_tracker('shopify')
+        self.breakers = ReamazeAPIClient._make_breakers('Shopify')
+        self.singleflight = ReamazeAPIClient._make_singleflight('shopify')
+        self.throttle = ShopifyCostThrottle(interactive_reserve=app.config['SHOPIFY_INTERACTIVE_RESERVE'])
+        self.hedger = Hedger(
+            'shopify',
+            self.latency,
+            enabled=app.config['HEDGE_READS'],
+            percentile=app.config['HEDGE_PERCENTILE'],
+            budget_ratio=app.config['HEDGE_BUDGET_RATIO']
+        )
+
+    def _breaker(self, query):
+        return self.breakers['write' if query.lstrip().startswith('mutation') else 'read']
 
-    def _graphql(self, query: str, variables: dict):
+    def _make_bulkhead(self):
+        return Bulkhead(
+            'Shopify',
+            max_concurrent=Config.SHOPIFY_MAX_CONCURRENCY,
+            max_queue=Config.BULKHEAD_MAX_QUEUE,
+            max_wait=Config.BULKHEAD_MAX_WAIT
+        )
+
+    def _graphql(self, query: str, variables: dict, interactive: bool = True):
         if not self.graphql_url:
             return {"error": "Shopify not configured", "status_code": 500}
+        min_attempt = app.config['MIN_ATTEMPT_BUDGET']
+        if remaining_budget(default=min_attempt) < min_attempt:
+            return deadline_exceeded()
+        cost, wait, error = self._reserve_cost(query, variables, interactive, min_attempt)
+        if error:
+            return error
+        if wait > 0:
+            time.sleep(wait)
+        settled = False
         try:
-            response = requests.post(
-                self.graphql_url,
-                headers={
-                    'X-Shopify-Access-Token': self.admin_token,
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
-                json={"query": query, "variables": variables},
-                timeout=30
-            )
+            # Queue for a slot before claiming the breaker, so a half-open probe is held only for the call
+            with self.bulkhead.slot(max_wait=cap_to_budget(app.config['BULKHEAD_MAX_WAIT'], reserve=min_attempt)), \
+                    self._breaker(query).call(failure_types=(requests.exceptions.RequestException,)) as call:
+                started = time.monotonic()
+                response = self.http.post(
+                    self.graphql_url,
+                    json={"query": query, "variables": variables},
+                    timeout=self.latency.attempt_timeout(app.config['UPSTREAM_TIMEOUT'])
+                )
+                self.latency.record(time.monotonic() - started)
+                call.record_status(response.status_code)
             logger.info(f"Shopify GraphQL status: {response.status_code}")
             response.raise_for_status()
             data = response.json()
-            if 'errors' in data and data['errors']:
-                return {"error": str(data['errors']), "status_code": 400}
-            return data.get('data', {})
+            settled = True
+            return self._graphql_result(data, query, variables, cost)
+        except CircuitOpen as e:
+            return circuit_open_rejection(e)
+        except BulkheadFull as e:
+            return bulkhead_rejection(e)
+        except requests.exceptions.Timeout as e:
+            logger.error(f"Shopify GraphQL request timed out: {e}")
+            if remaining_budget(default=min_attempt) < min_attempt:
+                return deadline_exceeded()
+            return {"error": str(e), "status_code": 500}
         except requests.exceptions.RequestException as e:
             logger.error(f"Shopify GraphQL request failed: {e}")
             return {"error": str(e), "status_code": 500}
+        finally:
+            if not settled:
+                self.throttle.settle(cost, query, variables, None)
 
-    def get_order_by_number(self, order_number: str):
-        """Find a single order by name (e.g., #1001), using GraphQL search and a wider recent scan."""
-        logger.info(f"Searching for order: {order_number}")
-        
-        # 1) Try GraphQL search by name (with and without #)
-        potential_names = [f"#{str(order_number).strip()}", str(order_number).strip()]
-        search_gql = """
-        query($q: String!) {
-          orders(first: 5, query: $q) {
-            edges { node { id name processedAt cancelledAt closedAt displayFinancialStatus displayFulfillmentStatus
-              customer { displayName email }
-              shippingAddress { name address1 address2 city province country zip phone }
-              fulfillments { createdAt status trackingInfo { number url company } }
-              lineItems(first: 50) { edges { node { name quantity sku variant { id title image { url } product { id title handle onlineStoreUrl } } } } }
-            } }
-          }
-        }
+    def _read(self, query: str, variables: dict, interactive: bool = True):
+        """Idempotent GraphQL query: coalesced with identical in-flight reads, and hedged when HEDGE_READS is on.
+
+        Non-interactive reads (wide scans) are never hedged and yield the cost budget to interactive ones.
         """
-        for name in potential_names:
-            q = f'name:"{name}"'
-            logger.info(f"Attempting GraphQL search with query: {q}")
-            data = self._graphql(search_gql, {"q": q})
-            
-            if isinstance(data, dict):
-                edges = (((data or {}).get('orders') or {}).get('edges'))
-                if edges:
-                    logger.info(f"GraphQL search found {len(edges)} potential matches for {name}")
-                    # Look for exact match in name
-                    for edge in edges:
-                        node = edge.get('node', {})
-                        if node.get('name') == name:
-                            logger.info(f"Found exact match: {node.get('name')}")
-                            return node
-                    # Fallback to first result if no exact name match but we found something
-                    logger.info(f"No exact name match, using first result: {edges[0].get('node', {}).get('name')}")
-                    return edges[0].get('node')
-
-        # 2) Scan a wider recent window (up to 250 most recent) and match by name
-        logger.info("GraphQL specific search failed, starting wider recent scan...")
-        scan_gql = """
+        key = flight_key(query, variables)
+        if not interactive:
+            return self.singleflight.do(key, self._graphql, query, variables, False)
+        return self.singleflight.do(key, self.hedger.run, self._graphql, query, variables, True)
+
+    def _reserve_cost(self, query, variables, interactive, min_attempt):
+        """Reserve the query's estimated cost; returns (cost, wait, error) where error is set if it would take too long"""
+        cost = self.throttle.estimate(query, variables)
+        max_wait = cap_to_budget(app.config['SHOPIFY_COST_MAX_WAIT'], reserve=min_attempt)
+        granted, wait = self.throttle.reserve(cost, interactive, max_wait)
+        if not granted:
+            logger.warning(f"Shopify cost budget too low for a {cost:.0f}-point query, asking caller to retry in {wait:.1f} seconds")
+            return cost, 0.0, {"error": "Shopify is busy, please try again shortly", "status_code": 429, "retry_after": round(max(1.0, wait), 1)}
+        if wait > 0:
+            logger.info(f"Delaying {cost:.0f}-point Shopify query {wait:.2f}s for the cost budget to refill")
+        return cost, wait, None
+
+    def _graphql_result(self, data, query, variables, cost):
+        """Settle the cost reservation from the response and unwrap its data, or return an error dict"""
+        self.throttle.settle(cost, query, variables, (data.get('extensions') or {}).get('cost'))
+        errors = data.get('errors')
+        if errors and is_throttled(errors):
+            retry_after = self.throttle.throttled_retry_after(cost)
+            logger.warning(f"Shopify throttled a {cost:.0f}-point query, retry in {retry_after}s")
+            return {"error": "Shopify is busy, please try again shortly", "status_code": 429, "retry_after": retry_after}
+        if errors:
+            return {"error": str(errors), "status_code": 400}
+        return data.get('data', {})
+
+    # Every order field; order_queries(field_set) compiles the narrower selections
+    ORDER_FIELDS = order_queries()['fields']
+    ORDER_NAME_SEARCH_GQL = order_queries()['name_search']
+
+    # Names only: with full order fields a 250-order page would cost far more than Shopify's per-query limit
+    ORDER_SCAN_GQL = """
         query($first: Int!) {
           orders(first: $first, sortKey: PROCESSED_AT, reverse: true) {
-            edges { node { id name processedAt cancelledAt closedAt displayFinancialStatus displayFulfillmentStatus
-              customer { displayName email }
-              shippingAddress { name address1 address2 city province country zip phone }
-              fulfillments { createdAt status trackingInfo { number url company } }
-              lineItems(first: 50) { edges { node { name quantity sku variant { id title image { url } product { id title handle onlineStoreUrl } } } } }
-            } }
+            edges { node { id name } }
           }
         }
         """
-        data = self._graphql(scan_gql, {"first": 250})
+
+    ORDER_BY_ID_GQL = order_queries()['by_id']
+
+    ORDER_SCAN_SIZES = (250, 100, 50)
+
+    # Orders per aliased /track-orders query: each costs ~157 points, so four stay well
+    # inside the 1000-point per-query limit without waiting for a full bucket
+    ORDER_BATCH_SIZE = 4
+
+    ORDERS_UPDATED_GQL = """
+        query($q: String!, $after: String, $first: Int!) {
+          orders(first: $first, after: $after, query: $q, sortKey: UPDATED_AT) {
+            pageInfo { hasNextPage endCursor }
+            edges { node { """ + ORDER_SUMMARY_FIELDS + """ } }
+          }
+        }
+        """
+
+    @staticmethod
+    def _order_name_candidates(order_number):
+        return [f"#{str(order_number).strip()}", str(order_number).strip()]
+
+    @staticmethod
+    def _is_upstream_error(data):
+        """Failed, rejected or throttled calls must reach the caller as errors, not as 'order not found'"""
+        return is_upstream_failure(data)
+
+    @staticmethod
+    def _match_searched_order(data, name):
+        """Pick the order for `name` out of a name search result, or None if the search found nothing"""
+        if not isinstance(data, dict):
+            return None
+        edges = (((data or {}).get('orders') or {}).get('edges'))
+        if not edges:
+            return None
+        logger.info(f"GraphQL search found {len(edges)} potential matches for {name}")
+        # Look for exact match in name
+        for edge in edges:
+            node = edge.get('node', {})
+            if node.get('name') == name:
+                logger.info(f"Found exact match: {node.get('name')}")
+                return node
+        # Fallback to first result if no exact name match but we found something
+        logger.info(f"No exact name match, using first result: {edges[0].get('node', {}).get('name')}")
+        return edges[0].get('node')
+
+    @classmethod
+    def _match_name_search(cls, data, potential_names):
+        """The order an aliased name search found (the "#" form first), None, or the upstream error dict"""
+        if cls._is_upstream_error(data):
+            return data
+        if not isinstance(data, dict) or "error" in data:
+            return None
+        for alias, name in zip(('hashed', 'plain'), potential_names):
+            node = cls._match_searched_order({"orders": data.get(alias)}, name)
+            if node:
+                return node
+        return None
+
+    @staticmethod
+    def _order_name_variables(potential_names):
+        return {"hashed": f'name:"{potential_names[0]}"', "plain": f'name:"{potential_names[1]}"'}
+
+    @staticmethod
+    def _match_scanned_order(data, potential_names, order_number):
+        """Find an order by exact name in a recent-orders scan result"""
         if not isinstance(data, dict):
             logger.error(f"Scan GraphQL failed: {data}")
             return None
@@ -399,9 +675,117 @@ class ShopifyAPIClient:
                 logger.info(f"Scan found match: {node_name}")
                 return node
         
-        logger.warning(f"Order {order_number} not found in top 250 recent orders")
+        logger.warning(f"Order {order_number} not found in top {len(edges)} recent orders")
         return None
 
+    def get_order_by_number(self, order_number: str, fields=None):
+        """Find a single order by name (e.g., #1001), using GraphQL search and a wider recent scan.
+
+        Only the parts of the order in `fields` (an order field set, None for all) are fetched.
+        Returns the order node, None if not found, or an error dict if Shopify failed or asked us to back off.
+        """
+        logger.info(f"Searching for order: {order_number}")
+
+        # 0) Resolve the name locally and fetch just that order
+        summary = indexed_order(order_number)
+        if summary:
+            order = self.get_order_by_id(summary['id'], fields)
+            if order:
+                return order
+
+        # 1) Search both name forms (with and without #) in one aliased query
+        potential_names = self._order_name_candidates(order_number)
+        search = lambda: self._search_order_names(potential_names, fields)
+        # A current order index already holds every order the scan could find
+        if order_index_ready():
+            return search()
+        # 2) ...raced by a scan of the recent window (names only), then a fetch of the match
+        scan = lambda: self._scan_for_order(potential_names, order_number, fields)
+        return self.hedger.race(search, scan, self._order_race_delay())
+
+    def _search_order_names(self, potential_names, fields=None):
+        logger.info(f"Attempting aliased GraphQL name search for {potential_names}")
+        data = self._read(order_queries(fields)['name_search'], self._order_name_variables(potential_names))
+        return self._match_name_search(data, potential_names)
+
+    def _scan_for_order(self, potential_names, order_number, fields=None):
+        logger.info("Starting wider recent scan...")
+        data = self._read(self.ORDER_SCAN_GQL, {"first": self._order_scan_size()}, False)
+        if self._is_upstream_error(data):
+            return data
+        match = self._match_scanned_order(data, potential_names, order_number)
+        if not match:
+            return None
+        return self.get_order_by_id(match['id'], fields)
+
+    def get_orders_by_number(self, order_numbers):
+        """Find several orders by name, with one aliased GraphQL query per ORDER_BATCH_SIZE orders.
+
+        Returns (found, error): {order number: order node or None} for the batches
+        answered, and the error dict that stopped the rest (None if none did).
+        """
+        found = {}
+        for start in range(0, len(order_numbers), self.ORDER_BATCH_SIZE):
+            batch = order_numbers[start:start + self.ORDER_BATCH_SIZE]
+            data = self._read(*self._order_batch_request(batch))
+            if self._is_upstream_error(data):
+                return found, data
+            found.update(self._match_order_batch(data, batch))
+        return found, None
+
+    def _order_batch_request(self, order_numbers):
+        """(query, variables) for one alias per order: a fetch by id for indexed names, a name search for the rest"""
+        params, selections, variables = [], [], {}
+        for i, order_number in enumerate(order_numbers):
+            alias = f"o{i}"
+            summary = indexed_order(order_number)
+            if summary:
+                params.append(f"${alias}: ID!")
+                selections.append(f"{alias}: order(id: ${alias}) {{ {self.ORDER_FIELDS} }}")
+                variables[alias] = summary['id']
+            else:
+                params.append(f"${alias}: String!")
+                selections.append(f"{alias}: orders(first: 1, query: ${alias}) {{ edges {{ node {{ {self.ORDER_FIELDS} }} }} }}")
+                variables[alias] = ' OR '.join(f'name:"{name}"' for name in self._order_name_candidates(order_number))
+        return f"query({', '.join(params)}) {{ {' '.join(selections)} }}", variables
+
+    @classmethod
+    def _match_order_batch(cls, data, order_numbers):
+        """{order number: order node or None} out of an aliased batch result; searches must match the name exactly"""
+        found = {}
+        for i, order_number in enumerate(order_numbers):
+            node = (data or {}).get(f"o{i}") if isinstance(data, dict) else None
+            if node and 'edges' in node:
+                edges = node.get('edges') or []
+                node = edges[0].get('node') if edges else None
+                if node and node.get('name') not in cls._order_name_candidates(order_number):
+                    node = None
+            found[order_number] = node or None
+        return found
+
+    def _order_race_delay(self):
+        """Head start the name search gets before the scan races it: its usual (p95) latency once observed, else until it misses"""
+        if not app.config['ORDER_LOOKUP_RACE'] or not self.latency.warmed_up():
+            return None
+        return max(self.hedger.min_delay, self.latency.quantile(self.hedger.percentile))
+
+    def get_order_by_id(self, order_id: str, fields=None):
+        """Fetch one order by its GraphQL id: the order node, None, or an error dict if Shopify failed or asked us to back off"""
+        data = self._read(order_queries(fields)['by_id'], {"id": order_id})
+        if self._is_upstream_error(data):
+            return data
+        return (data or {}).get('order') if isinstance(data, dict) else None
+
+    def _order_scan_size(self):
+        """Widest recent-orders scan the cost budget affords right now; scans never eat into the interactive reserve"""
+        for size in self.ORDER_SCAN_SIZES:
+            if self.throttle.affordable_now(self.throttle.estimate(self.ORDER_SCAN_GQL, {"first": size}), interactive=False):
+                break
+        if size != self.ORDER_SCAN_SIZES[0]:
+            self.throttle.downgraded += 1
+            logger.info(f"Shopify cost budget is low, narrowing the order scan to {size} orders")
+        return size
+
     def _determine_sort_strategy(self, query_text: str = None, filters: dict = None):
         """Determine the best sorting strategy based on query context"""
         if not query_text:
@@ -425,70 +809,14 @@ class ShopifyAPIClient:
         # Default to relevance for general queries
         return {"sortKey": "RELEVANCE", "reverse": False}
 
-    def _sort_products_python(self, products, query_text: str = None, filters: dict = None):
-        """Apply Python-based sorting for better product recommendations"""
-        if not products:
-            return products
-        
-        def calculate_product_score(product):
-            """Calculate a score for product ranking"""
-            score = 0
-            variants = product.get('variants', [])
-            
-            if not variants:
-                return score
-            
-            # Get the first variant for scoring
-            first_variant = variants[0]
-            price = safe_float(first_variant.get('price'))
-            compare_price = safe_float(first_variant.get('compare_at_price'))
-            
-            # Boost score for products on sale
-            if price is not None and compare_price is not None and compare_price > price:
-                score += 100
-            
-            # Boost score for products with multiple variants (more options)
-            score += min(len(variants) * 5, 25)  # Cap at 25 points
-            
-            # Boost score for lower prices (more affordable)
-            if price is not None and price > 0:
-                if price <= 20:
-                    score += 30  # Very affordable
-                elif price <= 40:
-                    score += 20  # Affordable
-                elif price <= 60:
-                    score += 10  # Moderate
-            
-            # Boost score for products with images
-            if product.get('image'):
-                score += 5
-            
-            # Boost score for recently updated products
-            updated_at = product.get('updated_at')
-            if updated_at:
-                try:
-                    from datetime import datetime, timezone
-                    update_time = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
-                    days_old = (datetime.now(timezone.utc) - update_time).days
-                    if days_old <= 30:
-                        score += 15  # Recently updated
-                    elif days_old <= 90:
-                        score += 5   # Somewhat recent
-                except:
-                    pass  # Ignore date parsing errors
-            
-            return score
-        
-        # Sort by calculated score (highest first), then by title for consistency
-        products.sort(key=lambda p: (-calculate_product_score(p), p.get('title', '').lower()))
-        
-        return products
+    PRODUCT_SEARCH_GQL = product_search_query()
 
-    def search_products(self, query_text: str = None, filters: dict = None, limit: int = 5):
-        """Search products using simple natural language query + basic filters with smart sorting"""
-        filters = filters or {}
-        
-        # Use query_text as-is - Shopify's search is quite good with natural language
+    def _product_search_request(self, query_text: str = None, filters: dict = None, limit: int = 5):
+        """Build the (q, variables) pair for a product search"""
+        # Use query_text as-is - Shopify's search is quite good with natural language;
+        # it has no compatibility index, so the watch model and size become search words
+        fit_terms = [(filters or {}).get(key) for key in ('watch_model', 'size')]
+        query_text = " ".join(filter(None, [query_text] + fit_terms)) or None
         if query_text:
             q = query_text.strip()
         else:
@@ -497,134 +825,158 @@ class ShopifyAPIClient:
 
         # Determine best sorting strategy based on query context
         sort_strategy = self._determine_sort_strategy(query_text, filters)
-        
-        gql = """
-        query($q: String!, $first: Int!, $sortKey: ProductSortKeys!, $reverse: Boolean!) {
-          products(first: $first, query: $q, sortKey: $sortKey, reverse: $reverse) {
+
+        # Price and sale constraints go into Shopify's search syntax, so fewer results are filtered away here
+        pushdown = pushdown_terms(*product_filters(filters))
+
+        return q, {
+            "q": " ".join([q] + pushdown),
+            "first": max(1, min(limit, 25)),
+            "sortKey": sort_strategy["sortKey"],
+            "reverse": sort_strategy["reverse"],
+            "after": None
+        }
+
+    def _product_fill(self, variables):
+        return ProductFill(variables['first'], app.config['PRODUCT_SEARCH_MAX_PAGES'])
+
+    def _add_product_page(self, fill, data, variables, filters):
+        """
+        Shape and filter one page of search results into `fill`. Returns the
+        variables for the next page, or None when the search is done.
+        """
+        connection = ((data or {}).get('products') or {}) if isinstance(data, dict) else {}
+        products = [shape_product(edge.get('node', {}), self.store_domain) for edge in connection.get('edges') or []]
+        kept = product_ranker.rank(products, filters, allowed=sellable_variants(products))
+        next_page = fill.add_page(len(products), kept, connection.get('pageInfo'))
+        if next_page is None:
+            return None
+        first, after = next_page
+        return dict(variables, first=first, after=after)
+
+    def _product_fill_result(self, fill, q, variables):
+        """Rank what the pages produced and record how full the search came back"""
+        product_fill_stats.record(fill, variables['q'] != q)
+        return {"products": product_ranker.rank(fill.products, limit=fill.limit), "query": q}
+
+    def _mirrored_product_search(self, q, variables, query_text, filters):
+        """Search answered from the local catalog mirror, or None if Shopify should be asked"""
+        products = mirrored_products(query_text, filters, variables['first'])
+        if products is None:
+            return None
+        product_fill_stats.record_mirrored(len(products), variables['first'])
+        return {"products": products, "query": q}
+
+    def search_products(self, query_text: str = None, filters: dict = None, limit: int = 5, fields=None):
+        """Search products using simple natural language query + basic filters with smart sorting
+
+        Live searches select only the product parts in `fields` (a product field set, None for all).
+        """
+        filters = filters or {}
+        q, variables = self._product_search_request(query_text, filters, limit)
+        local = self._mirrored_product_search(q, variables, query_text, filters)
+        if local is not None:
+            return local
+
+        fill = self._product_fill(variables)
+        page_variables = variables
+        while page_variables is not None:
+            data = self._read(product_search_query(fields), page_variables)
+            if "error" in data:
+                # With nothing kept yet an empty list would pass an outage off as "no products"
+                if not fill.products:
+                    return data
+                break  # keep what the earlier pages found
+            page_variables = self._add_product_page(fill, data, page_variables, filters)
+
+        return self._product_fill_result(fill, q, variables)
+
+    BULK_RUN_GQL = """
+        mutation($query: String!) {
+          bulkOperationRunQuery(query: $query) {
+            bulkOperation { id status }
+            userErrors { field message }
+          }
+        }
+        """
+
+    BULK_STATUS_GQL = """
+        query {
+          currentBulkOperation { id status errorCode objectCount url }
+        }
+        """
+
+    PRODUCTS_UPDATED_GQL = """
+        query($q: String!, $after: String) {
+          products(first: 5, after: $after, query: $q, sortKey: UPDATED_AT) {
+            pageInfo { hasNextPage endCursor }
             edges {
               node {
-                id
-                title
-                handle
-                onlineStoreUrl
-                featuredImage { url }
-                createdAt
-                updatedAt
-                variants(first: 10) {
-                  edges {
-                    node {
-                      id
-                      title
-                      sku
-                      price
-                      compareAtPrice
-                      image { url }
-                    }
-                  }
-                }
+                """ + CATALOG_PRODUCT_FIELDS + """
+                variants(first: 100) { edges { node { """ + CATALOG_VARIANT_FIELDS + """ } } }
               }
             }
           }
         }
         """
 
-        data = self._graphql(gql, {
-            "q": q, 
-            "first": max(1, min(limit, 25)),
-            "sortKey": sort_strategy["sortKey"],
-            "reverse": sort_strategy["reverse"]
-        })
+    def start_bulk_query(self, bulk_query: str):
+        """Start a bulk export of `bulk_query` (catalog mirror seeding); poll current_bulk_operation() for the result"""
+        data = self._graphql(self.BULK_RUN_GQL, {"query": bulk_query}, False)
         if "error" in data:
             return data
+        result = data.get('bulkOperationRunQuery') or {}
+        if result.get('userErrors'):
+            return {"error": str(result['userErrors']), "status_code": 400}
+        return result.get('bulkOperation') or {}
 
-        edges = (((data or {}).get('products') or {}).get('edges')) if isinstance(data, dict) else None
-        products = []
-        if edges:
-            for edge in edges:
-                node = edge.get('node', {})
-                handle = node.get('handle')
-                online_url = node.get('onlineStoreUrl') or (f"https://{self.store_domain}/products/{handle}" if self.store_domain and handle else None)
-                image = (node.get('featuredImage') or {}).get('url')
-                # Build variants
-                variants = []
-                for v_edge in (node.get('variants', {}).get('edges') or []):
-                    v = v_edge.get('node', {})
-                    # Extract numeric variant id for storefront URLs
-                    variant_gid = v.get('id') or ''
-                    variant_numeric_id = None
-                    if isinstance(variant_gid, str) and '/' in variant_gid:
-                        variant_numeric_id = variant_gid.split('/')[-1]
-                    # Variant-specific URL if possible
-                    variant_url = None
-                    if online_url and variant_numeric_id:
-                        separator = '&' if '?' in (online_url or '') else '?'
-                        variant_url = f"{online_url}{separator}variant={variant_numeric_id}"
-
-                    # Variant image fallback to product image
-                    variant_image = ((v.get('image') or {}).get('url')) or image
-                    variants.append({
-                        "id": v.get('id'),
-                        "title": v.get('title'),
-                        "sku": v.get('sku'),
-                        "price": v.get('price'),
-                        "compare_at_price": v.get('compareAtPrice'),
-                        "currency": None,
-                        "image": variant_image,
-                        "url": variant_url
-                    })
-                
-                # Simple post-filtering for essential filters only
-                price_min_val = safe_float(filters.get('price_min'))
-                price_max_val = safe_float(filters.get('price_max'))
-
-                # Handle on_sale filter
-                on_sale_raw = filters.get('on_sale')
-                if isinstance(on_sale_raw, str):
-                    stripped = on_sale_raw.strip().lower()
-                    on_sale = stripped in ("1", "true", "yes", "y") if stripped else False
-                else:
-                    on_sale = bool(on_sale_raw) if on_sale_raw is not None else False
-
-                def price_in_range(v):
-                    p = safe_float(v.get('price'))
-                    if p is None:
-                        return True if (price_min_val is None and price_max_val is None) else False
-                    if price_min_val is not None and p is not None and p < price_min_val:
-                        return False
-                    if price_max_val is not None and p is not None and p > price_max_val:
-                        return False
-                    return True
-
-                def matches_sale(v):
-                    if not on_sale:
-                        return True
-                    price = safe_float(v.get('price'))
-                    cap = safe_float(v.get('compare_at_price'))
-                    return price is not None and cap is not None and cap > price
-
-                # Apply only essential filters
-                filtered_variants = [
-                    v for v in variants
-                    if price_in_range(v) and matches_sale(v)
-                ]
-
-                if not filtered_variants:
-                    continue
-                products.append({
-                    "id": node.get('id'),
-                    "title": node.get('title'),
-                    "handle": handle,
-                    "url": online_url,
-                    "image": image,
-                    "variants": filtered_variants,
-                    "created_at": node.get('createdAt'),
-                    "updated_at": node.get('updatedAt')
-                })
-        
-        # Apply Python-based sorting for better control
-        products = self._sort_products_python(products, query_text, filters)
-        
-        return {"products": products, "query": q}
+    def current_bulk_operation(self):
+        data = self._graphql(self.BULK_STATUS_GQL, {}, False)
+        if "error" in data:
+            return data
+        return data.get('currentBulkOperation') or {}
+
+    def download_bulk_result(self, url: str):
+        """Lines of a finished bulk operation's JSONL file (a signed URL, no API credentials needed)"""
+        try:
+            # Never send the Admin API token to the storage host
+            response = self.http.request('GET', url, headers={'X-Shopify-Access-Token': None}, timeout=app.config['UPSTREAM_TIMEOUT'])
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Bulk result download failed: {e}")
+            return {"error": str(e), "status_code": 500}
+        return response.text.splitlines()
+
+    def products_updated_since(self, since: str, after: str = None):
+        """One page of products updated at or after `since`, oldest first (catalog mirror incremental sync)"""
+        return self._graphql(self.PRODUCTS_UPDATED_GQL, {"q": f"updated_at:>='{since}'", "after": after}, False)
+
+    INVENTORY_GQL = """
+        query($after: String) {
+          productVariants(first: 50, after: $after) {
+            pageInfo { hasNextPage endCursor }
+            edges {
+              node {
+                id inventoryPolicy
+                inventoryItem {
+                  id tracked
+                  inventoryLevels(first: 5) {
+                    edges { node { updatedAt location { id } quantities(names: ["available"]) { quantity } } }
+                  }
+                }
+              }
+            }
+          }
+        }
+        """
+
+    def inventory_page(self, after: str = None):
+        """One page of variants with their inventory item, policy and per-location stock (availability sync)"""
+        return self._graphql(self.INVENTORY_GQL, {"after": after}, False)
+
+    def orders_updated_since(self, since: str, after: str = None, first: int = 250):
+        """One page of order summaries updated at or after `since`, oldest first (order index sync)"""
+        return self._graphql(self.ORDERS_UPDATED_GQL, {"q": f"updated_at:>='{since}'", "after": after, "first": first}, False)
 
     def list_recent_orders(self, limit: int = 5):
         """List recent orders to help locate a valid order number for testing"""
@@ -663,6 +1015,706 @@ class ShopifyAPIClient:
 # Initialize Shopify client
 shopify_client = ShopifyAPIClient()
 
+# Last good answer per tool read, served when the upstream is down
+stale_reads = StaleCache(app.config['STALE_CACHE_MAX_ENTRIES'], app.config['STALE_MAX_AGES'])
+
+# Repeat tool calls (however the LLM phrased them) answered without touching an upstream
+TOOL_CACHE_FIELDS = {
+    '/search-kb': ('query_term', 'max_results'),
+    '/get-instructions': ('topic', 'article_id', 'max_tokens', 'format'),
+    '/recommend-products': ('query_text', 'watch_model', 'material', 'color', 'size', 'limit',
+                            'price_min', 'price_max', 'on_sale', 'fields'),
+    # Only lookups by order number; see tool_cache_key
+    '/track-order': ('order_number', 'fields'),
+}
+tool_cache = ToolCache(
+    TOOL_CACHE_FIELDS,
+    app.config['TOOL_CACHE_TTLS'],
+    app.config['TOOL_CACHE_NEGATIVE_TTLS'],
+    max_entries=app.config['TOOL_CACHE_MAX_ENTRIES'],
+    max_bytes=app.config['TOOL_CACHE_MAX_BYTES']
+)
+
+def tool_cache_key(path, data):
+    """Tool cache key for a payload, or None when the cache is off or the tool isn't cached"""
+    if not app.config['TOOL_CACHE_ENABLED']:
+        return None
+    if path == '/track-order' and not str(data.get('order_number', '')).strip():
+        # Lookups by email/phone/tracking number/zip stay uncached: the key would hold only
+        # `fields`, and the canonical form sorts tokens, so different customers could share one
+        return None
+    if isinstance(data.get('fields'), (list, tuple)):
+        # Field sets arrive as lists too; as text they get the canonical (sorted) form
+        data = dict(data, fields=' '.join(str(name) for name in data['fields']))
+    return tool_cache.key(path, data)
+
+def tool_cached(view):
+    """Answer repeat calls of an idempotent tool from the tool cache"""
+    @wraps(view)
+    def cached_view():
+        raw_data = request.get_json(silent=True)
+        key = tool_cache_key(request.path, extract_payload(raw_data)) if isinstance(raw_data, dict) else None
+        hit = tool_cache.get(key)
+        if hit is not None:
+            return jsonify(hit[0]), hit[1]
+        response = make_response(view())
+        if key is not None and response.is_json:
+            tool_cache.put(key, response.get_json(), response.status_code)
+        return response
+    return cached_view
+
+# Local copy of the knowledge base for /search-kb and /get-instructions (synced by start_kb_mirror)
+kb_mirror = KnowledgeBaseMirror(app.config['KB_MIRROR_DB_PATH'], app.config['KB_SYNC_INTERVAL'], app.config['KB_MIRROR_MAX_AGE'])
+
+# Compact (plain text + steps + links) form of each KB article version, built once per worker
+instruction_digests = DigestCache(app.config['INSTRUCTION_DIGEST_CACHE_SIZE'])
+
+# Scores, filters and orders /recommend-products candidates (live results and the catalog mirror)
+product_ranker = ProductRanker(app.config['PRODUCT_RANKING_WEIGHTS'])
+
+# Fill rate and pages fetched by live product searches
+product_fill_stats = FillStats()
+
+# Sellable state per variant, from inventory webhooks and a periodic sync (started by start_availability_index)
+product_availability = AvailabilityIndex(
+    app.config['AVAILABILITY_DB_PATH'],
+    sync_interval=app.config['AVAILABILITY_SYNC_INTERVAL'],
+    max_age=app.config['AVAILABILITY_MAX_AGE']
+)
+
+# Local copy of the Shopify catalog for /recommend-products (synced by start_catalog_mirror)
+catalog_mirror = CatalogMirror(
+    app.config['CATALOG_MIRROR_DB_PATH'],
+    shopify_client.store_domain,
+    sync_interval=app.config['CATALOG_SYNC_INTERVAL'],
+    reseed_interval=app.config['CATALOG_RESEED_INTERVAL'],
+    max_age=app.config['CATALOG_MIRROR_MAX_AGE'],
+    bulk_timeout=app.config['CATALOG_BULK_TIMEOUT'],
+    ranker=product_ranker,
+    availability=product_availability if app.config['AVAILABILITY_ENABLED'] else None
+)
+
+# Order name -> id for /track-order (synced by start_order_index)
+order_index = OrderIndex(
+    app.config['ORDER_INDEX_DB_PATH'],
+    sync_interval=app.config['ORDER_INDEX_SYNC_INTERVAL'],
+    backfill_days=app.config['ORDER_INDEX_BACKFILL_DAYS'],
+    max_age=app.config['ORDER_INDEX_MAX_AGE']
+)
+
+def start_order_index():
+    """Start the background order index sync for this worker (called once per gunicorn worker / ASGI process)"""
+    if app.config['ORDER_INDEX_ENABLED'] and shopify_client.graphql_url:
+        order_index.start(shopify_client)
+
+def order_index_ready():
+    return app.config['ORDER_INDEX_ENABLED'] and order_index.ready()
+
+def indexed_order(order_number):
+    """Indexed summary of the order with this name, or None (not indexed, or the index isn't current)"""
+    if not order_index_ready():
+        return None
+    return order_index.lookup(order_number)
+
+def order_lookup_identifiers(data):
+    """The customer identifiers (email, phone, tracking_number, zip) given in a /track-order payload"""
+    return {kind: str(data[kind]).strip() for kind in IDENTIFIERS if str(data.get(kind) or '').strip()}
+
+def order_lookup_error(identifiers):
+    """(body, status) if a /track-order payload can't be answered by identifier lookup, else None"""
+    if not identifiers:
+        return {
+            "success": False,
+            "error": "Missing required field: order_number"
+        }, 400
+    # Many customers share a zip: it only narrows a lookup down
+    if set(identifiers) == {'zip'}:
+        return {
+            "success": False,
+            "error": "A zip code alone can't identify an order: include email, phone or tracking_number"
+        }, 400
+    if not order_index_ready():
+        return {
+            "success": False,
+            "error": "Order lookup by email, phone or tracking number is unavailable right now: ask for the order number"
+        }, 503
+    return None
+
+def parse_order_numbers(value):
+    """/track-orders `order_numbers` (a list, or text like "#1001, #1002 and 1003") -> unique normalized order numbers"""
+    import re
+    if isinstance(value, (list, tuple)):
+        raw = [str(item) for item in value if str(item).strip()]
+    else:
+        raw = re.findall(r'#?\w*\d\w*', str(value or ''))
+    order_numbers = []
+    for item in raw:
+        order_number = normalize_order_number(item.strip())
+        if order_number and order_number not in order_numbers:
+            order_numbers.append(order_number)
+    return order_numbers
+
+def track_orders_error(order_numbers):
+    """(body, status) if a /track-orders payload can't be looked up, else None"""
+    if not order_numbers:
+        return {
+            "success": False,
+            "error": "Missing required field: order_numbers"
+        }, 400
+    if len(order_numbers) > app.config['TRACK_ORDERS_MAX_ORDERS']:
+        return {
+            "success": False,
+            "error": f"Too many orders: at most {app.config['TRACK_ORDERS_MAX_ORDERS']} per call"
+        }, 400
+    return None
+
+def track_orders_body(order_numbers, found, error=None):
+    """(body, status, headers) for the orders found, in the order they were asked for.
+
+    Numbers missing from `found` could not be looked up because of `error`;
+    they are listed as failed next to the orders found. 404 only if every
+    number was looked up and none was found.
+    """
+    orders = [format_order(found[n]) for n in order_numbers if found.get(n)]
+    not_found = [n for n in order_numbers if n in found and not found[n]]
+    failed = [n for n in order_numbers if n not in found]
+    if failed and not orders:
+        return upstream_error(error)
+    if not orders:
+        logger.error(f"Shopify batch search found none of: {order_numbers}")
+        return {
+            "success": False,
+            "error": f"Orders not found: {', '.join(not_found)}",
+            "not_found": not_found
+        }, 404, {}
+    body = {
+        "success": True,
+        "count": len(orders),
+        "orders": orders,
+        "not_found": not_found
+    }
+    if failed:
+        logger.warning(f"Shopify batch search failed for {failed}: {error.get('error')}")
+        body["failed"] = failed
+        body["error"] = error.get("error", "Unknown error")
+        if error.get("retry_after") is not None:
+            body["retry_after"] = error["retry_after"]
+    return body, 200, {}
+
+def summarize_other_orders(summaries):
+    """Short form of the other orders an identifier lookup matched, for the bot to offer"""
+    return [{
+        "name": s.get('name'),
+        "processed_at": s.get('processed_at'),
+        "financial_status": s.get('financial_status'),
+        "fulfillment_status": s.get('fulfillment_status')
+    } for s in summaries]
+
+def start_catalog_mirror():
+    """Start the background catalog sync for this worker (called once per gunicorn worker / ASGI process)"""
+    if app.config['CATALOG_MIRROR_ENABLED'] and shopify_client.graphql_url:
+        catalog_mirror.start(shopify_client)
+
+def start_availability_index():
+    """Start the background inventory sync for this worker (called once per gunicorn worker / ASGI process)"""
+    if app.config['AVAILABILITY_ENABLED'] and shopify_client.graphql_url:
+        product_availability.start(shopify_client)
+
+def sellable_variants(products):
+    """Sellable flag per variant of live search results (ProductRanker's `allowed`), or None to keep them all"""
+    if not app.config['AVAILABILITY_ENABLED']:
+        return None
+    return product_availability.allowed(products)
+
+def inventory_webhook(body, signature, topic):
+    """Verify and apply a Shopify inventory-level webhook. Returns (response body, status)."""
+    secret = app.config['SHOPIFY_WEBHOOK_SECRET']
+    if not secret:
+        return {"success": False, "error": "Inventory webhooks are not configured"}, 404
+    expected = base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode('ascii')
+    if not signature or not hmac.compare_digest(expected, signature):
+        return {"success": False, "error": "Invalid webhook signature"}, 401
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return {"success": False, "error": "Invalid webhook body"}, 400
+    # Acknowledge late or unrelated events too, or Shopify keeps retrying them
+    applied = product_availability.apply_event(topic, event)
+    return {"success": True, "applied": applied}, 200
+
+def mirrored_products(query_text, filters, limit):
+    """Filtered and ranked products from the local catalog, or None if Shopify should be searched live"""
+    if not app.config['CATALOG_MIRROR_ENABLED']:
+        return None
+    return catalog_mirror.search(query_text, filters, limit)
+
+def start_kb_mirror():
+    """Start the background KB sync for this worker (called once per gunicorn worker / ASGI process)"""
+    if app.config['KB_MIRROR_ENABLED']:
+        kb_mirror.start(reamaze_client.list_articles)
+
+def mirrored_article_search(query, limit):
+    """KB search answered from the local mirror, or None if Reamaze should be searched live"""
+    if not app.config['KB_MIRROR_ENABLED']:
+        return None
+    return kb_mirror.search(query, limit)
+
+def mirrored_article(article_id):
+    """KB article from the local mirror by id or slug, or None if Reamaze should be asked"""
+    if not app.config['KB_MIRROR_ENABLED']:
+        return None
+    return kb_mirror.get(article_id)
+
+def warm_http_pools():
+    """Open keep-alive connections to each configured upstream (called once per gunicorn worker)"""
+    if not app.config['HTTP_PREWARM']:
+        return
+    reamaze_client.http.warm(reamaze_client.base_url)
+    if shopify_client.graphql_url:
+        shopify_client.http.warm(shopify_client.graphql_url)
+
+# ==========================
+# Tool payload parsing and response shaping
+# (shared by the Flask views below and the async app in async_bridge.py)
+# ==========================
+
+def build_ticket_fields(data):
+    """Pull ticket fields out of a tool payload. Returns (fields, missing_fields)."""
+    # Robust field extraction with aliases
+    customer_email = data.get('customer_email') or data.get('email') or data.get('user_email')
+    issue = (
+        data.get('issue') or 
+        data.get('issue_summary') or 
+        data.get('summary') or 
+        data.get('description') or 
+        data.get('problem') or
+        data.get('message')
+    )
+    customer_name = data.get('customer_name') or data.get('name') or customer_email
+    order_number = data.get('order_number') or data.get('order') or data.get('order_id')
+    
+    # Validate required fields
+    missing_fields = []
+    if not customer_email: missing_fields.append('customer_email')
+    if not issue: missing_fields.append('issue')
+    if missing_fields:
+        return None, missing_fields
+    
+    # Create ticket subject and body
+    subject = f"Support Request: {issue[:50]}..." if len(issue) > 50 else f"Support Request: {issue}"
+    body_parts = [
+        f"Customer: {customer_name}",
+        f"Email: {customer_email}",
+        f"Issue: {issue}"
+    ]
+    
+    if order_number:
+        body_parts.append(f"Order Number: {order_number}")
+    
+    return {
+        "subject": subject,
+        "body": "\n".join(body_parts),
+        "customer_email": customer_email,
+        "customer_name": customer_name
+    }, []
+
+def mock_reamaze_enabled():
+    return os.environ.get('MOCK_REAMAZE', 'false').lower() == 'true'
+
+def mock_ticket_response(fields):
+    logger.info("MOCK MODE: Skipping Reamaze API call")
+    logger.info(f"WOULD SENT payload to Reamaze: subject='{fields['subject']}', customer={fields['customer_email']}")
+    
+    # Simulate success response
+    mock_ticket_id = f"mock-ticket-{int(time.time())}"
+    return {
+        "success": True,
+        "message": "[MOCK] Support ticket created successfully",
+        "ticket_id": mock_ticket_id,
+        "ticket_slug": mock_ticket_id,
+        "data": {"mock": True, "subject": fields['subject']}
+    }
+
+def format_created_ticket(result):
+    # Extract ticket identifier - more robustly
+    ticket_id = (
+        result.get("slug") or 
+        result.get("id") or 
+        result.get("conversation", {}).get("slug") or 
+        result.get("conversation", {}).get("id")
+    )
+    
+    logger.info(f"Successfully created ticket: {ticket_id}")
+    
+    return {
+        "success": True,
+        "message": "Support ticket created successfully",
+        "ticket_id": ticket_id,
+        "ticket_slug": result.get("slug") or result.get("conversation", {}).get("slug"),
+        "data": result
+    }
+
+def format_article_results(result, query_term, max_results):
+    articles = []
+    if isinstance(result, dict) and 'articles' in result:
+        for article in result['articles'][:max_results]:
+            articles.append({
+                "id": article.get("id"),
+                "title": article.get("title"),
+                "slug": article.get("slug"),
+                "body": article.get("body", "")[:300] + "..." if len(article.get("body", "")) > 300 else article.get("body", ""),
+                "url": article.get("url")
+            })
+    
+    logger.info(f"Found {len(articles)} articles for query: {query_term} (total in KB: {result.get('total_count', 'unknown')})")
+    return {
+        "success": True,
+        "query": query_term,
+        "count": len(articles),
+        "total_articles_in_kb": result.get('total_count', 0),
+        "articles": articles
+    }
+
+def first_search_article(search_result, topic):
+    """Pick the top article from a topic search. Returns (article, error_body, status)."""
+    # Check if articles were found
+    if not isinstance(search_result, dict) or 'articles' not in search_result:
+        return None, {
+            "success": False,
+            "error": "Invalid response from API"
+        }, 500
+    
+    articles = search_result.get("articles", [])
+    if not articles or len(articles) == 0:
+        return None, {
+            "success": False,
+            "error": f"No articles found for topic: {topic}"
+        }, 404
+    
+    return articles[0], None, 200
+
+def instruction_token_budget(data):
+    """Token budget for /get-instructions from the payload's max_tokens, or None for the raw article ("format": "raw")"""
+    if str(data.get('format', '')).lower() == 'raw':
+        return None
+    default = app.config['INSTRUCTIONS_MAX_TOKENS']
+    try:
+        max_tokens = int(data.get('max_tokens') or default)
+    except (ValueError, TypeError):
+        max_tokens = default
+    return max(32, min(max_tokens, app.config['INSTRUCTIONS_MAX_TOKENS_LIMIT']))
+
+def format_instructions(result, max_tokens=None):
+    raw = {
+        "id": result.get("id"),
+        "title": result.get("title"),
+        "content": result.get("body", ""),
+        "slug": result.get("slug"),
+        "url": result.get("url")
+    }
+    if max_tokens is None:
+        return {
+            "success": True,
+            "instructions": raw
+        }
+
+    digest = instruction_digests.get(result.get("id") or result.get("slug"), result.get("body") or "")
+    fitted, truncated = fit_digest(digest, max_tokens)
+    instructions = {
+        "id": result.get("id"),
+        "title": result.get("title"),
+        "content": "\n".join(fitted["paragraphs"]),
+        "steps": fitted["steps"],
+        "links": fitted["links"],
+        "truncated": truncated,
+        "slug": result.get("slug"),
+        "url": result.get("url")
+    }
+    original = json.dumps(raw)
+    compact = json.dumps(instructions)
+    instruction_digests.record_payload(len(original), len(compact))
+    return {
+        "success": True,
+        "instructions": instructions,
+        "payload": {
+            "original_bytes": len(original),
+            "digest_bytes": len(compact),
+            "original_tokens": estimate_tokens(original),
+            "digest_tokens": estimate_tokens(compact)
+        }
+    }
+
+def format_conversations(result, customer_email, order_number):
+    conversations = []
+    if isinstance(result, dict) and 'conversations' in result:
+        for conv in result['conversations']:
+            # Extract customer email from author or followers
+            conv_email = None
+            if conv.get("author", {}).get("email"):
+                conv_email = conv["author"]["email"]
+            elif conv.get("followers") and len(conv["followers"]) > 0:
+                # Get the first customer's email from followers
+                for follower in conv["followers"]:
+                    if follower.get("customer?", False):
+                        conv_email = follower.get("email")
+                        break
+            
+            # Extract last message snippet
+            last_message_snippet = ""
+            if conv.get("last_customer_message", {}).get("body"):
+                body = conv["last_customer_message"]["body"]
+                last_message_snippet = body[:100] + "..." if len(body) > 100 else body
+            
+            conversations.append({
+                "id": None,  # Reamaze conversations don't have numeric IDs
+                "slug": conv.get("slug"),  # Slug is the primary identifier
+                "subject": conv.get("subject"),
+                "status": conv.get("status"),
+                "status_text": STATUS_CODES.get(conv.get("status"), "Unknown"),
+                "origin": conv.get("origin"),
+                "origin_text": ORIGIN_CODES.get(conv.get("origin"), "Unknown"),
+                "created_at": conv.get("created_at"),
+                "updated_at": conv.get("updated_at"),
+                "assignee": conv.get("assignee", {}).get("name") if conv.get("assignee") else None,
+                "customer_email": conv_email,
+                "message_count": conv.get("message_count", 0),
+                "last_message_snippet": last_message_snippet
+            })
+    
+    search_type = "email" if customer_email else "order_number"
+    search_value = customer_email or order_number
+    
+    logger.info(f"Found {len(conversations)} conversations for {search_type}: {search_value}")
+    return {
+        "success": True,
+        "search_type": search_type,
+        "search_value": search_value,
+        "count": len(conversations),
+        "conversations": conversations
+    }
+
+def is_not_found(result):
+    # Check for 404 in error message if status_code not set
+    return result.get("status_code") == 404 or "404" in str(result.get("error", ""))
+
+def format_ticket_status(result):
+    # Extract key ticket information
+    ticket_info = {
+        "id": result.get("id"),
+        "slug": result.get("slug"),
+        "subject": result.get("subject"),
+        "status": result.get("status"),
+        "status_text": STATUS_CODES.get(result.get("status"), "Unknown"),
+        "origin": result.get("origin"),
+        "origin_text": ORIGIN_CODES.get(result.get("origin"), "Unknown"),
+        "created_at": result.get("created_at"),
+        "updated_at": result.get("updated_at"),
+        "category": result.get("category"),
+        "assignee": {
+            "name": result.get("assignee", {}).get("name"),
+            "email": result.get("assignee", {}).get("email")
+        } if result.get("assignee") else None,
+        "customer": {
+            "name": result.get("user", {}).get("name"),
+            "email": result.get("user", {}).get("email")
+        } if result.get("user") else None,
+        "message_count": len(result.get("messages", [])),
+        "tags": result.get("tags", []),
+        "messages": []  # Initialize messages list
+    }
+    
+    # Process all messages for conversation history
+    messages = result.get("messages", [])
+    if messages:
+        for message in messages:
+            author_name = "Unknown"
+            if message.get("user"):
+                author_name = message["user"].get("name", message["user"].get("email", "Unknown"))
+            
+            ticket_info["messages"].append({
+                "body": message.get("body"),
+                "created_at": message.get("created_at"),
+                "author_name": author_name,
+                "author_type": "staff" if message.get("visible_to_customer") is False else "customer"
+            })
+
+        # If top-level customer is null, try to find it from messages
+        if not ticket_info["customer"] and any(msg["author_type"] == "customer" for msg in ticket_info["messages"]):
+            first_customer_msg = next((msg for msg in messages if msg.get("user") and msg.get("visible_to_customer") is not False), None)
+            if first_customer_msg:
+                ticket_info["customer"] = {
+                    "name": first_customer_msg["user"].get("name"),
+                    "email": first_customer_msg["user"].get("email")
+                }
+
+        # If top-level assignee is null, try to find it from staff messages
+        if not ticket_info["assignee"] and any(msg["author_type"] == "staff" for msg in ticket_info["messages"]):
+            first_staff_msg = next((msg for msg in messages if msg.get("user") and msg.get("visible_to_customer") is False), None)
+            if first_staff_msg:
+                ticket_info["assignee"] = {
+                    "name": first_staff_msg["user"].get("name"),
+                    "email": first_staff_msg["user"].get("email")
+                }
+
+    return {
+        "success": True,
+        "ticket": ticket_info
+    }
+
+def format_added_ticket_info(result, ticket_id):
+    return {
+        "success": True,
+        "message": "Information added to ticket successfully",
+        "ticket_id": ticket_id,
+        "message_id": result.get("id") or result.get("message", {}).get("id"),
+        "data": result
+    }
+
+def normalize_order_number(raw_order_number):
+    """Robust normalization: extract only the last numeric/alphanumeric part if prefixed"""
+    # e.g. "Order 1001" -> "1001", "Order #1001" -> "1001", "#1001" -> "1001"
+    order_number = raw_order_number
+    if ' ' in order_number:
+        # Take the last part (e.g. from "Order #12345")
+        order_number = order_number.split()[-1]
+    
+    # Strip leading # if present
+    if order_number.startswith('#'):
+        order_number = order_number[1:]
+    
+    # Final cleanup
+    return order_number.strip()
+
+def format_order(order, fields=None):
+    """Normalize a Shopify order node into the /track-order response shape (only the parts in `fields`, if given)"""
+    fulfillments = []
+    for f in (order.get('fulfillments') or []):
+        tracking = []
+        for t in (f.get('trackingInfo') or []):
+            tracking.append({
+                "number": t.get('number'),
+                "url": t.get('url'),
+                "company": t.get('company')
+            })
+        fulfillments.append({
+            "created_at": f.get('createdAt'),
+            "status": f.get('status'),
+            "tracking": tracking
+        })
+
+    items = []
+    for edge in (order.get('lineItems', {}).get('edges') or []):
+        node = edge.get('node', {})
+        variant = node.get('variant') or {}
+        product = (variant.get('product') or {})
+        items.append({
+            "name": node.get('name'),
+            "quantity": node.get('quantity'),
+            "sku": node.get('sku'),
+            "variant_title": variant.get('title'),
+            "product_title": product.get('title'),
+            "product_url": product.get('onlineStoreUrl'),
+            "variant_image": (variant.get('image') or {}).get('url')
+        })
+
+    return project_order({
+        "id": order.get('id'),
+        "name": order.get('name'),
+        "order_number": order.get('name'),
+        "processed_at": order.get('processedAt'),
+        "closed_at": order.get('closedAt'),
+        "cancelled_at": order.get('cancelledAt'),
+        "financial_status": order.get('displayFinancialStatus'),
+        "fulfillment_status": order.get('displayFulfillmentStatus'),
+        "customer": order.get('customer'),
+        "shipping_address": order.get('shippingAddress'),
+        "fulfillments": fulfillments,
+        "items": items
+    }, fields)
+
+def product_search_key(query_text, filters, limit):
+    """Normalized identity of a product search, for the stale-if-error cache"""
+    return flight_key((query_text or '').strip().lower(), filters, limit)
+
+def build_product_search(data):
+    """Turn a /recommend-products payload into (query_text, essential_filters, limit)"""
+    # Build smart query_text from user input
+    query_parts = []
+    base_query = data.get('query_text', '').strip()
+    if base_query:
+        query_parts.append(base_query)
+    
+    # Add key descriptors to query_text for better natural language search
+    if data.get('material') and data.get('material') not in ("any", "all", "none", ""):
+        query_parts.append(str(data['material']))
+    if data.get('color') and data.get('color') not in ("any", "all", "none", ""):
+        query_parts.append(str(data['color']))
+
+    query_text = " ".join(query_parts) if query_parts else None
+    
+    # Handle limit
+    limit_raw = data.get('limit', 5)
+    try:
+        limit = int(limit_raw) if limit_raw not in (None, "") else 5
+    except (ValueError, TypeError):
+        limit = 5
+
+    # Only keep essential filters: price, sale and what the band has to fit
+    essential_filters = {}
+    for key in ['watch_model', 'size']:
+        if data.get(key) and data.get(key) not in ("any", "all", "none", ""):
+            essential_filters[key] = str(data[key])
+    for key in ['price_min', 'price_max', 'on_sale']:
+        value = data.get(key)
+        if value not in (None, "", "any", "all", "none"):
+            if key in ('price_min', 'price_max'):
+                # Keep 0 as valid for prices
+                essential_filters[key] = value
+            elif key == 'on_sale':
+                essential_filters[key] = value
+
+    return query_text, essential_filters, limit
+
+def format_products(result, fields=None):
+    return {
+        "success": True,
+        "query": result.get('query'),
+        "count": len(result.get('products', [])),
+        "products": project_products(result.get('products', []), fields)
+    }
+
+def requested_fields(data, choices, base):
+    """(field set or None for everything, error (body, status) or None) for a payload's `fields`"""
+    field_set, unknown = parse_field_set(data.get('fields'), choices, base)
+    if unknown:
+        return None, ({
+            "success": False,
+            "error": f"Unknown fields: {', '.join(unknown)} (choose from {', '.join(choices)})"
+        }, 400)
+    return field_set, None
+
+def field_set_key(key, field_set):
+    """Stale-cache key for an answer narrowed to `field_set` (the plain key for full answers)"""
+    return key if field_set is None else f"{key}|{','.join(sorted(field_set))}"
+
+def tool_deadline_budget(path, header_value):
+    """Seconds this tool call may spend in total, from the caller's header or the endpoint default"""
+    default = app.config['TOOL_DEADLINES'].get(path, app.config['TOOL_DEADLINE_DEFAULT'])
+    return resolve_budget(header_value, default, app.config['TOOL_DEADLINE_MAX'])
+
+@app.before_request
+def start_tool_deadline():
+    """Give every tool call a deadline that all of its upstream attempts share"""
+    if request.method == 'POST':
+        budget = tool_deadline_budget(request.path, request.headers.get(app.config['TOOL_DEADLINE_HEADER']))
+        g.deadline_token = start_deadline(budget)
+
+@app.teardown_request
+def end_tool_deadline(exc):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        reset_deadline(token)
+
 @app.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -680,6 +1732,60 @@ def debug_payloads():
         "payloads": RECENT_RAW_PAYLOADS
     })
 
+@app.route('/debug-stats', methods=['GET'])
+def debug_stats():
+    """Per-worker runtime statistics for the upstream clients."""
+    return jsonify({
+        "http_pools": {
+            "reamaze": reamaze_client.http.stats(),
+            "shopify": shopify_client.http.stats()
+        },
+        "rate_limiters": {
+            "reamaze": reamaze_client.rate_limiter.stats()
+        },
+        "bulkheads": {
+            "reamaze": reamaze_client.bulkhead.stats(),
+            "shopify": shopify_client.bulkhead.stats()
+        },
+        "latency": {
+            "reamaze": reamaze_client.latency.stats(),
+            "shopify": shopify_client.latency.stats()
+        },
+        "circuit_breakers": circuit_breaker_stats(reamaze_client, shopify_client),
+        "hedging": {
+            "shopify": shopify_client.hedger.stats()
+        },
+        "singleflight": {
+            "reamaze": reamaze_client.singleflight.stats(),
+            "shopify": shopify_client.singleflight.stats()
+        },
+        "response_cache": {
+            "reamaze": reamaze_client.cache.stats()
+        },
+        "shopify_cost": shopify_client.throttle.stats(),
+        "stale_cache": stale_reads.stats(),
+        "kb_mirror": kb_mirror.stats(),
+        "instruction_digests": instruction_digests.stats(),
+        "catalog_mirror": catalog_mirror.stats(),
+        "product_ranking": product_ranker.stats(),
+        "product_fill": product_fill_stats.stats(),
+        "tool_cache": tool_cache.stats(),
+        "availability": product_availability.stats(),
+        "order_index": order_index.stats()
+    })
+
+def circuit_breaker_stats(reamaze, shopify):
+    """State of every upstream breaker, keyed by upstream and operation class"""
+    return {
+        name: {kind: breaker.stats() for kind, breaker in client.breakers.items()}
+        for name, client in (("reamaze", reamaze), ("shopify", shopify))
+    }
+
+@app.route('/circuit-breakers', methods=['GET'])
+def circuit_breakers():
+    """Current breaker states and recent transitions for the upstream clients."""
+    return jsonify(circuit_breaker_stats(reamaze_client, shopify_client))
+
 @app.route('/create-ticket', methods=['POST'])
 def create_ticket():
     """Create a support ticket in Reamaze"""
@@ -687,92 +1793,27 @@ def create_ticket():
         raw_data = request.get_json()
         data = extract_payload(raw_data)
         
-        # Robust field extraction with aliases
-        customer_email = data.get('customer_email') or data.get('email') or data.get('user_email')
-        issue = (
-            data.get('issue') or 
-            data.get('issue_summary') or 
-            data.get('summary') or 
-            data.get('description') or 
-            data.get('problem') or
-            data.get('message')
-        )
-        customer_name = data.get('customer_name') or data.get('name') or customer_email
-        order_number = data.get('order_number') or data.get('order') or data.get('order_id')
-        
-        # Validate required fields
-        missing_fields = []
-        if not customer_email: missing_fields.append('customer_email')
-        if not issue: missing_fields.append('issue')
-        
+        fields, missing_fields = build_ticket_fields(data)
         if missing_fields:
             logger.warning(f"Ticket creation failed: Missing {', '.join(missing_fields)}")
             return jsonify({
                 "success": False,
                 "error": f"Missing required fields: {', '.join(missing_fields)}"
             }), 400
-        
-        # Create ticket subject and body
-        subject = f"Support Request: {issue[:50]}..." if len(issue) > 50 else f"Support Request: {issue}"
-        body_parts = [
-            f"Customer: {customer_name}",
-            f"Email: {customer_email}",
-            f"Issue: {issue}"
-        ]
-        
-        if order_number:
-            body_parts.append(f"Order Number: {order_number}")
-        
-        body = "\n".join(body_parts)
 
         # MOCK MODE CHECK
-        if os.environ.get('MOCK_REAMAZE', 'false').lower() == 'true':
-            logger.info("MOCK MODE: Skipping Reamaze API call")
-            logger.info(f"WOULD SENT payload to Reamaze: subject='{subject}', customer={customer_email}")
-            
-            # Simulate success response
-            mock_ticket_id = f"mock-ticket-{int(time.time())}"
-            return jsonify({
-                "success": True,
-                "message": "[MOCK] Support ticket created successfully",
-                "ticket_id": mock_ticket_id,
-                "ticket_slug": mock_ticket_id,
-                "data": {"mock": True, "subject": subject}
-            })
+        if mock_reamaze_enabled():
+            return jsonify(mock_ticket_response(fields))
         
         # Create conversation via Reamaze API
-        logger.info(f"Attempting to create Reamaze ticket for {customer_email}")
-        result = reamaze_client.create_conversation(
-            subject=subject,
-            body=body,
-            customer_email=customer_email,
-            customer_name=customer_name
-        )
+        logger.info(f"Attempting to create Reamaze ticket for {fields['customer_email']}")
+        result = reamaze_client.create_conversation(**fields)
         
         if "error" in result:
             logger.error(f"Reamaze API error: {result['error']}")
-            return jsonify({
-                "success": False,
-                "error": result["error"]
-            }), result.get("status_code", 500)
+            return upstream_error_response(result)
         
-        # Extract ticket identifier - more robustly
-        ticket_id = (
-            result.get("slug") or 
-            result.get("id") or 
-            result.get("conversation", {}).get("slug") or 
-            result.get("conversation", {}).get("id")
-        )
-        
-        logger.info(f"Successfully created ticket: {ticket_id}")
-        
-        return jsonify({
-            "success": True,
-            "message": "Support ticket created successfully",
-            "ticket_id": ticket_id,
-            "ticket_slug": result.get("slug") or result.get("conversation", {}).get("slug"),
-            "data": result
-        })
+        return jsonify(format_created_ticket(result))
         
     except Exception as e:
         logger.exception(f"Unexpected error creating ticket: {e}")
@@ -782,6 +1823,7 @@ def create_ticket():
         }), 500
 
 @app.route('/search-kb', methods=['POST'])
+@tool_cached
 def search_knowledge_base():
     """Search knowledge base articles"""
     try:
@@ -798,36 +1840,15 @@ def search_knowledge_base():
         query_term = data['query_term']
         max_results = data.get('max_results', 5)
         
-        # Search articles
-        result = reamaze_client.search_articles(query_term, max_results)
+        # Search articles (local mirror first, live Reamaze search as the fallback)
+        result = mirrored_article_search(query_term, max_results) or reamaze_client.search_articles(query_term, max_results)
+        result, stale_age = stale_reads.read('/search-kb', flight_key(query_term.strip().lower(), max_results), result)
         
         if "error" in result:
             logger.error(f"Failed to search knowledge base: {result['error']}")
-            return jsonify({
-                "success": False,
-                "error": result["error"]
-            }), result.get("status_code", 500)
+            return upstream_error_response(result)
         
-        # Process results
-        articles = []
-        if isinstance(result, dict) and 'articles' in result:
-            for article in result['articles'][:max_results]:
-                articles.append({
-                    "id": article.get("id"),
-                    "title": article.get("title"),
-                    "slug": article.get("slug"),
-                    "body": article.get("body", "")[:300] + "..." if len(article.get("body", "")) > 300 else article.get("body", ""),
-                    "url": article.get("url")
-                })
-        
-        logger.info(f"Found {len(articles)} articles for query: {query_term} (total in KB: {result.get('total_count', 'unknown')})")
-        return jsonify({
-            "success": True,
-            "query": query_term,
-            "count": len(articles),
-            "total_articles_in_kb": result.get('total_count', 0),
-            "articles": articles
-        })
+        return jsonify(mark_stale(format_article_results(result, query_term, max_results), stale_age))
         
     except Exception as e:
         logger.error(f"Error searching knowledge base: {e}")
@@ -837,6 +1858,7 @@ def search_knowledge_base():
         }), 500
 
 @app.route('/get-instructions', methods=['POST'])
+@tool_cached
 def get_instructions():
     """Get step-by-step instructions from knowledge base"""
     try:
@@ -855,53 +1877,23 @@ def get_instructions():
         
         # Get article by ID or search for topic
         if article_id:
-            result = reamaze_client.get_article(article_id)
+            result = mirrored_article(article_id) or reamaze_client.get_article(article_id)
         else:
             # Search for the topic and get the first result
-            search_result = reamaze_client.search_articles(topic, 1)
+            search_result = mirrored_article_search(topic, 1) or reamaze_client.search_articles(topic, 1)
             if "error" in search_result:
-                return jsonify({
-                    "success": False,
-                    "error": search_result["error"]
-                }), search_result.get("status_code", 500)
-            
-            # Check if articles were found
-            if not isinstance(search_result, dict) or 'articles' not in search_result:
-                return jsonify({
-                    "success": False,
-                    "error": "Invalid response from API"
-                }), 500
-            
-            articles = search_result.get("articles", [])
-            if not articles or len(articles) == 0:
-                return jsonify({
-                    "success": False,
-                    "error": f"No articles found for topic: {topic}"
-                }), 404
+                return upstream_error_response(search_result)
             
-            result = articles[0]
+            result, error_body, status = first_search_article(search_result, topic)
+            if error_body:
+                return jsonify(error_body), status
         
         if "error" in result:
             logger.error(f"Failed to get instructions: {result['error']}")
-            return jsonify({
-                "success": False,
-                "error": result["error"]
-            }), result.get("status_code", 500)
-        
-        # Extract instructions
-        instructions = {
-            "id": result.get("id"),
-            "title": result.get("title"),
-            "content": result.get("body", ""),
-            "slug": result.get("slug"),
-            "url": result.get("url")
-        }
+            return upstream_error_response(result)
         
         logger.info(f"Retrieved instructions for: {topic or article_id}")
-        return jsonify({
-            "success": True,
-            "instructions": instructions
-        })
+        return jsonify(format_instructions(result, instruction_token_budget(data)))
         
     except Exception as e:
         logger.error(f"Error getting instructions: {e}")
@@ -937,59 +1929,9 @@ def get_previous_conversations():
         
         if "error" in result:
             logger.error(f"Failed to retrieve conversations: {result['error']}")
-            return jsonify({
-                "success": False,
-                "error": result["error"]
-            }), result.get("status_code", 500)
+            return upstream_error_response(result)
         
-        # Process conversations
-        conversations = []
-        if isinstance(result, dict) and 'conversations' in result:
-            for conv in result['conversations']:
-                # Extract customer email from author or followers
-                customer_email = None
-                if conv.get("author", {}).get("email"):
-                    customer_email = conv["author"]["email"]
-                elif conv.get("followers") and len(conv["followers"]) > 0:
-                    # Get the first customer's email from followers
-                    for follower in conv["followers"]:
-                        if follower.get("customer?", False):
-                            customer_email = follower.get("email")
-                            break
-                
-                # Extract last message snippet
-                last_message_snippet = ""
-                if conv.get("last_customer_message", {}).get("body"):
-                    body = conv["last_customer_message"]["body"]
-                    last_message_snippet = body[:100] + "..." if len(body) > 100 else body
-                
-                conversations.append({
-                    "id": None,  # Reamaze conversations don't have numeric IDs
-                    "slug": conv.get("slug"),  # Slug is the primary identifier
-                    "subject": conv.get("subject"),
-                    "status": conv.get("status"),
-                    "status_text": STATUS_CODES.get(conv.get("status"), "Unknown"),
-                    "origin": conv.get("origin"),
-                    "origin_text": ORIGIN_CODES.get(conv.get("origin"), "Unknown"),
-                    "created_at": conv.get("created_at"),
-                    "updated_at": conv.get("updated_at"),
-                    "assignee": conv.get("assignee", {}).get("name") if conv.get("assignee") else None,
-                    "customer_email": customer_email,
-                    "message_count": conv.get("message_count", 0),
-                    "last_message_snippet": last_message_snippet
-                })
-        
-        search_type = "email" if customer_email else "order_number"
-        search_value = customer_email or order_number
-        
-        logger.info(f"Found {len(conversations)} conversations for {search_type}: {search_value}")
-        return jsonify({
-            "success": True,
-            "search_type": search_type,
-            "search_value": search_value,
-            "count": len(conversations),
-            "conversations": conversations
-        })
+        return jsonify(format_conversations(result, customer_email, order_number))
         
     except Exception as e:
         logger.error(f"Error retrieving previous conversations: {e}")
@@ -1019,80 +1961,15 @@ def check_ticket_status():
         
         if "error" in result:
             logger.error(f"Failed to get ticket status: {result['error']}")
-            # Check for 404 in error message if status_code not set
-            if result.get("status_code") == 404 or "404" in str(result.get("error", "")):
+            if is_not_found(result):
                 return jsonify({
                     "success": False,
                     "error": f"Ticket not found: {ticket_id}"
                 }), 404
-            return jsonify({
-                "success": False,
-                "error": result["error"]
-            }), result.get("status_code", 500)
+            return upstream_error_response(result)
         
-        # Extract key ticket information
-        ticket_info = {
-            "id": result.get("id"),
-            "slug": result.get("slug"),
-            "subject": result.get("subject"),
-            "status": result.get("status"),
-            "status_text": STATUS_CODES.get(result.get("status"), "Unknown"),
-            "origin": result.get("origin"),
-            "origin_text": ORIGIN_CODES.get(result.get("origin"), "Unknown"),
-            "created_at": result.get("created_at"),
-            "updated_at": result.get("updated_at"),
-            "category": result.get("category"),
-            "assignee": {
-                "name": result.get("assignee", {}).get("name"),
-                "email": result.get("assignee", {}).get("email")
-            } if result.get("assignee") else None,
-            "customer": {
-                "name": result.get("user", {}).get("name"),
-                "email": result.get("user", {}).get("email")
-            } if result.get("user") else None,
-            "message_count": len(result.get("messages", [])),
-            "tags": result.get("tags", []),
-            "messages": []  # Initialize messages list
-        }
-        
-        # Process all messages for conversation history
-        messages = result.get("messages", [])
-        if messages:
-            for message in messages:
-                author_name = "Unknown"
-                if message.get("user"):
-                    author_name = message["user"].get("name", message["user"].get("email", "Unknown"))
-                
-                ticket_info["messages"].append({
-                    "body": message.get("body"),
-                    "created_at": message.get("created_at"),
-                    "author_name": author_name,
-                    "author_type": "staff" if message.get("visible_to_customer") is False else "customer"
-                })
-
-            # If top-level customer is null, try to find it from messages
-            if not ticket_info["customer"] and any(msg["author_type"] == "customer" for msg in ticket_info["messages"]):
-                first_customer_msg = next((msg for msg in messages if msg.get("user") and msg.get("visible_to_customer") is not False), None)
-                if first_customer_msg:
-                    ticket_info["customer"] = {
-                        "name": first_customer_msg["user"].get("name"),
-                        "email": first_customer_msg["user"].get("email")
-                    }
-
-            # If top-level assignee is null, try to find it from staff messages
-            if not ticket_info["assignee"] and any(msg["author_type"] == "staff" for msg in ticket_info["messages"]):
-                first_staff_msg = next((msg for msg in messages if msg.get("user") and msg.get("visible_to_customer") is False), None)
-                if first_staff_msg:
-                     ticket_info["assignee"] = {
-                        "name": first_staff_msg["user"].get("name"),
-                        "email": first_staff_msg["user"].get("email")
-                    }
-
         logger.info(f"Retrieved ticket status for ID: {ticket_id}")
-        return jsonify({
-            "success": True,
-            "ticket": ticket_info
-        })
+        return jsonify(format_ticket_status(result))
         
     except Exception as e:
         logger.error(f"Error checking ticket status: {e}")
@@ -1127,15 +2004,12 @@ def add_ticket_info():
         existing_ticket = reamaze_client.get_conversation(ticket_id)
         
         if "error" in existing_ticket:
-            if existing_ticket.get("status_code") == 404 or "404" in str(existing_ticket.get("error", "")):
+            if is_not_found(existing_ticket):
                 return jsonify({
                     "success": False,
                     "error": f"Ticket not found: {ticket_id}"
                 }), 404
-            return jsonify({
-                "success": False,
-                "error": existing_ticket["error"]
-            }), existing_ticket.get("status_code", 500)
+            return upstream_error_response(existing_ticket)
         
         # Add message to the conversation
         result = reamaze_client.add_message_to_conversation(
@@ -1147,19 +2021,10 @@ def add_ticket_info():
         
         if "error" in result:
             logger.error(f"Failed to add message to ticket {ticket_id}: {result['error']}")
-            return jsonify({
-                "success": False,
-                "error": result["error"]
-            }), result.get("status_code", 500)
+            return upstream_error_response(result)
         
         logger.info(f"Successfully added message to ticket {ticket_id} from {customer_email}")
-        return jsonify({
-            "success": True,
-            "message": "Information added to ticket successfully",
-            "ticket_id": ticket_id,
-            "message_id": result.get("id") or result.get("message", {}).get("id"),
-            "data": result
-        })
+        return jsonify(format_added_ticket_info(result, ticket_id))
         
     except Exception as e:
         logger.error(f"Error adding information to ticket: {e}")
@@ -1258,34 +2123,34 @@ def get_daily_stats():
 # Shopify Endpoints
 # ==========================
 
+@app.route('/webhooks/inventory-levels', methods=['POST'])
+def inventory_levels_webhook():
+    """Shopify inventory_levels/update webhook: keeps the availability index current between syncs"""
+    body, status = inventory_webhook(
+        request.get_data(), request.headers.get('X-Shopify-Hmac-Sha256'), request.headers.get('X-Shopify-Topic')
+    )
+    return jsonify(body), status
+
 @app.route('/track-order', methods=['POST'])
+@tool_cached
 def track_order():
-    """Track an order by order number (e.g., 1001 or #1001) via Shopify Admin GraphQL"""
+    """Track an order by order number (e.g., 1001 or #1001) via Shopify Admin GraphQL, or by email/phone/tracking number/zip"""
     try:
         raw_data = request.get_json() or {}
         data = extract_payload(raw_data)
+        fields, error = requested_fields(data, tuple(ORDER_FIELD_SETS), 'status')
+        if error:
+            return jsonify(error[0]), error[1]
         raw_order_number = str(data.get('order_number', '')).strip()
         if not raw_order_number:
-            return jsonify({
-                "success": False,
-                "error": "Missing required field: order_number"
-            }), 400
+            return track_order_by_identifiers(order_lookup_identifiers(data), fields)
 
-        # Robust normalization: extract only the last numeric/alphanumeric part if prefixed
-        # e.g. "Order 1001" -> "1001", "Order #1001" -> "1001", "#1001" -> "1001"
-        order_number = raw_order_number
-        if ' ' in order_number:
-            # Take the last part (e.g. from "Order #12345")
-            order_number = order_number.split()[-1]
-        
-        # Strip leading # if present
-        if order_number.startswith('#'):
-            order_number = order_number[1:]
-        
-        # Final cleanup
-        order_number = order_number.strip()
+        order_number = normalize_order_number(raw_order_number)
 
-        order = shopify_client.get_order_by_number(order_number)
+        order = shopify_client.get_order_by_number(order_number, fields)
+        order, stale_age = stale_reads.read('/track-order', field_set_key(order_number, fields), order)
+        if order and "error" in order:
+            return upstream_error_response(order)
         if not order:
             logger.error(f"Shopify search returned no results for order_number: {order_number}. Targets searched: {['#'+order_number, order_number]}")
             return jsonify({
@@ -1293,56 +2158,60 @@ def track_order():
                 "error": f"Order not found: {order_number}"
             }), 404
 
-        # Normalize output
-        fulfillments = []
-        for f in (order.get('fulfillments') or []):
-            tracking = []
-            for t in (f.get('trackingInfo') or []):
-                tracking.append({
-                    "number": t.get('number'),
-                    "url": t.get('url'),
-                    "company": t.get('company')
-                })
-            fulfillments.append({
-                "created_at": f.get('createdAt'),
-                "status": f.get('status'),
-                "tracking": tracking
-            })
+        return jsonify(mark_stale({
+            "success": True,
+            "order": format_order(order, fields)
+        }, stale_age))
+    except Exception as e:
+        logger.error(f"Error tracking order: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
 
-        items = []
-        for edge in (order.get('lineItems', {}).get('edges') or []):
-            node = edge.get('node', {})
-            variant = node.get('variant') or {}
-            product = (variant.get('product') or {})
-            items.append({
-                "name": node.get('name'),
-                "quantity": node.get('quantity'),
-                "sku": node.get('sku'),
-                "variant_title": variant.get('title'),
-                "product_title": product.get('title'),
-                "product_url": product.get('onlineStoreUrl'),
-                "variant_image": (variant.get('image') or {}).get('url')
-            })
 
+def track_order_by_identifiers(identifiers, fields=None):
+    """/track-order without an order number: the newest indexed order matching every identifier given"""
+    error = order_lookup_error(identifiers)
+    if error:
+        return jsonify(error[0]), error[1]
+    matches = order_index.find(identifiers)
+    if not matches:
         return jsonify({
-            "success": True,
-            "order": {
-                "id": order.get('id'),
-                "name": order.get('name'),
-                "order_number": order.get('name'),
-                "processed_at": order.get('processedAt'),
-                "closed_at": order.get('closedAt'),
-                "cancelled_at": order.get('cancelledAt'),
-                "financial_status": order.get('displayFinancialStatus'),
-                "fulfillment_status": order.get('displayFulfillmentStatus'),
-                "customer": order.get('customer'),
-                "shipping_address": order.get('shippingAddress'),
-                "fulfillments": fulfillments,
-                "items": items
-            }
-        })
+            "success": False,
+            "error": f"No order found for that {' and '.join(kind.replace('_', ' ') for kind in identifiers)}"
+        }), 404
+    order = shopify_client.get_order_by_id(matches[0]['id'], fields)
+    if order and "error" in order:
+        return upstream_error_response(order)
+    if not order:
+        return jsonify({
+            "success": False,
+            "error": f"Order not found: {matches[0]['name']}"
+        }), 404
+    return jsonify({
+        "success": True,
+        "order": format_order(order, fields),
+        "matched_by": sorted(identifiers),
+        "other_orders": summarize_other_orders(matches[1:5])
+    })
+
+
+@app.route('/track-orders', methods=['POST'])
+def track_orders():
+    """Track several orders at once by order number (aliased Shopify GraphQL queries), with partial results"""
+    try:
+        raw_data = request.get_json() or {}
+        data = extract_payload(raw_data)
+        order_numbers = parse_order_numbers(data.get('order_numbers'))
+        error = track_orders_error(order_numbers)
+        if error:
+            return jsonify(error[0]), error[1]
+
+        body, status, headers = track_orders_body(order_numbers, *shopify_client.get_orders_by_number(order_numbers))
+        return jsonify(body), status, headers
     except Exception as e:
-        logger.error(f"Error tracking order: {e}")
+        logger.error(f"Error tracking orders: {e}")
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -1350,6 +2219,7 @@ def track_order():
 
 
 @app.route('/recommend-products', methods=['POST'])
+@tool_cached
 def recommend_products():
     """Return product recommendations based on structured filters and/or a query string.
 
@@ -1378,56 +2248,18 @@ def recommend_products():
     try:
         raw_data = request.get_json() or {}
         data = extract_payload(raw_data)
-            
-        # Build smart query_text from user input
-        query_parts = []
-        base_query = data.get('query_text', '').strip()
-        if base_query:
-            query_parts.append(base_query)
-        
-        # Add key descriptors to query_text for better natural language search
-        if data.get('watch_model') and data.get('watch_model') not in ("any", "all", "none", ""):
-            query_parts.append(str(data['watch_model']))
-        if data.get('material') and data.get('material') not in ("any", "all", "none", ""):
-            query_parts.append(str(data['material']))
-        if data.get('color') and data.get('color') not in ("any", "all", "none", ""):
-            query_parts.append(str(data['color']))
-        if data.get('size') and data.get('size') not in ("any", "all", "none", ""):
-            query_parts.append(str(data['size']))
-            
-        query_text = " ".join(query_parts) if query_parts else None
-        
-        # Handle limit
-        limit_raw = data.get('limit', 5)
-        try:
-            limit = int(limit_raw) if limit_raw not in (None, "") else 5
-        except (ValueError, TypeError):
-            limit = 5
-
-        # Only keep essential filters: price and sale
-        essential_filters = {}
-        for key in ['price_min', 'price_max', 'on_sale']:
-            value = data.get(key)
-            if value not in (None, "", "any", "all", "none"):
-                if key in ('price_min', 'price_max'):
-                    # Keep 0 as valid for prices
-                    essential_filters[key] = value
-                elif key == 'on_sale':
-                    essential_filters[key] = value
-
-        result = shopify_client.search_products(query_text=query_text, filters=essential_filters, limit=limit)
+        query_text, essential_filters, limit = build_product_search(data)
+        fields, error = requested_fields(data, PRODUCT_FIELD_SETS, 'summary')
+        if error:
+            return jsonify(error[0]), error[1]
+
+        result = shopify_client.search_products(query_text=query_text, filters=essential_filters, limit=limit, fields=fields)
+        stale_key = field_set_key(product_search_key(query_text, essential_filters, limit), fields)
+        result, stale_age = stale_reads.read('/recommend-products', stale_key, result)
         if "error" in result:
-            return jsonify({
-                "success": False,
-                "error": result.get('error', 'Unknown error')
-            }), result.get('status_code', 500)
+            return upstream_error_response(result)
 
-        return jsonify({
-            "success": True,
-            "query": result.get('query'),
-            "count": len(result.get('products', [])),
-            "products": result.get('products', [])
-        })
+        return jsonify(mark_stale(format_products(result, fields), stale_age))
     except Exception as e:
         logger.error(f"Error recommending products: {e}")
         return jsonify({
@@ -1443,10 +2275,7 @@ if app.config.get('DEBUG', False):
             limit = int(request.args.get('limit', 5))
             result = shopify_client.list_recent_orders(limit=limit)
             if "error" in result:
-                return jsonify({
-                    "success": False,
-                    "error": result.get('error', 'Unknown error')
-                }), result.get('status_code', 500)
+                return upstream_error_response(result)
             return jsonify({
                 "success": True,
                 "count": len(result.get('orders', [])),
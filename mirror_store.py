@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+_SYNC_FIELDS = ('synced_at', 'seeded_at', 'cursor')
+
+
+class MirrorStore:
+    """
+    One mirrored upstream collection in a sqlite file shared by every worker on the host.
+
+    Items are kept as JSON next to the upstream's `updated_at`, so a sync only
+    writes what changed. A version counter moves on every change (workers
+    reload their in-memory view when it does), and a lease lets one worker at
+    a time run a sync; a lease older than `lease` seconds is abandoned.
+    """
+
+    def __init__(self, db_path, name, lease):
+        if not re.fullmatch(r'[a-z_]+', name):
+            raise ValueError(f"Invalid mirror name: {name}")
+        self.db_path = db_path
+        self.items_table = f"{name}_items"
+        self.sync_table = f"{name}_sync"
+        self.lease = lease
+        self._local = threading.local()
+        self._process_lock = threading.Lock()
+        conn = self._connect()
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self.items_table} (key TEXT PRIMARY KEY, updated_at TEXT, item TEXT)")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.sync_table} ("
+            "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER, synced_at REAL, seeded_at REAL, cursor TEXT, "
+            "lease_token TEXT, lease_until REAL)"
+        )
+        conn.execute(
+            f"INSERT OR IGNORE INTO {self.sync_table} (id, version, synced_at, seeded_at, cursor, lease_token, lease_until) "
+            "VALUES (1, 0, 0, 0, NULL, NULL, 0)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def state(self):
+        """{version, synced_at, seeded_at, cursor} as last committed by any worker"""
+        row = self._connect().execute(
+            f"SELECT version, synced_at, seeded_at, cursor FROM {self.sync_table} WHERE id = 1"
+        ).fetchone()
+        return dict(zip(('version',) + _SYNC_FIELDS, row))
+
+    def claim(self, due=None):
+        """
+        Lease token if `due(state)` says a sync should run (always, when `due` is
+        None) and no other worker holds the lease; otherwise None.
+        """
+        with self._process_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                state = self.state()
+                lease_until = conn.execute(f"SELECT lease_until FROM {self.sync_table} WHERE id = 1").fetchone()[0]
+                if lease_until > now or (due is not None and not due(state)):
+                    conn.execute("COMMIT")
+                    return None
+                token = uuid.uuid4().hex
+                conn.execute(f"UPDATE {self.sync_table} SET lease_token = ?, lease_until = ? WHERE id = 1", (token, now + self.lease))
+                conn.execute("COMMIT")
+                return token
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def release(self, token, **fields):
+        """Give up the lease, recording any of synced_at / seeded_at / cursor"""
+        fields = {k: v for k, v in fields.items() if k in _SYNC_FIELDS}
+        assignments = ''.join(f", {k} = ?" for k in fields)
+        with self._process_lock:
+            self._connect().execute(
+                f"UPDATE {self.sync_table} SET lease_until = 0{assignments} WHERE id = 1 AND lease_token = ?",
+                (*fields.values(), token)
+            )
+
+    def apply(self, items, replace=False, only_newer=False):
+        """
+        Write `items` ({key: (updated_at, item)}) whose updated_at differs from the
+        stored copy (with `only_newer`, sorts after it, so late arrivals can't
+        undo a newer write). With `replace`, stored keys missing from `items`
+        are deleted. Returns (changed, removed) counts.
+        """
+        with self._process_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = dict(conn.execute(f"SELECT key, updated_at FROM {self.items_table}").fetchall())
+                changed = [
+                    (key, updated_at, json.dumps(item))
+                    for key, (updated_at, item) in items.items()
+                    if key not in stored or updated_at is None or stored[key] is None or (
+                        updated_at > stored[key] if only_newer else stored[key] != updated_at)
+                ]
+                removed = [(key,) for key in stored if key not in items] if replace else []
+                conn.executemany(f"INSERT OR REPLACE INTO {self.items_table} (key, updated_at, item) VALUES (?, ?, ?)", changed)
+                conn.executemany(f"DELETE FROM {self.items_table} WHERE key = ?", removed)
+                if changed or removed:
+                    conn.execute(f"UPDATE {self.sync_table} SET version = version + 1 WHERE id = 1")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(changed), len(removed)
+
+    def load(self, since=None):
+        """
+        (version, items) as one consistent read; with `since`, only items whose
+        updated_at sorts at or after it (for collections that are never deleted from)
+        """
+        conn = self._connect()
+        where, params = ("WHERE updated_at >= ? ", (since,)) if since is not None else ("", ())
+        with self._process_lock:
+            conn.execute("BEGIN")
+            try:
+                version = conn.execute(f"SELECT version FROM {self.sync_table} WHERE id = 1").fetchone()[0]
+                items = [json.loads(row[0]) for row in conn.execute(f"SELECT item FROM {self.items_table} {where}ORDER BY key", params)]
+            finally:
+                conn.execute("COMMIT")
+        return version, items
@@ -0,0 +1,319 @@
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from mirror_store import MirrorStore
+
+logger = logging.getLogger(__name__)
+
+# Per order: just enough to find it again, by name or by customer identifier, and say where it stands
+ORDER_SUMMARY_FIELDS = ("id name updatedAt processedAt cancelledAt displayFinancialStatus displayFulfillmentStatus "
+                        "email phone customer { email phone } shippingAddress { zip phone } "
+                        "fulfillments { trackingInfo { number } }")
+
+
+def order_key(order_number):
+    """"#1001", "1001" and " #1001 " -> "1001" (the form names are indexed under)"""
+    return str(order_number or '').strip().lstrip('#').strip().lower()
+
+
+def normalize_email(value):
+    email = str(value or '').strip().lower()
+    return email if '@' in email else None
+
+
+def normalize_phone(value):
+    """Last 10 digits, so "+1 (555) 123-4567" and "555.123.4567" agree"""
+    digits = re.sub(r'\D', '', str(value or ''))
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def normalize_tracking_number(value):
+    number = re.sub(r'[^A-Z0-9]', '', str(value or '').upper())
+    return number if len(number) >= 6 else None
+
+
+def normalize_zip(value):
+    """US ZIP+4 down to the ZIP ("10001-1234" -> "10001"), others uppercased without spaces"""
+    code = re.sub(r'[^A-Z0-9]', '', str(value or '').upper())
+    if len(code) == 9 and code.isdigit():
+        code = code[:5]
+    return code or None
+
+
+# Secondary index -> normalizer for the values a customer might give instead of an order number
+IDENTIFIERS = {
+    "email": normalize_email,
+    "phone": normalize_phone,
+    "tracking_number": normalize_tracking_number,
+    "zip": normalize_zip,
+}
+
+
+def identifier_digest(kind, value):
+    """Hashed normalized identifier (the shared sqlite file holds no contact details), or None if `value` isn't valid"""
+    normalized = IDENTIFIERS[kind](value)
+    if not normalized:
+        return None
+    return hashlib.sha256(f"{kind}:{normalized}".encode('utf-8')).hexdigest()[:32]
+
+
+def order_identifiers(node):
+    """Orders page node -> {kind: [digests]} for every identifier the order can be found by"""
+    customer = node.get('customer') or {}
+    address = node.get('shippingAddress') or {}
+    values = {
+        "email": [node.get('email'), customer.get('email')],
+        "phone": [node.get('phone'), customer.get('phone'), address.get('phone')],
+        "tracking_number": [
+            info.get('number')
+            for fulfillment in node.get('fulfillments') or []
+            for info in fulfillment.get('trackingInfo') or []
+        ],
+        "zip": [address.get('zip')],
+    }
+    identifiers = {}
+    for kind, raw in values.items():
+        digests = sorted({d for d in (identifier_digest(kind, v) for v in raw) if d})
+        if digests:
+            identifiers[kind] = digests
+    return identifiers
+
+
+def _epoch(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def summarize_order(node):
+    """Orders page node -> the stored summary"""
+    return {
+        "id": node.get('id'),
+        "name": node.get('name'),
+        "updated_at": node.get('updatedAt'),
+        "processed_at": node.get('processedAt'),
+        "cancelled_at": node.get('cancelledAt'),
+        "financial_status": node.get('displayFinancialStatus'),
+        "fulfillment_status": node.get('displayFulfillmentStatus'),
+        "identifiers": order_identifiers(node)
+    }
+
+
+class OrderIndex:
+    """
+    Order name -> order id (plus a short summary), resolved in-process.
+
+    Backfilled once by paging through every order updated in the last
+    `backfill_days`, then kept current by polling for orders with `updated_at`
+    at or after the newest one seen, every `sync_interval` seconds. Like the
+    mirrors, summaries live in a sqlite file shared by all workers and one
+    worker at a time syncs; each worker loads only the rows that changed since
+    its last load. Lookups are only trusted (`ready()`) once the backfill has
+    finished and the last sync is younger than `max_age`.
+
+    Secondary indexes map each hashed, normalized email, phone, tracking
+    number and shipping zip to the ids of the orders carrying it; when an
+    order changes, the identifiers it no longer has are dropped.
+    """
+
+    # Summaries with contact and tracking fields cost ~4 points per order; 150 per page
+    # keeps a sync page (~600 points) clear of the interactive reserve
+    PAGE_SIZE = 150
+
+    def __init__(self, db_path, sync_interval, backfill_days, max_age, lease=900):
+        # Own table per summary shape: incremental syncs never rewrite unchanged orders
+        self.store = MirrorStore(db_path, 'order_summaries', lease)
+        self.sync_interval = sync_interval
+        self.backfill_days = backfill_days
+        self.max_age = max_age
+        self.syncs = 0
+        self.sync_failures = 0
+        self.orders_updated = 0
+        self.lookups = 0
+        self.hits = 0
+        self.identifier_lookups = 0
+        self.identifier_hits = 0
+        self.last_error = None
+        # Seconds between an order changing in Shopify and an incremental sync picking it up
+        self._lags = deque(maxlen=1000)
+        self._version = None
+        self._loaded_through = None
+        self._synced_at = 0.0
+        self._seeded_at = 0.0
+        self._by_key = {}
+        self._by_id = {}
+        self._by_identifier = {kind: {} for kind in IDENTIFIERS}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ---- sync (writer side) ----
+
+    def sync(self, source, force=False):
+        """
+        Backfill or incrementally update the index through `source` (a ShopifyAPIClient).
+        Returns True if the index is now current, False if skipped or failed.
+        """
+        due = None if force else (lambda state: state['synced_at'] <= time.time() - self.sync_interval)
+        token = self.store.claim(due)
+        if token is None:
+            return False
+        state = self.store.state()
+        backfill = not state['cursor']
+        since = state['cursor'] or (
+            datetime.now(timezone.utc) - timedelta(days=self.backfill_days)
+        ).strftime('%Y-%m-%dT%H:%M:%SZ')
+        try:
+            nodes = self._updated_since(source, since)
+            changed, _ = self.store.apply({n['id']: (n.get('updatedAt'), summarize_order(n)) for n in nodes})
+        except Exception as e:
+            self.sync_failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Order index sync failed: {e}")
+            self.store.release(token)
+            return False
+
+        now = time.time()
+        if not backfill:
+            for node in nodes:
+                updated = _epoch(node.get('updatedAt'))
+                if updated is not None and node.get('updatedAt') != state['cursor']:
+                    self._lags.append(max(0.0, now - updated))
+        cursor = max([n.get('updatedAt') or '' for n in nodes] + [state['cursor'] or since])
+        if backfill:
+            self.store.release(token, synced_at=now, seeded_at=now, cursor=cursor)
+            logger.info(f"Order index backfilled with {changed} orders")
+        else:
+            self.store.release(token, synced_at=now, cursor=cursor)
+        self.syncs += 1
+        self.orders_updated += changed
+        self.last_error = None
+        return True
+
+    def _updated_since(self, source, since):
+        nodes, after = [], None
+        while True:
+            page = source.orders_updated_since(since, after, self.PAGE_SIZE)
+            if isinstance(page, dict) and "error" in page:
+                raise RuntimeError(f"order sync failed: {page['error']}")
+            connection = (page or {}).get('orders') or {}
+            nodes.extend(edge.get('node') or {} for edge in connection.get('edges') or [])
+            page_info = connection.get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                return nodes
+            after = page_info.get('endCursor')
+
+    # ---- lookups (reader side) ----
+
+    def refresh(self):
+        """Load the summaries another worker (or this one) wrote since this worker's last load"""
+        state = self.store.state()
+        self._synced_at, self._seeded_at = state['synced_at'], state['seeded_at']
+        if state['version'] == self._version:
+            return False
+        version, summaries = self.store.load(since=self._loaded_through)
+        with self._lock:
+            for summary in summaries:
+                self._index(summary)
+                if summary.get('updated_at') and (self._loaded_through is None or summary['updated_at'] > self._loaded_through):
+                    self._loaded_through = summary['updated_at']
+            self._version = version
+        return True
+
+    def _index(self, summary):
+        previous = self._by_id.get(summary['id'])
+        if previous is not None:
+            if order_key(previous['name']) != order_key(summary['name']):
+                self._by_key.pop(order_key(previous['name']), None)
+            for kind, digests in (previous.get('identifiers') or {}).items():
+                for digest in digests:
+                    ids = self._by_identifier[kind].get(digest)
+                    if ids is not None:
+                        ids.discard(summary['id'])
+                        if not ids:
+                            del self._by_identifier[kind][digest]
+        self._by_id[summary['id']] = summary
+        self._by_key[order_key(summary['name'])] = summary
+        for kind, digests in (summary.get('identifiers') or {}).items():
+            for digest in digests:
+                self._by_identifier[kind].setdefault(digest, set()).add(summary['id'])
+
+    def ready(self):
+        return bool(self._seeded_at) and time.time() - self._synced_at <= self.max_age
+
+    def lookup(self, order_number):
+        """Summary of the order with this name, or None if the index doesn't have it"""
+        summary = self._by_key.get(order_key(order_number))
+        self.lookups += 1
+        self.hits += summary is not None
+        return summary
+
+    def find(self, identifiers):
+        """
+        Summaries of the orders matching every given identifier ({kind: raw value},
+        kinds from IDENTIFIERS), newest first. Invalid values match nothing.
+        """
+        matched = None
+        for kind, value in identifiers.items():
+            digest = identifier_digest(kind, value)
+            ids = self._by_identifier[kind].get(digest, set()) if digest else set()
+            matched = set(ids) if matched is None else matched & ids
+            if not matched:
+                break
+        summaries = [self._by_id[i] for i in matched or () if i in self._by_id]
+        self.identifier_lookups += 1
+        self.identifier_hits += bool(summaries)
+        return sorted(summaries, key=lambda s: s.get('processed_at') or '', reverse=True)
+
+    # ---- background loop ----
+
+    def start(self, source):
+        """Keep the index synced and this worker's copy current from a daemon thread"""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, args=(source,), name='order-index', daemon=True)
+        self._thread.start()
+
+    def _run(self, source):
+        while True:
+            try:
+                self.sync(source)
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception(f"Order index loop error: {e}")
+            # Jitter so workers don't all poll the sqlite file in lockstep
+            time.sleep(min(self.sync_interval, 60) * random.uniform(0.5, 1.0))
+
+    def stats(self):
+        lags = sorted(self._lags)
+        state = self.store.state()
+        return {
+            "ready": self.ready(),
+            "orders": len(self._by_key),
+            "synced_seconds_ago": round(time.time() - self._synced_at, 1) if self._synced_at else None,
+            "backfilled_seconds_ago": round(time.time() - self._seeded_at, 1) if self._seeded_at else None,
+            "cursor": state['cursor'],
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+            "orders_updated": self.orders_updated,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else None,
+            "identifiers": {kind: len(digests) for kind, digests in self._by_identifier.items()},
+            "identifier_lookups": self.identifier_lookups,
+            "identifier_hit_rate": round(self.identifier_hits / self.identifier_lookups, 3) if self.identifier_lookups else None,
+            "freshness_lag_seconds": {
+                "avg": round(sum(lags) / len(lags), 1) if lags else None,
+                "p95": round(lags[int(len(lags) * 0.95)], 1) if lags else None,
+                "max": round(lags[-1], 1) if lags else None
+            },
+            "last_error": self.last_error
+        }
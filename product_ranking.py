@@ -0,0 +1,191 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+from catalog_mirror import to_float, product_filters, is_on_sale
+
+# Points per feature; the tier lists are (upper bound, points), checked in order
+DEFAULT_WEIGHTS = {
+    "on_sale": 100,
+    "per_variant": 5,
+    "variant_cap": 25,
+    "price_tiers": [(20, 30), (40, 20), (60, 10)],   # min price <= bound
+    "has_image": 5,
+    "age_tiers": [(30, 15), (90, 5)],                # days since updated_at <= bound
+}
+
+
+def parse_timestamp(value):
+    """ISO-8601 timestamp -> epoch seconds (NaN when missing or malformed)"""
+    if not value:
+        return np.nan
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (ValueError, TypeError, AttributeError):
+        return np.nan
+
+
+class ProductFeatures:
+    """
+    Ranking features for a list of shaped products, as arrays.
+
+    Per product: has-image, updated_at (epoch seconds) and a title order for
+    ties. Variants are kept flat (price, sale flag, owning product) with
+    `offsets` marking where each product's variants start, so filters can be
+    applied to every variant at once before per-product reductions.
+    """
+
+    def __init__(self, products):
+        counts, prices, sale, has_image, updated = [], [], [], [], []
+        for product in products:
+            variants = product.get('variants') or []
+            counts.append(len(variants))
+            for v in variants:
+                price = to_float(v.get('price'))
+                prices.append(np.nan if price is None else price)
+                sale.append(is_on_sale(price, to_float(v.get('compare_at_price'))))
+            has_image.append(bool(product.get('image')))
+            updated.append(parse_timestamp(product.get('updated_at')))
+        titles = [(product.get('title') or '').lower() for product in products]
+        self._set(
+            np.array(counts, dtype=np.int64),
+            np.array(prices, dtype=np.float64),
+            np.array(sale, dtype=bool),
+            np.array(has_image, dtype=bool),
+            np.array(updated, dtype=np.float64),
+            np.argsort(np.argsort(np.array(titles, dtype=object), kind='stable'), kind='stable')
+        )
+
+    def _set(self, counts, prices, sale, has_image, updated, title_order):
+        self.variant_counts = counts
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))[:-1]
+        self.owner = np.repeat(np.arange(len(counts)), counts)
+        self.prices = prices
+        self.sale = sale
+        self.has_image = has_image
+        self.updated = updated
+        self.title_order = title_order
+
+    def __len__(self):
+        return len(self.variant_counts)
+
+    def take(self, indices):
+        """Features of products[indices], in that order (catalog mirror search candidates)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        counts = self.variant_counts[indices]
+        starts = np.repeat(self.offsets[indices], counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        variant_index = starts + within
+        subset = ProductFeatures.__new__(ProductFeatures)
+        subset._set(counts, self.prices[variant_index], self.sale[variant_index], self.has_image[indices],
+                    self.updated[indices], self.title_order[indices])
+        return subset
+
+
+def _tier_points(values, tiers):
+    """Points of the first tier whose bound is >= value; 0 past the last tier or for NaN"""
+    if not tiers:
+        return np.zeros(len(values))
+    bounds = np.array([bound for bound, _ in tiers], dtype=np.float64)
+    points = np.array([p for _, p in tiers] + [0], dtype=np.float64)
+    slot = np.searchsorted(bounds, np.nan_to_num(values, nan=np.inf), side='left')
+    return points[slot]
+
+
+class ProductRanker:
+    """
+    Scores, filters and orders product search candidates with NumPy.
+
+    The price range and on-sale filters drop variants; a product with no
+    variants left is dropped. Each remaining product is scored on its
+    remaining variants (min price, any on sale, count) plus image and
+    freshness, and the top `limit` are returned best first, ties by title.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.rankings = 0
+        self.candidates = 0
+
+    @staticmethod
+    def features(products):
+        return ProductFeatures(products)
+
+    def score(self, features, keep=None, now=None):
+        """Scores for every product, using only the variants in `keep` (all when None)"""
+        w = self.weights
+        n = len(features)
+        if keep is None:
+            keep = np.ones(len(features.prices), dtype=bool)
+        owner = features.owner[keep]
+        counts = np.bincount(owner, minlength=n)
+        on_sale = np.bincount(owner[features.sale[keep]], minlength=n) > 0
+        min_price = np.full(n, np.inf)
+        np.minimum.at(min_price, owner, np.nan_to_num(features.prices[keep], nan=np.inf))
+        min_price[min_price <= 0] = np.inf  # free / unpriced variants earn no price points
+
+        age_days = np.floor(((now or time.time()) - features.updated) / 86400)
+        score = (
+            on_sale * w["on_sale"]
+            + np.minimum(counts * w["per_variant"], w["variant_cap"])
+            + _tier_points(min_price, w["price_tiers"])
+            + features.has_image * w["has_image"]
+            + _tier_points(age_days, w["age_tiers"])
+        )
+        score[counts == 0] = 0
+        return score
+
+    def variant_mask(self, features, filters):
+        price_min, price_max, on_sale_only = product_filters(filters)
+        keep = np.ones(len(features.prices), dtype=bool)
+        # NaN prices fail both comparisons, so unpriced variants drop out once a bound is set
+        if price_min is not None:
+            keep &= features.prices >= price_min
+        if price_max is not None:
+            keep &= features.prices <= price_max
+        if on_sale_only:
+            keep &= features.sale
+        return keep
+
+    def order(self, features, filters=None, limit=None, now=None, allowed=None):
+        """(product indices best first, variant mask) after filtering; `allowed` pre-selects variants"""
+        keep = self.variant_mask(features, filters)
+        if allowed is not None:
+            keep &= np.asarray(allowed, dtype=bool)
+        score = self.score(features, keep, now)
+        eligible = np.flatnonzero(np.bincount(features.owner[keep], minlength=len(features)) > 0)
+        if limit is not None and limit < len(eligible):
+            # Everything scoring at least the limit-th best, so ties at the cut are ordered by title too
+            threshold = -np.partition(-score[eligible], limit - 1)[limit - 1]
+            eligible = eligible[score[eligible] >= threshold]
+        ranked = eligible[np.lexsort((features.title_order[eligible], -score[eligible]))]
+        self.rankings += 1
+        self.candidates += len(features)
+        return (ranked if limit is None else ranked[:limit]), keep
+
+    def rank(self, products, filters=None, limit=None, features=None, now=None, allowed=None):
+        """
+        Filtered, scored and ordered copies of `products` (their features may be
+        precomputed). `allowed` is an optional flag per variant, across all
+        products in order, e.g. the ones that fit the caller's watch.
+        """
+        if not products:
+            return []
+        if features is None:
+            features = self.features(products)
+        ranked, keep = self.order(features, filters, limit, now, allowed)
+        results = []
+        for i in ranked.tolist():
+            start = features.offsets[i]
+            variants = products[i].get('variants') or []
+            kept = keep[start:start + len(variants)]
+            results.append(dict(products[i], variants=[dict(v) for v, k in zip(variants, kept) if k]))
+        return results
+
+    def stats(self):
+        return {
+            "rankings": self.rankings,
+            "candidates": self.candidates,
+            "weights": self.weights
+        }
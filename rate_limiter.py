@@ -0,0 +1,144 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds, or None."""
+    if value is None or value == '':
+        return None
+    try:
+        return max(0.0, float(value))
+    except (ValueError, TypeError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (ValueError, TypeError):
+        return None
+
+
+class SharedTokenBucket:
+    """
+    Token bucket shared by every process on the host through a sqlite file.
+
+    `acquire()` reserves a token and tells the caller how long to wait for it,
+    so calls are paced ahead of time instead of bursting into 429s. If the wait
+    would exceed the caller's budget nothing is reserved and the caller gets
+    the time after which it is worth trying again.
+    """
+
+    def __init__(self, name, rate, capacity, db_path):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.db_path = db_path
+        self._local = threading.local()
+        # Serialize threads of this process up front; sqlite's own busy handler
+        # backs off in steps of up to 100ms, which is far too coarse here
+        self._process_lock = threading.Lock()
+        self.denied = 0
+        self.delayed = 0
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL, updated_at REAL, blocked_until REAL)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO buckets (name, tokens, updated_at, blocked_until) VALUES (?, ?, ?, 0)",
+            (self.name, self.capacity, time.time())
+        )
+
+    def _locked(self, fn):
+        with self._process_lock:
+            return self._transact(fn)
+
+    def _transact(self, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at, blocked_until FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens, updated_at, blocked_until = row if row else (self.capacity, now, 0.0)
+            tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+            result, tokens, blocked_until = fn(now, tokens, blocked_until)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)",
+                (self.name, tokens, now, blocked_until)
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, max_wait):
+        """
+        Reserve one token.
+
+        Returns (granted, wait_seconds). When granted the caller must sleep
+        `wait_seconds` before sending; when not granted `wait_seconds` is the
+        suggested retry-after.
+        """
+        def reserve(now, tokens, blocked_until):
+            wait = max(0.0, blocked_until - now)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / self.rate)
+            if wait > max_wait:
+                return (False, wait), tokens, blocked_until
+            # Reserve the token now (the balance may go negative) so concurrent
+            # callers queue behind this one instead of all waking up together
+            return (True, wait), tokens - 1, blocked_until
+
+        try:
+            granted, wait = self._locked(reserve)
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limiter '{self.name}' unavailable, allowing request: {e}")
+            return True, 0.0
+
+        if not granted:
+            self.denied += 1
+        elif wait > 0:
+            self.delayed += 1
+        return granted, wait
+
+    def penalize(self, retry_after):
+        """Record an upstream 429: drain the bucket and block every worker for `retry_after` seconds."""
+        def block(now, tokens, blocked_until):
+            return None, min(tokens, 0.0), max(blocked_until, now + retry_after)
+
+        try:
+            self._locked(block)
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limiter '{self.name}' could not record 429: {e}")
+
+    def stats(self):
+        return {
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "delayed": self.delayed,
+            "denied": self.denied
+        }
@@ -0,0 +1,161 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Rough per-entry bookkeeping cost on top of the body, so tiny bodies still count
+ENTRY_OVERHEAD = 256
+
+
+def parse_cache_control(value):
+    """Cache-Control header -> {directive: value-or-True}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+
+class CachedResponse:
+    def __init__(self, path, content, etag, last_modified, max_age, must_revalidate):
+        self.path = path
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.monotonic()
+        self.max_age = max_age
+        self.must_revalidate = must_revalidate
+        self.size = len(content) + ENTRY_OVERHEAD
+
+    def fresh(self):
+        return not self.must_revalidate and time.monotonic() - self.stored_at < self.max_age
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def json(self):
+        return json.loads(self.content) if self.content else {}
+
+
+class ResponseCache:
+    """
+    Private HTTP cache for upstream GET responses, bounded by `max_bytes` with LRU eviction.
+
+    Responses are kept when they carry a validator (ETag/Last-Modified) or a
+    max-age. Fresh entries are served without a request; stale ones are
+    revalidated with If-None-Match/If-Modified-Since and reused on a 304.
+    `no-store` responses are never kept; `no-cache` ones are always revalidated.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Cached entry for `key` (fresh or stale), or None"""
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def hit(self, entry):
+        """Record a fresh entry being served without a request; returns the body"""
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(entry.content)
+        return entry.json()
+
+    def not_modified(self, key, entry, headers):
+        """Record a 304 for `entry`, refreshing its lifetime from the response headers; returns the body"""
+        cache_control = parse_cache_control(headers.get('Cache-Control'))
+        with self._lock:
+            self.revalidated += 1
+            self.bytes_saved += len(entry.content)
+            entry.stored_at = time.monotonic()
+            entry.max_age = self._max_age(cache_control, entry.max_age)
+            entry.etag = headers.get('ETag') or entry.etag
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry.json()
+
+    def store(self, key, path, headers, content):
+        """Record a full (200) response for `path`, keeping it if its headers allow reuse"""
+        with self._lock:
+            self.misses += 1
+        if self.max_bytes <= 0:
+            return
+        cache_control = parse_cache_control(headers.get('Cache-Control'))
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        max_age = self._max_age(cache_control, 0)
+        if 'no-store' in cache_control or not (etag or last_modified or max_age > 0):
+            self._discard(key)
+            return
+        entry = CachedResponse(path, content, etag, last_modified, max_age, 'no-cache' in cache_control)
+        if entry.size > self.max_bytes:
+            self._discard(key)
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def invalidate(self, path):
+        """Drop entries a write to `path` may have changed: the resource itself and its parents"""
+        path = path.rstrip('/')
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if path == e.path or path.startswith(e.path.rstrip('/') + '/')]:
+                self.bytes -= self._entries.pop(key).size
+
+    def _discard(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+
+    @staticmethod
+    def _max_age(cache_control, default):
+        try:
+            return max(0, int(cache_control.get('max-age', default)))
+        except (TypeError, ValueError):
+            return default
+
+    def stats(self):
+        lookups = self.hits + self.revalidated + self.misses
+        ratio = (lambda n: round(n / lookups, 3) if lookups else 0.0)
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_ratio": ratio(self.hits),
+            "revalidation_ratio": ratio(self.revalidated),
+            "miss_ratio": ratio(self.misses),
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved
+        }
@@ -0,0 +1,114 @@
+import math
+import threading
+
+# Pages are sized from the share of products that survived filtering so far;
+# rates under this count as this, so one bad page asks for at most 5x what is missing
+_MIN_PASS_RATE = 0.2
+
+
+def _number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+def pushdown_terms(price_min, price_max, on_sale_only):
+    """
+    Shopify search syntax for the essential filters. Shopify matches a product
+    when any variant satisfies each term, so variants still need checking.
+    """
+    terms = []
+    if price_min is not None:
+        terms.append(f"price:>={_number(price_min)}")
+    if price_max is not None:
+        terms.append(f"price:<={_number(price_max)}")
+    if on_sale_only:
+        terms.append("is_price_reduced:true")
+    return terms
+
+
+class ProductFill:
+    """
+    One product search filled across cursor pages.
+
+    Each page's products are kept if any variant passes the filters. While
+    fewer than `limit` are kept, the next page is sized for what is still
+    missing at the pass rate seen so far, until Shopify runs out of results
+    or `max_pages` pages have been fetched.
+    """
+
+    def __init__(self, limit, max_pages, page_cap=25):
+        self.limit = limit
+        self.max_pages = max_pages
+        self.page_cap = page_cap
+        self.pages = 0
+        self.seen = 0
+        self.products = []
+        self.budget_exhausted = False
+        self._ids = set()
+
+    def add_page(self, returned, kept, page_info):
+        """
+        Record a page (`returned` products, of which `kept` passed the filters).
+        Returns (first, after) for the next page, or None when the search is done.
+        """
+        self.pages += 1
+        self.seen += returned
+        for product in kept:
+            if product.get('id') not in self._ids:
+                self._ids.add(product.get('id'))
+                self.products.append(product)
+        missing = self.limit - len(self.products)
+        if missing <= 0 or not (page_info or {}).get('hasNextPage') or not page_info.get('endCursor'):
+            return None
+        if self.pages >= self.max_pages:
+            self.budget_exhausted = True
+            return None
+        pass_rate = max(len(self.products) / self.seen if self.seen else 1.0, _MIN_PASS_RATE)
+        return max(1, min(math.ceil(missing / pass_rate), self.page_cap)), page_info['endCursor']
+
+
+class FillStats:
+    """
+    How full product searches came back, and how many Shopify pages that took.
+    Searches the catalog mirror answered count with 0 pages.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.filled = 0
+        self.fill_total = 0.0
+        self.pages = {}
+        self.budget_exhausted = 0
+        self.pushed_down = 0
+        self.mirrored = 0
+        self._lock = threading.Lock()
+
+    def record(self, fill, pushed_down):
+        with self._lock:
+            self.requests += 1
+            self.fill_total += min(len(fill.products), fill.limit) / fill.limit
+            self.filled += len(fill.products) >= fill.limit
+            self.pages[fill.pages] = self.pages.get(fill.pages, 0) + 1
+            self.budget_exhausted += fill.budget_exhausted
+            self.pushed_down += bool(pushed_down)
+
+    def record_mirrored(self, returned, limit):
+        """A search the catalog mirror answered with `returned` products"""
+        with self._lock:
+            self.requests += 1
+            self.fill_total += min(returned, limit) / limit
+            self.filled += returned >= limit
+            self.pages[0] = self.pages.get(0, 0) + 1
+            self.mirrored += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "filled": self.filled,
+                "avg_fill_rate": round(self.fill_total / self.requests, 3) if self.requests else None,
+                "pages_per_request": {str(k): v for k, v in sorted(self.pages.items())},
+                "avg_pages": round(sum(k * v for k, v in self.pages.items()) / self.requests, 2) if self.requests else None,
+                "page_budget_exhausted": self.budget_exhausted,
+                "filters_pushed_down": self.pushed_down,
+                "answered_by_mirror": self.mirrored
+            }
@@ -0,0 +1,309 @@
+"""
+Local stand-in for the Shopify Admin GraphQL API, for offline tests.
+
+Mount it on a requests session in place of the real store:
+
+    standin = ShopifyStandIn(orders=[...], products=[...])
+    shopify_client.http.session.mount(shopify_client.graphql_url, standin)
+
+It answers the queries ShopifyAPIClient sends from in-memory data (including
+bulk product exports, whose JSONL is served from BULK_URL_PREFIX; mount the
+stand-in there too, and variant inventory, which set_available() changes while
+queueing the inventory_levels/update webhook Shopify would send) and runs
+Shopify's leaky-bucket cost model: every response carries
+`extensions.cost` (requested/actual cost and throttleStatus), queries over
+the single-query limit fail with MAX_COST_EXCEEDED, and queries the bucket
+cannot cover fail with THROTTLED.
+"""
+
+import hmac
+import json
+import math
+import base64
+import hashlib
+import re
+import threading
+import time
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from shopify_throttle import estimate_query_cost
+
+SINGLE_QUERY_LIMIT = 1000
+BULK_URL_PREFIX = "https://storage.standin.test/bulk/"
+
+
+class ShopifyStandIn(BaseAdapter):
+    def __init__(self, orders=None, products=None, maximum=1000.0, restore_rate=50.0, latency=0.0, unindexed=()):
+        super().__init__()
+        self.orders = orders or []
+        self.products = products or []
+        # Order names the search index hasn't picked up yet (only a scan finds them)
+        self.unindexed = set(unindexed)
+        self.maximum = float(maximum)
+        self.restore_rate = float(restore_rate)
+        self.latency = latency
+        self.available = self.maximum
+        self.updated_at = time.monotonic()
+        self.calls = 0
+        self.throttled = 0
+        self.points_spent = 0
+        self.bytes_sent = 0
+        self.queries = []
+        self.bulk_operations = []
+        self.bulk_polls = 0
+        self.bulk_downloads = []
+        self.inventory_events = []
+        self._lock = threading.Lock()
+
+    # ---- cost model ----
+
+    def _charge(self, requested, returned, first):
+        """Returns (extensions.cost, error code or None)"""
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.maximum, self.available + (now - self.updated_at) * self.restore_rate)
+            self.updated_at = now
+            code = None
+            actual = None
+            if requested > SINGLE_QUERY_LIMIT:
+                code = 'MAX_COST_EXCEEDED'
+            elif requested > self.available:
+                code = 'THROTTLED'
+                self.throttled += 1
+            else:
+                # Shopify refunds the part of the requested cost that wasn't returned
+                fraction = min(1.0, returned / first) if first else 1.0
+                actual = max(1, math.ceil(requested * fraction))
+                self.available -= actual
+                self.points_spent += actual
+            return {
+                "requestedQueryCost": requested,
+                "actualQueryCost": actual,
+                "throttleStatus": {
+                    "maximumAvailable": self.maximum,
+                    "currentlyAvailable": int(self.available),
+                    "restoreRate": self.restore_rate
+                }
+            }, code
+
+    # ---- data ----
+
+    def _resolve(self, query, variables):
+        """Returns (data, number of top-level nodes returned, page size asked for)"""
+        fetches = re.findall(r'(\w+):\s*order\(id:\s*\$(\w+)\)', query)
+        searches = re.findall(r'(\w+):\s*orders\(first:\s*(\d+),\s*query:\s*\$(\w+)\)', query)
+        if fetches or searches:
+            # Aliased order fetches and name searches, in one query
+            data, returned, first = {}, 0, 0
+            for alias, variable in fetches:
+                data[alias] = self._selected(next((o for o in self.orders if o['id'] == variables.get(variable)), None), query)
+                returned, first = returned + 1, first + 1
+            for alias, size, variable in searches:
+                found = self._orders_named(variables.get(variable), int(size))
+                data[alias] = {"edges": [{"node": self._selected(o, query)} for o in found]}
+                returned, first = returned + len(found), first + int(size)
+            return data, returned, first
+        if re.search(r'\border\(id:', query):
+            order = next((o for o in self.orders if o['id'] == variables.get('id')), None)
+            return {"order": self._selected(order, query)}, 1, 0
+        if 'orders(' in query:
+            match = re.search(r"updated_at:>='([^']+)'", variables.get('q') or '')
+            if match:
+                return self._orders_updated_since(match.group(1), variables.get('first', 0), variables.get('after'))
+            if '$q' in query:
+                found, first = self._orders_named(variables.get('q'), 5), 5
+            else:
+                first = variables.get('first', 0)
+                found = sorted(self.orders, key=lambda o: o.get('processedAt') or '', reverse=True)[:first]
+                found = [{"id": o['id'], "name": o['name']} for o in found]
+            return {"orders": {"edges": [{"node": o} for o in found]}}, len(found), first
+        if 'bulkOperationRunQuery' in query:
+            operation = {"id": f"gid://shopify/BulkOperation/{len(self.bulk_operations) + 1}", "status": "CREATED"}
+            self.bulk_operations.append(operation)
+            return {"bulkOperationRunQuery": {"bulkOperation": dict(operation), "userErrors": []}}, 1, 0
+        if 'currentBulkOperation' in query:
+            operation = self.bulk_operations[-1] if self.bulk_operations else None
+            if operation:
+                # Running on the first poll, done on the next
+                self.bulk_polls += 1
+                operation["status"] = "RUNNING" if operation["status"] == "CREATED" else "COMPLETED"
+                if operation["status"] == "COMPLETED":
+                    operation.update(url=BULK_URL_PREFIX + operation["id"].split('/')[-1] + ".jsonl",
+                                     objectCount=str(len(self.products) + sum(len(self._variants(p)) for p in self.products)),
+                                     errorCode=None)
+            return {"currentBulkOperation": dict(operation) if operation else None}, 1, 0
+        if 'productVariants(' in query:
+            return self._product_variants(variables)
+        if 'products(' in query:
+            match = re.search(r"updated_at:>='([^']+)'", variables.get('q') or '')
+            if match:
+                return self._products_updated_since(query, match.group(1), variables.get('after'))
+            return self._search_products(query, variables)
+        return {}, 0, 0
+
+    def _search_products(self, query, variables):
+        """Products matching the q's price / is_price_reduced terms (free text is ignored), cursor-paged"""
+        q = variables.get('q') or ''
+        matching = self.products
+        for op, value in re.findall(r'price:(>=|<=)([\d.]+)', q):
+            bound = float(value)
+            matching = [p for p in matching if any(
+                float(v['price']) >= bound if op == '>=' else float(v['price']) <= bound for v in self._variants(p))]
+        if 'is_price_reduced:true' in q:
+            matching = [p for p in matching if any(
+                v.get('compareAtPrice') and float(v['compareAtPrice']) > float(v['price']) for v in self._variants(p))]
+        first = variables.get('first', 0)
+        start = int(variables.get('after') or 0)
+        found = matching[start:start + first]
+        return {"products": {
+            "pageInfo": {"hasNextPage": start + first < len(matching), "endCursor": str(start + len(found))},
+            "edges": [{"node": self._selected_product(p, query)} for p in found]
+        }}, len(found), first
+
+    def _product_variants(self, variables):
+        """Every product's variants (with their inventory items), cursor-paged"""
+        variants = [v for p in self.products for v in self._variants(p)]
+        first = variables.get('first', 50)
+        start = int(variables.get('after') or 0)
+        page = variants[start:start + first]
+        return {"productVariants": {
+            "pageInfo": {"hasNextPage": start + first < len(variants), "endCursor": str(start + len(page))},
+            "edges": [{"node": v} for v in page]
+        }}, len(page), first
+
+    # ---- inventory ----
+
+    def set_available(self, variant_id, available, location="gid://shopify/Location/1", updated_at=None, policy=None):
+        """
+        Set a variant's available quantity at a location (tracking its inventory
+        from now on) and queue the webhook event Shopify would send for it.
+        """
+        variant = next(v for p in self.products for v in self._variants(p) if v['id'] == variant_id)
+        if policy:
+            variant['inventoryPolicy'] = policy
+        item = variant.setdefault('inventoryItem', {
+            "id": f"gid://shopify/InventoryItem/{variant_id.split('/')[-1]}", "tracked": True,
+            "inventoryLevels": {"edges": []}
+        })
+        updated_at = updated_at or time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        levels = item['inventoryLevels']['edges']
+        level = next((e['node'] for e in levels if e['node']['location']['id'] == location), None)
+        if level is None:
+            level = {"location": {"id": location}}
+            levels.append({"node": level})
+        level.update(updatedAt=updated_at, quantities=[{"name": "available", "quantity": available}])
+        event = {
+            "inventory_item_id": int(item['id'].split('/')[-1]),
+            "location_id": int(location.split('/')[-1]),
+            "available": available,
+            "updated_at": updated_at,
+            "admin_graphql_api_id": f"gid://shopify/InventoryLevel/{location.split('/')[-1]}?inventory_item_id={item['id'].split('/')[-1]}"
+        }
+        self.inventory_events.append(event)
+        return event
+
+    def inventory_webhooks(self, secret, events=None):
+        """(body, headers) for each queued inventory event, signed like Shopify's webhook deliveries"""
+        deliveries = []
+        for event in self.inventory_events if events is None else events:
+            body = json.dumps(event).encode('utf-8')
+            signature = base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode('ascii')
+            deliveries.append((body, {
+                "Content-Type": "application/json",
+                "X-Shopify-Topic": "inventory_levels/update",
+                "X-Shopify-Hmac-Sha256": signature
+            }))
+        return deliveries
+
+    @staticmethod
+    def _variants(product):
+        return [edge['node'] for edge in (product.get('variants') or {}).get('edges', [])]
+
+    def _products_updated_since(self, query, since, after):
+        first = int(re.search(r'products\(first:\s*(\d+)', query).group(1))
+        matching = sorted((p for p in self.products if p.get('updatedAt', '') >= since), key=lambda p: p.get('updatedAt', ''))
+        start = int(after) if after else 0
+        page = matching[start:start + first]
+        return {"products": {
+            "pageInfo": {"hasNextPage": start + first < len(matching), "endCursor": str(start + len(page))},
+            "edges": [{"node": p} for p in page]
+        }}, len(page), first
+
+    @staticmethod
+    def _selected(node, query):
+        """A node (order, product, variant) with only the fields the query names, as Shopify answers"""
+        if node is None:
+            return None
+        return {k: v for k, v in node.items() if re.search(rf'\b{k}\b', query)}
+
+    @classmethod
+    def _selected_product(cls, product, query):
+        """A product, and each of its variants, with only the fields the query selects"""
+        selected = cls._selected(product, query)
+        if 'variants' in selected:
+            selected['variants'] = {"edges": [{"node": cls._selected(v, query)} for v in cls._variants(product)]}
+        return selected
+
+    def _orders_named(self, q, first):
+        """Name search: orders named exactly as one of the `name:"..."` terms (ORed), unless not yet in the search index"""
+        names = set(re.findall(r'name:"([^"]+)"', q or ''))
+        return [o for o in self.orders if o['name'] in names and o['name'] not in self.unindexed][:first]
+
+    def _orders_updated_since(self, since, first, after):
+        """Orders updated at or after `since` (processedAt when they have no updatedAt), oldest first, cursor-paged"""
+        updated = lambda o: o.get('updatedAt') or o.get('processedAt') or ''
+        matching = sorted((o for o in self.orders if updated(o) >= since), key=updated)
+        start = int(after) if after else 0
+        page = matching[start:start + first]
+        return {"orders": {
+            "pageInfo": {"hasNextPage": start + first < len(matching), "endCursor": str(start + len(page))},
+            "edges": [{"node": dict(o, updatedAt=updated(o))} for o in page]
+        }}, len(page), first
+
+    def bulk_jsonl(self):
+        """The bulk export file: each product, then its variants with __parentId"""
+        lines = []
+        for product in self.products:
+            lines.append(json.dumps({k: v for k, v in product.items() if k != 'variants'}))
+            for variant in self._variants(product):
+                lines.append(json.dumps(dict(variant, __parentId=product['id'])))
+        return '\n'.join(lines) + '\n'
+
+    # ---- requests adapter ----
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if request.url.startswith(BULK_URL_PREFIX):
+            self.bulk_downloads.append(dict(request.headers))
+            return self._response(request, self.bulk_jsonl().encode('utf-8'), "application/jsonl")
+        payload = json.loads(request.body or b'{}')
+        query, variables = payload.get('query', ''), payload.get('variables') or {}
+        self.calls += 1
+        self.queries.append((query, variables))
+        data, returned, first = self._resolve(query, variables)
+        cost, code = self._charge(estimate_query_cost(query, variables), returned, first)
+        body = {"extensions": {"cost": cost}}
+        if code:
+            body["errors"] = [{"message": code.replace('_', ' ').title(), "extensions": {"code": code}}]
+        else:
+            body["data"] = data
+
+        return self._response(request, json.dumps(body).encode('utf-8'), "application/json")
+
+    def _response(self, request, content, content_type):
+        self.bytes_sent += len(content)
+        response = Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type})
+        response._content = content
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        return response
+
+    def close(self):
+        pass
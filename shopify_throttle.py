@@ -0,0 +1,165 @@
+import re
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A selection set opening (`name(args) {`) or closing
+_SELECTION = re.compile(r'(\w+)\s*(\([^)]*\))?\s*\{|\}')
+_FIRST_ARG = re.compile(r'(?<!\$)\bfirst\s*:\s*(\$?\w+)')
+# Wrappers that Shopify does not charge for on their own (pageInfo is free, not per node)
+_TRANSPARENT = {'query', 'mutation', 'edges', 'node', 'pageInfo'}
+
+
+def estimate_query_cost(query, variables=None):
+    """
+    Requested cost of a GraphQL query following Shopify's published rules:
+    objects cost 1, scalars 0, and a connection costs 2 plus `first` times the
+    cost of one of its nodes (at least 1).
+    """
+    variables = variables or {}
+    stack = [[0]]
+    for match in _SELECTION.finditer(query):
+        if match.group(0) == '}':
+            if len(stack) == 1:
+                break
+            children = stack.pop()[0]
+            name, first = stack[-1].pop(), stack[-1].pop()
+            if first is not None:
+                cost = 2 + first * max(1, children)
+            elif name in _TRANSPARENT:
+                cost = children
+            else:
+                cost = 1 + children
+            stack[-1][0] += cost
+            continue
+        first = None
+        first_arg = _FIRST_ARG.search(match.group(2) or '')
+        if first_arg:
+            value = first_arg.group(1)
+            try:
+                first = int(variables.get(value[1:], 0)) if value.startswith('$') else int(value)
+            except (TypeError, ValueError):
+                first = 0
+        stack[-1].extend([first, match.group(1)])
+        stack.append([0])
+    return stack[0][0]
+
+
+def _cost_key(query, variables):
+    # Cost depends on the query shape and page sizes, not on search strings
+    sizes = tuple(sorted((k, v) for k, v in (variables or {}).items() if isinstance(v, int) and not isinstance(v, bool)))
+    return query, sizes
+
+
+class ShopifyCostThrottle:
+    """
+    Client-side model of Shopify's GraphQL leaky bucket for one worker.
+
+    The bucket state is re-synchronised from every response's
+    `extensions.cost.throttleStatus`; in between it refills at `restoreRate`.
+    Each query reserves its requested cost before it is sent (the estimate is
+    learned from Shopify's `requestedQueryCost` for that query shape) and the
+    unused part is refunded when the actual cost comes back.
+
+    Non-interactive queries (wide scans) may not dip into the last
+    `interactive_reserve` fraction of the bucket, so lookups made while a
+    customer is waiting keep getting through.
+    """
+
+    def __init__(self, maximum=1000.0, restore_rate=50.0, interactive_reserve=0.2):
+        self.maximum = float(maximum)
+        self.restore_rate = float(restore_rate)
+        self.interactive_reserve = interactive_reserve
+        self.available = self.maximum
+        self.updated_at = time.monotonic()
+        self.outstanding = 0.0
+        self.delayed = 0
+        self.denied = 0
+        self.throttled = 0
+        self.downgraded = 0
+        self.last_cost = None
+        self._learned = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.available = min(self.maximum, self.available + (now - self.updated_at) * self.restore_rate)
+        self.updated_at = now
+
+    def _floor(self, interactive):
+        return 0.0 if interactive else self.maximum * self.interactive_reserve
+
+    def estimate(self, query, variables):
+        cost = self._learned.get(_cost_key(query, variables))
+        return cost if cost is not None else estimate_query_cost(query, variables)
+
+    def affordable_now(self, cost, interactive=True):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.available - cost >= self._floor(interactive)
+
+    def reserve(self, cost, interactive, max_wait):
+        """
+        Reserve `cost` points. Returns (granted, wait): when granted the caller
+        must sleep `wait` seconds before sending; otherwise `wait` is a retry hint.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            shortfall = cost + self._floor(interactive) - self.available
+            wait = max(0.0, shortfall / self.restore_rate)
+            if wait > max_wait or cost > self.maximum:
+                self.denied += 1
+                return False, wait
+            if wait > 0:
+                self.delayed += 1
+            # The balance may go negative so later callers queue behind this one
+            self.available -= cost
+            self.outstanding += cost
+            return True, wait
+
+    def settle(self, reserved, query, variables, cost):
+        """Reconcile a reservation with the response's `extensions.cost` block (None if there was none)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.outstanding = max(0.0, self.outstanding - reserved)
+            if not cost:
+                self.available = min(self.maximum, self.available + reserved)
+                return
+            self.last_cost = cost
+            if cost.get('requestedQueryCost') is not None:
+                self._learned[_cost_key(query, variables)] = float(cost['requestedQueryCost'])
+            status = cost.get('throttleStatus') or {}
+            if status:
+                self.maximum = float(status.get('maximumAvailable', self.maximum))
+                self.restore_rate = float(status.get('restoreRate', self.restore_rate))
+                # Shopify's figure already includes this call; our other in-flight calls are not in it yet
+                self.available = float(status.get('currentlyAvailable', self.available)) - self.outstanding
+                self.updated_at = now
+
+    def throttled_retry_after(self, cost):
+        """Record a THROTTLED response and return seconds until `cost` points are available again"""
+        with self._lock:
+            self.throttled += 1
+            self._refill(time.monotonic())
+            return max(1.0, round((cost - self.available) / self.restore_rate, 1))
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "maximum_available": self.maximum,
+                "currently_available": round(self.available, 1),
+                "restore_rate": self.restore_rate,
+                "outstanding": self.outstanding,
+                "delayed": self.delayed,
+                "denied": self.denied,
+                "throttled": self.throttled,
+                "downgraded": self.downgraded,
+                "last_cost": self.last_cost
+            }
+
+
+def is_throttled(errors):
+    return any(((error or {}).get('extensions') or {}).get('code') == 'THROTTLED' for error in errors or [])
@@ -0,0 +1,274 @@
+import os
+import copy
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+
+from deadline import remaining_budget, deadline_exceeded
+
+logger = logging.getLogger(__name__)
+
+
+def flight_key(*parts):
+    """Stable key for a request: identical arguments always serialize the same way"""
+    return json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SharedFlights:
+    """
+    Cross-process half of the singleflight, through a sqlite file.
+
+    The first worker to claim a key runs the call and publishes its JSON result;
+    other workers poll for it. A claim older than `lease` seconds is treated as
+    abandoned (its worker died) and may be taken over.
+    """
+
+    def __init__(self, db_path, lease, poll_interval):
+        self.db_path = db_path
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._process_lock = threading.Lock()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS flights ("
+            "key TEXT PRIMARY KEY, token TEXT, claimed_at REAL, done INTEGER, result TEXT)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def claim(self, key):
+        """Returns our claim token if this worker should run the call, else None"""
+        with self._process_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT claimed_at, done FROM flights WHERE key = ?", (key,)).fetchone()
+                if row and not row[1] and row[0] > now - self.lease:
+                    conn.execute("COMMIT")
+                    return None
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT OR REPLACE INTO flights (key, token, claimed_at, done, result) VALUES (?, ?, ?, 0, NULL)",
+                    (key, token, now)
+                )
+                conn.execute("COMMIT")
+                return token
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def publish(self, key, token, result):
+        with self._process_lock:
+            conn = self._connect()
+            if result is None:
+                conn.execute("DELETE FROM flights WHERE key = ? AND token = ?", (key, token))
+            else:
+                conn.execute(
+                    "UPDATE flights SET done = 1, result = ? WHERE key = ? AND token = ?",
+                    (json.dumps(result), key, token)
+                )
+            # Finished flights only need to outlive their followers
+            conn.execute("DELETE FROM flights WHERE claimed_at < ?", (time.time() - 2 * self.lease,))
+
+    def poll(self, key):
+        """(finished, result) for another worker's flight; finished with no result means it was abandoned"""
+        row = self._connect().execute(
+            "SELECT claimed_at, done, result FROM flights WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] < time.time() - self.lease:
+            return True, None
+        if row[1]:
+            return True, json.loads(row[2])
+        return False, None
+
+
+class Singleflight:
+    """
+    Coalesces identical concurrent calls so only one reaches the upstream.
+
+    Within a worker, callers with the same key wait for the first caller's
+    result. With `db_path` set, workers also coordinate through sqlite: a
+    worker that finds the key already claimed elsewhere waits for that
+    worker's published result (up to `lease` seconds, and never past the
+    caller's deadline) instead of making its own call.
+    """
+
+    def __init__(self, name, db_path=None, lease=30, poll_interval=0.05):
+        self.name = name
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced_local = 0
+        self.coalesced_shared = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+        self._shared = None
+        if db_path:
+            try:
+                self._shared = _SharedFlights(db_path, lease, poll_interval)
+            except sqlite3.Error as e:
+                logger.warning(f"Singleflight '{self.name}' running per-worker only: {e}")
+
+    def _wait_budget(self):
+        lease = self._shared.lease if self._shared else 30
+        return remaining_budget(default=lease)
+
+    def _claim(self, key):
+        """Claim token, None if another worker has the flight, or '' when sharing is unavailable"""
+        if self._shared is None:
+            return ''
+        try:
+            return self._shared.claim(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Singleflight '{self.name}' claim failed, calling directly: {e}")
+            return ''
+
+    def _publish(self, key, token, result):
+        if not token:
+            return
+        try:
+            self._shared.publish(key, token, result)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Singleflight '{self.name}' could not publish result: {e}")
+
+    def _poll(self, key):
+        try:
+            return self._shared.poll(key)
+        except sqlite3.Error:
+            return True, None
+
+    def _run_shared(self, key, fn, args):
+        token = self._claim(key)
+        if token is None:
+            expires = time.monotonic() + self._wait_budget()
+            while time.monotonic() < expires:
+                finished, result = self._poll(key)
+                if finished:
+                    if result is not None:
+                        with self._lock:
+                            self.coalesced_shared += 1
+                        return result
+                    break
+                time.sleep(self._shared.poll_interval)
+            else:
+                return deadline_exceeded()
+            token = self._claim(key) or ''
+        with self._lock:
+            self.leaders += 1
+        result = None
+        try:
+            result = fn(*args)
+            return result
+        finally:
+            self._publish(key, token, result)
+
+    def do(self, key, fn, *args):
+        """Return fn(*args), sharing one call among concurrent callers with the same key"""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced_local += 1
+        if not leader:
+            if not flight.done.wait(self._wait_budget()):
+                return deadline_exceeded()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+        try:
+            flight.result = self._run_shared(key, fn, args)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def _arun_shared(self, key, fn, args):
+        token = await asyncio.to_thread(self._claim, key)
+        if token is None:
+            expires = time.monotonic() + self._wait_budget()
+            while time.monotonic() < expires:
+                finished, result = await asyncio.to_thread(self._poll, key)
+                if finished:
+                    if result is not None:
+                        self.coalesced_shared += 1
+                        return result
+                    break
+                await asyncio.sleep(self._shared.poll_interval)
+            else:
+                return deadline_exceeded()
+            token = await asyncio.to_thread(self._claim, key) or ''
+        self.leaders += 1
+        result = None
+        try:
+            result = await fn(*args)
+            return result
+        finally:
+            await asyncio.to_thread(self._publish, key, token, result)
+
+    async def ado(self, key, fn, *args):
+        """asyncio counterpart of do(); `fn(*args)` must return an awaitable"""
+        self.calls += 1
+        future = self._async_flights.get(key)
+        if future is not None:
+            self.coalesced_local += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self._wait_budget())
+            except asyncio.TimeoutError:
+                return deadline_exceeded()
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader's caller went away; take over instead of failing with it
+                return await self.ado(key, fn, *args)
+            return copy.deepcopy(result)
+        future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._arun_shared(key, fn, args)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # followers re-raise it; don't warn if there are none
+            raise
+        finally:
+            del self._async_flights[key]
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "leaders": self.leaders,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_shared": self.coalesced_shared,
+            "in_flight": len(self._flights) + len(self._async_flights),
+            "shared": self._shared is not None
+        }
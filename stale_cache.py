@@ -0,0 +1,87 @@
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def is_upstream_failure(result):
+    """Errors worth papering over with an older answer: upstream 5xx, timeouts, rejections and rate limits"""
+    if not isinstance(result, dict) or "error" not in result:
+        return False
+    status = result.get("status_code", 500)
+    return status >= 500 or status == 429
+
+
+class StaleCache:
+    """
+    Last good upstream result per endpoint and normalized read, served when the upstream fails.
+
+    `max_ages` limits how old (in seconds) a result may be when served for each
+    endpoint; endpoints without an entry use `default_max_age`. The cache holds
+    at most `max_entries` results across endpoints, evicting the least recently
+    refreshed.
+    """
+
+    def __init__(self, max_entries, max_ages=None, default_max_age=0):
+        self.max_entries = max_entries
+        self.max_ages = dict(max_ages or {})
+        self.default_max_age = default_max_age
+        self.stored = 0
+        self.served = {}
+        self.unavailable = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, endpoint, key, result):
+        """
+        Pass `result` through, remembering it if it is a good answer. If it is an
+        upstream failure and a recent enough good answer exists, return that
+        instead. Returns (result, stale_age_seconds or None).
+        """
+        if is_upstream_failure(result):
+            return self._recall(endpoint, key, result)
+        if result and not (isinstance(result, dict) and "error" in result):
+            self._remember(endpoint, key, result)
+        return result, None
+
+    def _remember(self, endpoint, key, result):
+        with self._lock:
+            self._entries[(endpoint, key)] = (time.time(), result)
+            self._entries.move_to_end((endpoint, key))
+            self.stored += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _recall(self, endpoint, key, failure):
+        max_age = self.max_ages.get(endpoint, self.default_max_age)
+        with self._lock:
+            entry = self._entries.get((endpoint, key))
+            age = time.time() - entry[0] if entry else None
+            if entry is None or age > max_age:
+                self.unavailable += 1
+                return failure, None
+            self.served[endpoint] = self.served.get(endpoint, 0) + 1
+        logger.warning(f"Serving {age:.0f}s old result for {endpoint} after upstream error: {failure.get('error')}")
+        return copy.deepcopy(entry[1]), age
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "stored": self.stored,
+            "served": dict(self.served),
+            "served_total": sum(self.served.values()),
+            "unavailable": self.unavailable,
+            "max_age_seconds": dict(self.max_ages)
+        }
+
+
+def mark_stale(body, age):
+    """Flag a response body as built from a stale result, so the bot can hedge its wording"""
+    if age is not None:
+        body["stale"] = True
+        body["stale_age_seconds"] = int(age)
+    return body
@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Start script for Reamaze API Bridge
-# Usage: ./start.sh [development|production]
+# Usage: ./start.sh [development|production|async]
 
 MODE=${1:-development}
 
@@ -34,7 +34,12 @@ if [ "$MODE" = "production" ]; then
     export FLASK_DEBUG=False
     export LOG_LEVEL=WARNING
     echo "🏭 Starting in production mode with Gunicorn..."
-    gunicorn -w 4 -b 0.0.0.0:5000 main:app
+    gunicorn -c gunicorn.conf.py -w 4 -b 0.0.0.0:5000 main:app
+elif [ "$MODE" = "async" ]; then
+    export FLASK_DEBUG=False
+    export LOG_LEVEL=WARNING
+    echo "⚡ Starting in async (ASGI) mode with Uvicorn..."
+    uvicorn async_bridge:asgi_app --host 0.0.0.0 --port 5000 --workers 4
 else
     export FLASK_DEBUG=True
     export LOG_LEVEL=INFO
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Offline parity test for the ASGI serving mode.
+
+Both the Flask app (main.py) and the ASGI app (async_bridge.py) are pointed at
+the same canned upstream responses, and every tool endpoint must return the
+same status code and JSON body from both.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+
+import main
+import async_bridge
+from circuit_breaker import CLOSED, OPEN
+
+
+ARTICLE = {"id": 7, "title": "Band sizing", "slug": "band-sizing", "body": "Measure your wrist. " * 30, "url": "https://kb/band-sizing"}
+CONVERSATION = {
+    "slug": "where-is-my-order-abc", "subject": "Where is my order", "status": 1, "origin": 0,
+    "created_at": "2026-01-01", "updated_at": "2026-01-02", "author": {"email": "jane@example.com"},
+    "message_count": 2, "last_customer_message": {"body": "Any update?"},
+    "messages": [{"body": "Any update?", "created_at": "2026-01-02", "user": {"name": "Jane", "email": "jane@example.com"}}]
+}
+ORDER = {
+    "id": "gid://shopify/Order/1", "name": "#1001", "processedAt": "2026-01-01T00:00:00Z",
+    "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+    "customer": {"displayName": "Jane", "email": "jane@example.com"}, "shippingAddress": {"zip": "10001"},
+    "fulfillments": [{"createdAt": "2026-01-02", "status": "SUCCESS", "trackingInfo": [{"number": "1Z", "url": "https://t", "company": "UPS"}]}],
+    "lineItems": {"edges": [{"node": {"name": "Leather Band", "quantity": 1, "sku": "LB-45", "variant": {"id": "gid://shopify/ProductVariant/11", "title": "45mm", "image": None, "product": {"id": "gid://shopify/Product/1", "title": "Leather Band", "handle": "leather-band", "onlineStoreUrl": None}}}}]}
+}
+PRODUCT = {
+    "id": "gid://shopify/Product/1", "title": "Leather Band", "handle": "leather-band", "onlineStoreUrl": None,
+    "featuredImage": {"url": "https://img/1"}, "createdAt": "2025-01-01T00:00:00Z", "updatedAt": "2025-01-01T00:00:00Z",
+    "variants": {"edges": [{"node": {"id": "gid://shopify/ProductVariant/11", "title": "45mm", "sku": "LB-45", "price": "25.00", "compareAtPrice": "40.00", "image": None}}]}
+}
+
+
+def fake_reamaze(method, endpoint, data=None, params=None):
+    if endpoint == '/articles':
+        return {"articles": [ARTICLE] if params['q'] != 'nothing' else [], "total_count": 1}
+    if endpoint.startswith('/articles/'):
+        return ARTICLE
+    if endpoint == '/conversations' and method == 'GET':
+        return {"conversations": [CONVERSATION]}
+    if endpoint == '/conversations/missing':
+        return {"error": "404 Client Error: Not Found", "status_code": 404}
+    if endpoint.startswith('/conversations/') and endpoint.endswith('/messages'):
+        return {"id": 99}
+    if endpoint.startswith('/conversations/'):
+        return CONVERSATION
+    if endpoint == '/conversations' and method == 'POST':
+        return {"slug": "support-request-new", "id": 5}
+    return {"error": "unexpected", "status_code": 500}
+
+
+def fake_graphql(query, variables, interactive=True):
+    if 'products(' in query:
+        return {"products": {"edges": [{"node": PRODUCT}]}}
+    if 'o0' in variables:
+        return {alias: {"edges": [{"node": ORDER}] if 'name:"#1001"' in q else []} for alias, q in variables.items()}
+    if variables.get('hashed') == 'name:"#1001"':
+        return {"hashed": {"edges": [{"node": ORDER}]}, "plain": {"edges": []}}
+    return {"orders": {"edges": []}}
+
+
+async def async_fake_reamaze(*args, **kwargs):
+    return fake_reamaze(*args, **kwargs)
+
+
+async def async_fake_graphql(*args, **kwargs):
+    return fake_graphql(*args, **kwargs)
+
+
+CASES = [
+    ('/search-kb', {"query_term": "band size", "max_results": 3}),
+    ('/search-kb', {}),
+    ('/get-instructions', {"topic": "sizing"}),
+    ('/get-instructions', {"topic": "nothing"}),
+    ('/get-instructions', {"article_id": 7}),
+    ('/get-previous-conversations', {"customer_email": "jane@example.com"}),
+    ('/get-previous-conversations', {"tool_payload": {"order_number": "1001"}}),
+    ('/check-ticket-status', {"ticket_id": "where-is-my-order-abc"}),
+    ('/check-ticket-status', {"ticket_id": "missing"}),
+    ('/add-ticket-info', {"ticket_id": "where-is-my-order-abc", "message": "New address", "customer_email": "jane@example.com"}),
+    ('/add-ticket-info', {"ticket_id": "missing", "message": "x", "customer_email": "jane@example.com"}),
+    ('/create-ticket', {"customer_email": "jane@example.com", "issue_summary": "Band broke after a week"}),
+    ('/create-ticket', {"issue": "No email given"}),
+    ('/track-order', {"order_number": "Order #1001"}),
+    ('/track-order', {"order_number": "999"}),
+    ('/track-order', {"order_number": "1001", "fields": "status, tracking"}),
+    ('/track-order', {"order_number": "1001", "fields": ["status", "invoice"]}),
+    ('/track-orders', {"order_numbers": ["#1001", "999"]}),
+    ('/track-orders', {"order_numbers": "999"}),
+    ('/track-orders', {}),
+    ('/recommend-products', {"query_text": "leather", "on_sale": "true", "price_max": 30}),
+    ('/recommend-products', {"query_text": "leather", "fields": "summary"}),
+]
+
+
+def run_flask(cases):
+    main.reamaze_client._make_request = fake_reamaze
+    main.shopify_client._graphql = fake_graphql
+    try:
+        client = main.app.test_client()
+        return [(r.status_code, r.get_json()) for r in (client.post(path, json=payload) for path, payload in cases)]
+    finally:
+        del main.reamaze_client._make_request
+        del main.shopify_client._graphql
+
+
+async def run_asgi(cases):
+    async_bridge.reamaze_client._make_request = async_fake_reamaze
+    async_bridge.shopify_client._graphql = async_fake_graphql
+    transport = httpx.ASGITransport(app=async_bridge.asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bridge") as client:
+        responses = await asyncio.gather(*(client.post(path, json=payload) for path, payload in cases))
+    return [(r.status_code, r.json()) for r in responses]
+
+
+def test_asgi_matches_flask_contracts():
+    expected = run_flask(CASES)
+    actual = asyncio.run(run_asgi(CASES))
+    for (path, payload), want, got in zip(CASES, expected, actual):
+        assert want == got, f"{path} {json.dumps(payload)}:\n flask={want}\n asgi={got}"
+
+
+def test_unknown_route_is_json_404():
+    async def call():
+        transport = httpx.ASGITransport(app=async_bridge.asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bridge") as client:
+            return await client.get("/nope")
+    response = asyncio.run(call())
+    assert response.status_code == 404
+    assert response.json() == {"success": False, "error": "Endpoint not found"}
+
+
+def test_half_open_probe_is_admitted_after_the_rate_limit_wait():
+    client = async_bridge.AsyncReamazeAPIClient()
+    breaker = client.breakers['write']
+    breaker.state, breaker.opened_at = OPEN, time.monotonic() - breaker.recovery_timeout - 1
+    seen = {}
+
+    def acquire(max_wait):
+        # While this worker waits for a token, other callers may still probe
+        seen["probes_while_waiting"] = breaker.probes_in_flight
+        return True, 0.0
+
+    class Transport:
+        async def request(self, method, url, **kwargs):
+            seen["probes_during_call"] = breaker.probes_in_flight
+            return httpx.Response(200, content=b'{}', request=httpx.Request(method, url))
+
+    client.rate_limiter.acquire = acquire
+    client.client = Transport()
+    assert asyncio.run(client._send_request('POST', '/conversations', data={})) == {}
+    assert seen == {"probes_while_waiting": 0, "probes_during_call": 1}
+    assert breaker.state == CLOSED
+
+
+def test_previous_conversations_report_the_searched_email():
+    forwarded = dict(CONVERSATION, author={"email": "colleague@example.com"})
+    result = main.format_conversations({"conversations": [CONVERSATION, forwarded]}, "jane@example.com", None)
+    assert result["search_type"] == "email" and result["search_value"] == "jane@example.com"
+    assert [c["customer_email"] for c in result["conversations"]] == ["jane@example.com", "colleague@example.com"]
+
+
+if __name__ == "__main__":
+    test_asgi_matches_flask_contracts()
+    test_unknown_route_is_json_404()
+    test_half_open_probe_is_admitted_after_the_rate_limit_wait()
+    test_previous_conversations_report_the_searched_email()
+    print("✅ ASGI responses match the Flask app")
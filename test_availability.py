@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the variant availability index: sync and webhook events replayed from the Shopify stand-in.
+"""
+
+import os
+import time
+import tempfile
+
+import main
+from availability import AvailabilityIndex, utc_timestamp
+from catalog_mirror import CatalogMirror
+from mirror_store import MirrorStore
+from product_ranking import ProductRanker
+from shopify_standin import ShopifyStandIn
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+SECRET = "standin-webhook-secret"
+
+
+def make_product(number, variant_count=2, price="29.99"):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": f"Band {number}", "handle": f"band-{number}",
+        "status": "ACTIVE", "tags": [], "onlineStoreUrl": None, "featuredImage": None,
+        "createdAt": None, "updatedAt": f"2026-01-{number:02d}T00:00:00Z",
+        "variants": {"edges": [
+            {"node": {"id": f"gid://shopify/ProductVariant/{number}{i}", "title": f"V{i}", "sku": None,
+                      "price": price, "compareAtPrice": None, "image": None}}
+            for i in range(variant_count)
+        ]}
+    }
+
+
+def make_setup(products):
+    standin = ShopifyStandIn(products=products, restore_rate=2000)
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    index = AvailabilityIndex(os.path.join(tempfile.mkdtemp(), 'availability.sqlite3'), sync_interval=900, max_age=3600)
+    return standin, client, index
+
+
+def test_sync_builds_sellable_flags():
+    standin, client, index = make_setup([make_product(1), make_product(2), make_product(3)])
+    standin.set_available("gid://shopify/ProductVariant/10", 0)
+    standin.set_available("gid://shopify/ProductVariant/11", 4)
+    standin.set_available("gid://shopify/ProductVariant/20", 0, policy="CONTINUE")         # may oversell
+    standin.set_available("gid://shopify/ProductVariant/21", 0)
+    standin.set_available("gid://shopify/ProductVariant/21", 2, location="gid://shopify/Location/2")
+    assert not index.ready() and index.sellable("gid://shopify/ProductVariant/10")
+    assert index.sync(client, force=True) and index.refresh()
+    assert not index.sellable("gid://shopify/ProductVariant/10")
+    assert index.sellable("gid://shopify/ProductVariant/11") and index.quantity("gid://shopify/ProductVariant/11") == 4
+    assert index.sellable("gid://shopify/ProductVariant/20")
+    assert index.sellable("gid://shopify/ProductVariant/21") and index.quantity("gid://shopify/ProductVariant/21") == 2
+    assert index.sellable("gid://shopify/ProductVariant/30") and index.quantity("gid://shopify/ProductVariant/30") is None
+    assert index.sellable("gid://shopify/ProductVariant/999")  # unknown variants are never hidden
+    stats = index.stats()
+    assert stats["variants"] == 6 and stats["sold_out"] == 1 and stats["syncs"] == 1
+
+
+def test_webhook_events_update_sellable_flags():
+    standin, client, index = make_setup([make_product(1)])
+    standin.set_available("gid://shopify/ProductVariant/10", 3, updated_at="2026-02-01T00:00:00Z")
+    index.sync(client, force=True)
+    index.refresh()
+    standin.inventory_events.clear()
+    sold_out = standin.set_available("gid://shopify/ProductVariant/10", 0, updated_at="2026-03-01T10:00:00-05:00")
+    earlier = dict(sold_out, available=7, updated_at="2026-03-01T14:59:00Z")
+
+    original_index, original_secret = main.product_availability, main.app.config['SHOPIFY_WEBHOOK_SECRET']
+    main.product_availability = index
+    main.app.config['SHOPIFY_WEBHOOK_SECRET'] = SECRET
+    try:
+        http = main.app.test_client()
+        body, headers = standin.inventory_webhooks(SECRET)[0]
+        assert http.post('/webhooks/inventory-levels', data=body, headers=headers).get_json() == {"success": True, "applied": True}
+        assert not index.sellable("gid://shopify/ProductVariant/10")
+        # Delivered after the newer event: acknowledged, not applied
+        body, headers = standin.inventory_webhooks(SECRET, [earlier])[0]
+        assert http.post('/webhooks/inventory-levels', data=body, headers=headers).get_json()["applied"] is False
+        assert not index.sellable("gid://shopify/ProductVariant/10")
+        forged = http.post('/webhooks/inventory-levels', data=body, headers=dict(headers, **{"X-Shopify-Hmac-Sha256": "AAAA"}))
+        assert forged.status_code == 401
+    finally:
+        main.product_availability = original_index
+        main.app.config['SHOPIFY_WEBHOOK_SECRET'] = original_secret
+    # Another worker sharing the file sees the event on refresh
+    other = AvailabilityIndex(index.variant_store.db_path, sync_interval=900, max_age=3600)
+    other.refresh()
+    assert not other.sellable("gid://shopify/ProductVariant/10")
+    assert index.stats()["events"] == 2 and index.stats()["late_events"] == 1
+    assert utc_timestamp("2026-03-01T10:00:00-05:00") == "2026-03-01T15:00:00Z"
+
+
+def test_mirror_search_leaves_out_sold_out_products():
+    products = [make_product(n) for n in range(1, 5)]
+    standin, client, index = make_setup(products)
+    for i in range(2):
+        standin.set_available(f"gid://shopify/ProductVariant/4{i}", 0)  # newest product: fully sold out
+    standin.set_available("gid://shopify/ProductVariant/30", 0)
+    index.sync(client, force=True)
+    index.refresh()
+
+    path = os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3')
+    store = MirrorStore(path, 'catalog', lease=60)
+    nodes = [dict(p, variants=[e["node"] for e in p["variants"]["edges"]]) for p in products]
+    store.apply({n["id"]: (n["updatedAt"], n) for n in nodes})
+    store.release(store.claim(), synced_at=time.time(), seeded_at=time.time(), cursor="2026-01-01T00:00:00Z")
+    mirror = CatalogMirror(path, 'astrastraps.com', sync_interval=300, reseed_interval=86400, max_age=3600,
+                           ranker=ProductRanker(), availability=index)
+    mirror.refresh()
+
+    browse = mirror.search(None, {}, 3)
+    assert sorted(p["title"] for p in browse) == ["Band 1", "Band 2", "Band 3"]
+    assert [v["title"] for p in browse if p["title"] == "Band 3" for v in p["variants"]] == ["V1"]
+    assert "Band 4" not in [p["title"] for p in mirror.search("band", {}, 5)]
+    assert mirror.stats()["sold_out_products"] == 1
+
+
+def test_live_search_leaves_out_sold_out_variants():
+    standin, client, index = make_setup([make_product(1), make_product(2)])
+    standin.set_available("gid://shopify/ProductVariant/10", 0)
+    standin.set_available("gid://shopify/ProductVariant/11", 0)
+    standin.set_available("gid://shopify/ProductVariant/20", 0)
+    index.sync(client, force=True)
+    index.refresh()
+    original_index = main.product_availability
+    main.product_availability = index
+    try:
+        result = client.search_products(limit=5)
+    finally:
+        main.product_availability = original_index
+    assert [(p["title"], [v["title"] for v in p["variants"]]) for p in result["products"]] == [("Band 2", ["V1"])]
+
+
+if __name__ == "__main__":
+    test_sync_builds_sellable_flags()
+    test_webhook_events_update_sellable_flags()
+    test_mirror_search_leaves_out_sold_out_products()
+    test_live_search_leaves_out_sold_out_variants()
+    print("✅ All availability index tests passed")
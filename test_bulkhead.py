@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the per-upstream bulkheads.
+"""
+
+import threading
+import time
+
+import main
+from bulkhead import Bulkhead, BulkheadFull
+
+
+def hold_slots(bulkhead, count):
+    """Occupy `count` slots until the returned event is set"""
+    release = threading.Event()
+    entered = threading.Barrier(count + 1)
+
+    def occupy():
+        with bulkhead.slot():
+            entered.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=occupy) for _ in range(count)]
+    for t in threads:
+        t.start()
+    entered.wait()
+    return release, threads
+
+
+def test_rejects_when_queue_is_full():
+    bulkhead = Bulkhead("Shopify", max_concurrent=2, max_queue=0, max_wait=5)
+    release, threads = hold_slots(bulkhead, 2)
+    try:
+        started = time.monotonic()
+        try:
+            with bulkhead.slot():
+                assert False, "should have been rejected"
+        except BulkheadFull as e:
+            assert e.retry_after >= 1
+        assert time.monotonic() - started < 0.1
+        assert bulkhead.stats()["rejected_queue_full"] == 1
+    finally:
+        release.set()
+        for t in threads:
+            t.join()
+    assert bulkhead.stats()["in_flight"] == 0
+
+
+def test_queued_caller_times_out():
+    bulkhead = Bulkhead("Reamaze", max_concurrent=1, max_queue=1, max_wait=0.1)
+    release, threads = hold_slots(bulkhead, 1)
+    try:
+        try:
+            with bulkhead.slot():
+                assert False, "should have timed out"
+        except BulkheadFull:
+            pass
+        stats = bulkhead.stats()
+        assert stats["rejected_timeout"] == 1
+        assert stats["peak_queue_depth"] == 1
+        assert stats["queue_depth"] == 0
+    finally:
+        release.set()
+        for t in threads:
+            t.join()
+
+
+def test_queued_caller_gets_freed_slot():
+    bulkhead = Bulkhead("Reamaze", max_concurrent=1, max_queue=1, max_wait=2)
+    release, threads = hold_slots(bulkhead, 1)
+    threading.Timer(0.05, release.set).start()
+    with bulkhead.slot():
+        pass
+    for t in threads:
+        t.join()
+    assert bulkhead.stats()["admitted"] == 2
+
+
+def test_full_bulkhead_returns_fast_503():
+    client = main.reamaze_client
+    original = client.bulkhead
+    client.bulkhead = Bulkhead("Reamaze", max_concurrent=1, max_queue=0, max_wait=1)
+    release, threads = hold_slots(client.bulkhead, 1)
+    try:
+        response = main.app.test_client().post('/search-kb', json={"query_term": "band size"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.get_json()["success"] is False
+    finally:
+        release.set()
+        for t in threads:
+            t.join()
+        client.bulkhead = original
+
+
+if __name__ == "__main__":
+    test_rejects_when_queue_is_full()
+    test_queued_caller_times_out()
+    test_queued_caller_gets_freed_slot()
+    test_full_bulkhead_returns_fast_503()
+    print("✅ All bulkhead tests passed")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the Shopify catalog mirror, synced from the local Shopify stand-in.
+"""
+
+import os
+import tempfile
+
+import main
+from catalog_mirror import CatalogMirror, parse_bulk_jsonl
+from shopify_standin import ShopifyStandIn, BULK_URL_PREFIX
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+
+def make_product(number, title, price, compare_at=None, status="ACTIVE", updated="2026-01-01T00:00:00Z", tags=()):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": title, "handle": title.lower().replace(' ', '-'),
+        "onlineStoreUrl": f"https://astrastraps.com/products/{title.lower().replace(' ', '-')}",
+        "status": status, "productType": "Watch Band", "vendor": "Astra", "tags": list(tags),
+        "featuredImage": {"url": f"https://cdn.test/{number}.jpg"},
+        "createdAt": "2025-06-01T00:00:00Z", "updatedAt": updated,
+        "variants": {"edges": [
+            {"node": {"id": f"gid://shopify/ProductVariant/{number}{size}", "title": f"Black / {size}mm", "sku": f"SKU-{number}-{size}",
+                      "price": price, "compareAtPrice": compare_at, "image": None}}
+            for size in (41, 45)
+        ]}
+    }
+
+
+CATALOG = [
+    make_product(1, "Marley Magnetic Leather Band", "39.99", "59.99", tags=("leather", "magnetic")),
+    make_product(2, "Nix Nylon Band", "19.99", tags=("nylon", "sport")),
+    make_product(3, "Slick Stainless Steel Band", "49.99", tags=("metal",)),
+    make_product(4, "London Leather Band", "29.99", status="ARCHIVED", tags=("leather",)),
+]
+
+
+def make_setup(products, **kwargs):
+    standin = ShopifyStandIn(products=products, restore_rate=2000)
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None  # keep the test within this process
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    client.http.session.mount(BULK_URL_PREFIX, standin)
+    kwargs.setdefault('reseed_interval', 86400)
+    mirror = CatalogMirror(os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3'), 'astrastraps.myshopify.com',
+                           sync_interval=300, max_age=3600, poll_interval=0.01, **kwargs)
+    return standin, client, mirror
+
+
+def test_parse_bulk_jsonl_attaches_variants():
+    standin = ShopifyStandIn(products=CATALOG[:2])
+    products = parse_bulk_jsonl(standin.bulk_jsonl().splitlines())
+    assert list(products) == ["gid://shopify/Product/1", "gid://shopify/Product/2"]
+    assert [v["sku"] for v in products["gid://shopify/Product/1"]["variants"]] == ["SKU-1-41", "SKU-1-45"]
+
+
+def test_seed_from_bulk_export_then_incremental_sync():
+    products = [dict(p) for p in CATALOG]
+    standin, client, mirror = make_setup(products)
+    assert mirror.sync(client, force=True)
+    mirror.refresh()
+    stats = mirror.stats()
+    assert stats["seeds"] == 1 and stats["products"] == 3  # archived product not searchable
+    assert stats["cursor"] == "2026-01-01T00:00:00Z"
+    assert len(standin.bulk_operations) == 1 and standin.bulk_polls == 2
+    assert "X-Shopify-Access-Token" not in standin.bulk_downloads[0]
+
+    products[1] = make_product(2, "Nix Nylon Sport Band", "14.99", "19.99", updated="2026-02-01T00:00:00Z")
+    products.append(make_product(5, "Thunder Paracord Band", "24.99", updated="2026-02-02T00:00:00Z"))
+    standin.products = products
+    assert mirror.sync(client, force=True)
+    assert mirror.refresh()
+    stats = mirror.stats()
+    assert stats["seeds"] == 1 and stats["products"] == 4
+    assert stats["cursor"] == "2026-02-02T00:00:00Z"
+    incremental = [v for q, v in standin.queries if q == client.PRODUCTS_UPDATED_GQL]
+    assert incremental[0]["q"] == "updated_at:>='2026-01-01T00:00:00Z'"
+    assert mirror.search("nylon sport", None, 5)[0]["title"] == "Nix Nylon Sport Band"
+
+
+def test_reseed_drops_deleted_products():
+    products = [dict(p) for p in CATALOG]
+    standin, client, mirror = make_setup(products, reseed_interval=0)
+    mirror.sync(client, force=True)
+    standin.products = products[1:]
+    mirror.sync(client, force=True)
+    mirror.refresh()
+    assert mirror.stats()["seeds"] == 2 and mirror.stats()["products_removed"] == 1
+    assert all(p["title"] != "Marley Magnetic Leather Band" for p in mirror.search("leather band", None, 5) or [])
+
+
+def test_failed_sync_keeps_serving():
+    standin, client, mirror = make_setup([dict(p) for p in CATALOG])
+    mirror.sync(client, force=True)
+    mirror.refresh()
+    client.graphql_url = None  # Shopify unreachable / unconfigured
+    assert not mirror.sync(client, force=True)
+    assert mirror.stats()["sync_failures"] == 1
+    assert mirror.search("leather", None, 5)
+
+
+def test_local_search_precomputes_urls_and_sale_filters():
+    standin, client, mirror = make_setup([dict(p) for p in CATALOG])
+    mirror.sync(client, force=True)
+    mirror.refresh()
+    product = mirror.search("magnetic leather", None, 5)[0]
+    assert product["variants"][0]["url"] == "https://astrastraps.com/products/marley-magnetic-leather-band?variant=141"
+    assert product["variants"][0]["image"] == "https://cdn.test/1.jpg"
+    assert [p["title"] for p in mirror.search("band", {"on_sale": "yes"}, 1)] == ["Marley Magnetic Leather Band"]
+    assert [p["title"] for p in mirror.search("band", {"price_max": "25"}, 1)] == ["Nix Nylon Band"]
+    assert len(mirror.search(None, None, 2)) == 2
+    # Fewer filtered matches than asked for: the live search gets to page for more
+    assert mirror.search("band", {"on_sale": "yes"}, 5) is None
+    assert mirror.search("band", {"price_max": "5"}, 5) is None
+    assert mirror.stats()["fallbacks"] == {"filtered_short": 1, "no_filter_matches": 1}
+
+
+def test_filters_apply_before_the_relevance_cut():
+    # The sale bands match "band" less strongly than the nylon ones, so they rank below the limit
+    catalog = [make_product(n, "Nylon Band", "19.99", tags=("nylon", "band")) for n in range(1, 9)]
+    catalog += [make_product(n, "Aere Slim Stainless Steel Watch Strap Band", "39.99", "59.99") for n in (9, 10)]
+    standin, client, mirror = make_setup(catalog)
+    mirror.sync(client, force=True)
+    mirror.refresh()
+    original = main.catalog_mirror
+    main.catalog_mirror = mirror
+    calls = standin.calls
+    try:
+        result = client.search_products(query_text="band", filters={"on_sale": "yes"}, limit=2)
+    finally:
+        main.catalog_mirror = original
+    assert {p["id"] for p in result["products"]} == {"gid://shopify/Product/9", "gid://shopify/Product/10"}
+    assert standin.calls == calls  # answered by the mirror
+    assert mirror.stats()["fallbacks"] == {}
+
+
+def test_search_products_skips_shopify_when_mirrored():
+    standin, client, mirror = make_setup([dict(p) for p in CATALOG])
+    mirror.sync(client, force=True)
+    mirror.refresh()
+    original = main.catalog_mirror
+    main.catalog_mirror = mirror
+    calls = standin.calls
+    try:
+        local = client.search_products(query_text="leather band", filters={}, limit=5)
+        live_fallback = client.search_products(query_text="warranty", filters={}, limit=5)
+    finally:
+        main.catalog_mirror = original
+    assert local["query"] == "leather band"
+    assert local["products"][0]["title"] == "Marley Magnetic Leather Band"
+    assert standin.calls == calls + 1  # only the no-hits query went to Shopify
+    assert "products" in live_fallback
+    assert mirror.stats()["fallbacks"] == {"no_hits": 1}
+
+
+if __name__ == "__main__":
+    test_parse_bulk_jsonl_attaches_variants()
+    test_seed_from_bulk_export_then_incremental_sync()
+    test_reseed_drops_deleted_products()
+    test_failed_sync_keeps_serving()
+    test_local_search_precomputes_urls_and_sale_filters()
+    test_filters_apply_before_the_relevance_cut()
+    test_search_products_skips_shopify_when_mirrored()
+    print("✅ All catalog mirror tests passed")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the upstream circuit breakers.
+"""
+
+import time
+from contextlib import contextmanager
+
+import requests
+
+import main
+from bulkhead import BulkheadFull
+from circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+
+
+def fail(breaker):
+    try:
+        with breaker.call(failure_types=(requests.exceptions.RequestException,)):
+            raise requests.exceptions.ConnectionError("refused")
+    except requests.exceptions.ConnectionError:
+        pass
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("Shopify", failure_threshold=3, recovery_timeout=60)
+    for _ in range(2):
+        fail(breaker)
+    with breaker.call() as call:
+        call.record_status(404)  # upstream answered, resets the streak
+    for _ in range(3):
+        fail(breaker)
+    assert breaker.state == OPEN
+    started = time.monotonic()
+    try:
+        with breaker.call():
+            assert False, "should have short-circuited"
+    except CircuitOpen as e:
+        assert e.retry_after > 1
+    assert time.monotonic() - started < 0.05
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("Reamaze", failure_threshold=1, recovery_timeout=0.05, half_open_max_calls=1)
+    fail(breaker)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+
+    with breaker.call() as probe:
+        assert breaker.state == HALF_OPEN
+        try:
+            with breaker.call():
+                assert False, "only one probe at a time"
+        except CircuitOpen:
+            pass
+        probe.record_status(503)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    with breaker.call() as probe:
+        probe.record_status(200)
+    assert breaker.state == CLOSED
+    assert [t["to"] for t in breaker.stats()["transitions"]] == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
+
+
+def test_open_breaker_returns_fast_503():
+    client = main.reamaze_client
+    breaker = client.breakers['read']
+    original = breaker.state, breaker.opened_at
+    breaker.state, breaker.opened_at = OPEN, time.monotonic()
+    try:
+        http = main.app.test_client()
+        response = http.post('/search-kb', json={"query_term": "band size"})
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        assert http.get('/circuit-breakers').get_json()["reamaze"]["read"]["state"] == OPEN
+    finally:
+        breaker.state, breaker.opened_at = original
+
+
+def test_half_open_probe_is_admitted_after_the_rate_limit_wait():
+    client = main.ReamazeAPIClient()
+    breaker = client.breakers['write']
+    breaker.state, breaker.opened_at = OPEN, time.monotonic() - breaker.recovery_timeout - 1
+    seen = {}
+
+    def acquire(max_wait):
+        # While this worker waits for a token, other callers may still probe
+        seen["probes_while_waiting"] = breaker.probes_in_flight
+        return True, 0.0
+
+    def request(method, url, **kwargs):
+        seen["probes_during_call"] = breaker.probes_in_flight
+        response = requests.models.Response()
+        response.status_code, response._content = 200, b'{}'
+        return response
+
+    client.rate_limiter.acquire = acquire
+    client.http.request = request
+    assert client._send_request('POST', '/conversations', data={}) == {}
+    assert seen == {"probes_while_waiting": 0, "probes_during_call": 1}
+    assert breaker.state == CLOSED
+
+
+def test_bulkhead_rejection_leaves_the_shopify_breaker_alone():
+    client = main.ShopifyAPIClient()
+    client.graphql_url = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+    breaker = client.breakers['read']
+    breaker.state, breaker.opened_at = OPEN, time.monotonic() - breaker.recovery_timeout - 1
+    seen = {}
+
+    class FullBulkhead:
+        @contextmanager
+        def slot(self, max_wait=None):
+            seen["probes_while_queued"] = breaker.probes_in_flight
+            raise BulkheadFull('Shopify', 1.0)
+            yield
+
+    client.bulkhead = FullBulkhead()
+    result = client._graphql('{ shop { name } }', {})
+    assert result["status_code"] == 503 and "busy" in result["error"]
+    # The rejected caller never claimed the probe, so the next one still may
+    assert seen == {"probes_while_queued": 0}
+    assert breaker.state == OPEN and breaker.probes_in_flight == 0
+
+
+if __name__ == "__main__":
+    test_opens_after_consecutive_failures()
+    test_half_open_probe_closes_or_reopens()
+    test_open_breaker_returns_fast_503()
+    test_half_open_probe_is_admitted_after_the_rate_limit_wait()
+    test_bulkhead_rejection_leaves_the_shopify_breaker_alone()
+    print("✅ All circuit breaker tests passed")
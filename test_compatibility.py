@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the watch-model / band-size compatibility index.
+"""
+
+import os
+import time
+import tempfile
+
+import main
+from catalog_mirror import CatalogMirror
+from compatibility import CompatibilityIndex, CompatSpec, parse_request, detect_models, case_sizes
+from mirror_store import MirrorStore
+from product_ranking import ProductRanker
+
+APPLE_SIZES = ["Black / 38/40/41mm", "Black / 42/44/45/49mm"]
+
+
+def test_parse_request_normalizes_models_and_sizes():
+    assert parse_request("Series 7", "45mm") == CompatSpec('apple', 'series 7', frozenset({'large'}))
+    assert parse_request("Apple Watch Ultra 2", None) == CompatSpec('apple', 'ultra', frozenset({'large'}))
+    assert parse_request("series 10", "42") == CompatSpec('apple', 'series 10', frozenset({'small'}))
+    assert parse_request(None, "41mm") == CompatSpec('apple', None, frozenset({'small'}))
+    assert parse_request("Galaxy Watch 6", "44mm") == CompatSpec('galaxy', 'watch 6', None)
+    assert parse_request("Versa 2", None) == CompatSpec('fitbit', 'versa 2', None)
+    assert parse_request("my watch", None) is None
+
+
+def test_titles_list_several_models_and_sizes():
+    assert detect_models('fitbit', "Alke Stainless Steel Fitbit Charge 3 & 4 Band") == ['charge 3', 'charge 4']
+    assert set(detect_models('fitbit', "Band For Fitbit Versa / Versa 2 / Versa Lite")) == {'versa', 'versa 2', 'versa lite'}
+    assert case_sizes("Rose Gold / 38/40/41mm") == {38, 40, 41}
+
+
+def test_index_maps_requests_to_products_and_variants():
+    index = CompatibilityIndex([
+        ("Marley Leather Band", APPLE_SIZES),                              # untagged, Apple-sized: Apple band
+        ("Celer Bumper Apple Watch Case Series 7/8/9", ["Clear"]),
+        ("Trellum Nylon Loop Band For Galaxy Watch Ultra", ["Black"]),
+        ("Alke Stainless Steel Fitbit Charge 3 & 4 Band", ["Silver"]),
+        ("Astra Straps Gift Card", ["$25"]),
+    ])
+    assert index.lookup(parse_request("Series 7", "45mm")) == {0: frozenset({1}), 1: None}
+    assert index.lookup(parse_request("Series 5", "40mm")) == {0: frozenset({0})}
+    assert index.lookup(parse_request("Galaxy Watch Ultra", None)) == {2: None}
+    assert index.lookup(parse_request("Fitbit Charge 4", None)) == {3: None}
+    assert index.lookup(parse_request("Fitbit Charge 6", None)) == {}
+    assert index.lookup(parse_request("Series 7", "45mm")) is index.lookup(parse_request("Series 7", "45mm"))
+    assert index.stats()["families"] == ["apple", "fitbit", "galaxy"]
+
+
+def make_mirror(nodes):
+    path = os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3')
+    store = MirrorStore(path, 'catalog', lease=60)
+    store.apply({n["id"]: (n["updatedAt"], n) for n in nodes})
+    store.release(store.claim(), synced_at=time.time(), seeded_at=time.time(), cursor="2026-01-01T00:00:00Z")
+    mirror = CatalogMirror(path, 'astrastraps.com', sync_interval=300, reseed_interval=86400, max_age=3600,
+                           ranker=ProductRanker())
+    mirror.refresh()
+    return mirror
+
+
+def node(number, title, variant_titles, price="29.99"):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": title, "handle": f"p{number}", "status": "ACTIVE",
+        "tags": [], "updatedAt": f"2026-01-{number:02d}T00:00:00Z",
+        "variants": [{"id": f"gid://shopify/ProductVariant/{number}{i}", "title": t, "price": price}
+                     for i, t in enumerate(variant_titles)]
+    }
+
+
+CATALOG = [
+    node(1, "Marley Leather Band", APPLE_SIZES),
+    node(2, "Nix Leather Galaxy Band", ["Brown"]),
+    node(3, "Slick Stainless Steel Band", APPLE_SIZES, price="49.99"),
+]
+
+
+def test_mirror_search_starts_from_compatible_products():
+    mirror = make_mirror(CATALOG)
+    products = mirror.search("leather", {"watch_model": "Series 9", "size": "45mm"}, 5)
+    assert [p["title"] for p in products] == ["Marley Leather Band"]
+    assert [v["title"] for v in products[0]["variants"]] == ["Black / 42/44/45/49mm"]
+    browse = mirror.search(None, {"watch_model": "Apple Watch SE", "size": "40mm"}, 5)
+    assert [p["title"] for p in browse] == ["Marley Leather Band", "Slick Stainless Steel Band"]
+    assert [p["title"] for p in mirror.search(None, {"watch_model": "Galaxy Watch 5"}, 5)] == ["Nix Leather Galaxy Band"]
+    assert mirror.search(None, {"watch_model": "Fitbit Versa"}, 5) is None  # nothing fits: ask Shopify
+    stats = mirror.stats()
+    assert stats["fallbacks"] == {"no_compatible": 1}
+    assert stats["compatibility"]["lookups"] == 4 and stats["compatibility"]["avg_lookup_ms"] is not None
+
+
+def test_unknown_models_fall_back_to_search_words():
+    mirror = make_mirror(CATALOG)
+    products = mirror.search(None, {"watch_model": "stainless"}, 5)
+    assert [p["title"] for p in products] == ["Slick Stainless Steel Band"]
+
+
+def test_live_search_still_sends_model_and_size_as_words():
+    query_text, filters, _ = main.build_product_search({"query_text": "leather band", "watch_model": "Series 7", "size": "45mm"})
+    assert query_text == "leather band" and filters == {"watch_model": "Series 7", "size": "45mm"}
+    q, variables = main.shopify_client._product_search_request(query_text, filters, 5)
+    assert q == variables["q"] == "leather band Series 7 45mm"
+
+
+if __name__ == "__main__":
+    test_parse_request_normalizes_models_and_sizes()
+    test_titles_list_several_models_and_sizes()
+    test_index_maps_requests_to_products_and_variants()
+    test_mirror_search_starts_from_compatible_products()
+    test_unknown_models_fall_back_to_search_words()
+    test_live_search_still_sends_model_and_size_as_words()
+    print("✅ All compatibility index tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Offline tests for per-call deadline budgets and adaptive upstream timeouts.
+"""
+
+import os
+import asyncio
+import time
+
+import httpx
+import requests
+
+import config
+import main
+import async_bridge
+from deadline import (
+    LatencyTracker, start_deadline, reset_deadline, remaining_budget, cap_to_budget, resolve_budget
+)
+
+
+def test_resolve_budget():
+    assert resolve_budget(None, 10, 28) == 10
+    assert resolve_budget("abc", 10, 28) == 10
+    assert resolve_budget("-1", 10, 28) == 10
+    assert resolve_budget("4.5", 10, 28) == 4.5
+    assert resolve_budget("120", 10, 28) == 28
+
+
+def test_cap_to_budget():
+    assert cap_to_budget(5) == 5
+    assert remaining_budget() is None
+    token = start_deadline(2)
+    try:
+        assert cap_to_budget(5) <= 2
+        assert cap_to_budget(5, reserve=1.5) <= 0.5
+        assert cap_to_budget(5, reserve=3) == 0
+        assert cap_to_budget(0.1) == 0.1
+    finally:
+        reset_deadline(token)
+    assert remaining_budget() is None
+
+
+def test_latency_tracker_adapts_timeout():
+    tracker = LatencyTracker("test", window=50, percentile=0.99, multiplier=2, minimum=0.5, min_samples=10)
+    assert tracker.attempt_timeout(30) == 30
+    for _ in range(60):
+        tracker.record(0.4)
+    assert tracker.attempt_timeout(30) == 0.8
+    assert tracker.stats()["samples"] == 50
+    token = start_deadline(0.3)
+    try:
+        assert tracker.attempt_timeout(30) <= 0.3
+    finally:
+        reset_deadline(token)
+
+
+def test_flask_returns_504_once_budget_is_spent():
+    client = main.reamaze_client
+    calls = []
+
+    def slow_request(method, url, **kwargs):
+        calls.append(kwargs["timeout"])
+        time.sleep(kwargs["timeout"])
+        raise requests.exceptions.Timeout("read timed out")
+
+    client.http.request = slow_request
+    try:
+        started = time.monotonic()
+        response = main.app.test_client().post(
+            '/search-kb', json={"query_term": "band size"}, headers={"X-Request-Timeout": "1"}
+        )
+        elapsed = time.monotonic() - started
+    finally:
+        del client.http.request
+    assert response.status_code == 504
+    assert response.get_json()["success"] is False
+    assert elapsed < 1.5
+    assert calls and all(timeout <= 1 for timeout in calls)
+
+
+def test_asgi_handler_is_cut_off_at_deadline():
+    async def stuck(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    async def call():
+        transport = httpx.ASGITransport(app=async_bridge.asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bridge") as http:
+            return await http.post('/search-kb', json={"query_term": "band"}, headers={"X-Request-Timeout": "0.3"})
+
+    async_bridge.reamaze_client._make_request = stuck
+    try:
+        started = time.monotonic()
+        response = asyncio.run(call())
+        elapsed = time.monotonic() - started
+    finally:
+        del async_bridge.reamaze_client._make_request
+    assert response.status_code == 504
+    assert elapsed < 1
+
+
+def test_per_tool_overrides_from_the_environment():
+    os.environ['TOOL_DEADLINES_OVERRIDE'] = "/track-order=12, /search-kb=6"
+    try:
+        parsed = config._parse_overrides('TOOL_DEADLINES_OVERRIDE', config.Config.TOOL_DEADLINES)
+    finally:
+        del os.environ['TOOL_DEADLINES_OVERRIDE']
+    assert parsed["/track-order"] == 12.0 and parsed["/search-kb"] == 6.0
+    assert parsed["/create-ticket"] == config.Config.TOOL_DEADLINES["/create-ticket"]
+    # Parsing leaves nothing behind for app.config.from_object to pick up
+    assert not [name for name in vars(config.Config) if name.startswith('_') and not name.startswith('__')]
+
+
+if __name__ == "__main__":
+    test_resolve_budget()
+    test_cap_to_budget()
+    test_latency_tracker_adapts_timeout()
+    test_flask_returns_504_once_budget_is_spent()
+    test_asgi_handler_is_cut_off_at_deadline()
+    test_per_tool_overrides_from_the_environment()
+    print("✅ All deadline tests passed")
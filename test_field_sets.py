@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Offline tests for caller-selected field sets on /track-order and /recommend-products.
+"""
+
+import main
+from field_sets import ORDER_FIELD_SETS, parse_field_set, order_queries, product_search_query
+from shopify_standin import ShopifyStandIn
+from shopify_throttle import estimate_query_cost
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+
+def make_order(number):
+    return {
+        "id": f"gid://shopify/Order/{number}", "name": f"#{number}", "processedAt": "2026-01-01T00:00:00Z",
+        "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+        "customer": {"displayName": "Jane Smith", "email": "jane@example.com"},
+        "shippingAddress": {"name": "Jane Smith", "city": "Austin", "country": "US", "zip": "78701"},
+        "fulfillments": [{"createdAt": "2026-01-02T10:00:00Z", "status": "SUCCESS",
+                          "trackingInfo": [{"number": "1Z999", "url": "https://ups.example/track", "company": "UPS"}]}],
+        "lineItems": {"edges": [{"node": {
+            "name": f"Leather Band / {i}", "quantity": 1, "sku": f"AS-LE-45-{i}",
+            "variant": {"id": f"gid://shopify/ProductVariant/{i}", "title": "Black / 45mm", "image": {"url": "https://cdn.test/band.jpg"},
+                        "product": {"id": "gid://shopify/Product/1", "title": "Leather Band", "handle": "leather-band",
+                                    "onlineStoreUrl": "https://astrastraps.com/products/leather-band"}}
+        }} for i in range(4)]}
+    }
+
+
+def make_product(number):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": f"Leather Band {number}", "handle": f"leather-band-{number}",
+        "onlineStoreUrl": f"https://astrastraps.com/products/leather-band-{number}", "featuredImage": {"url": f"https://cdn.test/{number}.jpg"},
+        "createdAt": "2025-06-01T00:00:00Z", "updatedAt": "2026-01-01T00:00:00Z",
+        "variants": {"edges": [
+            {"node": {"id": f"gid://shopify/ProductVariant/{number}{size}", "title": f"Black / {size}mm", "sku": f"AS-LE-{number}-{size}",
+                      "price": "39.99", "compareAtPrice": None, "image": {"url": f"https://cdn.test/{number}-{size}.jpg"}}}
+            for size in (41, 45)
+        ]}
+    }
+
+
+def make_client(standin):
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    return client
+
+
+def test_parse_field_set():
+    choices = tuple(ORDER_FIELD_SETS)
+    assert parse_field_set(None, choices, 'status') == (None, [])
+    assert parse_field_set("all", choices, 'status') == (None, [])
+    assert parse_field_set("Tracking, items", choices, 'status') == (frozenset({"status", "tracking", "items"}), [])
+    assert parse_field_set(["tracking", "invoice"], choices, 'status') == (frozenset({"status", "tracking"}), ["invoice"])
+    # Every part named is the same as none: the default queries are shared
+    assert parse_field_set(list(choices), choices, 'status') == (None, [])
+
+
+def test_queries_are_compiled_once_per_field_set():
+    status = frozenset({"status"})
+    assert order_queries(status) is order_queries(frozenset({"status"}))
+    assert main.ShopifyAPIClient.ORDER_BY_ID_GQL == order_queries(None)['by_id']
+    assert 'lineItems' not in order_queries(status)['by_id']
+    full = estimate_query_cost(order_queries()['by_id'], {})
+    assert estimate_query_cost(order_queries(status)['by_id'], {}) == 1 < full
+    # Filters and ranking still get variant prices whatever the caller asks for
+    summary = product_search_query(frozenset({"summary"}))
+    assert 'price' in summary and 'sku' not in summary and 'image {' not in summary
+    assert product_search_query() == main.ShopifyAPIClient.PRODUCT_SEARCH_GQL
+
+
+def test_status_only_track_order_skips_line_items():
+    standin = ShopifyStandIn(orders=[make_order(1001)], restore_rate=2000)
+    original_client, original_index = main.shopify_client, main.app.config['ORDER_INDEX_ENABLED']
+    main.shopify_client = make_client(standin)
+    main.app.config['ORDER_INDEX_ENABLED'] = False
+    try:
+        http = main.app.test_client()
+        full = http.post('/track-order', json={"order_number": "1001"})
+        full_bytes = standin.bytes_sent
+        standin.queries.clear()
+        response = http.post('/track-order', json={"order_number": "1001", "fields": "status"})
+        order = response.get_json()["order"]
+        assert response.status_code == 200 and order["fulfillment_status"] == "FULFILLED"
+        assert not {"items", "customer", "shipping_address", "fulfillments"} & set(order)
+        assert set(full.get_json()["order"]) - set(order) == {"items", "customer", "shipping_address", "fulfillments"}
+        assert all('lineItems' not in query for query, _ in standin.queries)
+        assert standin.bytes_sent - full_bytes < full_bytes / 2
+
+        tracking = http.post('/track-order', json={"order_number": "1001", "fields": ["tracking"]}).get_json()["order"]
+        assert tracking["fulfillments"][0]["tracking"][0]["company"] == "UPS" and "items" not in tracking
+        bad = http.post('/track-order', json={"order_number": "1001", "fields": "status, invoice"})
+        assert bad.status_code == 400 and "invoice" in bad.get_json()["error"]
+    finally:
+        main.shopify_client = original_client
+        main.app.config['ORDER_INDEX_ENABLED'] = original_index
+
+
+def test_product_field_sets_trim_the_answer():
+    standin = ShopifyStandIn(products=[make_product(n) for n in range(3)], restore_rate=2000)
+    original_client, original_mirror = main.shopify_client, main.app.config['CATALOG_MIRROR_ENABLED']
+    main.shopify_client = make_client(standin)
+    main.app.config['CATALOG_MIRROR_ENABLED'] = False
+    try:
+        http = main.app.test_client()
+        summary = http.post('/recommend-products', json={"query_text": "leather band", "fields": "summary"}).get_json()
+        assert summary["count"] == 3 and all("variants" not in p and "image" not in p for p in summary["products"])
+        variants = http.post('/recommend-products', json={"query_text": "leather band", "fields": ["variants"]}).get_json()
+        variant = variants["products"][0]["variants"][0]
+        assert variant["sku"].startswith("AS-LE-") and "image" not in variant
+        full = http.post('/recommend-products', json={"query_text": "leather band"}).get_json()
+        assert full["products"][0]["variants"][0]["image"].endswith(".jpg")
+        assert http.post('/recommend-products', json={"fields": "prices"}).status_code == 400
+    finally:
+        main.shopify_client = original_client
+        main.app.config['CATALOG_MIRROR_ENABLED'] = original_mirror
+
+
+if __name__ == "__main__":
+    test_parse_field_set()
+    test_queries_are_compiled_once_per_field_set()
+    test_status_only_track_order_skips_line_items()
+    test_product_field_sets_trim_the_answer()
+    print("✅ All field set tests passed")
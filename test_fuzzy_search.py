@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Offline tests for typo-tolerant product retrieval (character n-gram TF-IDF).
+"""
+
+import os
+import time
+import tempfile
+
+from catalog_mirror import CatalogMirror
+from fuzzy_search import NgramIndex, ngrams, expand_synonyms
+from mirror_store import MirrorStore
+from product_ranking import ProductRanker
+
+TITLES = ["Neptuse Silicone Band", "Oscen Silicone Sports Band", "Lea Milanese Slim Band",
+          "London Leather Band", "Nix Nylon Band"]
+
+
+def make_index(titles=TITLES, previous=None, versions=None):
+    versions = versions or {}
+    return NgramIndex([(title, versions.get(title, 1), title, '') for title in titles], previous=previous)
+
+
+def test_ngrams_and_synonyms():
+    assert ngrams("Nix!")[:3] == [" ni", "nix", "ix "]
+    assert ngrams("the") == []  # stopwords carry no signal
+    assert expand_synonyms("Rubber mesh strap") == "rubber mesh strap silicone milanese band"
+
+
+def test_misspelled_names_find_the_product():
+    index = make_index()
+    assert TITLES[index.search("Neptune band", 5)[0][0]] == "Neptuse Silicone Band"
+    assert TITLES[index.search("oscen", 5)[0][0]] == "Oscen Silicone Sports Band"
+    assert TITLES[index.search("millanese", 5)[0][0]] == "Lea Milanese Slim Band"
+    assert TITLES[index.search("lether london", 5)[0][0]] == "London Leather Band"
+    assert TITLES[index.search("mesh", 5)[0][0]] == "Lea Milanese Slim Band"  # via the synonym table
+    assert index.search("xyzzy", 5) == []
+    hits = index.search("silicone band", 5, candidates={0, 3})
+    assert {doc for doc, _ in hits} <= {0, 3} and hits[0][1] >= hits[-1][1]
+
+
+def test_rebuild_reuses_unchanged_products():
+    index = make_index()
+    titles = TITLES[:4] + ["Nix Nylon Sports Band"]
+    rebuilt = make_index(titles, previous=index, versions={"Nix Nylon Sports Band": 2})
+    assert rebuilt.reused == 4 and rebuilt.stats()["documents"] == 5
+    assert titles[rebuilt.search("nix sport", 5)[0][0]] == "Nix Nylon Sports Band"
+    # Same answers as a from-scratch build
+    fresh = make_index(titles)
+    for query in ("neptune", "nylon sport", "milanese"):
+        assert [doc for doc, _ in rebuilt.search(query, 5)] == [doc for doc, _ in fresh.search(query, 5)]
+
+
+def test_mirror_answers_misspelled_queries():
+    path = os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3')
+    store = MirrorStore(path, 'catalog', lease=60)
+    nodes = [{
+        "id": f"gid://shopify/Product/{n}", "title": title, "handle": f"p{n}", "status": "ACTIVE", "tags": [],
+        "updatedAt": f"2026-01-{n + 1:02d}T00:00:00Z",
+        "variants": [{"id": f"gid://shopify/ProductVariant/{n}", "title": "Black", "price": "29.99"}]
+    } for n, title in enumerate(TITLES)]
+    store.apply({n["id"]: (n["updatedAt"], n) for n in nodes})
+    store.release(store.claim(), synced_at=time.time(), seeded_at=time.time(), cursor="2026-01-01T00:00:00Z")
+    mirror = CatalogMirror(path, 'astrastraps.com', sync_interval=300, reseed_interval=86400, max_age=3600,
+                           ranker=ProductRanker())
+    mirror.refresh()
+    assert [p["title"] for p in mirror.search("Neptune", {}, 5)] == ["Neptuse Silicone Band"]
+    assert mirror.search("Nix Nylon", {}, 1)[0]["title"] == "Nix Nylon Band"  # known words stay on BM25
+    stats = mirror.stats()["fuzzy"]
+    assert stats["searches"] == 1 and stats["documents"] == 5
+
+    # One product changes: the next snapshot re-tokenizes only that one
+    changed = dict(nodes[0], title="Neptuse Silicone Sports Band", updatedAt="2026-02-01T00:00:00Z")
+    store.apply({changed["id"]: (changed["updatedAt"], changed)})
+    mirror.refresh()
+    assert mirror.stats()["fuzzy"]["reused_documents"] == 4
+
+
+if __name__ == "__main__":
+    test_ngrams_and_synonyms()
+    test_misspelled_names_find_the_product()
+    test_rebuild_reuses_unchanged_products()
+    test_mirror_answers_misspelled_queries()
+    print("✅ All fuzzy product search tests passed")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Offline tests for hedged Shopify reads.
+"""
+
+import asyncio
+import threading
+import time
+
+from deadline import LatencyTracker
+from hedging import Hedger
+
+
+def warmed_tracker(latency=0.02):
+    tracker = LatencyTracker("test", min_samples=5)
+    for _ in range(10):
+        tracker.record(latency)
+    return tracker
+
+
+def make_hedger(**kwargs):
+    return Hedger("test", warmed_tracker(), min_delay=0.01, budget_ratio=1.0, **kwargs)
+
+
+def test_disabled_or_cold_calls_directly():
+    calls = []
+    hedger = Hedger("test", LatencyTracker("cold"), budget_ratio=1.0)
+    assert hedger.run(lambda: calls.append(threading.current_thread()) or "ok") == "ok"
+    assert calls == [threading.current_thread()]
+    assert Hedger("test", warmed_tracker(), enabled=False).hedge_delay() is None
+
+
+def test_slow_primary_is_beaten_by_hedge():
+    hedger = make_hedger()
+    attempts = []
+
+    def read():
+        attempts.append(1)
+        time.sleep(0.5 if len(attempts) == 1 else 0.01)
+        return {"orders": len(attempts)}
+
+    started = time.monotonic()
+    result = hedger.run(read)
+    assert time.monotonic() - started < 0.3
+    assert result == {"orders": 2}
+    stats = hedger.stats()
+    assert stats["hedges_fired"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_fast_primary_never_hedges():
+    hedger = make_hedger()
+    assert hedger.run(lambda: {"ok": True}) == {"ok": True}
+    assert hedger.stats()["hedges_fired"] == 0
+
+
+def test_budget_caps_hedges():
+    hedger = Hedger("test", warmed_tracker(), min_delay=0.01, budget_ratio=0.5)
+
+    def slow():
+        time.sleep(0.1)
+        return {"ok": True}
+
+    for _ in range(6):
+        hedger.run(slow)
+    stats = hedger.stats()
+    assert stats["hedges_fired"] == 3
+    assert stats["skipped_no_budget"] == 3
+
+
+def test_async_loser_is_cancelled():
+    hedger = make_hedger()
+    cancelled = []
+    attempts = []
+
+    async def read():
+        attempts.append(1)
+        try:
+            await asyncio.sleep(0.5 if len(attempts) == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(len(attempts))
+            raise
+        return {"ok": True}
+
+    async def run():
+        result = await hedger.arun(read)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == {"ok": True}
+    assert cancelled
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_race_starts_fallback_for_slow_or_missing_primary():
+    hedger = make_hedger()
+    fallbacks = []
+
+    def fallback():
+        fallbacks.append(1)
+        return {"found": "scan"}
+
+    # Answered within the head start: the fallback never runs
+    assert hedger.race(lambda: {"found": "search"}, fallback, 0.05) == {"found": "search"}
+    # Slow primary: the fallback starts after the head start and wins
+    started = time.monotonic()
+    assert hedger.race(lambda: time.sleep(0.5), fallback, 0.02) == {"found": "scan"}
+    assert time.monotonic() - started < 0.3
+    # Sequential (no head start): a primary error is returned without starting the fallback
+    assert hedger.race(lambda: {"error": "busy", "status_code": 429}, fallback, None)["status_code"] == 429
+    assert hedger.race(lambda: None, lambda: None, None) is None
+    assert len(fallbacks) == 1
+    stats = hedger.stats()
+    assert stats["races"] == 4 and stats["race_fallbacks"] == 2 and stats["race_fallback_wins"] == 1
+
+
+def test_async_race_cancels_the_losing_stage():
+    hedger = make_hedger()
+    cancelled = []
+
+    async def search():
+        try:
+            await asyncio.sleep(0.5)
+        except asyncio.CancelledError:
+            cancelled.append("search")
+            raise
+
+    async def scan():
+        await asyncio.sleep(0.01)
+        return {"found": "scan"}
+
+    async def run():
+        result = await hedger.arace(search, scan, 0.02)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == {"found": "scan"}
+    assert cancelled == ["search"]
+    assert hedger.stats()["race_fallback_wins"] == 1
+
+
+if __name__ == "__main__":
+    test_disabled_or_cold_calls_directly()
+    test_slow_primary_is_beaten_by_hedge()
+    test_fast_primary_never_hedges()
+    test_budget_caps_hedges()
+    test_async_loser_is_cancelled()
+    test_race_starts_fallback_for_slow_or_missing_primary()
+    test_async_race_cancels_the_losing_stage()
+    print("✅ All hedging tests passed")
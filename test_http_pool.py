@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Offline test for the pooled upstream sessions.
+
+Starts a local keep-alive HTTP server and checks that repeated calls through a
+PooledSession reuse one connection instead of handshaking every time.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_pool import PooledSession
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_connections_are_reused():
+    server = start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        pooled = PooledSession("local", pool_maxsize=2, keepalive_idle=30)
+
+        assert pooled.warm(url)
+        for _ in range(5):
+            assert pooled.request("GET", f"{url}/ping", timeout=5).json() == {"ok": True}
+
+        host_stats = list(pooled.stats()["hosts"].values())[0]
+        print(f"Pool stats: {host_stats}")
+        assert host_stats["requests"] == 6
+        assert host_stats["new_connections"] == 1
+        assert host_stats["reused"] == 5
+    finally:
+        server.shutdown()
+
+
+def test_stats_empty_before_first_request():
+    pooled = PooledSession("unused")
+    assert pooled.stats()["hosts"] == {}
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_stats_empty_before_first_request()
+    print("✅ All pool tests passed")
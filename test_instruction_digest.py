@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Offline tests for /get-instructions article digests and token budgets.
+"""
+
+import main
+from instruction_digest import DigestCache, digest_article, fit_digest, estimate_tokens
+
+ARTICLE = {
+    "id": 42,
+    "slug": "install-band",
+    "title": "How to install your band",
+    "url": "https://help.example.com/install-band",
+    "body": (
+        "<h2>Install your band</h2>"
+        "<p>This takes about two minutes. Watch the <a href=\"https://help.example.com/video\">video guide</a>.</p>"
+        "<ol><li>Turn the watch over.</li><li>Press the <b>band release</b> button.</li><li>Slide the new band in until it clicks.</li></ol>"
+        "<ul><li>Works with every Series and Ultra case.</li></ul>"
+        "<style>.x{color:red}</style>"
+        "<p>" + "Questions? Our team is happy to help with sizing and fit. " * 20 + "</p>"
+    )
+}
+
+
+def test_digest_extracts_steps_links_and_text():
+    digest = digest_article(ARTICLE["body"])
+    assert digest["steps"] == ["Turn the watch over.", "Press the band release button.", "Slide the new band in until it clicks."]
+    assert digest["links"] == [{"text": "video guide", "url": "https://help.example.com/video"}]
+    assert digest["paragraphs"][:3] == [
+        "Install your band",
+        "This takes about two minutes. Watch the video guide.",
+        "- Works with every Series and Ultra case."
+    ]
+    assert not any("color" in p for p in digest["paragraphs"])
+
+
+def test_numbered_lines_become_steps_without_a_list():
+    digest = digest_article("Before you start\n1. Unbuckle the band\n2) Remove it\nStep 3: Fit the new one")
+    assert digest["steps"] == ["Unbuckle the band", "Remove it", "Fit the new one"]
+    assert digest["paragraphs"] == ["Before you start"]
+
+
+def test_fit_keeps_steps_first_and_cuts_text():
+    digest = digest_article(ARTICLE["body"])
+    fitted, truncated = fit_digest(digest, 90)
+    assert truncated
+    assert fitted["steps"] == digest["steps"] and fitted["links"] == digest["links"]
+    assert fitted["paragraphs"][-1].endswith("…")
+    used = sum(map(estimate_tokens, fitted["steps"] + fitted["paragraphs"])) + sum(
+        estimate_tokens(link["text"] + link["url"]) for link in fitted["links"])
+    assert used <= 92
+
+    fitted, truncated = fit_digest(digest, 10000)
+    assert not truncated and fitted == digest
+
+
+def test_cache_converts_each_article_version_once():
+    cache = DigestCache(max_entries=10)
+    first = cache.get(42, ARTICLE["body"])
+    assert cache.get(42, ARTICLE["body"]) is first
+    cache.get(42, ARTICLE["body"] + "<p>Updated.</p>")
+    assert cache.stats()["conversions"] == 2 and cache.stats()["hits"] == 1
+
+
+def test_endpoint_returns_budgeted_digest():
+    main.reamaze_client.get_article = lambda article_id: dict(ARTICLE)
+    try:
+        client = main.app.test_client()
+        digest = client.post('/get-instructions', json={"article_id": 42, "max_tokens": 80}).get_json()
+        raw = client.post('/get-instructions', json={"article_id": 42, "format": "raw"}).get_json()
+    finally:
+        del main.reamaze_client.get_article
+    assert digest["instructions"]["steps"][0] == "Turn the watch over."
+    assert digest["instructions"]["truncated"] is True
+    assert "<" not in digest["instructions"]["content"]
+    payload = digest["payload"]
+    assert payload["digest_bytes"] < payload["original_bytes"] / 2
+    assert payload["digest_tokens"] < payload["original_tokens"]
+    assert raw["instructions"]["content"] == ARTICLE["body"] and "payload" not in raw
+
+
+if __name__ == "__main__":
+    test_digest_extracts_steps_links_and_text()
+    test_numbered_lines_become_steps_without_a_list()
+    test_fit_keeps_steps_first_and_cuts_text()
+    test_cache_converts_each_article_version_once()
+    test_endpoint_returns_budgeted_digest()
+    print("✅ All instruction digest tests passed")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the local knowledge-base mirror and its BM25 index.
+"""
+
+import os
+import tempfile
+
+import main
+from kb_mirror import BM25Index, KnowledgeBaseMirror, tokenize
+
+ARTICLES = [
+    {"id": 1, "slug": "band-sizing", "title": "Band sizing guide", "updated_at": "2025-01-01T00:00:00Z",
+     "body": "<p>Measure your wrist to find the right band size. Sizes run from 38mm to 49mm.</p>", "url": "u1"},
+    {"id": 2, "slug": "returns", "title": "Returns and exchanges", "updated_at": "2025-01-01T00:00:00Z",
+     "body": "<p>Items can be returned within 30 days. Exchanges for a different size are free.</p>", "url": "u2"},
+    {"id": 3, "slug": "shipping", "title": "Shipping times", "updated_at": "2025-01-01T00:00:00Z",
+     "body": "<p>Orders ship within 2 business days &amp; arrive in 5-7 days.</p>", "url": "u3"},
+]
+
+
+def make_mirror(**kwargs):
+    kwargs.setdefault('sync_interval', 600)
+    kwargs.setdefault('max_age', 3600)
+    return KnowledgeBaseMirror(os.path.join(tempfile.mkdtemp(), 'kb.sqlite3'), **kwargs)
+
+
+def pages_of(articles, page_size=2):
+    """fetch_page(page) over `articles`, shaped like Reamaze's paginated article list; records pages asked for"""
+    page_count = max(1, -(-len(articles) // page_size))
+    requested = []
+
+    def fetch_page(page):
+        requested.append(page)
+        start = (page - 1) * page_size
+        return {"articles": articles[start:start + page_size], "page_count": page_count, "total_count": len(articles)}
+
+    fetch_page.requested = requested
+    return fetch_page
+
+
+def test_tokenize_strips_html_stopwords_and_suffixes():
+    assert tokenize("<p>How do I measure the sizes?</p>") == ["measur", "siz"]
+    assert tokenize("Sizing") == tokenize("size") == ["siz"]
+    assert tokenize("glasses &amp; glass") == ["glass", "glass"]
+
+
+def test_bm25_prefers_title_and_rare_terms():
+    index = BM25Index([(a["title"], a["body"]) for a in ARTICLES])
+    hits = index.search("what size band should I get", 3)
+    assert hits[0][0] == 0
+    assert [doc for doc, _ in index.search("exchange", 3)] == [1]
+    assert index.search("warranty", 3) == []
+
+
+def test_sync_is_incremental_and_bumps_version():
+    mirror = make_mirror()
+    assert mirror.sync(pages_of(ARTICLES), force=True)
+    mirror.refresh()
+    assert mirror.stats()["articles"] == 3 and mirror.stats()["version"] == 1
+    assert mirror.articles_updated == 3
+
+    # Nothing changed: no writes, same version, no index rebuild
+    mirror.sync(pages_of(ARTICLES), force=True)
+    assert mirror.articles_updated == 3 and not mirror.refresh()
+
+    edited = dict(ARTICLES[2], title="Shipping and delivery times", updated_at="2025-02-01T00:00:00Z")
+    mirror.sync(pages_of([ARTICLES[0], edited]), force=True)
+    assert mirror.refresh()
+    assert mirror.articles_updated == 4 and mirror.articles_removed == 1
+    assert mirror.get("returns") is None
+    assert mirror.get(3)["title"] == "Shipping and delivery times"
+
+
+def test_failed_sync_keeps_the_mirror():
+    mirror = make_mirror()
+    mirror.sync(pages_of(ARTICLES), force=True)
+    mirror.refresh()
+
+    def broken(page):
+        return {"error": "Service unavailable", "status_code": 503}
+
+    assert not mirror.sync(broken, force=True)
+    mirror.refresh()
+    assert mirror.stats()["articles"] == 3 and mirror.stats()["sync_failures"] == 1
+    assert mirror.search("returns", 1)["articles"][0]["slug"] == "returns"
+
+
+def test_sync_lease_runs_one_sync_per_interval():
+    mirror = make_mirror(sync_interval=600)
+    fetch_page = pages_of(ARTICLES)
+    assert mirror.sync(fetch_page)
+    assert not mirror.sync(fetch_page)
+    assert fetch_page.requested == [1, 2]
+
+
+def test_search_falls_back_until_ready():
+    mirror = make_mirror(max_age=3600)
+    assert mirror.search("band size", 5) is None
+    mirror.sync(pages_of(ARTICLES), force=True)
+    mirror.refresh()
+    result = mirror.search("band size", 5)
+    assert result["articles"][0]["slug"] == "band-sizing" and result["total_count"] == 3
+    assert mirror.search("warranty", 5) is None
+    assert mirror.stats()["fallbacks"] == {"not_ready": 1, "no_hits": 1}
+
+
+def test_views_answer_from_the_mirror():
+    mirror = make_mirror()
+    mirror.sync(pages_of(ARTICLES), force=True)
+    mirror.refresh()
+
+    def live(*args, **kwargs):
+        raise AssertionError("live Reamaze search should not be called")
+
+    original_mirror = main.kb_mirror
+    main.kb_mirror = mirror
+    main.reamaze_client.search_articles = live
+    main.reamaze_client.get_article = live
+    try:
+        client = main.app.test_client()
+        search = client.post('/search-kb', json={"query_term": "how long does shipping take", "max_results": 2}).get_json()
+        topic = client.post('/get-instructions', json={"topic": "exchange for another size"}).get_json()
+        by_slug = client.post('/get-instructions', json={"article_id": "band-sizing"}).get_json()
+    finally:
+        main.kb_mirror = original_mirror
+        del main.reamaze_client.search_articles
+        del main.reamaze_client.get_article
+    assert search["articles"][0]["id"] == 3 and search["total_articles_in_kb"] == 3
+    assert topic["instructions"]["slug"] == "returns"
+    assert by_slug["instructions"]["id"] == 1
+
+
+if __name__ == "__main__":
+    test_tokenize_strips_html_stopwords_and_suffixes()
+    test_bm25_prefers_title_and_rare_terms()
+    test_sync_is_incremental_and_bumps_version()
+    test_failed_sync_keeps_the_mirror()
+    test_sync_lease_runs_one_sync_per_interval()
+    test_search_falls_back_until_ready()
+    test_views_answer_from_the_mirror()
+    print("✅ All KB mirror tests passed")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the local order-name index, synced from the Shopify stand-in.
+"""
+
+import os
+import time
+import tempfile
+
+import main
+from order_index import OrderIndex, order_key, normalize_phone, normalize_zip
+from shopify_standin import ShopifyStandIn
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+
+def make_order(number, updated_at=None, email="jane@example.com", phone=None, zip_code="10001", tracking=()):
+    order = {
+        "id": f"gid://shopify/Order/{number}", "name": f"#{number}",
+        "processedAt": f"2026-01-01T{number // 3600:02d}:{number // 60 % 60:02d}:{number % 60:02d}Z",
+        "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+        "customer": {"displayName": "Jane", "email": email, "phone": phone}, "shippingAddress": {"zip": zip_code},
+        "fulfillments": [{"trackingInfo": [{"number": number}]} for number in tracking], "lineItems": {"edges": []}
+    }
+    if updated_at:
+        order["updatedAt"] = updated_at
+    return order
+
+
+def make_setup(orders, unindexed=()):
+    standin = ShopifyStandIn(orders=orders, restore_rate=2000, unindexed=unindexed)
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    index = OrderIndex(os.path.join(tempfile.mkdtemp(), 'orders.sqlite3'), sync_interval=60, backfill_days=3650, max_age=900)
+    return standin, client, index
+
+
+def sent(standin, query):
+    return [v for q, v in standin.queries if q == query]
+
+
+def test_backfill_pages_through_every_order():
+    standin, client, index = make_setup([make_order(n) for n in range(1000, 1300)])
+    assert not index.ready()
+    assert index.sync(client, force=True) and index.refresh()
+    assert index.ready() and index.stats()["orders"] == 300
+    assert [v["after"] for v in sent(standin, client.ORDERS_UPDATED_GQL)] == [None, "150"]
+    assert index.lookup("#1250")["id"] == "gid://shopify/Order/1250"
+    assert index.lookup(" 1001 ")["fulfillment_status"] == "FULFILLED"
+    assert index.lookup("9999") is None
+    assert order_key("#AB1001") == "ab1001"
+    assert index.stats()["hit_rate"] == 0.667
+
+
+def test_track_order_hydrates_only_the_indexed_order():
+    # The oldest order is past the 250-order scan window and missing from Shopify's search index
+    standin, client, index = make_setup([make_order(n) for n in range(1000, 1300)], unindexed={"#1000"})
+    index.sync(client, force=True)
+    index.refresh()
+    original = main.order_index
+    main.order_index = index
+    try:
+        standin.queries.clear()
+        assert client.get_order_by_number("1000")["name"] == "#1000"
+        assert [q for q, _ in standin.queries] == [client.ORDER_BY_ID_GQL]
+        # Unknown to the index: a name search still runs (brand-new orders), the scan does not
+        standin.queries.clear()
+        assert client.get_order_by_number("5000") is None
+        assert [q for q, _ in standin.queries] == [client.ORDER_NAME_SEARCH_GQL]
+    finally:
+        main.order_index = original
+
+
+def test_incremental_sync_picks_up_changes_and_measures_lag():
+    standin, client, index = make_setup([make_order(n) for n in range(1000, 1010)])
+    index.sync(client, force=True)
+    index.refresh()
+    changed_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - 30))
+    standin.orders.append(make_order(1010, updated_at=changed_at))
+    standin.orders[0] = dict(standin.orders[0], updatedAt=changed_at, displayFulfillmentStatus="UNFULFILLED")
+    standin.queries.clear()
+    assert index.sync(client, force=True)
+    # Only orders changed since the newest one seen are fetched
+    assert sent(standin, client.ORDERS_UPDATED_GQL)[0]["q"] == "updated_at:>='2026-01-01T00:16:49Z'"
+    assert index.stats()["orders_updated"] == 12
+
+    other = OrderIndex(index.store.db_path, sync_interval=60, backfill_days=3650, max_age=900)
+    other.refresh()
+    assert index.refresh()
+    assert index.lookup("1010")["id"] == other.lookup("1010")["id"] == "gid://shopify/Order/1010"
+    assert index.lookup("1000")["fulfillment_status"] == "UNFULFILLED"
+    lag = index.stats()["freshness_lag_seconds"]
+    assert 25 <= lag["avg"] <= lag["max"] < 120
+
+
+def test_identifier_lookup_finds_orders_without_a_number():
+    orders = [
+        make_order(1000, email="Sam@Example.com", phone="+1 (555) 010-2000", zip_code="94107-1234"),
+        make_order(1001, email="sam@example.com", zip_code="94107", tracking=["1Z 999 AA1 01 2345 6784"]),
+        make_order(1002, email="other@example.com", zip_code="94107")
+    ]
+    standin, client, index = make_setup(orders)
+    index.sync(client, force=True)
+    index.refresh()
+    assert [s["name"] for s in index.find({"email": " SAM@example.com"})] == ["#1001", "#1000"]
+    assert [s["name"] for s in index.find({"phone": "555.010.2000"})] == ["#1000"]
+    assert [s["name"] for s in index.find({"tracking_number": "1z999aa10123456784"})] == ["#1001"]
+    assert [s["name"] for s in index.find({"email": "sam@example.com", "zip": "94107"})] == ["#1001", "#1000"]
+    assert index.find({"email": "other@example.com", "zip": "10001"}) == []
+    assert index.find({"phone": "12"}) == []
+    assert normalize_phone("+44 20 7946 0958") == "2079460958" and normalize_zip("sw1a 1aa") == "SW1A1AA"
+
+    # A changed email leaves the old one's index
+    changed_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    standin.orders[2] = make_order(1002, updated_at=changed_at, email="new@example.com", zip_code="94107")
+    index.sync(client, force=True)
+    index.refresh()
+    assert index.find({"email": "other@example.com"}) == []
+    assert [s["name"] for s in index.find({"email": "new@example.com"})] == ["#1002"]
+    assert index.stats()["identifiers"]["email"] == 2
+
+    original_index, original_client = main.order_index, main.shopify_client
+    main.order_index, main.shopify_client = index, client
+    try:
+        http = main.app.test_client()
+        body = http.post('/track-order', json={"email": "sam@example.com"}).get_json()
+        assert body["order"]["name"] == "#1001" and body["matched_by"] == ["email"]
+        assert [o["name"] for o in body["other_orders"]] == ["#1000"]
+        assert http.post('/track-order', json={"zip": "94107"}).status_code == 400
+        assert http.post('/track-order', json={}).status_code == 400
+        missing = http.post('/track-order', json={"tracking_number": "NOSUCHNUMBER"})
+        assert missing.status_code == 404 and missing.get_json()["error"] == "No order found for that tracking number"
+    finally:
+        main.order_index, main.shopify_client = original_index, original_client
+    assert index.stats()["identifier_hit_rate"] == 0.6
+
+
+def test_track_orders_resolves_a_batch_in_one_query():
+    standin, client, index = make_setup([make_order(n) for n in range(1000, 1010)])
+    index.sync(client, force=True)
+    index.refresh()
+    standin.orders.append(make_order(1010))  # placed after the last sync: only the name search finds it
+    original_index, original_client = main.order_index, main.shopify_client
+    main.order_index, main.shopify_client = index, client
+    try:
+        http = main.app.test_client()
+        standin.queries.clear()
+        response = http.post('/track-orders', json={"order_numbers": "Orders #1003, #1010 and 4242, also 1003"})
+        body = response.get_json()
+        assert response.status_code == 200 and body["count"] == 2
+        assert [o["name"] for o in body["orders"]] == ["#1003", "#1010"] and body["not_found"] == ["4242"]
+        query, variables = standin.queries[0]
+        assert len(standin.queries) == 1
+        assert variables == {"o0": "gid://shopify/Order/1003", "o1": 'name:"#1010" OR name:"1010"',
+                             "o2": 'name:"#4242" OR name:"4242"'}
+        # More orders than one query carries: one round-trip per ORDER_BATCH_SIZE
+        standin.queries.clear()
+        body = http.post('/track-orders', json={"order_numbers": [str(n) for n in range(1000, 1006)]}).get_json()
+        assert body["count"] == 6 and len(standin.queries) == 2
+        missing = http.post('/track-orders', json={"order_numbers": ["9999"]})
+        assert missing.status_code == 404 and missing.get_json()["not_found"] == ["9999"]
+        assert http.post('/track-orders', json={"order_numbers": list(range(1000, 1011))}).status_code == 400
+    finally:
+        main.order_index, main.shopify_client = original_index, original_client
+
+
+def test_track_orders_keeps_earlier_batches_when_a_later_one_fails():
+    standin, client, index = make_setup([make_order(n) for n in range(1000, 1010)])
+    graphql, calls = client._graphql, []
+
+    def flaky(query, variables, interactive=True):
+        calls.append(variables)
+        if len(calls) > 1:
+            return {"error": "Shopify is busy, please try again shortly", "status_code": 429, "retry_after": 2.0}
+        return graphql(query, variables, interactive)
+
+    client._graphql = flaky
+    original_index, original_client = main.order_index, main.shopify_client
+    main.order_index, main.shopify_client = index, client
+    try:
+        http = main.app.test_client()
+        response = http.post('/track-orders', json={"order_numbers": ["1000", "1001", "4242", "1003", "1004", "1005"]})
+        body = response.get_json()
+        assert response.status_code == 200 and body["count"] == 3
+        assert [o["name"] for o in body["orders"]] == ["#1000", "#1001", "#1003"]
+        assert body["not_found"] == ["4242"] and body["failed"] == ["1004", "1005"]
+        assert body["retry_after"] == 2.0 and "busy" in body["error"]
+        # Nothing answered before the failure: the error itself, not a 404
+        calls.append(None)
+        failed = http.post('/track-orders', json={"order_numbers": ["1000", "1001"]})
+        assert failed.status_code == 429 and failed.headers["Retry-After"] == "2"
+    finally:
+        main.order_index, main.shopify_client = original_index, original_client
+
+
+if __name__ == "__main__":
+    test_backfill_pages_through_every_order()
+    test_track_order_hydrates_only_the_indexed_order()
+    test_incremental_sync_picks_up_changes_and_measures_lag()
+    test_identifier_lookup_finds_orders_without_a_number()
+    test_track_orders_resolves_a_batch_in_one_query()
+    test_track_orders_keeps_earlier_batches_when_a_later_one_fails()
+    print("✅ All order index tests passed")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the NumPy product ranking used by /recommend-products.
+"""
+
+import os
+import time
+import tempfile
+
+from datetime import datetime, timezone, timedelta
+
+from catalog_mirror import CatalogMirror
+from mirror_store import MirrorStore
+from product_ranking import ProductRanker, ProductFeatures
+
+NOW = time.time()
+
+
+def days_ago(days):
+    return (datetime.fromtimestamp(NOW, timezone.utc) - timedelta(days=days)).isoformat().replace('+00:00', 'Z')
+
+
+def make_product(title, prices, compare_at=None, image=True, updated_days=365):
+    return {
+        "id": f"gid://shopify/Product/{title}",
+        "title": title,
+        "image": "https://cdn.test/img.jpg" if image else None,
+        "updated_at": days_ago(updated_days),
+        "variants": [
+            {"id": f"{title}-{i}", "price": price, "compare_at_price": compare_at} for i, price in enumerate(prices)
+        ]
+    }
+
+
+def titles(products):
+    return [p["title"] for p in products]
+
+
+def test_scores_match_the_documented_points():
+    ranker = ProductRanker()
+    products = [
+        make_product("Sale", ["45.00"], compare_at="60.00"),               # 100 + 5 + 10 + 5
+        make_product("Cheap", ["15.00", "18.00"], updated_days=3),          # 10 + 30 + 5 + 15
+        make_product("Plain", ["80.00"], image=False, updated_days=60),     # 5 + 5
+        make_product("Unpriced", [None]),                                   # 5 + 5
+    ]
+    scores = ranker.score(ProductFeatures(products), now=NOW).tolist()
+    assert scores == [120, 60, 10, 10]
+    assert titles(ranker.rank(products, now=NOW)) == ["Sale", "Cheap", "Plain", "Unpriced"]
+
+
+def test_filters_drop_variants_and_rescore_what_is_left():
+    ranker = ProductRanker()
+    products = [
+        make_product("Mixed", ["15.00", "55.00"], updated_days=3),
+        make_product("Pricey", ["70.00"]),
+        make_product("Deal", ["35.00"], compare_at="50.00"),
+    ]
+    ranked = ranker.rank(products, {"price_min": "50"}, now=NOW)
+    assert titles(ranked) == ["Mixed", "Pricey"]  # 55.00 still earns price points, and Mixed is fresh
+    assert [v["price"] for v in ranked[0]["variants"]] == ["55.00"]
+    assert titles(ranker.rank(products, {"on_sale": "true"}, now=NOW)) == ["Deal"]
+    assert ranker.rank(products, {"price_max": "5"}, now=NOW) == []
+    assert products[0]["variants"][1]["price"] == "55.00" and len(products[0]["variants"]) == 2  # inputs untouched
+
+
+def test_top_k_orders_ties_at_the_cut_by_title():
+    ranker = ProductRanker()
+    products = [make_product(name, ["99.00"]) for name in ("delta", "Alpha", "charlie", "bravo")]
+    products.append(make_product("Zulu", ["10.00"]))
+    assert titles(ranker.rank(products, limit=3, now=NOW)) == ["Zulu", "Alpha", "bravo"]
+
+
+def test_weights_are_configurable():
+    products = [make_product("Sale", ["45.00"], compare_at="60.00"), make_product("Fresh", ["45.00"], updated_days=1)]
+    ranker = ProductRanker({"on_sale": 0, "age_tiers": [[7, 50]]})
+    assert titles(ranker.rank(products, now=NOW)) == ["Fresh", "Sale"]
+
+
+def test_take_matches_features_built_from_the_subset():
+    products = [make_product(f"P{i}", [f"{10 * (i + 1)}.00"] * (i % 3 + 1), updated_days=i * 20) for i in range(8)]
+    features = ProductFeatures(products)
+    subset = [5, 1, 6]
+    ranker = ProductRanker()
+    taken = ranker.rank([products[i] for i in subset], features=features.take(subset), now=NOW)
+    fresh = ranker.rank([products[i] for i in subset], now=NOW)
+    assert taken == fresh
+
+
+def test_catalog_mirror_ranks_with_precomputed_features():
+    path = os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3')
+    nodes = [
+        {"id": f"gid://shopify/Product/{n}", "title": title, "handle": title.lower(), "status": "ACTIVE",
+         "featuredImage": {"url": "https://cdn.test/x.jpg"}, "updatedAt": days_ago(200),
+         "variants": [{"id": f"gid://shopify/ProductVariant/{n}", "title": "Default", "price": price, "compareAtPrice": compare}]}
+        for n, title, price, compare in ((1, "Leather Band Classic", "59.00", None), (2, "Leather Band Sale", "39.00", "49.00"))
+    ]
+    store = MirrorStore(path, 'catalog', lease=60)
+    store.apply({n["id"]: (n["updatedAt"], n) for n in nodes})
+    store.release(store.claim(), synced_at=time.time(), seeded_at=time.time(), cursor=days_ago(200))
+    ranker = ProductRanker()
+    mirror = CatalogMirror(path, 'astrastraps.com', sync_interval=300, reseed_interval=86400, max_age=3600, ranker=ranker)
+    mirror.refresh()
+    assert len(mirror._snapshot.features) == 2
+    assert titles(mirror.search("leather band classic", None, 5)) == ["Leather Band Sale", "Leather Band Classic"]
+    assert ranker.stats()["rankings"] == 1
+
+
+def test_catalog_mirror_ranks_beyond_the_relevance_top_k():
+    path = os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3')
+    # "Leather Band" matches every plain band better than the longer-titled sale band
+    specs = [(n, "Leather Band", "59.00", None) for n in range(1, 6)] + [(6, "Slim Padded Leather Watch Band Sale", "39.00", "49.00")]
+    nodes = [
+        {"id": f"gid://shopify/Product/{n}", "title": title, "handle": f"band-{n}", "status": "ACTIVE",
+         "featuredImage": {"url": "https://cdn.test/x.jpg"}, "updatedAt": days_ago(200),
+         "variants": [{"id": f"gid://shopify/ProductVariant/{n}", "title": "Default", "price": price, "compareAtPrice": compare}]}
+        for n, title, price, compare in specs
+    ]
+    store = MirrorStore(path, 'catalog', lease=60)
+    store.apply({n["id"]: (n["updatedAt"], n) for n in nodes})
+    store.release(store.claim(), synced_at=time.time(), seeded_at=time.time(), cursor=days_ago(200))
+    mirror = CatalogMirror(path, 'astrastraps.com', sync_interval=300, reseed_interval=86400, max_age=3600, ranker=ProductRanker())
+    mirror.refresh()
+    assert 5 not in [doc for doc, _ in mirror._snapshot.index.search("leather band", 2)]
+    ranked = mirror.search("leather band", None, 2)
+    assert len(ranked) == 2 and ranked[0]["title"] == "Slim Padded Leather Watch Band Sale"
+
+
+if __name__ == "__main__":
+    test_scores_match_the_documented_points()
+    test_filters_drop_variants_and_rescore_what_is_left()
+    test_top_k_orders_ties_at_the_cut_by_title()
+    test_weights_are_configurable()
+    test_take_matches_features_built_from_the_subset()
+    test_catalog_mirror_ranks_with_precomputed_features()
+    test_catalog_mirror_ranks_beyond_the_relevance_top_k()
+    print("✅ All product ranking tests passed")
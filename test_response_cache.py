@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the Reamaze response cache and conditional revalidation.
+"""
+
+import json
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import main
+from response_cache import ResponseCache, parse_cache_control
+
+
+def make_response(status, body=None, headers=None):
+    response = requests.models.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = json.dumps(body).encode() if body is not None else b''
+    return response
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('private, max-age=60, no-cache') == {"private": True, "max-age": "60", "no-cache": True}
+    assert parse_cache_control(None) == {}
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResponseCache("test", max_bytes=1500)
+    for key in ("a", "b", "c"):
+        cache.store(key, f"/articles/{key}", {"ETag": f'"{key}"'}, b"x" * 200)
+    cache.lookup("a")  # touch, so "b" is the least recently used
+    cache.store("d", "/articles/d", {"ETag": '"d"'}, b"x" * 200)
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None
+    assert cache.bytes <= 1500
+    assert cache.stats()["evictions"] == 1
+
+
+def test_uncacheable_responses_are_not_kept():
+    cache = ResponseCache("test", max_bytes=10000)
+    cache.store("plain", "/articles", {}, b"{}")
+    cache.store("no-store", "/articles", {"ETag": '"1"', "Cache-Control": "no-store"}, b"{}")
+    assert cache.lookup("plain") is None and cache.lookup("no-store") is None
+
+
+def test_writes_invalidate_the_resource_and_parents():
+    cache = ResponseCache("test", max_bytes=10000)
+    for key, path in (("conv", "/conversations/abc"), ("list", "/conversations"), ("other", "/conversations/abcd")):
+        cache.store(key, path, {"Cache-Control": "max-age=60"}, b"{}")
+    cache.invalidate("/conversations/abc/messages")
+    assert cache.lookup("conv") is None and cache.lookup("list") is None
+    assert cache.lookup("other") is not None
+
+
+def test_client_revalidates_and_reuses_body():
+    client = main.reamaze_client
+    article = {"articles": [{"title": "Band sizing", "body": "Measure your wrist. " * 50}]}
+    sent = []
+
+    def fake_request(method, url, headers=None, **kwargs):
+        sent.append(dict(headers or {}))
+        if headers and headers.get('If-None-Match') == '"v1"':
+            return make_response(304, headers={"ETag": '"v1"'})
+        return make_response(200, article, {"ETag": '"v1"', "Cache-Control": "private, no-cache"})
+
+    client.http.request = fake_request
+    original_cache = client.cache
+    client.cache = ResponseCache("reamaze", max_bytes=1 << 20)
+    try:
+        first = client.search_articles("band size")
+        second = client.search_articles("band size")
+    finally:
+        del client.http.request
+        stats = client.cache.stats()
+        client.cache = original_cache
+    assert first == second == article
+    assert sent[0] == {} and sent[1] == {"If-None-Match": '"v1"'}
+    assert stats["misses"] == 1 and stats["revalidated"] == 1
+    assert stats["bytes_saved"] == len(json.dumps(article))
+
+
+def test_fresh_entry_skips_the_request():
+    client = main.reamaze_client
+    sent = []
+
+    def fake_request(method, url, headers=None, **kwargs):
+        sent.append(url)
+        return make_response(200, {"id": 7}, {"Cache-Control": "max-age=60"})
+
+    client.http.request = fake_request
+    original_cache = client.cache
+    client.cache = ResponseCache("reamaze", max_bytes=1 << 20)
+    try:
+        assert client.get_article(7) == {"id": 7}
+        assert client.get_article(7) == {"id": 7}
+        hit_ratio = client.cache.stats()["hit_ratio"]
+    finally:
+        del client.http.request
+        client.cache = original_cache
+    assert len(sent) == 1
+    assert hit_ratio == 0.5
+
+
+if __name__ == "__main__":
+    test_parse_cache_control()
+    test_lru_eviction_by_bytes()
+    test_uncacheable_responses_are_not_kept()
+    test_writes_invalidate_the_resource_and_parents()
+    test_client_revalidates_and_reuses_body()
+    test_fresh_entry_skips_the_request()
+    print("✅ All response cache tests passed")
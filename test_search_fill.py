@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Offline tests for product search filter push-down and cursor-based fill, against the Shopify stand-in.
+"""
+
+import os
+import tempfile
+
+import main
+from catalog_mirror import CatalogMirror
+from search_fill import ProductFill, FillStats, pushdown_terms
+from shopify_standin import ShopifyStandIn, BULK_URL_PREFIX
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+
+def make_product(number, prices, compare_at=None):
+    return {
+        "id": f"gid://shopify/Product/{number}", "title": f"Band {number}", "handle": f"band-{number}",
+        "onlineStoreUrl": None, "featuredImage": None, "createdAt": None, "updatedAt": None,
+        "variants": {"edges": [
+            {"node": {"id": f"gid://shopify/ProductVariant/{number}{i}", "title": f"V{i}", "sku": None,
+                      "price": price, "compareAtPrice": compare_at, "image": None}}
+            for i, price in enumerate(prices)
+        ]}
+    }
+
+
+def make_client(products):
+    standin = ShopifyStandIn(products=products, restore_rate=2000)
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    return standin, client
+
+
+def search_pages(standin):
+    return [v for q, v in standin.queries if q == main.ShopifyAPIClient.PRODUCT_SEARCH_GQL]
+
+
+def test_pushdown_terms_use_shopify_search_syntax():
+    assert pushdown_terms(20.0, 29.5, True) == ["price:>=20", "price:<=29.5", "is_price_reduced:true"]
+    assert pushdown_terms(None, None, False) == []
+    _, variables = main.shopify_client._product_search_request("leather", {"price_max": "30", "on_sale": "yes"}, 5)
+    assert variables["q"] == "leather price:<=30 is_price_reduced:true"
+
+
+def test_fill_sizes_next_page_from_pass_rate():
+    fill = ProductFill(limit=5, max_pages=3)
+    # 5 returned, 1 kept: 4 missing at a 20% pass rate -> ask for 20
+    assert fill.add_page(5, [{"id": 1}], {"hasNextPage": True, "endCursor": "5"}) == (20, "5")
+    assert fill.add_page(20, [{"id": n} for n in range(2, 6)], {"hasNextPage": True, "endCursor": "25"}) is None
+    assert len(fill.products) == 5 and fill.pages == 2 and not fill.budget_exhausted
+
+    fill = ProductFill(limit=5, max_pages=2)
+    fill.add_page(5, [], {"hasNextPage": True, "endCursor": "5"})
+    assert fill.add_page(25, [], {"hasNextPage": True, "endCursor": "30"}) is None and fill.budget_exhausted
+
+
+def test_pushdown_filters_most_products_upstream():
+    # Shopify matches any variant per term, so mixed-price products still need variant filtering here
+    products = [make_product(n, ["45.00"]) for n in range(20)] + [make_product(100 + n, ["25.00"], "35.00") for n in range(5)]
+    standin, client = make_client(products)
+    result = client.search_products(filters={"price_max": "30", "on_sale": "true"}, limit=5)
+    assert len(result["products"]) == 5
+    assert len(search_pages(standin)) == 1
+
+
+def test_fills_limit_across_cursor_pages():
+    # Every product has a cheap and an expensive variant, so price_min/price_max both match upstream;
+    # only 1 in 4 has a variant inside the range
+    products = [make_product(n, ["10.00", "50.00"] if n % 4 else ["10.00", "25.00", "50.00"]) for n in range(40)]
+    standin, client = make_client(products)
+    before = main.product_fill_stats.stats()["requests"]
+    result = client.search_products(filters={"price_min": "20", "price_max": "30"}, limit=5)
+    assert len(result["products"]) == 5
+    assert all(v["price"] == "25.00" for p in result["products"] for v in p["variants"])
+    pages = search_pages(standin)
+    # 2 of 5 kept -> 3 missing at 40% asks for 8; 4 of 13 kept -> 1 missing asks for 4
+    assert [v["first"] for v in pages] == [5, 8, 4] and [v["after"] for v in pages] == [None, "5", "13"]
+    stats = main.product_fill_stats.stats()
+    assert stats["requests"] == before + 1 and stats["filters_pushed_down"] >= 1
+
+
+def test_page_budget_bounds_a_search_that_cannot_fill():
+    products = [make_product(n, ["10.00", "50.00"]) for n in range(200)]
+    standin, client = make_client(products)
+    result = client.search_products(filters={"price_min": "20", "price_max": "30"}, limit=5)
+    assert result["products"] == []
+    assert len(search_pages(standin)) == main.app.config['PRODUCT_SEARCH_MAX_PAGES']
+
+
+def test_fill_stats_report_fill_rate_and_pages():
+    stats = FillStats()
+    full, partial = ProductFill(limit=4, max_pages=3), ProductFill(limit=4, max_pages=3)
+    full.add_page(4, [{"id": n} for n in range(4)], {})
+    partial.add_page(4, [{"id": 1}], {"hasNextPage": True, "endCursor": "4"})
+    partial.add_page(4, [], {})
+    stats.record(full, pushed_down=False)
+    stats.record(partial, pushed_down=True)
+    report = stats.stats()
+    assert report["filled"] == 1 and report["avg_fill_rate"] == 0.625
+    assert report["pages_per_request"] == {"1": 1, "2": 1} and report["avg_pages"] == 1.5
+    assert report["filters_pushed_down"] == 1
+    stats.record_mirrored(2, 4)
+    report = stats.stats()
+    assert report["requests"] == 3 and report["answered_by_mirror"] == 1
+    assert report["pages_per_request"] == {"0": 1, "1": 1, "2": 1} and report["avg_fill_rate"] == 0.583
+
+
+def test_filtered_recommendations_fill_from_the_mirror():
+    # 5 sale bands under $30 among 40 equally relevant products; the top five by relevance alone are full-price
+    products = [make_product(n, ["49.00", "59.00"]) for n in range(35)]
+    products += [make_product(n, ["19.00", "49.00"], compare_at="39.00") for n in range(35, 40)]
+    standin, client = make_client(products)
+    client.http.session.mount(BULK_URL_PREFIX, standin)
+    mirror = CatalogMirror(os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3'), client.store_domain, sync_interval=300,
+                           reseed_interval=86400, max_age=3600, poll_interval=0.01, ranker=main.product_ranker)
+    mirror.sync(client, force=True)
+    mirror.refresh()
+    originals = main.catalog_mirror, main.shopify_client, main.app.config['CATALOG_MIRROR_ENABLED']
+    main.catalog_mirror, main.shopify_client, main.app.config['CATALOG_MIRROR_ENABLED'] = mirror, client, True
+    before = main.product_fill_stats.stats()
+    calls = standin.calls
+    try:
+        response = main.app.test_client().post('/recommend-products', json={
+            "query_text": "band", "on_sale": "true", "price_max": 30, "limit": 5
+        })
+    finally:
+        main.catalog_mirror, main.shopify_client, main.app.config['CATALOG_MIRROR_ENABLED'] = originals
+    body = response.get_json()
+    assert response.status_code == 200 and body["count"] == 5
+    assert all(v["price"] == "19.00" for p in body["products"] for v in p["variants"])
+    assert standin.calls == calls
+    stats = main.product_fill_stats.stats()
+    assert stats["answered_by_mirror"] == before["answered_by_mirror"] + 1
+    assert stats["filled"] == before["filled"] + 1
+
+
+if __name__ == "__main__":
+    test_pushdown_terms_use_shopify_search_syntax()
+    test_fill_sizes_next_page_from_pass_rate()
+    test_pushdown_filters_most_products_upstream()
+    test_fills_limit_across_cursor_pages()
+    test_page_budget_bounds_a_search_that_cannot_fill()
+    test_fill_stats_report_fill_rate_and_pages()
+    test_filtered_recommendations_fill_from_the_mirror()
+    print("✅ All product search fill tests passed")
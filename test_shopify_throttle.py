@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the Shopify GraphQL cost throttle, run against the local Shopify stand-in.
+"""
+
+import main
+from shopify_standin import ShopifyStandIn
+from shopify_throttle import ShopifyCostThrottle, estimate_query_cost
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+
+
+def make_order(number):
+    return {
+        "id": f"gid://shopify/Order/{number}", "name": f"#{number}", "processedAt": f"2026-01-01T{number // 3600:02d}:{number // 60 % 60:02d}:{number % 60:02d}Z",
+        "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+        "customer": {"displayName": "Jane", "email": "jane@example.com"}, "shippingAddress": {"zip": "10001"},
+        "fulfillments": [], "lineItems": {"edges": []}
+    }
+
+
+def make_client(standin):
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None  # keep the test within this process
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    return client
+
+
+def test_estimates_follow_shopify_cost_rules():
+    S = main.ShopifyAPIClient
+    assert estimate_query_cost(S.ORDER_NAME_SEARCH_GQL, {"hashed": 'name:"#1"', "plain": 'name:"1"'}) == 316
+    assert estimate_query_cost(S.ORDER_SCAN_GQL, {"first": 250}) == 252
+    assert estimate_query_cost(S.ORDER_BY_ID_GQL, {"id": "x"}) == 157
+    assert estimate_query_cost(S.PRODUCT_SEARCH_GQL, {"first": 5}) == 67
+
+
+def test_scans_leave_room_for_interactive_queries():
+    throttle = ShopifyCostThrottle(maximum=1000, restore_rate=50, interactive_reserve=0.2)
+    throttle.available = 300
+    assert throttle.reserve(250, interactive=True, max_wait=0) == (True, 0.0)
+    granted, wait = throttle.reserve(252, interactive=False, max_wait=0)
+    assert not granted and wait > 0
+    assert throttle.stats()["denied"] == 1
+
+
+def test_back_to_back_lookups_are_delayed_not_throttled():
+    standin = ShopifyStandIn(orders=[make_order(n) for n in range(1000, 1010)], restore_rate=2000)
+    client = make_client(standin)
+    for number in range(1000, 1006):
+        order = client.get_order_by_number(str(number))
+        assert order and order["name"] == f"#{number}"
+    stats = client.throttle.stats()
+    assert standin.throttled == 0
+    assert stats["delayed"] >= 1
+    assert stats["restore_rate"] == 2000
+
+
+def test_scan_downgrades_and_fetches_match_by_id():
+    orders = [make_order(n) for n in range(1000, 1300)]
+    standin = ShopifyStandIn(orders=orders, restore_rate=2000, unindexed={"#1299"})
+    client = make_client(standin)
+    assert client.get_order_by_number("1299")["id"] == "gid://shopify/Order/1299"
+    scans = [v for q, v in standin.queries if q == client.ORDER_SCAN_GQL]
+    assert scans == [{"first": 250}]
+
+    client.throttle.available = 350  # another burst has drained most of the bucket
+    client.throttle.restore_rate = 0.001
+    assert client._order_scan_size() == 100
+    assert client.throttle.stats()["downgraded"] == 1
+
+
+def test_name_lookup_is_one_round_trip():
+    standin = ShopifyStandIn(orders=[make_order(n) for n in range(1000, 1010)], restore_rate=2000)
+    client = make_client(standin)
+    assert client.get_order_by_number("1004")["name"] == "#1004"
+    assert standin.queries == [(client.ORDER_NAME_SEARCH_GQL, {"hashed": 'name:"#1004"', "plain": 'name:"1004"'})]
+    # Unknown name: the search misses, then the names-only scan finds nothing to fetch
+    standin.queries.clear()
+    assert client.get_order_by_number("5000") is None
+    assert [q for q, _ in standin.queries] == [client.ORDER_NAME_SEARCH_GQL, client.ORDER_SCAN_GQL]
+
+
+def test_server_throttle_is_reported_and_remembered():
+    standin = ShopifyStandIn(orders=[make_order(1001)], restore_rate=10)
+    standin.available = 0  # drained by another worker; our model doesn't know yet
+    client = make_client(standin)
+    result = client.get_order_by_number("1001")
+    assert result["status_code"] == 429 and result["retry_after"] >= 1
+    calls = standin.calls
+    # The model now knows the bucket is empty, so the next lookup is refused locally
+    assert client.get_order_by_number("1001")["status_code"] == 429
+    assert standin.calls == calls
+    assert client.throttle.stats()["throttled"] == 1
+
+
+if __name__ == "__main__":
+    test_estimates_follow_shopify_cost_rules()
+    test_scans_leave_room_for_interactive_queries()
+    test_back_to_back_lookups_are_delayed_not_throttled()
+    test_scan_downgrades_and_fetches_match_by_id()
+    test_name_lookup_is_one_round_trip()
+    test_server_throttle_is_reported_and_remembered()
+    print("✅ All Shopify cost throttle tests passed")
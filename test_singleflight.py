@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Offline tests for coalescing identical in-flight reads.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from singleflight import Singleflight, flight_key
+
+
+def test_flight_key_ignores_dict_order():
+    assert flight_key('GET', '/articles', {"q": "band", "limit": 5}) == flight_key('GET', '/articles', {"limit": 5, "q": "band"})
+    assert flight_key('GET', '/articles', {"q": "band"}) != flight_key('GET', '/articles', {"q": "strap"})
+
+
+def test_concurrent_callers_share_one_call():
+    flights = Singleflight("test")
+    calls = []
+
+    def slow_search(query):
+        calls.append(query)
+        time.sleep(0.1)
+        return {"articles": [query]}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("k", slow_search, "band")))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["band"]
+    assert results == [{"articles": ["band"]}] * 5
+    stats = flights.stats()
+    assert stats["leaders"] == 1 and stats["coalesced_local"] == 4 and stats["in_flight"] == 0
+
+    flights.do("k", slow_search, "band")
+    assert len(calls) == 2  # finished calls are not cached
+
+
+def test_leader_error_reaches_followers():
+    flights = Singleflight("test")
+    errors = []
+
+    def broken():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flights.do("k", broken)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 3
+
+
+def test_async_callers_share_one_call():
+    flights = Singleflight("test")
+    calls = []
+
+    async def slow_lookup(name):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return {"orders": [name]}
+
+    async def run():
+        return await asyncio.gather(*(flights.ado("k", slow_lookup, "#1001") for _ in range(4)))
+
+    assert asyncio.run(run()) == [{"orders": ["#1001"]}] * 4
+    assert calls == ["#1001"]
+
+
+def _worker(db_path, start, results):
+    flights = Singleflight("test", db_path=db_path, poll_interval=0.01)
+
+    def lookup():
+        time.sleep(0.3)
+        return {"pid": os.getpid()}
+
+    start.wait()
+    results.put((flights.do("order-1001", lookup), flights.stats()))
+
+
+def test_workers_share_one_call():
+    db_path = os.path.join(tempfile.mkdtemp(), "flights.sqlite3")
+    Singleflight("test", db_path=db_path)  # create the table before the race
+    ctx = multiprocessing.get_context("fork")
+    start, results = ctx.Event(), ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(db_path, start, results)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    start.set()
+    outcomes = [results.get(timeout=10) for _ in workers]
+    for w in workers:
+        w.join()
+    assert len({result["pid"] for result, _ in outcomes}) == 1
+    assert sum(stats["leaders"] for _, stats in outcomes) == 1
+    assert sum(stats["coalesced_shared"] for _, stats in outcomes) == 2
+
+
+if __name__ == "__main__":
+    test_flight_key_ignores_dict_order()
+    test_concurrent_callers_share_one_call()
+    test_leader_error_reaches_followers()
+    test_async_callers_share_one_call()
+    test_workers_share_one_call()
+    print("✅ All singleflight tests passed")
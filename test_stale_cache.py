@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the stale-if-error fallback on tool reads.
+"""
+
+import time
+
+from requests.models import Response
+
+import main
+from shopify_standin import ShopifyStandIn
+from stale_cache import StaleCache, is_upstream_failure
+
+GRAPHQL_URL = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+ORDER = {
+    "id": "gid://shopify/Order/1", "name": "#1001", "processedAt": "2026-01-01T00:00:00Z",
+    "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+    "customer": None, "shippingAddress": None, "fulfillments": [], "lineItems": {"edges": []}
+}
+
+
+class FlakyShopify(ShopifyStandIn):
+    """Stand-in that answers with a bare 502 while `down` is set"""
+
+    down = False
+
+    def send(self, request, **kwargs):
+        if not self.down:
+            return super().send(request, **kwargs)
+        response = Response()
+        response.status_code, response._content = 502, b'Bad Gateway'
+        response.url, response.request = request.url, request
+        return response
+
+
+def flaky_client(standin):
+    client = main.ShopifyAPIClient()
+    client.graphql_url = GRAPHQL_URL
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    return client
+
+
+def test_only_upstream_failures_fall_back():
+    assert is_upstream_failure({"error": "boom", "status_code": 502})
+    assert is_upstream_failure({"error": "timed out", "status_code": 504})
+    assert is_upstream_failure({"error": "slow down", "status_code": 429})
+    assert is_upstream_failure({"error": "boom"})
+    assert not is_upstream_failure({"error": "bad query", "status_code": 400})
+    assert not is_upstream_failure({"articles": []})
+    assert not is_upstream_failure(None)
+
+
+def test_serves_last_good_result_on_failure():
+    cache = StaleCache(10, {"/search-kb": 60})
+    good = {"articles": [{"title": "Band sizing"}]}
+    assert cache.read("/search-kb", "k", good) == (good, None)
+
+    result, age = cache.read("/search-kb", "k", {"error": "down", "status_code": 503})
+    assert result == good and result is not good
+    assert 0 <= age < 1
+
+    client_error = {"error": "bad", "status_code": 400}
+    assert cache.read("/search-kb", "k", client_error) == (client_error, None)
+    stats = cache.stats()
+    assert stats["served"] == {"/search-kb": 1} and stats["stored"] == 1
+
+
+def test_respects_max_age_per_endpoint():
+    cache = StaleCache(10, {"/track-order": 0.05, "/search-kb": 60})
+    cache.read("/track-order", "1001", {"id": "gid://shopify/Order/1"})
+    cache.read("/search-kb", "1001", {"articles": []})
+    time.sleep(0.1)
+    failure = {"error": "down", "status_code": 503}
+    assert cache.read("/track-order", "1001", failure) == (failure, None)
+    assert cache.read("/search-kb", "1001", failure)[1] is not None
+    assert cache.read("/unknown", "1001", failure) == (failure, None)
+    assert cache.stats()["unavailable"] == 2
+
+
+def test_not_found_and_errors_are_not_remembered():
+    cache = StaleCache(10, {"/track-order": 60})
+    cache.read("/track-order", "1001", None)
+    cache.read("/track-order", "1001", {"error": "bad", "status_code": 400})
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_bound():
+    cache = StaleCache(2, {"/search-kb": 60})
+    for key in ("a", "b", "c"):
+        cache.read("/search-kb", key, {"articles": [key]})
+    failure = {"error": "down", "status_code": 503}
+    assert cache.read("/search-kb", "a", failure)[1] is None
+    assert cache.read("/search-kb", "c", failure)[0] == {"articles": ["c"]}
+
+
+def test_track_order_view_marks_stale_answer():
+    order = {
+        "id": "gid://shopify/Order/1", "name": "#1001", "displayFulfillmentStatus": "FULFILLED",
+        "lineItems": {"edges": []}, "fulfillments": []
+    }
+    answers = [order, {"error": "Shopify unavailable", "status_code": 503}]
+    original_get = main.shopify_client.get_order_by_number
+    original_cache = main.stale_reads
+    main.shopify_client.get_order_by_number = lambda number, fields=None: answers.pop(0)
+    main.stale_reads = StaleCache(10, {"/track-order": 60})
+    # The repeat would otherwise be answered by the tool cache before Shopify is asked
+    main.app.config['TOOL_CACHE_ENABLED'] = False
+    try:
+        client = main.app.test_client()
+        fresh = client.post('/track-order', json={"order_number": "#1001"})
+        stale = client.post('/track-order', json={"order_number": "1001"})
+    finally:
+        main.shopify_client.get_order_by_number = original_get
+        main.stale_reads = original_cache
+        main.app.config['TOOL_CACHE_ENABLED'] = True
+    assert fresh.status_code == 200 and "stale" not in fresh.get_json()
+    body = stale.get_json()
+    assert stale.status_code == 200
+    assert body["stale"] is True and body["stale_age_seconds"] == 0
+    assert body["order"] == fresh.get_json()["order"]
+
+
+def test_shopify_outage_serves_the_stale_order():
+    standin = FlakyShopify(orders=[ORDER], restore_rate=2000)
+    original_client, original_cache = main.shopify_client, main.stale_reads
+    original_index = main.app.config['ORDER_INDEX_ENABLED']
+    main.shopify_client = flaky_client(standin)
+    main.stale_reads = StaleCache(10, {"/track-order": 60})
+    main.app.config['ORDER_INDEX_ENABLED'] = False
+    main.app.config['TOOL_CACHE_ENABLED'] = False
+    try:
+        client = main.app.test_client()
+        fresh = client.post('/track-order', json={"order_number": "1001"})
+        standin.down = True
+        # A 5xx is an outage, not "order not found"
+        assert main.shopify_client.get_order_by_number("1001")["status_code"] == 500
+        stale = client.post('/track-order', json={"order_number": "1001"})
+    finally:
+        main.shopify_client, main.stale_reads = original_client, original_cache
+        main.app.config['ORDER_INDEX_ENABLED'] = original_index
+        main.app.config['TOOL_CACHE_ENABLED'] = True
+    assert fresh.status_code == 200 and fresh.get_json()["order"]["order_number"] == "#1001"
+    body = stale.get_json()
+    assert stale.status_code == 200 and body["stale"] is True
+    assert body["order"] == fresh.get_json()["order"]
+
+
+if __name__ == "__main__":
+    test_only_upstream_failures_fall_back()
+    test_serves_last_good_result_on_failure()
+    test_respects_max_age_per_endpoint()
+    test_not_found_and_errors_are_not_remembered()
+    test_lru_bound()
+    test_track_order_view_marks_stale_answer()
+    test_shopify_outage_serves_the_stale_order()
+    print("✅ All stale cache tests passed")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the tool-level response cache.
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+
+import httpx
+
+import main
+import async_bridge
+from order_index import OrderIndex
+from tool_cache import ToolCache, canonical_value
+from shopify_standin import ShopifyStandIn
+
+FIELDS = {"/recommend-products": ("query_text", "size", "limit"), "/track-order": ("order_number",)}
+
+
+def make_cache(**bounds):
+    bounds = dict({"max_entries": 100, "max_bytes": 1 << 20}, **bounds)
+    return ToolCache(FIELDS, {"/recommend-products": 60, "/track-order": 60},
+                     {"/recommend-products": 5, "/track-order": 5}, **bounds)
+
+
+def test_rephrased_payloads_share_a_key():
+    cache = make_cache()
+    key = cache.key("/recommend-products", {"query_text": "black leather band 45mm"})
+    assert key == cache.key("/recommend-products", {"query_text": "45mm Leather BLACK band", "size": "any"})
+    assert key == cache.key("/recommend-products", {"query_text": "a black leather band for 45mm", "debug": True})
+    assert key != cache.key("/recommend-products", {"query_text": "brown leather band 45mm"})
+    assert cache.key("/recommend-products", {"limit": "5"}) == cache.key("/recommend-products", {"limit": 5.0})
+    assert cache.key("/search-kb", {"query_term": "returns"}) is None  # endpoint not cached
+    assert cache.key("/track-order", {"order_number": "none"}) is None  # nothing left to key on
+    assert canonical_value("ALL") is None and canonical_value("the") == "the"
+
+
+def test_negative_answers_use_the_shorter_ttl():
+    cache = make_cache()
+    found, missing = cache.key("/track-order", {"order_number": "1001"}), cache.key("/track-order", {"order_number": "999"})
+    cache.put(found, {"order": {"name": "#1001"}}, 200)
+    cache.put(missing, {"error": "Order not found", "status_code": 404}, 404)
+    cache.put(cache.key("/track-order", {"order_number": "5"}), {"error": "down", "status_code": 503}, 503)
+    cache.put(cache.key("/track-order", {"order_number": "6"}), {"order": {}, "stale": True}, 200)
+    assert cache.stats()["entries"] == 2
+    assert cache.get(missing) == ({"error": "Order not found", "status_code": 404}, 404)
+    cache._entries[missing] = (time.time() - 1,) + cache._entries[missing][1:]
+    assert cache.get(missing) is None and cache.get(found)[0] == {"order": {"name": "#1001"}}
+    counts = cache.stats()["endpoints"]["/track-order"]
+    assert counts["hits"] == 2 and counts["negative_hits"] == 1 and counts["hit_rate"] == 0.667
+
+
+def test_lru_bounds_on_entries_and_bytes():
+    cache = make_cache(max_entries=2)
+    keys = [cache.key("/track-order", {"order_number": str(n)}) for n in range(3)]
+    cache.put(keys[0], {"order": 0}, 200)
+    cache.put(keys[1], {"order": 1}, 200)
+    cache.get(keys[0])
+    cache.put(keys[2], {"order": 2}, 200)
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) is not None and cache.stats()["evictions"] == 1
+
+    cache = make_cache(max_bytes=40)
+    cache.put(keys[0], {"order": "x" * 20}, 200)
+    cache.put(keys[1], {"order": "y" * 20}, 200)
+    assert cache.get(keys[0]) is None and cache.stats()["bytes"] <= 40
+
+
+def test_rephrased_product_search_skips_upstream():
+    calls = []
+    original_search = main.shopify_client.search_products
+    original_cache = main.tool_cache
+    original_mirror = main.app.config['CATALOG_MIRROR_ENABLED']
+
+    def search_products(query_text=None, filters=None, limit=10, fields=None):
+        calls.append(query_text)
+        return {"products": [{"id": "gid://shopify/Product/1", "title": "Marley Leather Band", "variants": []}]}
+
+    main.shopify_client.search_products = search_products
+    main.tool_cache = ToolCache(main.TOOL_CACHE_FIELDS, {"/recommend-products": 60}, {}, max_entries=10, max_bytes=1 << 20)
+    main.app.config['CATALOG_MIRROR_ENABLED'] = False
+    try:
+        client = main.app.test_client()
+        first = client.post('/recommend-products', json={"query_text": "black leather band 45mm"})
+        second = client.post('/recommend-products', json={"query_text": "45mm leather black band"})
+        stats = main.tool_cache.stats()
+    finally:
+        main.shopify_client.search_products = original_search
+        main.tool_cache = original_cache
+        main.app.config['CATALOG_MIRROR_ENABLED'] = original_mirror
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert len(calls) == 1
+    assert stats["endpoints"]["/recommend-products"]["hit_rate"] == 0.5
+
+
+def test_upstream_failures_are_never_negative_cached():
+    order = {
+        "id": "gid://shopify/Order/1", "name": "#1001", "processedAt": "2026-01-01T00:00:00Z",
+        "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+        "customer": None, "shippingAddress": None, "fulfillments": [], "lineItems": {"edges": []}
+    }
+    outage = {"error": "502 Server Error: Bad Gateway", "status_code": 500}
+    shopify = {"down": True}
+
+    def graphql(query, variables, interactive=True):
+        if 'products(' in query:
+            # The first page keeps nothing, the second fails
+            if variables.get('after'):
+                return outage
+            return {"products": {"edges": [], "pageInfo": {"hasNextPage": True, "endCursor": "c1"}}}
+        if shopify["down"]:
+            return outage
+        return {"hashed": {"edges": [{"node": order}]}, "plain": {"edges": []}}
+
+    original_cache, original_stale = main.tool_cache, main.stale_reads
+    originals = main.app.config['CATALOG_MIRROR_ENABLED'], main.app.config['ORDER_INDEX_ENABLED']
+    main.shopify_client._graphql = graphql
+    main.tool_cache = make_cache()
+    main.stale_reads = main.StaleCache(10, {})
+    main.app.config['CATALOG_MIRROR_ENABLED'] = main.app.config['ORDER_INDEX_ENABLED'] = False
+    try:
+        client = main.app.test_client()
+        down = client.post('/track-order', json={"order_number": "1001"})
+        shopify["down"] = False
+        # Shopify has recovered: the retry must ask it again rather than replay "not found"
+        recovered = client.post('/track-order', json={"order_number": "1001"})
+        # A later page failing with nothing kept yet is no "no products" answer either
+        partial = client.post('/recommend-products', json={"query_text": "leather band", "limit": 5})
+        stats = main.tool_cache.stats()
+    finally:
+        del main.shopify_client._graphql
+        main.tool_cache, main.stale_reads = original_cache, original_stale
+        main.app.config['CATALOG_MIRROR_ENABLED'], main.app.config['ORDER_INDEX_ENABLED'] = originals
+    assert down.status_code >= 500 and recovered.status_code == 200
+    assert recovered.get_json()["order"]["order_number"] == "#1001"
+    assert partial.status_code >= 500
+    assert all(counts["negative_hits"] == 0 for counts in stats["endpoints"].values())
+    assert stats["entries"] == 1  # the recovered order only
+
+
+def make_customer_orders():
+    """An order index holding one order each for two customers, and those orders by id"""
+    orders = {
+        f"gid://shopify/Order/{n}": {
+            "id": f"gid://shopify/Order/{n}", "name": f"#{n}", "processedAt": "2026-01-01T00:00:00Z", "email": email,
+            "cancelledAt": None, "closedAt": None, "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED",
+            "customer": {"displayName": name, "email": email}, "shippingAddress": {"zip": "10001"}, "fulfillments": []
+        }
+        for n, name, email in ((1001, "Alice", "alice@example.com"), (1002, "Bob", "bob@example.com"))
+    }
+    standin = ShopifyStandIn(orders=list(orders.values()), restore_rate=2000)
+    client = main.ShopifyAPIClient()
+    client.graphql_url = "https://standin.myshopify.com/admin/api/2024-07/graphql.json"
+    client.singleflight._shared = None
+    client.http.session.mount("https://standin.myshopify.com", standin)
+    index = OrderIndex(os.path.join(tempfile.mkdtemp(), 'orders.sqlite3'), sync_interval=60, backfill_days=3650, max_age=900)
+    index.sync(client, force=True)
+    index.refresh()
+    return index, orders
+
+
+def lookups_by_email(post):
+    """Alice's then Bob's status-only lookup by email, through `post(payload)` -> (status, body)"""
+    index, orders = make_customer_orders()
+    originals = main.order_index, main.tool_cache, main.app.config['TOOL_CACHE_ENABLED']
+    main.order_index = index
+    main.tool_cache = ToolCache(main.TOOL_CACHE_FIELDS, {"/track-order": 60}, {}, max_entries=10, max_bytes=1 << 20)
+    main.app.config['TOOL_CACHE_ENABLED'] = True
+    try:
+        return post(orders, [{"email": email, "fields": "status"} for email in ("alice@example.com", "bob@example.com")])
+    finally:
+        main.order_index, main.tool_cache, main.app.config['TOOL_CACHE_ENABLED'] = originals
+
+
+def test_identifier_lookups_never_share_a_cached_order():
+    def post(orders, payloads):
+        main.shopify_client._graphql = lambda query, variables, interactive=True: {"order": orders[variables["id"]]}
+        try:
+            client = main.app.test_client()
+            return [client.post('/track-order', json=payload).get_json() for payload in payloads]
+        finally:
+            del main.shopify_client._graphql
+
+    alice, bob = lookups_by_email(post)
+    assert alice["order"]["name"] == "#1001" and bob["order"]["name"] == "#1002"
+    assert main.tool_cache_key('/track-order', {"email": "bob@example.com", "fields": "status"}) is None
+
+
+def test_asgi_identifier_lookups_never_share_a_cached_order():
+    def post(orders, payloads):
+        async def graphql(query, variables, interactive=True):
+            return {"order": orders[variables["id"]]}
+
+        async def call():
+            transport = httpx.ASGITransport(app=async_bridge.asgi_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bridge") as client:
+                return [(await client.post('/track-order', json=payload)).json() for payload in payloads]
+
+        async_bridge.shopify_client._graphql = graphql
+        try:
+            return asyncio.run(call())
+        finally:
+            del async_bridge.shopify_client._graphql
+
+    alice, bob = lookups_by_email(post)
+    assert alice["order"]["name"] == "#1001" and bob["order"]["name"] == "#1002"
+
+
+if __name__ == "__main__":
+    test_rephrased_payloads_share_a_key()
+    test_negative_answers_use_the_shorter_ttl()
+    test_lru_bounds_on_entries_and_bytes()
+    test_rephrased_product_search_skips_upstream()
+    test_upstream_failures_are_never_negative_cached()
+    test_identifier_lookups_never_share_a_cached_order()
+    test_asgi_identifier_lookups_never_share_a_cached_order()
+    print("✅ All tool cache tests passed")
@@ -0,0 +1,148 @@
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from kb_mirror import STOPWORDS
+
+# "45mm", "29.99", "v2" stay whole; everything else separates tokens
+_TOKEN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+_UNSET = ("", "any", "all", "none")
+
+
+def canonical_value(value):
+    """
+    One payload value in canonical form: numbers normalized ("5", 5 and 5.0
+    agree), text lowercased with stopwords dropped and tokens sorted, so
+    "black leather band 45mm" and "45mm leather black band" agree. None for
+    values that mean "no constraint".
+    """
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    text = str(value).strip().lower()
+    if text in _UNSET:
+        return None
+    try:
+        number = float(text)
+        return f"{number:.6f}".rstrip('0').rstrip('.')
+    except ValueError:
+        pass
+    tokens = sorted(token for token in _TOKEN.findall(text) if token not in STOPWORDS)
+    # A value made only of stopwords still has to differ from "not given"
+    return ' '.join(tokens) or text
+
+
+def canonical_payload(data, fields):
+    """Stable key for the `fields` of a tool payload (others don't change the answer)"""
+    parts = []
+    for field in fields:
+        value = canonical_value((data or {}).get(field))
+        if value is not None:
+            parts.append(f"{field}={value}")
+    return '&'.join(parts)
+
+
+class ToolCache:
+    """
+    Whole tool responses for idempotent endpoints, keyed on the canonical payload.
+
+    `fields` lists, per endpoint, the payload fields that change its answer;
+    endpoints without an entry are never cached. Successful answers live for
+    the endpoint's `ttls` seconds, "nothing found" answers (404s and empty
+    result lists) for its `negative_ttls`. Stale, error and rate-limited
+    answers are not stored. Bounded by `max_entries` and `max_bytes`, evicting
+    the least recently used.
+    """
+
+    def __init__(self, fields, ttls, negative_ttls, max_entries, max_bytes):
+        self.fields = dict(fields)
+        self.ttls = dict(ttls)
+        self.negative_ttls = dict(negative_ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._counts = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, endpoint, data):
+        """Cache key for a payload, or None if the endpoint isn't cached"""
+        fields = self.fields.get(endpoint)
+        if fields is None:
+            return None
+        canonical = canonical_payload(data, fields)
+        # Nothing left to key on: "none" and a missing field answer differently upstream
+        if not canonical:
+            return None
+        return (endpoint, canonical)
+
+    def get(self, key):
+        """(body, status) of a live cached answer, or None"""
+        if key is None:
+            return None
+        with self._lock:
+            counts = self._count(key[0])
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            counts["hits"] += 1
+            if entry[3]:
+                counts["negative_hits"] += 1
+            body, status = json.loads(entry[1]), entry[2]
+        return body, status
+
+    def put(self, key, body, status):
+        """Remember an answer if it is a cacheable success or "nothing found" for its endpoint"""
+        if key is None or not isinstance(body, dict) or body.get("stale"):
+            return
+        negative = status == 404 or (status == 200 and body.get("count") == 0)
+        if status not in (200, 404):
+            return
+        ttl = (self.negative_ttls if negative else self.ttls).get(key[0], 0)
+        if ttl <= 0:
+            return
+        encoded = json.dumps(body, separators=(',', ':'), default=str)
+        if len(encoded) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + ttl, encoded, status, negative)
+            self.bytes += len(encoded)
+            self._count(key[0])["stores"] += 1
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= len(entry[1])
+
+    def _count(self, endpoint):
+        return self._counts.setdefault(endpoint, {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0})
+
+    def stats(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, counts in self._counts.items():
+                lookups = counts["hits"] + counts["misses"]
+                endpoints[endpoint] = dict(counts, hit_rate=round(counts["hits"] / lookups, 3) if lookups else None)
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "endpoints": endpoints,
+                "ttls": dict(self.ttls),
+                "negative_ttls": dict(self.negative_ttls)
+            }